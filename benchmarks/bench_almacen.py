@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del almacenamiento local de los datos: fichero HDF5 único (reescrito completo en cada grabación y leído
+completo en cada consulta) frente al almacén particionado por meses (`esiosdata.particiones`), en HDF5 y en Parquet.
+
+Sobre un histórico sintético de datos diezminutales de demanda, mide:
+- la grabación tras añadir un día nuevo (actualización),
+- la consulta de 3 días y 2 columnas (como `esiosdata -d -i dem eol 2016-03-01 2016-03-03`).
+
+Uso:
+```
+    python benchmarks/bench_almacen.py --years 8
+```
+
+@author: Eugenio Panadero
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _mide(func, repeticiones=3):
+    """Mejor tiempo de `repeticiones` ejecuciones de `func`."""
+    tiempos = []
+    for _ in range(repeticiones):
+        tic = time.time()
+        func()
+        tiempos.append(time.time() - tic)
+    return min(tiempos)
+
+
+def bench_almacen(data, data_new, consulta, dir_test):
+    """Grabación tras añadir un día y consulta de un intervalo corto, con cada backend de almacenamiento."""
+    import pandas as pd
+    from esiosdata.particiones import AlmacenParticionado, HAY_PYARROW, meses_index
+
+    t0, tf, cols = consulta
+    path_h5 = os.path.join(dir_test, 'store.h5')
+    data.to_hdf(path_h5, key='data', mode='w')
+    resultados = [('HDF5 único', _mide(lambda: data_new.to_hdf(path_h5, key='data', mode='w')),
+                   _mide(lambda: pd.read_hdf(path_h5, 'data').loc[t0:tf, cols]))]
+    meses_nuevos = set(meses_index(data_new.index[len(data):], data.index.tz))
+    for formato in ['hdf', 'parquet'] if HAY_PYARROW else ['hdf']:
+        almacen = AlmacenParticionado(os.path.join(dir_test, formato), data.index.tz, formato=formato)
+        almacen.escribe('data', data)
+
+        def _graba():
+            almacen.escribe('data', data, meses_nuevos)  # Se alterna el último mes: siempre hay que reescribirlo
+            almacen.escribe('data', data_new, meses_nuevos)
+
+        resultados.append(('particionado ({})'.format(formato), _mide(_graba) / 2,
+                           _mide(lambda: almacen.lee('data', t0, tf, columns=cols))))
+    return resultados
+
+
+def main_bench():
+    """Genera el histórico sintético y ejecuta los benchmarks de almacenamiento."""
+    p = argparse.ArgumentParser(description='Benchmark del almacenamiento: HDF5 único vs particionado por meses')
+    p.add_argument('--years', action='store', type=int, default=8, help='Años de histórico diezminutal')
+    p.add_argument('--columnas', action='store', type=int, default=17, help='Nº de columnas de datos')
+    args = p.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import numpy as np
+    import pandas as pd
+    from esiosdata.esios_config import TZ, INDICADORES_DEM
+
+    cols = (list(INDICADORES_DEM.keys()) + ['c{}'.format(i) for i in range(args.columnas)])[:args.columnas]
+    index = pd.date_range('2015-01-01', periods=args.years * 52560 + 144, freq='10min', tz=TZ)
+    data_new = pd.DataFrame(np.random.rand(len(index), len(cols)), index=index, columns=cols)
+    data = data_new.iloc[:-144]
+    consulta = ('2016-03-01', '2016-03-03', cols[:2])
+    dir_test = tempfile.mkdtemp()
+    try:
+        resultados = bench_almacen(data, data_new, consulta, dir_test)
+    finally:
+        shutil.rmtree(dir_test)
+
+    print('Histórico: {} filas x {} columnas ({} años)'.format(len(data), len(cols), args.years))
+    print('{:<28}{:>18}{:>18}'.format('BENCHMARK', 'GRABACIÓN (s)', 'CONSULTA (s)'))
+    for nombre, t_graba, t_consulta in resultados:
+        print('{:<28}{:>18.4f}{:>18.4f}'.format(nombre, t_graba, t_consulta))
+    return resultados
+
+
+if __name__ == '__main__':
+    main_bench()
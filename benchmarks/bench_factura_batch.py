@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la facturación por lotes (`esiosdata.facturabatch.FacturaBatch`, vectorizada sobre la matriz de consumo
+CUPS × horas) frente a una `FacturaElec` por suministro, con PVPC sintético del servidor local de pruebas
+(`esiosdata.standin`). Comprueba también que ambas dan las mismas facturas (`to_dict()`). Mide además la comparativa
+de los tres peajes para un consumo (`compara_tarifas`) frente a una `FacturaElec` por peaje.
+
+Uso:
+```
+    python benchmarks/bench_factura_batch.py --cups 5000 --comparar 200
+```
+El servidor local y un directorio de almacenamiento temporal se configuran (`ESIOS_SERVER`, `ESIOS_STORAGE_DIR`)
+antes de importar `esiosdata`, por lo que el benchmark nunca toca los datos locales del usuario.
+
+@author: Eugenio Panadero
+"""
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _mide(func, repeticiones=1):
+    """Ejecuta `func` y devuelve (resultado, segs), con el mejor tiempo de las repeticiones."""
+    tiempos = []
+    for _ in range(repeticiones):
+        tic = time.time()
+        resultado = func()
+        tiempos.append(time.time() - tic)
+    return resultado, min(tiempos)
+
+
+def main_bench():
+    """Lanza el servidor local y compara ambas facturaciones sobre consumos horarios aleatorios."""
+    p = argparse.ArgumentParser(description='Benchmark de la facturación por lotes de esiosdata')
+    p.add_argument('--cups', action='store', type=int, default=5000, help='Nº de suministros facturados')
+    p.add_argument('--comparar', action='store', type=int, default=200,
+                   help='Nº de suministros facturados también con FacturaElec (para el tiempo por CUPS)')
+    p.add_argument('--desde', action='store', default='2016-10-01', help='Día de lectura inicial (excluido)')
+    p.add_argument('--dias', action='store', type=int, default=31, help='Días facturados')
+    args = p.parse_args()
+
+    port = _puerto_libre()
+    storage_dir = tempfile.mkdtemp(prefix='esiosdata_bench_')
+    os.environ['ESIOS_SERVER'] = 'http://127.0.0.1:{}'.format(port)
+    os.environ['ESIOS_STORAGE_DIR'] = storage_dir
+    os.environ.setdefault('ESIOS_TOKEN', 'standin')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import numpy as np
+    import pandas as pd
+    from esiosdata.standin import ServidorESIOSLocal
+
+    servidor = ServidorESIOSLocal(port=port).start()
+    try:
+        from esiosdata.cachepvpc import CACHE_PVPC
+        from esiosdata.esios_config import TZ
+        from esiosdata.facturapvpc import FacturaElec, TIPOS_PEAJES, ZONAS_IMPUESTOS
+        from esiosdata.facturabatch import FacturaBatch, compara_tarifas
+
+        t0 = pd.Timestamp(args.desde)
+        horas = pd.date_range(t0 + pd.Timedelta('1D'), t0 + pd.Timedelta(days=args.dias + 1), freq='h', tz=TZ,
+                              inclusive='left')
+        rs = np.random.RandomState(42)
+        cups = ['ES{:016d}XX'.format(i) for i in range(args.cups)]
+        consumos = pd.DataFrame(rs.gamma(1.5, .3, (args.cups, len(horas))), index=cups, columns=horas)
+        contratos = pd.DataFrame(dict(tipo_peaje=rs.choice(TIPOS_PEAJES, args.cups),
+                                      potencia_contratada=rs.choice([3.3, 3.45, 4.6, 5.75], args.cups),
+                                      con_bono_social=rs.rand(args.cups) < .1,
+                                      zona_impuestos=rs.choice(ZONAS_IMPUESTOS, args.cups)), index=cups)
+        CACHE_PVPC.datos(horas[0].tz_localize(None), horas[-1].tz_localize(None))
+
+        facturas, t_batch = _mide(lambda: FacturaBatch(consumos, contratos).facturas)
+
+        def _facturas_individuales():
+            dicts = []
+            for c in cups[:args.comparar]:
+                params = contratos.loc[c]
+                dicts.append(FacturaElec(consumo=consumos.loc[c].rename('kWh'), cups=c,
+                                         tipo_peaje=params['tipo_peaje'],
+                                         potencia_contratada=float(params['potencia_contratada']),
+                                         con_bono_social=bool(params['con_bono_social']),
+                                         zona_impuestos=params['zona_impuestos']).to_dict())
+            return dicts
+
+        dicts, t_elec = _mide(_facturas_individuales)
+        assert dicts == facturas.iloc[:args.comparar].to_dict(orient='records')
+
+        consumo = consumos.iloc[0].rename('kWh')
+        comparativa, t_comparativa = _mide(lambda: compara_tarifas(consumo), 20)
+        totales, t_comparativa_elec = _mide(
+            lambda: {peaje: FacturaElec(consumo=consumo, tipo_peaje=peaje).coste_total for peaje in TIPOS_PEAJES}, 20)
+        assert totales == comparativa['total_factura'].to_dict()
+    finally:
+        servidor.stop()
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+    n = len(dicts)
+    print('Facturas de {} días ({} horas), {} CUPS (FacturaElec: {} CUPS, idénticas)'
+          .format(args.dias, len(horas), args.cups, n))
+    print('{:<16}{:>12}{:>16}{:>12}'.format('MÉTODO', 'SEGS', 'MS / CUPS', 'SPEED-UP'))
+    print('{:<16}{:>12.3f}{:>16.4f}{:>12}'.format('FacturaElec', t_elec, 1000 * t_elec / n, ''))
+    speedup = (t_elec / n) / (t_batch / args.cups)
+    print('{:<16}{:>12.3f}{:>16.4f}{:>11.1f}x'.format('FacturaBatch', t_batch, 1000 * t_batch / args.cups, speedup))
+    print('\nComparativa de peajes ({}): 3 x FacturaElec {:.2f} ms, compara_tarifas {:.2f} ms ({:.1f}x)'
+          .format(', '.join(comparativa.index), 1000 * t_comparativa_elec, 1000 * t_comparativa,
+                  t_comparativa_elec / t_comparativa))
+    return t_elec / n, t_batch / args.cups, t_comparativa_elec, t_comparativa
+
+
+if __name__ == '__main__':
+    main_bench()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de ingestión (días / segundo) contra el servidor local de pruebas (`esiosdata.standin`).
+
+Mide, sin red ni token, el rendimiento de:
+* `pvpc_data_dia(d0, df)`: descarga y procesado de un intervalo de días de PVPC.
+* `dem_data_dia(d0, df)`: ídem para los datos de demanda (4 peticiones JSONP por día).
+* `dem_range(d0, df)` frente a `dem_range_indicadores(d0, df)`: demanda con el motor asíncrono, por archivos diarios
+  o por indicadores (varios meses de datos por petición).
+* `PVPC(force_update=True)`: reconstrucción completa del store local de PVPC (desde `DATE_INI_PVPC`).
+
+Uso:
+```
+    python benchmarks/bench_ingestion.py --dias 60 --latencia .02 --jitter .02 --errores .01
+```
+El servidor local y un directorio de almacenamiento temporal se configuran (`ESIOS_SERVER`, `ESIOS_STORAGE_DIR`)
+antes de importar `esiosdata`, por lo que el benchmark nunca toca los datos locales del usuario.
+
+@author: Eugenio Panadero
+"""
+import argparse
+import datetime as dt
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _mide(nombre, func, num_dias, repeticiones=1, servidor=None):
+    """Ejecuta `func` y devuelve (nombre, nº días, segs, días/seg, nº peticiones por ejecución) con el mejor tiempo
+    de las repeticiones."""
+    tiempos = []
+    num_peticiones = servidor.num_peticiones if servidor is not None else 0
+    for _ in range(repeticiones):
+        tic = time.time()
+        func()
+        tiempos.append(time.time() - tic)
+    toc = min(tiempos)
+    if servidor is not None:
+        num_peticiones = (servidor.num_peticiones - num_peticiones) // repeticiones
+    return nombre, num_dias, toc, num_dias / toc if toc > 0 else float('nan'), num_peticiones
+
+
+def main_bench():
+    """Lanza el servidor local y ejecuta los benchmarks de ingestión."""
+    p = argparse.ArgumentParser(description='Benchmark de ingestión de esiosdata contra un servidor local')
+    p.add_argument('--dias', action='store', type=int, default=30, help='Nº de días de los intervalos')
+    p.add_argument('--latencia', action='store', type=float, default=0., help='Latencia fija por petición (s)')
+    p.add_argument('--jitter', action='store', type=float, default=0., help='Latencia aleatoria adicional (s)')
+    p.add_argument('--errores', action='store', type=float, default=0., help='Tasa de errores HTTP 503/429 (0-1)')
+    p.add_argument('--repeticiones', action='store', type=int, default=1)
+    p.add_argument('--sin-rebuild', action='store_true', help='No medir la reconstrucción completa de PVPC')
+    args = p.parse_args()
+
+    # La configuración se lee al importar `esiosdata`, así que el puerto se reserva antes de cualquier import:
+    port = _puerto_libre()
+    storage_dir = tempfile.mkdtemp(prefix='esiosdata_bench_')
+    os.environ['ESIOS_SERVER'] = 'http://127.0.0.1:{}'.format(port)
+    os.environ['ESIOS_STORAGE_DIR'] = storage_dir
+    os.environ.setdefault('ESIOS_TOKEN', 'standin')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from esiosdata.standin import ServidorESIOSLocal
+
+    servidor = ServidorESIOSLocal(port=port, latencia=args.latencia, jitter=args.jitter,
+                                  tasa_errores=args.errores).start()
+    try:
+        from esiosdata.aio import LOOP_DESCARGAS, dem_range, dem_range_indicadores
+        from esiosdata.esios_config import DATE_INI_PVPC
+        from esiosdata.importdemdata import dem_data_dia
+        from esiosdata.importpvpcdata import pvpc_data_dia
+        from esiosdata import PVPC
+
+        df = dt.date.today() - dt.timedelta(days=1)
+        d0 = df - dt.timedelta(days=args.dias - 1)
+        str_d0, str_df = d0.strftime('%Y-%m-%d'), df.strftime('%Y-%m-%d')
+        servidor.precalcula(d0, df)
+        resultados = [_mide('pvpc_data_dia', lambda: pvpc_data_dia(str_d0, str_df), args.dias, args.repeticiones,
+                            servidor),
+                      _mide('dem_data_dia', lambda: dem_data_dia(str_d0, str_df), args.dias, args.repeticiones,
+                            servidor),
+                      _mide('dem_range', lambda: LOOP_DESCARGAS.run(dem_range, d0=str_d0, df=str_df, verbose=False),
+                            args.dias, args.repeticiones, servidor),
+                      _mide('dem_range_indicadores',
+                            lambda: LOOP_DESCARGAS.run(dem_range_indicadores, d0=str_d0, df=str_df, verbose=False),
+                            args.dias, args.repeticiones, servidor)]
+        if not args.sin_rebuild:
+            dias_rebuild = (dt.date.today() + dt.timedelta(days=1) - dt.datetime.strptime(
+                DATE_INI_PVPC, '%Y-%m-%d').date()).days + 1
+            resultados.append(_mide('PVPC(force_update=True)', lambda: PVPC(force_update=True, verbose=False),
+                                    dias_rebuild, args.repeticiones, servidor))
+    finally:
+        servidor.stop()
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+    print('\nServidor local: latencia={}s, jitter={}s, errores={:.1%} -> {} peticiones ({} errores simulados)'
+          .format(args.latencia, args.jitter, args.errores, servidor.num_peticiones, servidor.num_errores))
+    print('{:<28}{:>8}{:>12}{:>12}{:>12}'.format('BENCHMARK', 'DÍAS', 'SEGS', 'DÍAS/SEG', 'PETICIONES'))
+    for nombre, num_dias, toc, dias_seg, num_peticiones in resultados:
+        print('{:<28}{:>8}{:>12.3f}{:>12.1f}{:>12}'.format(nombre, num_dias, toc, dias_seg, num_peticiones))
+    return resultados
+
+
+if __name__ == '__main__':
+    main_bench()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del ensamblado de los datos de muchos días: DataFrames por día + fusión (`merge_data`, como en la
+actualización día a día) frente al procesado por lotes con buffers preasignados (`esiosdata.lotes`).
+
+Mide tiempo total y pico de memoria (`tracemalloc`) sobre respuestas sintéticas de `esiosdata.standin`, sin red.
+
+Uso:
+```
+    python benchmarks/bench_lotes.py --dias 365 --dias-lote 31
+```
+
+@author: Eugenio Panadero
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _mide_memoria(nombre, func, num_dias):
+    """Ejecuta `func` y devuelve (nombre, nº días, segs, pico de memoria en MB)."""
+    tracemalloc.start()
+    tic = time.time()
+    func()
+    toc = time.time() - tic
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return nombre, num_dias, toc, pico / 1024 ** 2
+
+
+def bench_lotes(responses_pvpc, responses_dem, dias_por_lote):
+    """Ensamblado por días (merge de DataFrames diarios) vs por lotes, para PVPC y demanda."""
+    from dataweb.mergedataweb import merge_data
+    from esiosdata.importdemdata import dem_procesa_datos_dia, dem_procesa_lote
+    from esiosdata.importpvpcdata import pvpc_procesa_datos_dia, pvpc_procesa_lote
+    from esiosdata.lotes import procesa_por_lotes
+
+    def _por_dias(responses, func_procesa_data_dia):
+        data_dias = [func_procesa_data_dia(k, responses[k])[0] for k in sorted(responses.keys())]
+        return merge_data([d for d in data_dias if d is not None])
+
+    n_pvpc, n_dem = len(responses_pvpc), len(responses_dem)
+    return [_mide_memoria('pvpc por días + merge_data',
+                          lambda: _por_dias(responses_pvpc, lambda k, r: pvpc_procesa_datos_dia(k, r, verbose=False)),
+                          n_pvpc),
+            _mide_memoria('pvpc por lotes', lambda: procesa_por_lotes(responses_pvpc, pvpc_procesa_lote,
+                                                                      dias_por_lote), n_pvpc),
+            _mide_memoria('dem por días + merge_data', lambda: _por_dias(responses_dem, dem_procesa_datos_dia),
+                          n_dem),
+            _mide_memoria('dem por lotes', lambda: procesa_por_lotes(responses_dem, dem_procesa_lote,
+                                                                     dias_por_lote), n_dem)]
+
+
+def main_bench():
+    """Genera las respuestas sintéticas y ejecuta los benchmarks de ensamblado."""
+    p = argparse.ArgumentParser(description='Benchmark del ensamblado por días vs por lotes')
+    p.add_argument('--dias', action='store', type=int, default=365, help='Nº de días a procesar')
+    p.add_argument('--desde', action='store', default='2016-01-01', help='Día inicial (YYYY-MM-DD)')
+    p.add_argument('--dias-lote', action='store', type=int, default=31, help='Nº de días por lote')
+    args = p.parse_args()
+
+    os.environ.setdefault('ESIOS_TOKEN', 'standin')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import pandas as pd
+    from esiosdata.standin import payload_pvpc_dia, payload_dem_dia
+
+    dias = [d.strftime('%Y-%m-%d') for d in pd.date_range(args.desde, periods=args.dias)]
+    responses_pvpc = {d: payload_pvpc_dia(d) for d in dias}
+    responses_dem = {d: [payload_dem_dia(d, a) for a in (117, 116, 115, 114)] for d in dias}
+    resultados = bench_lotes(responses_pvpc, responses_dem, args.dias_lote)
+
+    print('{:<32}{:>8}{:>12}{:>12}{:>14}'.format('BENCHMARK', 'DÍAS', 'SEGS', 'DÍAS/SEG', 'PICO MEM (MB)'))
+    for nombre, num_dias, toc, pico in resultados:
+        print('{:<32}{:>8}{:>12.3f}{:>12.1f}{:>14.1f}'.format(nombre, num_dias, toc, num_dias / toc, pico))
+    return resultados
+
+
+if __name__ == '__main__':
+    main_bench()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del procesado (parsing) de las respuestas de ESIOS, sin red, con las respuestas sintéticas del servidor
+local de pruebas (`esiosdata.standin`).
+
+Uso:
+```
+    python benchmarks/bench_parsers.py --dias 365
+```
+
+@author: Eugenio Panadero
+"""
+import argparse
+import os
+import sys
+import time
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _mide(nombre, func, num_dias, repeticiones=3):
+    """Ejecuta `func` y devuelve (nombre, nº días, segs, días/seg) con el mejor tiempo de las repeticiones."""
+    tiempos = []
+    for _ in range(repeticiones):
+        tic = time.time()
+        func()
+        tiempos.append(time.time() - tic)
+    toc = min(tiempos)
+    return nombre, num_dias, toc, num_dias / toc if toc > 0 else float('nan')
+
+
+def _legacy_pvpc_hourly_data(df):
+    """Referencia: procesado anterior de PVPC (`strptime` por fila y conversión a float celda a celda)."""
+    import datetime as dt
+    import pandas as pd
+    from esiosdata.esios_config import TZ
+
+    if len(df) == 25 or len(df) == 23:
+        fecha = dt.datetime.strptime(df['Dia'][0], '%d/%m/%Y')
+        df['fecha'] = pd.date_range(start=fecha, periods=len(df), freq='h', tz=TZ)
+    else:
+        df['fecha'] = pd.DatetimeIndex([dt.datetime.strptime(x, '%d/%m/%Y %H')
+                                        for x in df['Dia'].str.cat(df['Hora'].str.slice(0, 2), sep=' ')]
+                                       ).tz_localize(TZ)
+    df = df.drop(['Dia', 'Hora'], axis=1).set_index('fecha').sort_index()
+    return df.apply(lambda col: col.apply(lambda x: float(x.replace('.', '').replace(',', '.'))))
+
+
+def _legacy_dem_ts_data(data):
+    """Referencia: procesado anterior de las series de demanda (`pd.Timestamp` por fila, con excepción en días DST)."""
+    import pandas as pd
+    from esiosdata.esios_config import TZ
+
+    df = pd.DataFrame(data)
+    try:
+        return pd.DataFrame(df.set_index(pd.DatetimeIndex(df['ts'].apply(lambda x: pd.Timestamp(x, tz=TZ)),
+                                                          freq='10min'), verify_integrity=True)
+                            .drop('ts', axis=1)).sort_index().apply(lambda col: col.apply(float))
+    except ValueError:
+        df['ts'] = pd.date_range(start=pd.Timestamp(df['ts'].iloc[0]), periods=len(df), freq='10min', tz=TZ)
+        return df.set_index('ts', verify_integrity=True).sort_index().apply(lambda col: col.apply(float))
+
+
+def bench_pvpc(responses, repeticiones=3):
+    """Procesado de respuestas del archivo 70 de PVPC: día a día y todos los días en una sola llamada."""
+    import pandas as pd
+    from esiosdata.importpvpcdata import pvpc_procesa_datos_dia, pvpc_procesa_datos_dias
+
+    return [_mide('pvpc (referencia anterior)', lambda: [_legacy_pvpc_hourly_data(pd.DataFrame(r['PVPC']))
+                                                         for r in responses.values()],
+                  len(responses), repeticiones),
+            _mide('pvpc_procesa_datos_dia', lambda: [pvpc_procesa_datos_dia(k, r, verbose=False)
+                                                     for k, r in responses.items()],
+                  len(responses), repeticiones),
+            _mide('pvpc_procesa_datos_dias', lambda: pvpc_procesa_datos_dias(responses, verbose=False),
+                  len(responses), repeticiones)]
+
+
+def bench_dem(responses, repeticiones=3):
+    """Procesado de las series diezminutales de demanda (archivos 115 y 114)."""
+    from esiosdata.importdemdata import _extract_func_json_data, _import_json_ts_data
+
+    series = [_extract_func_json_data(r)[1] for resp in responses.values() for r in resp]
+    return [_mide('dem_ts (referencia anterior)', lambda: [_legacy_dem_ts_data(data) for data in series],
+                  len(responses), repeticiones),
+            _mide('_import_json_ts_data', lambda: [_import_json_ts_data(data) for data in series],
+                  len(responses), repeticiones)]
+
+
+def _legacy_extract_jsonp(data_raw):
+    """Referencia: extracción anterior del JSONP (regex sobre toda la respuesta + json.loads + pd.DataFrame)."""
+    import json
+    import re
+    import pandas as pd
+
+    busca = re.compile(r'(?P<func>.*)\((?P<json>.*)\);').match(data_raw).groupdict()
+    data = json.loads(busca['json'])
+    return busca['func'], pd.DataFrame(data[list(data.keys())[0]])
+
+
+def bench_jsonp(payloads, num_dias, nombre_tamanyo, repeticiones=3):
+    """Extracción y decodificación a columnas de respuestas JSONP de demanda."""
+    from esiosdata.importdemdata import _extract_func_json_data, _columnas_registros, JSON_BACKEND
+
+    def _nuevo():
+        for raw in payloads:
+            _, data = _extract_func_json_data(raw)
+            _columnas_registros(data)
+
+    kb = sum(len(p) for p in payloads) / len(payloads) / 1024
+    sufijo = ' [{}, {:.0f} KB]'.format(nombre_tamanyo, kb)
+    return [_mide('jsonp (referencia)' + sufijo, lambda: [_legacy_extract_jsonp(raw) for raw in payloads],
+                  num_dias, repeticiones),
+            _mide('jsonp ({})'.format(JSON_BACKEND) + sufijo, _nuevo, num_dias, repeticiones)]
+
+
+def _payload_dem_mes(dias):
+    """Respuesta JSONP grande: la serie de generación de varios días en una sola respuesta."""
+    import json
+    from esiosdata.standin import payload_dem_dia
+    from esiosdata.importdemdata import _extract_func_json_data
+
+    valores = [r for d in dias for r in _extract_func_json_data(payload_dem_dia(d, 115))[1]]
+    return 'IND_DemandaRealGen({});'.format(json.dumps({'valoresHorariosGeneracion': valores}))
+
+
+def main_bench():
+    """Genera las respuestas sintéticas y ejecuta los benchmarks de procesado."""
+    p = argparse.ArgumentParser(description='Benchmark del procesado de respuestas de ESIOS')
+    p.add_argument('--dias', action='store', type=int, default=365, help='Nº de días a procesar')
+    p.add_argument('--desde', action='store', default='2016-01-01', help='Día inicial (YYYY-MM-DD)')
+    p.add_argument('--repeticiones', action='store', type=int, default=3)
+    args = p.parse_args()
+
+    os.environ.setdefault('ESIOS_TOKEN', 'standin')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import pandas as pd
+    from esiosdata.standin import payload_pvpc_dia, payload_dem_dia
+
+    dias = [d.strftime('%Y-%m-%d') for d in pd.date_range(args.desde, periods=args.dias)]
+    resultados = bench_pvpc({d: payload_pvpc_dia(d) for d in dias}, args.repeticiones)
+    resultados += bench_jsonp([payload_dem_dia(d, 115) for d in dias], len(dias), '1 día', args.repeticiones)
+    resultados += bench_jsonp([_payload_dem_mes(dias[i:i + 31]) for i in range(0, len(dias), 31)],
+                              len(dias), '31 días', args.repeticiones)
+    resultados += bench_dem({d: [payload_dem_dia(d, 115), payload_dem_dia(d, 114)] for d in dias},
+                            args.repeticiones)
+
+    print('{:<44}{:>8}{:>12}{:>12}'.format('BENCHMARK', 'DÍAS', 'SEGS', 'DÍAS/SEG'))
+    for nombre, num_dias, toc, dias_seg in resultados:
+        print('{:<44}{:>8}{:>12.3f}{:>12.1f}'.format(nombre, num_dias, toc, dias_seg))
+    return resultados
+
+
+if __name__ == '__main__':
+    main_bench()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la asignación de periodos tarifarios de la discriminación horaria (2.0DHA y 2.0DHS) a las horas de una
+factura: calendario horario anual en caché unido por posición (`esiosdata.calendarioperiodos`), frente a las máscaras
+anteriores de `FacturaElec` (varios `indexer_between_time`, `union`/`intersection` de índices y el horario de
+verano hora a hora con `[x.dst() ... for x in tt]`).
+
+Uso:
+```
+    python benchmarks/bench_periodos.py --dias 60
+```
+
+@author: Eugenio Panadero
+"""
+import argparse
+import os
+import sys
+import time
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _mide(func, repeticiones=5):
+    """Mejor tiempo de `repeticiones` ejecuciones de `func`."""
+    tiempos = []
+    for _ in range(repeticiones):
+        tic = time.time()
+        func()
+        tiempos.append(time.time() - tic)
+    return min(tiempos)
+
+
+def _legacy_asigna_periodos(series, num_periodos):
+    """Referencia: máscaras de periodos anteriores de `FacturaElec._asigna_periodos_discr_horaria`."""
+    import pandas as pd
+
+    df = pd.DataFrame(series)
+    tt = df.index
+
+    def _entre(h_ini, h_fin):
+        return tt[tt.indexer_between_time(h_ini, h_fin, include_start=True, include_end=False)]
+
+    idx_13_23h = _entre('13:00', '23:00')
+    if num_periodos == 3:
+        df['P1'] = df['P2'] = df['P3'] = False
+        df.loc[idx_13_23h, 'P1'] = True
+        df.loc[_entre('23:00', '01:00').union(_entre('07:00', '13:00')), 'P2'] = True
+        df.loc[_entre('01:00', '07:00'), 'P3'] = True
+    else:
+        idx_verano = tt[[x.dst().total_seconds() > 0 for x in tt]]
+        idx_invierno = tt[[x.dst().total_seconds() == 0 for x in tt]]
+        df['P1'] = df['P2'] = False
+        df.loc[idx_13_23h.intersection(idx_verano), 'P1'] = True
+        df.loc[_entre('23:00', '13:00').intersection(idx_verano), 'P2'] = True
+        df.loc[_entre('12:00', '22:00').intersection(idx_invierno), 'P1'] = True
+        df.loc[_entre('22:00', '12:00').intersection(idx_invierno), 'P2'] = True
+    return df
+
+
+def main_bench():
+    """Compara (y comprueba que coinciden) ambas asignaciones de periodos sobre el consumo horario de una factura."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    p = argparse.ArgumentParser(description='Benchmark de la asignación de periodos de discriminación horaria')
+    p.add_argument('--dias', action='store', type=int, default=60, help='Días de la factura')
+    p.add_argument('--desde', action='store', default='2016-02-15', help='Día inicial de la factura')
+    p.add_argument('--repeticiones', action='store', type=int, default=5, help='Repeticiones de cada medida')
+    args = p.parse_args()
+
+    import numpy as np
+    import pandas as pd
+    from esiosdata.esios_config import TZ
+    from esiosdata.calendarioperiodos import periodos_horarios
+
+    index = pd.date_range(args.desde, periods=args.dias, freq='D', tz=TZ)
+    index = pd.date_range(index[0], index[-1] + pd.Timedelta(days=1), freq='h', inclusive='left')
+    consumo = pd.Series(np.random.rand(len(index)), index=index, name='kWh')
+    print('Factura: {} horas ({} días desde {})'.format(len(index), args.dias, args.desde))
+    print('{:<12}{:>18}{:>18}{:>12}'.format('PEAJE', 'MÁSCARAS (s)', 'CALENDARIO (s)', 'SPEED-UP'))
+    resultados = []
+    for peaje, num_periodos in [('2.0DHA', 2), ('2.0DHS', 3)]:
+        ref = _legacy_asigna_periodos(consumo, num_periodos)
+        codigos = periodos_horarios(index, num_periodos)
+        for i in range(num_periodos):
+            assert (ref['P{}'.format(i + 1)].values == (codigos == i + 1)).all()
+        t_ref = _mide(lambda: _legacy_asigna_periodos(consumo, num_periodos), args.repeticiones)
+        t_cal = _mide(lambda: periodos_horarios(index, num_periodos), args.repeticiones)
+        print('{:<12}{:>18.5f}{:>18.5f}{:>11.1f}x'.format(peaje, t_ref, t_cal, t_ref / t_cal))
+        resultados.append((peaje, t_ref, t_cal))
+    return resultados
+
+
+if __name__ == '__main__':
+    main_bench()
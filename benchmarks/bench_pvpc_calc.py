@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del cálculo de las columnas derivadas de PVPC (€/kWh, TCU, CP, PD_) con `pvpc_calc_tcu_cp_feu_d`, sobre
+el histórico horario completo (desde `DATE_INI_PVPC` hasta hoy), con los datos sintéticos del servidor local de
+pruebas (`esiosdata.standin`), frente al cálculo anterior con pandas (agrupación de columnas por tarifa y FEU con
+`groupby('TEU' + tarifa).apply`).
+
+Uso:
+```
+    python benchmarks/bench_pvpc_calc.py
+```
+
+@author: Eugenio Panadero
+"""
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _mide(func, repeticiones=3):
+    """Mejor tiempo de `repeticiones` ejecuciones de `func`."""
+    tiempos = []
+    for _ in range(repeticiones):
+        tic = time.time()
+        func()
+        tiempos.append(time.time() - tic)
+    return min(tiempos)
+
+
+def _legacy_pvpc_calc_tcu_cp_feu_d(df, convert_kwh=True):
+    """Referencia: cálculo anterior con pandas (con `applymap` y `groupby(axis=1)` sustituidos por sus equivalentes
+    en las versiones actuales de pandas), con el FEU 'diario' agrupado por el valor del TEU."""
+    from esiosdata.esios_config import TARIFAS, COLS_PVPC
+
+    if convert_kwh:
+        cols_mwh = [c + t for c in COLS_PVPC for t in TARIFAS if c != 'COF']
+        df[cols_mwh] = df[cols_mwh].apply(lambda col: col.apply(lambda x: x / 1000.))
+    for k in TARIFAS:
+        g = df[[c + k for c in COLS_PVPC]]
+        df['TCU{}'.format(k)] = g[k] - g['TEU{}'.format(k)]
+        cols_cp = [c + k for c in COLS_PVPC if c not in ['', 'COF', 'TEU']]
+        df['CP{}'.format(k)] = g[cols_cp].sum(axis=1)
+        cols_k = ['TEU' + k, 'TCU' + k, 'COF' + k]
+        g = df[cols_k].groupby('TEU' + k)
+        pr = g.apply(lambda x: x['TCU' + k].dot(x['COF' + k]) / x['COF' + k].sum())
+        pr.name = 'PD_' + k
+        df = df.join(pr, on='TEU' + k, rsuffix='_r')
+        df['PD_' + k] += df['TEU' + k]
+    return df
+
+
+def historico_pvpc(desde, hasta):
+    """Histórico horario sintético de PVPC (27 columnas) entre dos días, con el formato del store."""
+    import pandas as pd
+    from esiosdata.importpvpcdata import pvpc_procesa_datos_dias
+    from esiosdata.standin import payload_pvpc_dia
+
+    dias = pd.date_range(desde, hasta, freq='D')
+    df, _ = pvpc_procesa_datos_dias([payload_pvpc_dia(d.date().isoformat()) for d in dias], verbose=False)
+    return df
+
+
+def main_bench():
+    """Genera el histórico sintético y compara los tiempos de cálculo."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from esiosdata.esios_config import DATE_INI_PVPC
+
+    p = argparse.ArgumentParser(description='Benchmark del cálculo de las columnas derivadas de PVPC')
+    p.add_argument('--desde', action='store', default=DATE_INI_PVPC, help='Día inicial del histórico')
+    p.add_argument('--hasta', action='store', default=dt.date.today().isoformat(), help='Día final del histórico')
+    p.add_argument('--repeticiones', action='store', type=int, default=3, help='Repeticiones de cada medida')
+    args = p.parse_args()
+
+    from esiosdata.importpvpcdata import pvpc_calc_tcu_cp_feu_d
+
+    df = historico_pvpc(args.desde, args.hasta)
+    t_ref = _mide(lambda: _legacy_pvpc_calc_tcu_cp_feu_d(df.copy()), args.repeticiones)
+    t_np = _mide(lambda: pvpc_calc_tcu_cp_feu_d(df, verbose=False), args.repeticiones)
+    print('Histórico: {} horas x {} columnas ({} -> {})'.format(len(df), df.shape[1], args.desde, args.hasta))
+    print('{:<36}{:>14}'.format('BENCHMARK', 'TIEMPO (s)'))
+    print('{:<36}{:>14.4f}'.format('pandas (referencia anterior)', t_ref))
+    print('{:<36}{:>14.4f}'.format('pvpc_calc_tcu_cp_feu_d (NumPy)', t_np))
+    print('Speed-up: x{:.1f}'.format(t_ref / t_np))
+    return t_ref, t_np
+
+
+if __name__ == '__main__':
+    main_bench()
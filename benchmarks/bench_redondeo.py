@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del redondeo a céntimos de importes: redondeo exacto en enteros sobre arrays (`esiosdata.redondeo`) frente
+al redondeo anterior de `FacturaElec._round`, valor a valor con `Decimal(str(v)).quantize(...)`. Comprueba también
+que ambos dan los mismos importes.
+
+Uso:
+```
+    python benchmarks/bench_redondeo.py --valores 1000000
+```
+
+@author: Eugenio Panadero
+"""
+import argparse
+import os
+import sys
+import time
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def _mide(func, repeticiones=3):
+    """Ejecuta `func` y devuelve (resultado, segs), con el mejor tiempo de las repeticiones."""
+    tiempos = []
+    for _ in range(repeticiones):
+        tic = time.time()
+        resultado = func()
+        tiempos.append(time.time() - tic)
+    return resultado, min(tiempos)
+
+
+def _legacy_round(valores):
+    """Referencia: redondeo anterior de `FacturaElec._round`, valor a valor."""
+    from decimal import Decimal, ROUND_HALF_UP
+
+    return [float(Decimal(str(v)).quantize(Decimal('1.11'), rounding=ROUND_HALF_UP)) for v in valores]
+
+
+def main_bench():
+    """Compara (y comprueba que coinciden) ambos redondeos sobre importes aleatorios, con empates de medio céntimo."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    p = argparse.ArgumentParser(description='Benchmark del redondeo a céntimos de esiosdata')
+    p.add_argument('--valores', action='store', type=int, default=1000000, help='Nº de importes redondeados')
+    args = p.parse_args()
+
+    import numpy as np
+    from esiosdata.redondeo import redondea
+
+    rs = np.random.RandomState(42)
+    valores = np.concatenate([rs.uniform(-500, 500, args.valores - args.valores // 4),
+                              rs.randint(-500000, 500000, args.valores // 4) / 1000])
+    lista = valores.tolist()
+    ref, t_ref = _mide(lambda: _legacy_round(lista), 1)
+    redondeados, t_arr = _mide(lambda: redondea(valores))
+    assert redondeados.tolist() == ref
+    print('Redondeo de {} importes (idénticos)'.format(len(valores)))
+    print('{:<12}{:>12}{:>12}'.format('DECIMAL (s)', 'ARRAY (s)', 'SPEED-UP'))
+    print('{:<12.4f}{:>12.4f}{:>11.1f}x'.format(t_ref, t_arr, t_ref / t_arr))
+    return t_ref, t_arr
+
+
+if __name__ == '__main__':
+    main_bench()
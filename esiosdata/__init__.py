@@ -7,6 +7,10 @@ Web Scraper para datos de demanda, producción y coste de la energía eléctrica
 from esiosdata.classdataesios import PVPC, DatosREE
 # noinspection PyUnresolvedReferences
 from esiosdata.facturapvpc import FacturaElec
+# noinspection PyUnresolvedReferences
+from esiosdata.facturabatch import FacturaBatch, compara_tarifas
+# noinspection PyUnresolvedReferences
+from esiosdata.zonas import DatosZonas
 
 
 __version__ = '0.6.10'
@@ -5,8 +5,10 @@ DataBase de datos de consumo eléctrico
 @author: Eugenio Panadero
 """
 import argparse
+import sys
 import pandas as pd
 from esiosdata.classdataesios import PVPC, DatosREE
+from esiosdata.zonas import DatosZonas
 from prettyprinting import print_secc, print_info, print_cyan, print_red
 
 
@@ -26,12 +28,17 @@ __maintainer__ = "Eugenio Panadero"
 def main_cli():
     """
      Actualiza la base de datos de PVPC/DEMANDA almacenados como dataframe en local,
-     creando una nueva si no existe o hubiere algún problema. Los datos registrados se guardan en HDF5
+     creando una nueva si no existe o hubiere algún problema. Los datos registrados se guardan en HDF5.
+     Con `esiosdata daemon ...`, mantiene los datos al día en segundo plano (ver `esiosdata.daemon`).
+     Las consultas (`-i`, sin actualizar) leen del almacén particionado sólo las columnas e intervalo pedidos.
     """
 
     def _get_parser_args():
         p = argparse.ArgumentParser(description='Gestor de DB de PVPC/DEMANDA (esios.ree.es)')
         p.add_argument('-d', '--dem', action='store_true', help='Selecciona BD de demanda (BD de PVPC por defecto)')
+        p.add_argument('-z', '--zonas', action='store', nargs='*',
+                       help="Con -d, actualiza en paralelo las BD de demanda de las zonas indicadas "
+                            "(PENINSULA, BALEARES, CANARIAS; todas por defecto) y muestra la demanda conjunta")
         p.add_argument('-i', '--info', action='store', nargs='*',
                        help="Muestra información de la BD seleccionada.      "
                             "* Puede usar intervalos temporales y nombres de columnas, "
@@ -54,15 +61,50 @@ def main_cli():
         except ValueError:
             pass
 
+    def _consulta(handler, cols, dates):
+        d_0, d_f = (dates * 2)[:2] if dates else (None, None)
+        if not dates and not cols:  # Últimos datos (sin leer todo el histórico)
+            ultimo = handler.almacen.ultimo(handler.masterkey) if handler.almacen_particionado else None
+            d_0 = ultimo - pd.Timedelta(days=2) if ultimo is not None else None
+        try:
+            return handler.lee_intervalo(d_0, d_f, columns=[c.upper() for c in cols] or None)
+        except KeyError as e:
+            print_red('NO SE PUEDE FILTRAR LA COLUMNA (Exception: {})'.format(e))
+            return handler.lee_intervalo(d_0, d_f)
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'daemon':
+        from esiosdata.daemon import main_daemon
+        return main_daemon(sys.argv[2:])
+
     args, parser = _get_parser_args()
     print_secc('ESIOS PVPC/DEMANDA')
-    if args.dem:
-        db_web = DatosREE(update=args.update, force_update=args.forceupdate, verbose=args.verbose)
+    # Consulta sin actualización: no se carga el histórico completo, sólo el intervalo y columnas pedidos
+    consulta = args.info is not None and not (args.update or args.forceupdate or args.plot)
+    if args.dem and args.zonas is not None:
+        db_web = DatosZonas(args.zonas or None, update=args.update, force_update=args.forceupdate,
+                            verbose=args.verbose)
+        data = db_web.datos()
+        consulta = False
+    elif args.dem:
+        db_web = DatosREE(update=args.update, force_update=args.forceupdate, verbose=args.verbose,
+                          carga_completa=not consulta)
+        data = db_web.data.get('data')
     else:
-        db_web = PVPC(update=args.update, force_update=args.forceupdate, verbose=args.verbose)
-    data = db_web.data['data']
+        db_web = PVPC(update=args.update, force_update=args.forceupdate, verbose=args.verbose,
+                      carga_completa=not consulta)
+        data = db_web.data.get('data')
     if args.info is not None:
-        if len(args.info) > 0:
+        if consulta:
+            cols = args.info.copy()
+            dates = [d for d in [_parse_date(s, cols) for s in args.info] if d]
+            data = _consulta(db_web, cols, dates)
+            if args.info:
+                print_info(data)
+            else:
+                print_secc('LAST 24h in DB:')
+                print_info(data.iloc[-24:])
+                print_cyan(data.columns)
+        elif len(args.info) > 0:
             cols = args.info.copy()
             dates = [d for d in [_parse_date(s, cols) for s in args.info] if d]
             if len(dates) == 2:
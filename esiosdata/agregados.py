@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Agregados por periodo (hora, día, semana o mes, en hora local) de las series temporales del store.
+
+`agrega_periodos(df, freq)` calcula de forma vectorial (`np.ufunc.reduceat` sobre los inicios de cada periodo en el
+index ordenado) la media, el mínimo, el máximo y los instantes del mínimo y del máximo de cada columna, ignorando los
+valores nulos. `actualiza_agregados` recalcula sólo los periodos con datos en los meses modificados por una
+actualización. `PVPC` y `DatosREE` guardan estos agregados en el store (keys 'agregados_<periodo>'), para que las
+consultas y gráficas de evolución (`PVPC.get_resample_data`, `pvpcplot_ev_scatter`) no recorran todo el histórico.
+
+Columnas del DataFrame de agregados, para cada columna `c` de los datos: `c` (media), `c_min`, `c_max`,
+`c_argmin` y `c_argmax` (instantes del mínimo y del máximo, NaT en periodos sin datos), indexado por el inicio de
+cada periodo.
+
+@author: Eugenio Panadero
+"""
+import numpy as np
+import pandas as pd
+from esiosdata.particiones import mascara_meses
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+ESTADISTICOS = ('', '_min', '_max', '_argmin', '_argmax')
+
+
+def columnas_agregados(columnas):
+    """Columnas del DataFrame de agregados de las columnas de datos indicadas."""
+    return [c + e for c in columnas for e in ESTADISTICOS]
+
+
+def etiquetas_periodo(index, freq):
+    """
+    Inicio del periodo de cada instante de un DatetimeIndex: hora ('h'), día ('D'), semana de lunes a domingo ('W')
+    o mes ('MS'), en la hora local del index (las horas, en UTC, para no juntar las dos 02:00 del cambio de hora).
+    """
+    if freq == 'h':
+        if index.tz is None:
+            return index.floor('h')
+        return index.tz_convert('UTC').floor('h').tz_convert(index.tz)
+    if freq not in ('D', 'W', 'MS'):
+        raise ValueError('Periodo de agregación no soportado: "{}"'.format(freq))
+    dias = (index.tz_localize(None) if index.tz is not None else index).normalize()
+    if freq == 'W':
+        dias = dias - pd.to_timedelta(dias.weekday, unit='D')
+    elif freq == 'MS':
+        dias = dias - pd.to_timedelta(dias.day - 1, unit='D')
+    return dias.tz_localize(index.tz) if index.tz is not None else dias
+
+
+def agrega_periodos(df, freq, columnas=None):
+    """
+    Media, mínimo, máximo e instantes del mínimo y del máximo de cada columna, por periodo.
+
+    :param df: pd.DataFrame con DatetimeIndex creciente
+    :param freq: periodo: 'h', 'D', 'W' (semanas de lunes a domingo) o 'MS'
+    :param columnas: (OPC) columnas a agregar (por defecto, todas)
+    :return: pd.DataFrame indexado por el inicio de cada periodo (ver `columnas_agregados`)
+    """
+    columnas = list(df.columns) if columnas is None else list(columnas)
+    if df.empty:
+        return pd.DataFrame(columns=columnas_agregados(columnas), index=df.index[:0])
+    etiquetas = etiquetas_periodo(df.index, freq)
+    inicios = np.flatnonzero(np.r_[True, etiquetas[1:] != etiquetas[:-1]])
+    valores = df[columnas].to_numpy(dtype=float)
+    validos = ~np.isnan(valores)
+    suma = np.add.reduceat(np.where(validos, valores, 0.), inicios, axis=0)
+    num_validos = np.add.reduceat(validos, inicios, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = suma / num_validos
+    minimo = np.fmin.reduceat(valores, inicios, axis=0)
+    maximo = np.fmax.reduceat(valores, inicios, axis=0)
+    # Posición de la primera muestra de cada periodo que alcanza el extremo (n: periodo sin datos)
+    n = len(df)
+    grupo = np.repeat(np.arange(len(inicios)), np.diff(np.r_[inicios, n]))
+    posiciones = np.arange(n)[:, np.newaxis]
+    arg_min = np.minimum.reduceat(np.where(valores == minimo[grupo], posiciones, n), inicios, axis=0)
+    arg_max = np.minimum.reduceat(np.where(valores == maximo[grupo], posiciones, n), inicios, axis=0)
+
+    def _instantes(pos):
+        return df.index[np.minimum(pos, n - 1)].where(pos < n)
+
+    datos = {}
+    for j, c in enumerate(columnas):
+        datos.update({c: media[:, j], c + '_min': minimo[:, j], c + '_max': maximo[:, j],
+                      c + '_argmin': _instantes(arg_min[:, j]), c + '_argmax': _instantes(arg_max[:, j])})
+    return pd.DataFrame(datos, index=etiquetas[inicios], columns=columnas_agregados(columnas))
+
+
+def actualiza_agregados(agregados, df, freq, meses=None, columnas=None, tz=None):
+    """
+    Actualiza los agregados de una serie tras una actualización, recalculando sólo los periodos con datos en los
+    meses modificados (las semanas que empiezan en el mes anterior, completas), o todos si no hay agregados previos
+    o si cambian las columnas.
+
+    :param agregados: pd.DataFrame de agregados existente (o None)
+    :param df: pd.DataFrame de datos completo, con DatetimeIndex creciente
+    :param freq: periodo de agregación (ver `agrega_periodos`)
+    :param meses: (OPC) meses ('YYYY-MM') con datos nuevos (None: se recalcula todo)
+    :param columnas: (OPC) columnas a agregar (por defecto, todas)
+    :param tz: (OPC) zona horaria de los meses
+    :return: agregados, DatetimeIndex de los periodos recalculados
+    """
+    columnas = list(df.columns) if columnas is None else list(columnas)
+    if (meses is None or agregados is None or agregados.empty
+            or list(agregados.columns) != columnas_agregados(columnas)):
+        nuevos = agrega_periodos(df, freq, columnas)
+        return nuevos, nuevos.index
+    etiquetas = etiquetas_periodo(df.index, freq)
+    periodos = etiquetas[mascara_meses(df.index, meses, tz)].unique()
+    if not len(periodos):
+        return agregados, periodos
+    nuevos = agrega_periodos(df[etiquetas.isin(periodos)], freq, columnas)
+    return pd.concat([agregados[~agregados.index.isin(periodos)], nuevos]).sort_index(), periodos
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de descarga asíncrona (asyncio) de los archivos diarios de ESIOS.
+
+En vez de lanzar un thread por día (`dataweb.requestweb.get_data_en_intervalo`), todas las peticiones de un intervalo
+(la de PVPC, o las 4 urls diarias de demanda) se realizan como corutinas sobre un único pool de conexiones keep-alive
+(`aiohttp.ClientSession`), compartido por `PVPC` y `DatosREE` a lo largo de toda la ejecución.
+
+* Corutinas públicas: `pvpc_range(d0, df)`, `dem_range(d0, df)` y `dem_range_indicadores(d0, df)` (demanda por
+  indicadores, con varios meses por petición).
+* La concurrencia efectiva la regula el controlador AIMD compartido `downloadscheduler.CONTROL_DESCARGAS`.
+* Uso síncrono (backend de actualización de `PVPC` y `DatosREE`): `get_data_en_intervalo_aio(d0, df, ...)`, con la
+  misma salida que `dataweb.requestweb.get_data_en_intervalo`: `(data, hay_errores, str_import)`.
+
+Requiere `aiohttp` (`pip install esiosdata[aio]`); si no está instalado, `HAY_AIOHTTP = False` y las clases de datos
+utilizan el motor multithread `esiosdata.descargathreads`, regulado por el mismo controlador.
+
+@author: Eugenio Panadero
+"""
+import asyncio
+import atexit
+import datetime as dt
+import logging
+import random
+import threading
+import time
+import pandas as pd
+from dataweb.mergedataweb import merge_data
+from esiosdata.downloadscheduler import CONTROL_DESCARGAS
+from esiosdata.esios_config import DATE_FMT, HEADERS, NUM_RETRIES, TIMEOUT, MAX_CONEXIONES_AIO, DIAS_POR_LOTE
+from esiosdata.importdemdata import (dem_url_dia, dem_procesa_datos_dia, dem_intervalos_indicadores,
+                                     dem_url_indicadores, dem_procesa_indicadores, dem_concat_intervalos)
+from esiosdata.importpvpcdata import pvpc_url_dia, pvpc_procesa_datos_dia
+from esiosdata.lotes import procesa_por_lotes
+try:
+    import aiohttp
+    HAY_AIOHTTP = True
+except ImportError:
+    aiohttp = None
+    HAY_AIOHTTP = False
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+MIN_LEN_REQUEST = 10
+ESPERA_RETRY = 1.
+
+
+def _lista_dias(d0, df=None, date_fmt=DATE_FMT):
+    """Devuelve la lista de días (str) del intervalo [d0, df]. Si `df` es None, hasta hoy."""
+    def _date(dia):
+        if dia is None:
+            return dt.date.today()
+        elif isinstance(dia, str):
+            return dt.datetime.strptime(dia, date_fmt).date()
+        return pd.Timestamp(dia).date()
+
+    return [dia.strftime(date_fmt) for dia in pd.date_range(_date(d0), _date(df))]
+
+
+def _nueva_sesion(headers=HEADERS, max_conexiones=MAX_CONEXIONES_AIO):
+    """Crea la sesión http con el pool de conexiones keep-alive (debe llamarse dentro del event loop)."""
+    if not HAY_AIOHTTP:
+        raise ImportError('Se requiere `aiohttp` para la descarga asíncrona: pip install aiohttp')
+    connector = aiohttp.TCPConnector(limit=max_conexiones, limit_per_host=max_conexiones, keepalive_timeout=30)
+    return aiohttp.ClientSession(headers=headers, connector=connector)
+
+
+async def _request_url(session, url, json_req=False, num_retries=NUM_RETRIES, timeout=TIMEOUT, control=None):
+    """Realiza sucesivos intentos de request a una url, como `dataweb.requestweb.request_data_url`.
+    Cada intento ocupa una ranura del controlador de concurrencia, informándole de su latencia y resultado.
+
+    :return: status, response
+    """
+    control = control or CONTROL_DESCARGAS
+    count, status, response = 0, -1, None
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    while count < num_retries:
+        async with control.ranura_async() as ranura:
+            try:
+                async with session.get(url, timeout=client_timeout) as resp:
+                    status = resp.status
+                    if status == 200:
+                        if json_req:
+                            response = await resp.json(content_type=None)
+                            break
+                        response = await resp.text()
+                        if len(response) > MIN_LEN_REQUEST:
+                            break
+                    else:  # HTTP 429 Too many requests, 503 Service unavailable, ...
+                        ranura.error()
+                        logging.warning('RECIBIDO ERROR HTTP {} en url:"{}"'.format(status, url))
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                ranura.error()
+                if count == num_retries - 1:
+                    logging.error('ERROR: {} en url: {}'.format(e, url))
+        count += 1
+        if count < num_retries:
+            # Backoff con jitter, para que las peticiones fallidas no se reintenten todas a la vez
+            await asyncio.sleep(ESPERA_RETRY * count * random.uniform(.5, 1.5))
+    if count == num_retries:
+        logging.error('NO SE HA PODIDO OBTENER LA INFO EN {}'.format(url))
+    return status, response
+
+
+async def descarga_dia(session, key_dia, func_url_data_dia, json_req=False, num_retries=NUM_RETRIES, timeout=TIMEOUT,
+                       control=None):
+    """Descarga la respuesta (o lista de respuestas, si hay varias urls) de un día, sin procesarla."""
+    url = func_url_data_dia(key_dia)
+    if type(url) is list:
+        results = await asyncio.gather(*[_request_url(session, u, json_req, num_retries, timeout, control)
+                                         for u in url])
+        return [r for _, r in results]
+    _, response = await _request_url(session, url, json_req, num_retries, timeout, control)
+    return response
+
+
+async def _obtiene_data_dia(session, key_dia, func_url_data_dia, func_procesa_data_dia,
+                            json_req=False, num_retries=NUM_RETRIES, timeout=TIMEOUT, control=None, verbose=True):
+    """Descarga (1 o varias urls) y procesa los datos de un día. Devuelve `(key_dia, data_import | None)`."""
+    count_process, ok, data_import = 0, -1, None
+    try:
+        while count_process < num_retries and ok != 0:
+            response = await descarga_dia(session, key_dia, func_url_data_dia, json_req, num_retries, timeout,
+                                          control)
+            data_import, ok = func_procesa_data_dia(key_dia, response)
+            if ok == -2:  # Código de salida temprana
+                break
+            count_process += 1
+    except Exception as e:
+        url = func_url_data_dia(key_dia)
+        if verbose:
+            print('PROCESANDO DATA!???? (Exception: {}; KEY: {}; URL: {})'.format(e, key_dia, url))
+        logging.error('PROCESANDO DATA!???? (Exception: {}; KEY: {}; URL: {})'.format(e, key_dia, url))
+        ok = -1
+    return key_dia, data_import if ok == 0 else None
+
+
+async def datos_en_intervalo(d0, df, func_url_data_dia, func_procesa_data_dia, session=None,
+                             json_req=False, headers=HEADERS, max_conexiones=MAX_CONEXIONES_AIO,
+                             num_retries=NUM_RETRIES, timeout=TIMEOUT, date_fmt=DATE_FMT, control=None, dias=None,
+                             verbose=True):
+    """Corutina genérica: descarga y procesa todos los días del intervalo sobre una única sesión http.
+
+    :param dias: (OPC) lista de días (str) a descargar, en vez de todos los del intervalo [d0, df]
+    :return: dict {key_dia: data_import | None}
+    """
+    lista_dias = list(dias) if dias is not None else _lista_dias(d0, df, date_fmt)
+    cerrar_sesion = session is None
+    if cerrar_sesion:
+        session = _nueva_sesion(headers, max_conexiones)
+    try:
+        tareas = [_obtiene_data_dia(session, key, func_url_data_dia, func_procesa_data_dia,
+                                    json_req, num_retries, timeout, control, verbose) for key in lista_dias]
+        return dict(await asyncio.gather(*tareas))
+    finally:
+        if cerrar_sesion:
+            await session.close()
+
+
+def _merge_datos_dias(dict_data, keys_merge=None):
+    keys_ok = [k for k in sorted(dict_data.keys()) if dict_data[k] is not None]
+    if not keys_ok:
+        return None
+    return merge_data([dict_data[k] for k in keys_ok], keys_merge)
+
+
+async def pvpc_range(d0, df=None, session=None, verbose=True, **kwargs):
+    """Corutina: obtiene los datos de PVPC (archivo 70) de un intervalo de días.
+
+    :return: pd.DataFrame con los datos del intervalo, o None si no se ha podido obtener ningún día.
+    """
+    dict_data = await datos_en_intervalo(d0, df, pvpc_url_dia,
+                                         lambda k, r: pvpc_procesa_datos_dia(k, r, verbose=verbose),
+                                         session=session, json_req=True, verbose=verbose, **kwargs)
+    return _merge_datos_dias(dict_data)
+
+
+async def dem_range(d0, df=None, session=None, verbose=True, **kwargs):
+    """Corutina: obtiene los datos de demanda (archivos 114-117, JSONP) de un intervalo de días.
+
+    :return: dict {'data': pd.DataFrame, 'data_dias': pd.DataFrame}, o None si no hay datos.
+    """
+    dict_data = await datos_en_intervalo(d0, df, dem_url_dia, dem_procesa_datos_dia,
+                                         session=session, json_req=False, verbose=verbose, **kwargs)
+    return _merge_datos_dias(dict_data)
+
+
+async def dem_range_indicadores(d0, df=None, session=None, verbose=True, **kwargs):
+    """Corutina: obtiene los datos de demanda de un intervalo de días por indicadores de la API, con varios meses de
+    datos por petición (`esiosdata.importdemdata.dem_intervalos_indicadores`).
+
+    :return: dict {'data': pd.DataFrame, 'data_dias': pd.DataFrame}, o None si no hay datos.
+    """
+    intervalos = dem_intervalos_indicadores(d0, df or dt.date.today())
+    dict_data = await datos_en_intervalo(None, None, dem_url_indicadores, dem_procesa_indicadores, session=session,
+                                         json_req=True, dias=intervalos, verbose=verbose, **kwargs)
+    return dem_concat_intervalos({k: v for k, v in dict_data.items() if v is not None})[0]
+
+
+class _LoopDescargas(object):
+    """Event loop en un thread de fondo con una sesión http persistente (pool keep-alive compartido).
+
+    Permite usar el motor asíncrono desde código síncrono (incluso si ya hay un loop en marcha, como en Jupyter),
+    reutilizando las conexiones entre sucesivas actualizaciones de `PVPC` y `DatosREE`. Las sesiones se cierran y el
+    loop se detiene con `close()` (registrado con `atexit` para la instancia global `LOOP_DESCARGAS`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._sessions = {}
+
+    def _start(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='esiosdata_aio', daemon=True)
+                self._thread.start()
+        return self._loop
+
+    async def _session(self, headers, max_conexiones):
+        key = (tuple(sorted((headers or {}).items())), max_conexiones)
+        if key not in self._sessions or self._sessions[key].closed:
+            self._sessions[key] = _nueva_sesion(headers, max_conexiones)
+        return self._sessions[key]
+
+    def run(self, func_corutina, headers=HEADERS, max_conexiones=MAX_CONEXIONES_AIO, **kwargs):
+        """Ejecuta `func_corutina(session=..., **kwargs)` en el loop de fondo y espera su resultado."""
+        loop = self._start()
+
+        async def _wrapper():
+            session = await self._session(headers, max_conexiones)
+            return await func_corutina(session=session, **kwargs)
+
+        return asyncio.run_coroutine_threadsafe(_wrapper(), loop).result()
+
+    async def _cierra_sesiones(self):
+        sessions, self._sessions = list(self._sessions.values()), {}
+        await asyncio.gather(*[s.close() for s in sessions if not s.closed])
+
+    def close(self):
+        """Cierra las sesiones http (y su pool de conexiones) en el loop de fondo y detiene el loop.
+        Una llamada posterior a `run` vuelve a arrancarlo."""
+        with self._lock:
+            loop, thread, self._loop, self._thread = self._loop, self._thread, None, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._cierra_sesiones(), loop).result(timeout=TIMEOUT)
+        except Exception as e:
+            logging.error('ERROR CERRANDO LAS SESIONES HTTP: {}'.format(e))
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=TIMEOUT)
+            if not thread.is_alive():
+                loop.close()
+
+
+LOOP_DESCARGAS = _LoopDescargas()
+atexit.register(LOOP_DESCARGAS.close)
+
+
+def get_data_en_intervalo_aio(d0=None, df=None, func_url_data_dia=None, func_procesa_data_dia=None,
+                              json_req=False, headers=HEADERS, max_conexiones=MAX_CONEXIONES_AIO,
+                              num_retries=NUM_RETRIES, timeout=TIMEOUT, date_fmt=DATE_FMT, keys_merge=None,
+                              control=None, func_procesa_lote=None, dias_por_lote=DIAS_POR_LOTE, dias=None,
+                              verbose=True):
+    """Versión asíncrona de `dataweb.requestweb.get_data_en_intervalo`, con la misma salida.
+
+    Con `func_procesa_lote`, `func_procesa_data_dia` sólo valida la respuesta de cada día, y el procesado se realiza
+    después, por lotes de `dias_por_lote` días (ver `esiosdata.lotes.procesa_por_lotes`).
+    Con `dias` (lista de str), se descargan sólo esos días (p.ej., los días con huecos), en vez del intervalo [d0, df].
+
+    :return: data_merge, hay_errores, str_import
+    """
+    tic_ini = time.time()
+    dict_data = LOOP_DESCARGAS.run(datos_en_intervalo, headers=headers, max_conexiones=max_conexiones,
+                                   d0=d0, df=df, func_url_data_dia=func_url_data_dia,
+                                   func_procesa_data_dia=func_procesa_data_dia, json_req=json_req,
+                                   num_retries=num_retries, timeout=timeout, date_fmt=date_fmt, control=control,
+                                   dias=dias, verbose=verbose)
+    return resultado_intervalo(dict_data, tic_ini, keys_merge, control, func_procesa_lote, dias_por_lote, verbose)
+
+
+def resultado_intervalo(dict_data, tic_ini, keys_merge=None, control=None, func_procesa_lote=None,
+                        dias_por_lote=DIAS_POR_LOTE, verbose=True):
+    """Combina (o procesa por lotes) los datos descargados de cada día, con la salida de `get_data_en_intervalo`.
+    Común a los motores asíncrono (`get_data_en_intervalo_aio`) y multithread (`descargathreads`).
+
+    :return: data_merge, hay_errores, str_import
+    """
+    num_dias = len(dict_data)
+    bad_days = [k for k in sorted(dict_data.keys()) if dict_data[k] is None]
+    if func_procesa_lote is not None:
+        data_merge, dias_error = procesa_por_lotes(dict_data, func_procesa_lote, dias_por_lote)
+        bad_days = sorted(bad_days + dias_error)
+    else:
+        data_merge = _merge_datos_dias(dict_data, keys_merge)
+    if bad_days and verbose:
+        print('HAY TAREAS NO REALIZADAS ({}):\n{}'.format(len(bad_days), bad_days))
+    if data_merge is None:
+        return None, True, 'ERROR IMPORTANDO!!'
+    toc = time.time() - tic_ini
+    str_resumen_import = '\n%lu días importados [Proceso Total %.2f seg, %.4f seg/día]\n%s' \
+                         % (num_dias, toc, toc / float(num_dias), control or CONTROL_DESCARGAS)
+    return data_merge, False, str_resumen_import
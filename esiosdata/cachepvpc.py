@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de proceso de los datos de PVPC con sus columnas derivadas (€/kWh, TCU, CP, PD_), compartida por todas las
+facturas (`FacturaElec`) y gráficas del proceso (`CACHE_PVPC`).
+
+Los datos se guardan por meses, como las particiones del almacén del store (`esiosdata.particiones`): cada consulta
+[start, end] reúne los meses en caché y lee del store (`PVPC.read`) sólo los que faltan. Un mes en caché deja de ser
+válido:
+* tras `ttl` segs (`TTL_CACHE_PVPC`), para volver a comprobar si hay datos nuevos, o
+* en cuanto cambia en disco su partición (firma en el manifiesto del almacén o, con el fichero HDF5 único, su fecha
+  de modificación), p.ej., tras una actualización del store en este o en otro proceso (`esiosdata daemon`).
+
+Las consultas sólo leen el store local: si sus datos no llegan al final de la consulta, la caché no descarga nada
+(salvo con `actualiza=True`, o `ACTUALIZA_CACHE_PVPC` en `esios_config`), por lo que una factura nunca espera a la red.
+
+Todos los accesos están protegidos por un lock: con varios threads pidiendo los mismos meses, sólo uno los lee y los
+demás esperan y los encuentran en caché. `resumen()` devuelve los contadores de aciertos y fallos.
+
+@author: Eugenio Panadero
+"""
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from esiosdata.classdataesios import PVPC
+from esiosdata.esios_config import TZ, TTL_CACHE_PVPC, MAX_MESES_CACHE_PVPC, ACTUALIZA_CACHE_PVPC, KEY_DATA_CALC
+from esiosdata.particiones import limite_intervalo
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+class CachePVPC(object):
+    """Caché thread-safe, por meses, de los datos derivados de PVPC, con caducidad (TTL) e invalidación."""
+
+    def __init__(self, ttl=TTL_CACHE_PVPC, max_meses=MAX_MESES_CACHE_PVPC, func_handler=None,
+                 actualiza=ACTUALIZA_CACHE_PVPC):
+        """
+        :param ttl: segs de validez de cada mes en caché
+        :param max_meses: nº máximo de meses en caché (se descartan los usados hace más tiempo)
+        :param actualiza: si los datos del store no llegan al final de la consulta, actualiza antes el store (con
+            peticiones a la red); si no, se leen sólo los datos locales
+        :param func_handler: (OPC) función sin argumentos que crea el handler de PVPC de las lecturas (por defecto,
+            `PVPC` sin actualizar ni cargar el histórico)
+        """
+        self._lock = threading.RLock()
+        self.ttl = ttl
+        self.max_meses = max_meses
+        self.actualiza = actualiza
+        self.func_handler = func_handler or (lambda: PVPC(update=False, verbose=False, carga_completa=False))
+        self._pvpc = None
+        self._meses = OrderedDict()  # {'YYYY-MM': (instante de lectura, versión en disco, DataFrame)}, LRU
+        self._aciertos = self._fallos = self._meses_leidos = self._invalidaciones = 0
+
+    @property
+    def handler(self):
+        """Handler de PVPC de las lecturas del store."""
+        if self._pvpc is None:
+            self._pvpc = self.func_handler()
+        return self._pvpc
+
+    def _version(self, mes):
+        """Versión en disco de los datos de un mes: firmas de sus particiones (de los datos y de las columnas derivadas)
+        o fecha de modificación del store."""
+        if self.handler.almacen_particionado:
+            return tuple(self.handler.almacen.firma_particion(k, mes) for k in (self.handler.masterkey, KEY_DATA_CALC))
+        try:
+            return os.path.getmtime(self.handler.PATH_DATABASE)
+        except OSError:
+            return None
+
+    def _valido(self, mes, ahora):
+        entrada = self._meses.get(mes)
+        if entrada is None:
+            return False
+        if ahora - entrada[0] < self.ttl and entrada[1] == self._version(mes):
+            self._meses.move_to_end(mes)
+            return True
+        self._meses.pop(mes)
+        self._invalidaciones += 1
+        return False
+
+    def _carga(self, meses, end):
+        """Lee del store (con `actualiza`, actualizándolo antes si no llega a `end`) los meses indicados y los guarda
+        en caché."""
+        if not self.handler.cubre_intervalo(end):
+            if self.actualiza:
+                self.handler.update_data()
+                self._pvpc = None  # Sin el histórico cargado por la actualización
+            else:
+                logging.warning('LOS DATOS DE PVPC DEL STORE LOCAL NO LLEGAN A {} (ACTUALIZACIÓN DESACTIVADA)'
+                                .format(end))
+        for mes in meses:
+            version = self._version(mes)
+            df = self.handler.read(mes, mes, actualiza=False)
+            self._meses[mes] = (time.monotonic(), version, df)
+            self._meses_leidos += 1
+
+    def _descarta_antiguos(self):
+        """Descarta de la caché los meses usados hace más tiempo, hasta dejar `max_meses`."""
+        while len(self._meses) > self.max_meses:
+            self._meses.popitem(last=False)
+
+    def datos(self, start, end):
+        """
+        Datos de PVPC (con las columnas derivadas de `pvpc_calc_tcu_cp_feu_d`) del intervalo [start, end].
+
+        :param start: instante o día inicial (sin tz, en la del store)
+        :param end: instante o día final (incluido; '2016-03-31' incluye todo el día)
+        :return: pd.DataFrame (nuevo en cada llamada; se puede modificar sin alterar la caché)
+        """
+        t0, tf = limite_intervalo(start, TZ), limite_intervalo(end, TZ, final=True)
+        meses = [str(p) for p in pd.period_range(t0.tz_localize(None), tf.tz_localize(None), freq='M')]
+        with self._lock:
+            ahora = time.monotonic()
+            faltan = [mes for mes in meses if not self._valido(mes, ahora)]
+            if faltan:
+                self._fallos += 1
+                self._carga(faltan, end)
+            else:
+                self._aciertos += 1
+            # Se descartan meses sólo después de reunir los de la consulta (que puede tener más de `max_meses`)
+            dfs = [self._meses[mes][2] for mes in meses if not self._meses[mes][2].empty]
+            self._descarta_antiguos()
+        if not dfs:
+            return pd.DataFrame()
+        return pd.concat(dfs).loc[t0:tf]
+
+    def invalida(self, meses=None):
+        """Elimina de la caché los meses indicados ('YYYY-MM'), o todos."""
+        with self._lock:
+            for mes in list(self._meses) if meses is None else meses:
+                if self._meses.pop(mes, None) is not None:
+                    self._invalidaciones += 1
+
+    def resumen(self):
+        """Estado de la caché: aciertos y fallos (consultas sin y con lectura del store), meses leídos y en caché."""
+        with self._lock:
+            return dict(aciertos=self._aciertos, fallos=self._fallos, meses_leidos=self._meses_leidos,
+                        invalidaciones=self._invalidaciones, meses_en_cache=len(self._meses))
+
+    def __repr__(self):
+        return ('Caché de PVPC: {meses_en_cache} meses; {aciertos} aciertos, {fallos} fallos, {meses_leidos} meses '
+                'leídos, {invalidaciones} invalidaciones'.format(**self.resumen()))
+
+
+# Caché compartida por todo el proceso (FacturaElec, gráficas, ...):
+CACHE_PVPC = CachePVPC()
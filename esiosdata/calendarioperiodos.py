@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Calendario horario de los periodos tarifarios de la discriminación horaria (peajes 2.0DHA y 2.0DHS).
+
+`calendario_periodos(year, num_periodos)` calcula (una vez por año, peaje y zona horaria; queda en caché) el código de
+periodo de cada hora local del año como array compacto `np.int8` (1: P1, 2: P2, 3: P3), con el horario de verano o
+invierno de cada hora. `periodos_horarios(index, num_periodos)` une ese calendario a cualquier índice horario por
+posición (horas transcurridas desde el inicio del año), sin recorrer las horas ni comparar horarios:
+
+  - 2.0DHA (2 periodos): P1 de 12 a 22h en invierno y de 13 a 23h en verano; P2 el resto.
+  - 2.0DHS (3 periodos): P1 de 13 a 23h, P2 de 23 a 01h y de 07 a 13h, P3 de 01 a 07h.
+
+@author: Eugenio Panadero
+"""
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from esiosdata.esios_config import TZ
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+NS_HORA = 3600 * 10**9
+
+
+def _ns(index):
+    return index.values.astype('datetime64[ns]').view('int64')
+
+
+@lru_cache(maxsize=128)
+def calendario_periodos(year, num_periodos, tz=TZ):
+    """
+    Códigos de periodo tarifario de cada hora de un año (en hora local de `tz`).
+
+    :param year: año
+    :param num_periodos: nº de periodos del peaje (1: sin discriminación horaria, 2: 2.0DHA, 3: 2.0DHS)
+    :param tz: zona horaria
+    :return: inicio del año (ns UTC), np.array de códigos (np.int8, de sólo lectura) con una posición por hora
+    """
+    horas = pd.date_range('{}-01-01'.format(year), '{}-01-01'.format(year + 1), freq='h', tz=tz, inclusive='left')
+    hora = horas.hour.values
+    if num_periodos == 3:
+        codigos = np.where((hora >= 13) & (hora < 23), 1, np.where((hora >= 1) & (hora < 7), 3, 2))
+    elif num_periodos == 2:
+        # Horario de verano: offset UTC mayor que el de invierno (P1 de 13 a 23h, en vez de 12 a 22h)
+        offset = _ns(horas.tz_localize(None)) - _ns(horas)
+        hora_inv = hora - (offset > offset.min())
+        codigos = np.where((hora_inv >= 12) & (hora_inv < 22), 1, 2)
+    elif num_periodos == 1:
+        codigos = np.ones(len(horas))
+    else:
+        raise ValueError('Nº de periodos tarifarios no soportado: {}'.format(num_periodos))
+    codigos = codigos.astype(np.int8)
+    codigos.flags.writeable = False
+    return int(_ns(horas[:1])[0]), codigos
+
+
+def periodos_horarios(index, num_periodos, tz=TZ):
+    """
+    Códigos de periodo tarifario (np.int8; 1: P1, 2: P2, 3: P3) de cada instante de un DatetimeIndex, alineados con
+    él por posición, a partir de los calendarios anuales en caché.
+
+    :param index: DatetimeIndex (tz-aware; uno 'naive' se localiza en `tz`)
+    :param num_periodos: nº de periodos del peaje (1, 2 o 3)
+    :param tz: zona horaria de los periodos, para índices 'naive'
+    :return: np.array (np.int8)
+    """
+    if index.tz is None:
+        index = index.tz_localize(tz, ambiguous='infer')
+    tz, ns = index.tz, _ns(index)
+    years = index.year.values
+    codigos = np.empty(len(index), dtype=np.int8)
+    for year in np.unique(years):
+        inicio, calendario = calendario_periodos(int(year), num_periodos, tz)
+        en_year = years == year
+        codigos[en_year] = calendario[(ns[en_year] - inicio) // NS_HORA]
+    return codigos
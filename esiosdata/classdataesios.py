@@ -20,13 +20,38 @@ Por favor, infórmese sobre descarga de información en
     https://www.esios.ree.es/es/pagina/api
 y actualice sus procesos de descarga.
 """
+import datetime as dt
+from functools import partial
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
 from dataweb.classdataweb import DataWeb
+from dataweb.mergedataweb import pdmerge_respeta_tz
+from esiosdata.agregados import agrega_periodos, actualiza_agregados, etiquetas_periodo
+from esiosdata.aio import HAY_AIOHTTP, get_data_en_intervalo_aio
+from esiosdata.descargathreads import get_data_en_intervalo_threads
+from esiosdata.downloadscheduler import CONTROL_DESCARGAS
 from esiosdata.esios_config import (HEADERS, NUM_RETRIES, MAX_THREADS_REQUESTS, USAR_MULTITHREAD, DATE_FMT, TZ, VERBOSE,
-                                    PATH_DATABASE_PVPC, DATE_INI_PVPC, TS_DATA_PVPC, PATH_DATABASE_DEM, DATE_INI_DEM,
-                                    TS_DATA_DEM, KEYS_DATA_DEM, FREQ_DAT_DEM)
-from esiosdata.importdemdata import dem_url_dia, dem_procesa_datos_dia
-from esiosdata.importpvpcdata import pvpc_url_dia, pvpc_procesa_datos_dia
+                                    PATH_DATABASE_PVPC, DATE_INI_PVPC, TS_DATA_PVPC, PATH_DATABASE_DEM,
+                                    TS_DATA_DEM, KEYS_DATA_DEM, FREQ_DAT_DEM, USAR_ASYNCIO, MAX_CONEXIONES_AIO,
+                                    GUARDAR_RAW, PROCESA_POR_LOTES, DIAS_POR_LOTE, REPARA_HUECOS, KEY_HUECOS,
+                                    MAX_INTENTOS_HUECO, DEM_USAR_INDICADORES, ZONAS, INI_ZONAS, TZ_ZONAS,
+                                    CURVAS_ZONAS, HEADERS_DEMANDA, USAR_MARCA_FRESCURA, ALMACEN_PARTICIONADO,
+                                    TARIFAS, COLS_PVPC, KEY_DATA_CALC, COLS_CALC_PVPC, KEY_AGREGADOS,
+                                    FREQ_AGREGADOS, AGREGADOS_PVPC, AGREGADOS_DEM, RAW_ARCHIVE_DIR)
+from esiosdata.frescura import (ahora_tz, publicacion_pvpc, esperado_pvpc, esperado_dem, proxima_dem, guarda_marca,
+                                lee_marca, marca_fresca)
+from esiosdata.huecos import indice_huecos, dias_consecutivos
+from esiosdata.importdemdata import (dem_url_dia, dem_procesa_datos_dia, dem_valida_datos_dia, dem_procesa_lote,
+                                     dem_intervalos_indicadores, dem_url_indicadores, dem_procesa_indicadores,
+                                     dem_concat_intervalos, dem_url_zona_dia, dem_procesa_zona_dia)
+from esiosdata.importpvpcdata import (pvpc_url_dia, pvpc_procesa_datos_dia, pvpc_valida_datos_dia,
+                                      pvpc_procesa_lote, pvpc_calc_tcu_cp_feu_d)
+from esiosdata.lotes import concat_lotes
+from esiosdata.particiones import AlmacenParticionado, meses_index, mascara_meses, limite_intervalo
+from esiosdata.rawarchive import guarda_raw_dia, procesa_archivo_raw, procesa_archivo_raw_lotes
 
 
 __author__ = 'Eugenio Panadero'
@@ -35,20 +60,599 @@ __license__ = "GPL"
 __version__ = "1.0"
 __maintainer__ = "Eugenio Panadero"
 
+# HDF5 (PyTables) no es thread-safe: lecturas y grabaciones de los stores, de una en una (ver `DatosZonas`)
+LOCK_HDF = threading.RLock()
 
-class PVPC(DataWeb):
-    """Handler de datos de PVPC en fichero local."""
 
-    def __init__(self, update=True, force_update=False, verbose=VERBOSE):
-        self._pvpc_mean_daily = None
-        self._pvpc_mean_monthly = None
-        super(PVPC, self).__init__(PATH_DATABASE_PVPC,
+class DataWebESIOS(DataWeb):
+    """
+    Superclase común a `PVPC` y `DatosREE`: `DataWeb` con backend de descarga seleccionable.
+
+    Con `usar_asyncio=True` (y `aiohttp` instalado), las actualizaciones se realizan con el motor asíncrono de
+    `esiosdata.aio` (pool de conexiones keep-alive compartido); si no, con el motor multithread de
+    `esiosdata.descargathreads`. En ambos casos, la concurrencia de descarga la regula el controlador AIMD
+    `control_descargas` (por defecto, el compartido por todo el proceso); tras cada descarga, `resumen_descargas`
+    indica la concurrencia en la que se ha estabilizado.
+
+    Con `guardar_raw=True`, cada día procesado correctamente se guarda también 'en bruto' en el archivo raw local
+    (`esiosdata.rawarchive`), desde el que `reprocess(start, end)` reconstruye el store sin acceder a la red.
+
+    Con `procesa_por_lotes=True` (y si la clase define `func_procesa_lote`), los días descargados no se procesan uno
+    a uno, sino por lotes (`procesa_data_dias`), formando un único DataFrame por lote (`esiosdata.lotes`).
+
+    Con `repara_huecos=True`, en cada actualización se calcula el índice de huecos de los datos (días incompletos,
+    guardado en el store con la key 'huecos') y se descargan de nuevo sólo esos días (`rellena_huecos`).
+
+    Cada actualización guarda la marca de frescura del store (`esiosdata.frescura`); con `usar_marca_frescura=True`,
+    si la marca indica que los datos están al día según el calendario de publicación (`instante_esperado`),
+    `update_data` sólo lee el store, sin consultar la red. `actualiza_hasta` descarga además los datos ya publicados
+    posteriores al instante actual (p.ej., los precios del día siguiente), como hace `esiosdata daemon`.
+
+    Con `almacen_particionado=True`, los datos se guardan particionados por meses (`esiosdata.particiones`, en el
+    directorio del mismo nombre que el fichero HDF5) y cada actualización escribe sólo los meses con datos nuevos o
+    modificados. `lee_intervalo(start, end, columns=...)` lee de disco sólo las particiones del intervalo (y, en
+    formato Parquet, sólo las columnas y grupos de filas necesarios). Con `carga_completa=False` (y sin actualizar), no
+    se carga todo el histórico en `data` al crear el objeto, para consultas con `lee_intervalo`. Un store HDF5 único
+    existente se migra a particiones en la primera lectura.
+
+    Los agregados por periodo de la key principal (`periodos_agregados`; ver `esiosdata.agregados`) se guardan en el
+    store con las keys 'agregados_<periodo>' y se recalculan en cada actualización sólo para los periodos con datos
+    nuevos; `agregados(periodo, start, end)` los lee sin recorrer el histórico.
+    """
+    # Identificador del origen de datos en el archivo raw y directorio del archivo
+    nombre_raw = None
+    raw_dir = RAW_ARCHIVE_DIR
+    # Keys calculadas a partir de los datos descargados en `post_update_data` (como éstos, sólo cambian en los meses
+    # con datos nuevos, por lo que sólo se comparan y graban esas particiones)
+    keys_derivadas = ()
+    # Periodos de los agregados de la key principal guardados en el store (claves de `FREQ_AGREGADOS`) y columnas
+    # agregadas (None: todas)
+    periodos_agregados = ()
+    columnas_agregados = None
+
+    def __init__(self, *args, usar_asyncio=USAR_ASYNCIO, control_descargas=CONTROL_DESCARGAS,
+                 guardar_raw=GUARDAR_RAW, procesa_por_lotes=PROCESA_POR_LOTES, repara_huecos=REPARA_HUECOS,
+                 usar_marca_frescura=USAR_MARCA_FRESCURA, almacen_particionado=ALMACEN_PARTICIONADO,
+                 carga_completa=True, **kwargs):
+        self.usar_asyncio = usar_asyncio and HAY_AIOHTTP
+        self.control_descargas = control_descargas
+        self.resumen_descargas = None
+        self.guardar_raw = guardar_raw
+        self.procesa_por_lotes = procesa_por_lotes
+        self.repara_huecos = repara_huecos
+        self.usar_marca_frescura = usar_marca_frescura
+        self.almacen_particionado = almacen_particionado
+        self._almacen = None
+        # Meses (particiones) con datos nuevos durante una actualización (None: se comparan todas las particiones)
+        self._meses_modificados = None
+        # Meses de los periodos de agregados recalculados fuera de los meses modificados (semanas entre dos meses)
+        self._meses_agregados = {}
+        self._omite_carga = almacen_particionado and not carga_completa and not kwargs.get('update_init', True)
+        super(DataWebESIOS, self).__init__(*args, **kwargs)
+        self._omite_carga = False
+
+    @property
+    def almacen(self):
+        """Almacén particionado por meses del store (directorio junto al fichero HDF5)."""
+        if self._almacen is None:
+            self._almacen = AlmacenParticionado(os.path.splitext(self.PATH_DATABASE)[0], self.TZ)
+        return self._almacen
+
+    # you can override this on the child classes
+    def instante_esperado(self, ahora):
+        """Instante del último dato que debe estar publicado en `ahora` (None si no hay calendario de publicación)."""
+        return None
+
+    # you can override this on the child classes
+    def ultima_publicacion(self, ahora):
+        """Instante de la última publicación de datos nuevos anterior a `ahora` (None para publicación continua)."""
+        return None
+
+    # you can override this on the child classes
+    def proxima_publicacion(self, ahora):
+        """Instante en el que se esperan nuevos datos (siguiente comprobación de `esiosdata daemon`)."""
+        return ahora + pd.Timedelta(days=1)
+
+    def ultimo_dato(self, data=None):
+        """Instante del último dato válido de la key principal (None si no hay datos)."""
+        data = self.data if data is None else data
+        df = data.get(self.masterkey) if data else None
+        if df is None or df.empty:
+            return None
+        cols = self.muestreo_huecos()[self.masterkey][1]
+        validos = (df[cols] if cols else df).notnull().any(axis=1).values
+        return df.index[validos][-1] if validos.any() else None
+
+    def datos_frescos(self, ahora=None):
+        """Indica si la marca de frescura del store dice que los datos están al día."""
+        ahora = ahora or ahora_tz(self.TZ)
+        return marca_fresca(lee_marca(self.PATH_DATABASE), self.instante_esperado(ahora), ahora,
+                            self.ultima_publicacion(ahora))
+
+    def ultimo_almacenado(self):
+        """Instante del último dato de la key principal en disco (con el almacén particionado y sin el histórico
+        cargado, según el manifiesto del almacén, sin leer datos), o None."""
+        if self.almacen_particionado and not self.data:
+            with LOCK_HDF:
+                return self.almacen.ultimo(self.masterkey)
+        return self.ultimo_dato()
+
+    def cubre_intervalo(self, end=None, ahora=None):
+        """
+        Indica si los datos locales llegan hasta `end` (o hasta el último dato ya publicado, si es anterior), o si la
+        marca de frescura indica que están al día (es decir, si no hace falta actualizar para leer hasta `end`).
+        """
+        ahora = ahora or ahora_tz(self.TZ)
+        tmax = self.ultimo_almacenado()
+        if tmax is None:
+            return False
+        necesario = self.instante_esperado(ahora) or ahora - pd.Timedelta(seconds=self.TS_DATA)
+        if end is not None:
+            necesario = min(necesario, limite_intervalo(end, self.TZ, final=True) - pd.Timedelta(seconds=self.TS_DATA))
+        return tmax >= necesario or (self.usar_marca_frescura and self.datos_frescos(ahora))
+
+    def guarda_marca_frescura(self):
+        """Guarda la marca de frescura del store (último dato e instante de la comprobación)."""
+        try:
+            guarda_marca(self.PATH_DATABASE, self.ultimo_dato())
+        except (OSError, TypeError, ValueError) as e:
+            self.printif('ERROR GUARDANDO LA MARCA DE FRESCURA: {}'.format(e), 'error')
+
+    def update_data(self, forzar_update=False):
+        """
+        Actualiza los datos hasta el instante actual (ver `DataWeb.update_data`) y guarda la marca de frescura.
+        Con `usar_marca_frescura` y los datos al día según la marca, sólo se lee el store, sin consultar la red.
+        """
+        if not forzar_update and self.usar_marca_frescura and os.path.exists(self.PATH_DATABASE) \
+                and self.datos_frescos():
+            try:
+                self.load_data()
+                if self.ultimo_dato() is not None:
+                    self.printif('DATOS AL DÍA SEGÚN LA MARCA DE FRESCURA (no se consulta la red)', 'ok')
+                    return False
+            except Exception as e:
+                self.printif('--> NO SE LEE DB_HDF (Exception: {}:{})'.format(type(e).__name__, str(e)), 'warning')
+        self._meses_modificados = set()
+        try:
+            hay_nueva_info = super(DataWebESIOS, self).update_data(forzar_update)
+        finally:
+            self._meses_modificados = None
+        self.guarda_marca_frescura()
+        return hay_nueva_info
+
+    def actualiza_hasta(self, tf=None):
+        """
+        Actualiza los datos (sin consultar la marca de frescura) y descarga además, si faltan, los datos publicados
+        hasta el instante `tf` aunque sea posterior al actual (por defecto, `instante_esperado`: p.ej., los precios
+        del día siguiente). Guarda la marca de frescura.
+
+        :param tf: (OPC) instante (tz-aware) hasta el que se esperan datos
+        :return: hay_nueva_info, completo (los datos llegan hasta `tf`)
+        """
+        tf = tf or self.instante_esperado(ahora_tz(self.TZ))
+        self._meses_modificados = set()
+        try:
+            hay_nueva_info = super(DataWebESIOS, self).update_data()
+            tmax = self.ultimo_dato()
+            if tmax is not None and tf is not None and tmax < tf:
+                data_new = self._get_data_en_intervalo(tmax.date(), tf.date())
+                tmax_new = self.ultimo_dato(data_new) if data_new else None
+                if tmax_new is not None and tmax_new > tmax:
+                    self.data = self._combina_data(self.data, data_new)
+                    self.post_update_data()
+                    self.save_data()
+                    hay_nueva_info, tmax = True, tmax_new
+        finally:
+            self._meses_modificados = None
+        self.guarda_marca_frescura()
+        return hay_nueva_info, tmax is not None and (tf is None or tmax >= tf)
+
+    # you want to override this on the child classes
+    def func_procesa_raw(self):
+        """Función 'picklable' equivalente a `procesa_data_dia`, para el reprocesado multiproceso."""
+        raise NotImplementedError
+
+    # you want to override this on the child classes
+    def func_procesa_lote(self):
+        """Función 'picklable' de procesado por lotes: `func(dict {key_dia: response}) -> (data, dias_error)`.
+        Si devuelve None, no se usa el procesado por lotes."""
+        return None
+
+    # you want to override this on the child classes
+    def valida_data_dia(self, key_dia, datos_para_procesar):
+        """Validación de la respuesta de un día en el procesado por lotes (sustituye a `procesa_data_dia`)."""
+        return datos_para_procesar, 0
+
+    def usa_lotes(self):
+        """Indica si se procesan los días descargados por lotes."""
+        return self.procesa_por_lotes and self.func_procesa_lote() is not None
+
+    def procesa_data_dias(self, dict_responses):
+        """
+        Hook de procesado por lotes: procesa de una vez las respuestas de varios días, formando un único DataFrame
+        (o dict de DataFrames) para todo el lote, y archiva en raw los días procesados correctamente.
+
+        :param dict_responses: dict {key_dia: response}
+        :return: data, lista de días con error
+        """
+        data, dias_error = self.func_procesa_lote()(dict_responses)
+        for key_dia in sorted(set(dict_responses.keys()) - set(dias_error)):
+            self.archiva_raw(key_dia, dict_responses[key_dia])
+        return data, dias_error
+
+    def archiva_raw(self, key_dia, response):
+        """Guarda en el archivo raw la respuesta de un día (si `guardar_raw`)."""
+        if self.guardar_raw and self.nombre_raw is not None:
+            try:
+                guarda_raw_dia(self.nombre_raw, key_dia, response, raw_dir=self.raw_dir)
+            except (OSError, TypeError, ValueError) as e:
+                self.printif('ERROR GUARDANDO RAW DEL DÍA {}: {}'.format(key_dia, e), 'error')
+
+    def reprocess(self, start=None, end=None, n_procesos=None):
+        """
+        Reconstruye los datos del intervalo [start, end] (por defecto, todo el archivo) a partir del archivo raw
+        local, procesando en paralelo y sin ninguna petición web. Los datos reprocesados se combinan con los
+        existentes (prevaleciendo los reprocesados), y se graban en disco sólo los meses reprocesados: el histórico
+        anterior al archivo raw se conserva.
+
+        :param start: (OPC) día inicial (str YYYY-MM-DD o datetime)
+        :param end: (OPC) día final
+        :param n_procesos: (OPC) nº de procesos de trabajo (por defecto, nº de CPUs)
+        :return: hay_nueva_info
+        """
+        tic = time.time()
+        if self.usa_lotes():
+            data_new, num_dias, dias_error = procesa_archivo_raw_lotes(self.nombre_raw, self.func_procesa_lote(),
+                                                                       start, end, raw_dir=self.raw_dir,
+                                                                       n_procesos=n_procesos,
+                                                                       dias_por_bloque=DIAS_POR_LOTE)
+        else:
+            dict_data = procesa_archivo_raw(self.nombre_raw, self.func_procesa_raw(), start, end,
+                                            raw_dir=self.raw_dir, n_procesos=n_procesos)
+            num_dias, dias_error = len(dict_data), [k for k in sorted(dict_data.keys()) if dict_data[k] is None]
+            data_new = concat_lotes([dict_data[k] for k in sorted(dict_data.keys())])
+        if data_new is None:
+            self.printif('NO HAY DATOS EN EL ARCHIVO RAW PARA REPROCESAR ({} -> {})'.format(start, end), 'warning')
+            return False
+        if type(data_new) is pd.DataFrame:
+            data_new = {self.masterkey: data_new}
+        self.integridad_data(data_new)
+        if not self.data:  # Sin el histórico cargado (`carga_completa=False`)
+            self.load_data()
+        self._meses_modificados = set()
+        try:
+            self.data = self._combina_data(self.data or {}, data_new)
+            huecos = self.busca_huecos(self.data, self.data.get(KEY_HUECOS))
+            if huecos is not None:
+                self.data[KEY_HUECOS] = huecos
+            self.post_update_data()
+            self.save_data()
+        finally:
+            self._meses_modificados = None
+        self.printif('{} días reprocesados desde el archivo raw ({} con errores) [{:.2f} seg]'
+                     .format(num_dias, len(dias_error), time.time() - tic), 'ok')
+        return True
+
+    def _combina_data(self, data, data_new):
+        """Combina los datos nuevos con los existentes (prevaleciendo los nuevos), manteniendo tz y muestreo."""
+        data = dict(data)
+        muestreo = self.muestreo_huecos()
+        self._marca_modificados(data_new)
+        for k, df_new in data_new.items():
+            df_ant = data.get(k)
+            if df_ant is None or df_ant.empty:
+                data[k] = df_new
+            else:
+                df = pdmerge_respeta_tz(df_new.combine_first, df_ant.index.tz, df_ant)
+                if k in muestreo and len(df) > 2:
+                    df = df.asfreq(pd.Timedelta(seconds=muestreo[k][0]))
+                data[k] = df
+        return data
+
+    def _marca_modificados(self, data_new):
+        """Registra los meses con datos nuevos, para comparar y grabar sólo esas particiones del almacén."""
+        if self._meses_modificados is not None and data_new is not None:
+            if isinstance(data_new, pd.DataFrame):
+                data_new = {self.masterkey: data_new}
+            for df in data_new.values():
+                if isinstance(df.index, pd.DatetimeIndex) and len(df):
+                    self._meses_modificados.update(meses_index(df.index, self.TZ))
+
+    # you can override this on the child classes
+    def muestreo_huecos(self):
+        """Dict {key: (muestreo en segs, columnas que deben tener datos)} de los DataFrames en los que buscar huecos.
+        Con columnas None, basta con que la fila tenga algún dato."""
+        return {self.masterkey: (self.TS_DATA, None)}
+
+    def busca_huecos(self, data=None, huecos_ant=None):
+        """
+        Índice de huecos (vectorial) de los datos, desde `DATE_INI` hasta el día anterior al último dato válido:
+        días con muestras de menos, con el nº de muestras que faltan en cada key de datos y el nº de intentos
+        fallidos de descarga de cada día ('intentos', que se conservan de `huecos_ant`).
+
+        :param data: (OPC) dict de DataFrames (por defecto, `self.data`)
+        :param huecos_ant: (OPC) índice de huecos anterior
+        :return: pd.DataFrame indexado por día, o None si no hay datos
+        """
+        data = self.data if data is None else data
+        muestreo = self.muestreo_huecos()
+        validos = {}
+        for k, (_, cols) in muestreo.items():
+            if data.get(k) is not None and not data[k].empty:
+                validos[k] = (data[k][cols] if cols else data[k]).notnull().any(axis=1).values
+        if not validos.get(self.masterkey, np.array([])).any():
+            return None
+        ultimo = data[self.masterkey].index[validos[self.masterkey]][-1]
+        d0, df = pd.Timestamp(self.DATE_INI).date(), ultimo.date() - dt.timedelta(days=1)
+        if self.DATE_FIN is not None:
+            df = min(df, pd.Timestamp(self.DATE_FIN).date())
+        faltan = {}
+        for k, mask in validos.items():
+            h = indice_huecos(data[k].index, muestreo[k][0], d0, df, self.TZ, mask)
+            faltan[k] = h['esperadas'] - h['presentes']
+        index = pd.DatetimeIndex(sorted(set().union(*[f.index for f in faltan.values()])), name='dia')
+        huecos = pd.DataFrame({k: f.reindex(index, fill_value=0).values for k, f in faltan.items()},
+                              index=index, dtype=int)
+        if huecos_ant is not None and 'intentos' in huecos_ant:
+            huecos['intentos'] = huecos_ant['intentos'].reindex(index, fill_value=0).values.astype(int)
+        else:
+            huecos['intentos'] = 0
+        return huecos
+
+    def rellena_huecos(self, data=None, huecos_ant=None):
+        """
+        Descarga de nuevo únicamente los días con huecos en los datos (con menos de `MAX_INTENTOS_HUECO` intentos
+        fallidos), los combina con los datos existentes y actualiza el índice de huecos en `data['huecos']`.
+
+        :param data: (OPC) dict de DataFrames (por defecto, `self.data`)
+        :param huecos_ant: (OPC) índice de huecos anterior (el del store)
+        :return: data, hay_cambios (datos nuevos o cambios en el índice de huecos)
+        """
+        data = self.data if data is None else data
+        huecos = self.busca_huecos(data, huecos_ant)
+        if huecos is None:
+            return data, False
+        dias = [d.strftime(self.DATE_FMT) for d in huecos.index[huecos['intentos'] < MAX_INTENTOS_HUECO]]
+        hay_nueva_info = False
+        if dias:
+            self.printif('Se descargan de nuevo {} días con huecos en los datos: {}{}'
+                         .format(len(dias), ', '.join(dias[:10]), '...' if len(dias) > 10 else ''), 'info')
+            data_new = self._get_data_en_intervalo(dias=dias)
+            if data_new:
+                data = self._combina_data(data, data_new)
+                hay_nueva_info = True
+            huecos = self.busca_huecos(data, huecos)
+            huecos.loc[huecos.index.isin(pd.to_datetime(dias)), 'intentos'] += 1
+            if not huecos.empty:
+                self.printif('QUEDAN {} DÍAS CON HUECOS EN LOS DATOS'.format(len(huecos)), 'warning')
+        hay_cambios = hay_nueva_info or huecos_ant is None or not huecos.equals(huecos_ant)
+        data[KEY_HUECOS] = huecos
+        return data, hay_cambios
+
+    def _descarga(self, d0=None, df=None, **kwargs):
+        """
+        Descarga con el motor asíncrono (`esiosdata.aio`) o, sin `aiohttp`, con el multithread
+        (`esiosdata.descargathreads`), ambos regulados por `self.control_descargas`, y deja en
+        `self.resumen_descargas` el estado del controlador.
+
+        :return: data_get, hay_errores, str_import
+        """
+        kwargs.update(headers=self.HEADERS, num_retries=self.NUM_RETRIES, timeout=self.TIMEOUT,
+                      control=self.control_descargas, verbose=self.verbose)
+        if self.usar_asyncio:
+            resultado = get_data_en_intervalo_aio(d0, df, max_conexiones=MAX_CONEXIONES_AIO, **kwargs)
+        else:
+            max_threads = self.MAX_THREADS_REQUESTS if self.USAR_MULTITHREAD else 1
+            resultado = get_data_en_intervalo_threads(d0, df, max_threads=max_threads, **kwargs)
+        self.resumen_descargas = self.control_descargas.resumen()
+        return resultado
+
+    def _get_data_en_intervalo(self, d0=None, df=None, dias=None):
+        """
+        Obtiene los datos de la red para el intervalo [d0, df] (o sólo para la lista de días `dias`) con el backend
+        seleccionado. Reemplaza al método privado `DataWeb.__get_data_en_intervalo`, usado por `update_data`.
+        """
+        lotes = self.usa_lotes()
+        data_get, hay_errores, str_import = self._descarga(
+            d0, df, func_url_data_dia=self.url_data_dia,
+            func_procesa_data_dia=self.valida_data_dia if lotes else self.procesa_data_dia,
+            json_req=self.JSON_REQUESTS, date_fmt=self.DATE_FMT,
+            func_procesa_lote=self.procesa_data_dias if lotes else None, dias_por_lote=DIAS_POR_LOTE, dias=dias)
+        if not hay_errores:
+            self.integridad_data(data_get)
+            self.printif(str_import, 'ok')
+            if type(data_get) is pd.DataFrame:
+                data_get = {self.masterkey: data_get}
+            return data_get
+        return None
+
+    def _migra_a_particiones(self):
+        """Copia al almacén particionado los datos del fichero HDF5 único del store, si existen."""
+        if not os.path.exists(self.PATH_DATABASE) or not os.path.getsize(self.PATH_DATABASE):
+            return False
+        with pd.HDFStore(self.PATH_DATABASE, mode='r') as store:
+            data = {k.replace('/', ''): store[k] for k in store.keys()}
+        if not data:
+            return False
+        for k, df in data.items():
+            self.almacen.escribe(k, df)
+        self.printif('STORE {} MIGRADO A PARTICIONES MENSUALES EN {}'
+                     .format(self.PATH_DATABASE, self.almacen.directorio), 'info')
+        return True
+
+    def load_data(self, key=None, **kwargs):
+        """
+        Lee de disco la información (con el lock de HDF5, para actualizar varios stores en paralelo), del almacén
+        particionado o del fichero HDF5 único del store.
+
+        :param key: (OPC) key de datos; si se indica, se devuelve su DataFrame (sin modificar `data`)
+        :param kwargs: (OPC) con el almacén particionado, `start`, `end` y `columns` (ver `lee_intervalo`)
+        """
+        with LOCK_HDF:
+            if not self.almacen_particionado:
+                return super(DataWebESIOS, self).load_data(key, **kwargs)
+            if not self.almacen.existe():
+                self._migra_a_particiones()
+            if key:
+                return self.almacen.lee(key, **kwargs)
+            if self._omite_carga:  # Sin carga inicial del histórico (`carga_completa=False`)
+                self.data = {}
+                return
+            self.data = self.almacen.lee_todo()
+            self.integridad_data()
+
+    def save_data(self, dataframe=None, key_data=None):
+        """
+        Guarda en disco la información (con el lock de HDF5, para actualizar varios stores en paralelo). Con el
+        almacén particionado, sólo se escriben las particiones mensuales nuevas o modificadas.
+        """
+        with LOCK_HDF:
+            if not self.almacen_particionado:
+                return super(DataWebESIOS, self).save_data(dataframe, key_data)
+            self.integridad_data()
+            if dataframe is not None:
+                datos = {key_data or self.masterkey: dataframe}
+            elif key_data is not None:
+                datos = {key_data: self.data[key_data]}
+            else:
+                datos = self.data
+            escritas = 0
+            derivadas = set(self.keys_derivadas) | set(self.keys_agregados)
+            for k, df in datos.items():
+                meses = self._meses_modificados if k in self.keys_data_web or k in derivadas else None
+                if meses is not None and k in self._meses_agregados:
+                    meses = meses | self._meses_agregados[k]
+                escritas += len(self.almacen.escribe(k, df, meses))
+            self.printif('{} particiones grabadas en {}'.format(escritas, self.almacen.directorio), 'info')
+
+    def integridad_data(self, data_integr=None, key=None):
+        """
+        Comprueba que el index de cada dataframe de la base de datos sea de fechas (`pd.DatetimeIndex`), único (sin
+        duplicados) y creciente. Reemplaza a `DataWeb.integridad_data`, que usa `Index.is_all_dates` (eliminado en
+        pandas 2.0).
+        :param data_integr:
+        :param key:
+        """
+        def _assert_integridad(df):
+            if df is not None and not df.empty:
+                assert (isinstance(df.index, pd.DatetimeIndex)
+                        and df.index.is_unique and df.index.is_monotonic_increasing)
+
+        if data_integr is None:
+            data_integr = self.data
+        if type(data_integr) is dict:
+            keys = data_integr.keys() if key is None else [key]
+            [_assert_integridad(data_integr[k]) for k in keys]
+        else:
+            _assert_integridad(data_integr)
+
+    def lee_intervalo(self, start=None, end=None, key=None, columns=None):
+        """
+        Lee de disco los datos de una key en el intervalo [start, end]. Con el almacén particionado, sólo se abren
+        las particiones mensuales necesarias, sin cargar todo el histórico.
+
+        :param start: (OPC) instante o día inicial (sin tz, en la del store)
+        :param end: (OPC) instante o día final (incluido; '2016-03-31' incluye todo el día)
+        :param key: (OPC) key de datos (por defecto, la principal)
+        :param columns: (OPC) lista de columnas (KeyError si alguna no existe)
+        :return: pd.DataFrame
+        """
+        key = key or self.masterkey
+        if self.almacen_particionado:
+            return self.load_data(key, start=start, end=end, columns=columns)
+        with LOCK_HDF:
+            df = pd.read_hdf(self.PATH_DATABASE, key)
+        tz = getattr(df.index, 'tz', None)
+        df = df.loc[limite_intervalo(start, tz):limite_intervalo(end, tz, final=True)]
+        return df[columns] if columns is not None else df
+
+    @property
+    def keys_agregados(self):
+        """Keys del store con los agregados por periodo de la key principal."""
+        return [KEY_AGREGADOS.format(p) for p in self.periodos_agregados]
+
+    def actualiza_data_agregados(self):
+        """
+        Actualiza en `data` los agregados por periodo de la key principal, recalculando sólo los periodos con datos en
+        los meses modificados (o todos, en una descarga completa o si el store aún no los tiene). Las particiones de
+        los periodos recalculados (p.ej., semanas que empiezan en el mes anterior) se graban con las de esos meses.
+        """
+        data = self.data.get(self.masterkey) if self.data else None
+        self._meses_agregados = {}
+        if data is None or data.empty:
+            return
+        for periodo, key in zip(self.periodos_agregados, self.keys_agregados):
+            agregados, periodos = actualiza_agregados(self.data.get(key), data, FREQ_AGREGADOS[periodo],
+                                                      self._meses_modificados, self.columnas_agregados, self.TZ)
+            self.data[key] = agregados
+            self._meses_agregados[key] = set(meses_index(periodos, self.TZ))
+
+    def agregados(self, periodo, start=None, end=None):
+        """
+        Agregados por periodo (media, mínimo, máximo e instantes del mínimo y del máximo; ver `esiosdata.agregados`)
+        de la key principal en el intervalo [start, end]: del histórico cargado o, si no lo está, leídos de disco (sólo
+        las particiones necesarias). Si el store aún no los tiene, se calculan sobre los datos del intervalo.
+
+        :param periodo: periodo de agregación (de `periodos_agregados`: 'hora', 'dia', 'semana' o 'mes')
+        :param start: (OPC) instante o día inicial (sin tz, en la del store)
+        :param end: (OPC) instante o día final (incluido)
+        :return: pd.DataFrame indexado por el inicio de cada periodo
+        """
+        if periodo not in self.periodos_agregados:
+            raise KeyError('Agregados "{}" no disponibles. Periodos: {}'.format(periodo, self.periodos_agregados))
+        key, freq = KEY_AGREGADOS.format(periodo), FREQ_AGREGADOS[periodo]
+        t0, tf = limite_intervalo(start, self.TZ), limite_intervalo(end, self.TZ, final=True)
+        if t0 is not None:  # Desde el inicio del periodo que contiene a `start`
+            t0 = etiquetas_periodo(pd.DatetimeIndex([t0]), freq)[0]
+        if self.data and self.data.get(self.masterkey) is not None:
+            if self.data.get(key) is None:
+                self.data[key] = agrega_periodos(self.data[self.masterkey], freq, self.columnas_agregados)
+            return self.data[key].loc[t0:tf]
+        try:
+            return self.lee_intervalo(t0, tf, key=key)
+        except KeyError:  # Store sin agregados: se calculan sobre los periodos completos del intervalo
+            return agrega_periodos(self.lee_intervalo(t0, tf), freq, self.columnas_agregados)
+
+    # Sobreescritura del método 'privado' de DataWeb (name mangling)
+    def _DataWeb__get_data_en_intervalo(self, d0=None, df=None):
+        data_new = self._get_data_en_intervalo(d0, df)
+        self._marca_modificados(data_new)
+        return data_new
+
+    # Sobreescritura del método 'privado' de DataWeb (name mangling): tras la actualización desde el último dato,
+    # se rellenan los huecos interiores
+    def _DataWeb__actualiza_datos(self, data_ant=None, tmax=None):
+        if data_ant is None:  # Descarga completa: se comparan todas las particiones al grabar
+            self._meses_modificados = None
+        huecos_ant = data_ant.get(KEY_HUECOS) if data_ant else None
+        data_act, hay_nueva_info = DataWeb._DataWeb__actualiza_datos(self, data_ant, tmax)
+        if data_act and self.repara_huecos:
+            data_act, hay_cambios = self.rellena_huecos(data_act, huecos_ant)
+            hay_nueva_info = hay_nueva_info or hay_cambios
+        return data_act, hay_nueva_info
+
+
+class PVPC(DataWebESIOS):
+    """
+    Handler de datos de PVPC en fichero local, con las columnas derivadas (€/kWh, TCU, CP, PD_) en 'data_calc' y los
+    agregados diarios, semanales y mensuales de los precios de cada tarifa (`AGREGADOS_PVPC`).
+    """
+    nombre_raw = 'pvpc'
+    keys_derivadas = (KEY_DATA_CALC,)
+    periodos_agregados = AGREGADOS_PVPC
+    columnas_agregados = TARIFAS
+
+    def __init__(self, update=True, force_update=False, verbose=VERBOSE, usar_asyncio=USAR_ASYNCIO,
+                 almacen_particionado=ALMACEN_PARTICIONADO, carga_completa=True, path_database=None):
+        super(PVPC, self).__init__(path_database or PATH_DATABASE_PVPC,
                                    'Histórico de precios de la electricidad [PVPC] (esios.ree.es)',
                                    forzar_update=force_update, verbose=verbose, update_init=update,
                                    TZ=TZ, DATE_FMT=DATE_FMT, DATE_INI=DATE_INI_PVPC, TS_DATA=TS_DATA_PVPC,
                                    USAR_MULTITHREAD=USAR_MULTITHREAD, NUM_RETRIES=NUM_RETRIES,
                                    MAX_THREADS_REQUESTS=MAX_THREADS_REQUESTS,
-                                   HEADERS=HEADERS, JSON_REQUESTS=True)  # , PARAMS_REQUESTS=)
+                                   HEADERS=HEADERS, JSON_REQUESTS=True,  # , PARAMS_REQUESTS=)
+                                   usar_asyncio=usar_asyncio, almacen_particionado=almacen_particionado,
+                                   carga_completa=carga_completa)
 
     # Definición necesaria en superclase
     def url_data_dia(self, key_dia):
@@ -58,16 +662,94 @@ class PVPC(DataWeb):
     # Definición necesaria en superclase
     def procesa_data_dia(self, key_dia, datos_para_procesar):
         """Procesa los datos descargados correspondientes a un día `key_dia`."""
-        return pvpc_procesa_datos_dia(key_dia, datos_para_procesar, verbose=self.verbose)
+        data_import, ok = pvpc_procesa_datos_dia(key_dia, datos_para_procesar, verbose=self.verbose)
+        if ok == 0:
+            self.archiva_raw(key_dia, datos_para_procesar)
+        return data_import, ok
+
+    def func_procesa_raw(self):
+        """Función 'picklable' equivalente a `procesa_data_dia`, para el reprocesado multiproceso."""
+        return partial(pvpc_procesa_datos_dia, verbose=False)
+
+    def func_procesa_lote(self):
+        """Función 'picklable' de procesado por lotes de días."""
+        return pvpc_procesa_lote
+
+    def valida_data_dia(self, key_dia, datos_para_procesar):
+        """Validación de la respuesta de un día en el procesado por lotes."""
+        return pvpc_valida_datos_dia(key_dia, datos_para_procesar, verbose=self.verbose)
+
+    def instante_esperado(self, ahora):
+        """Última hora de hoy o, tras la publicación diaria (`HORA_PUBLICACION_PVPC`), del día siguiente."""
+        return esperado_pvpc(ahora, self.TS_DATA)
+
+    def ultima_publicacion(self, ahora):
+        """Instante de la última publicación diaria de precios."""
+        return publicacion_pvpc(ahora)
+
+    def proxima_publicacion(self, ahora):
+        """Instante de la siguiente publicación diaria de precios."""
+        return publicacion_pvpc(ahora, siguiente=True)
+
+    def read(self, start=None, end=None, tarifa=None, actualiza=True, convert_kwh=True):
+        """
+        Lee los datos de PVPC del intervalo [start, end], con las columnas derivadas de `pvpc_calc_tcu_cp_feu_d`
+        (TCU, CP, PD_), sin cargar ni procesar todo el histórico: con el almacén particionado, se leen de disco sólo
+        los meses del intervalo y, en Parquet, sólo las columnas de las tarifas pedidas.
+
+        :param start: (OPC) instante o día inicial (sin tz, en la del store)
+        :param end: (OPC) instante o día final (incluido; '2016-03-31' incluye todo el día)
+        :param tarifa: (OPC) código de tarifa ('GEN', 'NOC', 'VHC') o lista de códigos (por defecto, todas)
+        :param actualiza: (OPC) si los datos locales no llegan a `end` (ver `cubre_intervalo`), actualiza antes el store
+        :param convert_kwh: (OPC) pasa los precios de €/MWh a €/kWh
+        :return: pd.DataFrame
+        """
+        tarifas = [tarifa] if isinstance(tarifa, str) else tarifa
+        if tarifas and any(t not in TARIFAS for t in tarifas):
+            raise KeyError('Tarifas {} no disponibles. Tarifas: {}'.format(tarifas, TARIFAS))
+        if actualiza and not self.cubre_intervalo(end):
+            self.update_data()
+        if convert_kwh:
+            columns = [c + t for t in tarifas for c in COLS_PVPC + COLS_CALC_PVPC] if tarifas else None
+            try:
+                return self.lee_intervalo(start, end, key=KEY_DATA_CALC, columns=columns)
+            except KeyError:  # Store sin las columnas derivadas ('data_calc'): se calculan sobre el intervalo leído
+                pass
+        columns = [c + t for c in COLS_PVPC for t in tarifas] if tarifas else None
+        df = self.lee_intervalo(start, end, columns=columns)
+        if df.empty:
+            return df
+        return pvpc_calc_tcu_cp_feu_d(df, verbose=False, convert_kwh=convert_kwh)
+
+    def post_update_data(self):
+        """
+        Actualiza las columnas derivadas de los precios (€/kWh, TCU, CP, PD_) en la key 'data_calc' y los agregados
+        por periodo, calculándolos sólo para los meses con datos nuevos o modificados (o para todo el histórico, en
+        una descarga completa o si el store aún no los tiene).
+        """
+        data = self.data.get(self.masterkey) if self.data else None
+        if data is None or data.empty:
+            return
+        calc_ant, meses = self.data.get(KEY_DATA_CALC), self._meses_modificados
+        if calc_ant is None or calc_ant.empty or meses is None:
+            calc = pvpc_calc_tcu_cp_feu_d(data.copy(), verbose=False, convert_kwh=True)
+        else:
+            mascara = mascara_meses(data.index, meses, self.TZ)
+            calc = calc_ant
+            if mascara.any():
+                calc_new = pvpc_calc_tcu_cp_feu_d(data[mascara].copy(), verbose=False, convert_kwh=True)
+                calc = pd.concat([calc_ant[~mascara_meses(calc_ant.index, meses, self.TZ)], calc_new]).sort_index()
+        if len(calc) == len(data) and calc.index.equals(data.index):
+            calc.index = data.index
+        self.data[KEY_DATA_CALC] = calc
+        self.actualiza_data_agregados()
 
     def get_resample_data(self):
-        """Obtiene los dataframes de los datos de PVPC con resampling diario y mensual."""
-        if self.data is not None:
-            if self._pvpc_mean_daily is None:
-                self._pvpc_mean_daily = self.data['data'].resample('D').mean()
-            if self._pvpc_mean_monthly is None:
-                self._pvpc_mean_monthly = self.data['data'].resample('MS').mean()
-        return self._pvpc_mean_daily, self._pvpc_mean_monthly
+        """
+        Obtiene los dataframes de los precios de PVPC con resampling diario y mensual (los agregados guardados en el
+        store: media por tarifa, con su mínimo, máximo e instantes de ambos), actualizados con cada actualización.
+        """
+        return self.agregados('dia'), self.agregados('mes')
 
     @property
     def tarifas(self):
@@ -80,46 +762,130 @@ class PVPC(DataWeb):
         return {'GEN': '#00A1DA', 'NOC': '#DF4A32', 'VHC': '#74BA04'}
 
 
-class DatosREE(DataWeb):
-    """Handler de datos de demanda energética en fichero local."""
+class DatosREE(DataWebESIOS):
+    """
+    Handler de datos de demanda energética en fichero local, para una zona y curva (`CURVAS_ZONAS`).
+
+    Los datos de la Península ('PENINSULA', curva 'DEMANDA') se descargan de ESIOS; los de cada isla o sistema
+    insular de Baleares y Canarias, de demanda.ree.es (sólo datos diezminutales, en hora local de la zona), cada uno en
+    su propio store. Para actualizar y consultar varias zonas a la vez, ver `esiosdata.zonas.DatosZonas`.
+
+    Con `usar_indicadores=True` (experimental: los ids de `INDICADORES_DEM` no están contrastados con la API real), los
+    datos se descargan por indicadores de la API, con `MESES_POR_PETICION_IND` meses de datos diezminutales por
+    petición, en vez de con 4 archivos por día (sólo para la Península).
+
+    Los agregados horarios y diarios de los datos diezminutales (`AGREGADOS_DEM`) se guardan en el store.
+    """
+    periodos_agregados = AGREGADOS_DEM
 
-    def __init__(self,  # zona=ZONAS[0], curva=CURVAS_ZONAS[ZONAS[0]][0],
+    def __init__(self, zona=ZONAS[0], curva=None,
                  update=True, force_update=False, verbose=VERBOSE,
-                 fecha_inicio=DATE_INI_DEM, fecha_fin=None,
-                 usar_multithread=USAR_MULTITHREAD, max_n_threads=MAX_THREADS_REQUESTS):
+                 fecha_inicio=None, fecha_fin=None,
+                 usar_multithread=USAR_MULTITHREAD, max_n_threads=MAX_THREADS_REQUESTS, usar_asyncio=USAR_ASYNCIO,
+                 usar_indicadores=DEM_USAR_INDICADORES, control_descargas=CONTROL_DESCARGAS,
+                 almacen_particionado=ALMACEN_PARTICIONADO, carga_completa=True):
+        zona = zona.upper()
+        if zona not in CURVAS_ZONAS:
+            raise ValueError('Zona desconocida: "{}". Zonas disponibles: {}'.format(zona, ZONAS))
+        curva = (curva or CURVAS_ZONAS[zona][0]).upper()
+        if curva not in CURVAS_ZONAS[zona]:
+            raise ValueError('Curva desconocida: "{}". Curvas en {}: {}'.format(curva, zona, CURVAS_ZONAS[zona]))
         self.verbose = verbose
-        # TODO incorporar resto de zonas y curvas:
-        self.zona = 'PENINSULA'
-        self.curva = 'DEMANDA'
-        # path_store = '{}_{}_{}.h5'.format(PATH_DATABASE, self.zona, self.curva)
-        path_store = '{}_{}.h5'.format(PATH_DATABASE_DEM, self.zona)
+        self.zona, self.curva = zona, curva
+        self.es_peninsula = zona == ZONAS[0]
+        self.usar_indicadores = usar_indicadores and self.es_peninsula
+        if self.es_peninsula:
+            self.nombre_raw = 'dem_{}'.format(self.zona)
+            path_store = '{}_{}.h5'.format(PATH_DATABASE_DEM, self.zona)
+            keys_data, headers = KEYS_DATA_DEM, HEADERS
+        else:
+            self.nombre_raw = 'dem_{}_{}'.format(self.zona, self.curva)
+            path_store = '{}_{}_{}.h5'.format(PATH_DATABASE_DEM, self.zona, self.curva)
+            keys_data, headers = KEYS_DATA_DEM[:1], HEADERS_DEMANDA
         titulo = 'Histórico de demanda y producción eléctrica en Zona: {}\n' \
-                 '(demanda.ree.es, curva: {})'.format(self.zona, self.curva)
-        params = {'update_init': update, 'TZ': TZ,  # pytz.timezone(TZ_ZONAS[zona]),
-                  'DATE_FMT': DATE_FMT, 'DATE_INI': fecha_inicio, 'DATE_FIN': fecha_fin,
-                  'TS_DATA': TS_DATA_DEM, 'keys_data_web': KEYS_DATA_DEM,
-                  'NUM_RETRIES': NUM_RETRIES,
-                  'USAR_MULTITHREAD': usar_multithread, 'MAX_THREADS_REQUESTS': max_n_threads}
+                 '({}, curva: {})'.format(self.zona, 'esios.ree.es' if self.es_peninsula else 'demanda.ree.es',
+                                          self.curva)
+        params = {'update_init': update, 'TZ': TZ_ZONAS[zona],
+                  'DATE_FMT': DATE_FMT, 'DATE_INI': fecha_inicio or INI_ZONAS[zona], 'DATE_FIN': fecha_fin,
+                  'TS_DATA': TS_DATA_DEM, 'keys_data_web': keys_data,
+                  'NUM_RETRIES': NUM_RETRIES, 'HEADERS': headers,
+                  'USAR_MULTITHREAD': usar_multithread, 'MAX_THREADS_REQUESTS': max_n_threads,
+                  'usar_asyncio': usar_asyncio, 'control_descargas': control_descargas,
+                  'almacen_particionado': almacen_particionado, 'carga_completa': carga_completa}
         super(DatosREE, self).__init__(path_store, titulo, force_update, verbose, **params)
 
     # Definición necesaria en superclase
     def url_data_dia(self, key_dia):
         """Devuelve la url de descarga de datos para `key_dia`."""
-        return dem_url_dia(key_dia)  # , self.zona, self.curva)
+        if self.es_peninsula:
+            return dem_url_dia(key_dia)
+        return dem_url_zona_dia(key_dia, self.zona, self.curva)
 
     # Definición necesaria en superclase
     def procesa_data_dia(self, str_dia, datos_para_procesar):
         """Procesa los datos descargados correspondientes a un día `key_dia`."""
-        return dem_procesa_datos_dia(str_dia, datos_para_procesar)  # self.TZ
+        data_import, ok = self.func_procesa_raw()(str_dia, datos_para_procesar)
+        if ok == 0:
+            self.archiva_raw(str_dia, datos_para_procesar)
+        return data_import, ok
+
+    def func_procesa_raw(self):
+        """Función 'picklable' equivalente a `procesa_data_dia`, para el reprocesado multiproceso."""
+        if self.es_peninsula:
+            return dem_procesa_datos_dia
+        return partial(dem_procesa_zona_dia, tz=self.TZ)
+
+    def func_procesa_lote(self):
+        """Función 'picklable' de procesado por lotes de días (sólo para los archivos diarios de la Península)."""
+        return dem_procesa_lote if self.es_peninsula else None
+
+    def valida_data_dia(self, key_dia, datos_para_procesar):
+        """Validación de las respuestas de un día en el procesado por lotes."""
+        return dem_valida_datos_dia(key_dia, datos_para_procesar)
+
+    def _get_data_en_intervalo(self, d0=None, df=None, dias=None):
+        """
+        Con `usar_indicadores`, obtiene los datos del intervalo [d0, df] (o de los días `dias`) por indicadores,
+        en tramos de varios meses, en vez de con los archivos diarios. Estas respuestas no se guardan en el archivo raw.
+        """
+        if not self.usar_indicadores:
+            return super(DatosREE, self)._get_data_en_intervalo(d0, df, dias)
+        if dias is None:
+            intervalos = [(d0 or self.DATE_INI, df or self.DATE_FIN or dt.date.today())]
+        else:
+            intervalos = dias_consecutivos(dias)
+        keys = [k for d_0, d_f in intervalos for k in dem_intervalos_indicadores(d_0, d_f)]
+        data_get, hay_errores, str_import = self._descarga(
+            func_url_data_dia=dem_url_indicadores, func_procesa_data_dia=dem_procesa_indicadores, json_req=True,
+            func_procesa_lote=dem_concat_intervalos, dias=keys)
+        if hay_errores:
+            return None
+        self.integridad_data(data_get)
+        self.printif(str_import, 'ok')
+        return data_get
+
+    def instante_esperado(self, ahora):
+        """Datos de demanda publicados de forma continua, con `RETRASO_PUBLICACION_DEM`."""
+        return esperado_dem(ahora)
+
+    def proxima_publicacion(self, ahora):
+        """Actualización periódica de los datos de demanda (`PERIODO_ACTUALIZACION_DEM`)."""
+        return proxima_dem(ahora)
+
+    def muestreo_huecos(self):
+        """Huecos en los datos diezminutales (con demanda real) y en los máximos y mínimos diarios."""
+        muestreo = {KEYS_DATA_DEM[0]: (TS_DATA_DEM, ['dem']), KEYS_DATA_DEM[1]: (24 * 3600, None)}
+        return {k: muestreo[k] for k in self.keys_data_web}
 
     # Definición opcional
     def post_update_data(self):
         """
         Definición opcional para analizar la información descargada en busca de errores,
-        que quedan almacenados en `self.data['errores']`.
+        que quedan almacenados en `self.data['errores']`, y actualizar los agregados horarios y diarios.
         """
         if self.data is not None:
             self.data['errores'] = self.busca_errores_data()
+            self.actualiza_data_agregados()
 
     # Definición específica
     def last_entry(self, data_revisar=None, key_revisar=None):
@@ -147,33 +913,29 @@ class DatosREE(DataWeb):
         :param data_integr:
         :param key:
         """
-        if data_integr is None and key is None and all(k in self.data.keys() for k in KEYS_DATA_DEM):
+        if data_integr is None and key is None and all(k in self.data.keys() for k in self.keys_data_web):
             assert(self.data[KEYS_DATA_DEM[0]].index.freq == FREQ_DAT_DEM
                    and self.data[KEYS_DATA_DEM[0]].index.tz == self.TZ)
-            if self.data[KEYS_DATA_DEM[1]] is not None:
+            if self.data.get(KEYS_DATA_DEM[1]) is not None:
                 assert(self.data[KEYS_DATA_DEM[1]].index.freq == 'D')
         super(DatosREE, self).integridad_data(data_integr, key)
 
     def busca_errores_data(self):
         """
-        Busca errores o inconsistencias en los datos adquiridos
-        :return: Dataframe de errores encontrados
-        """
-        data_busqueda = self.append_delta_index(TS_DATA_DEM, data_delta=self.data[self.masterkey].copy())
-        idx_desconex = (((data_busqueda.index < 'now') & (data_busqueda.index >= self.DATE_INI)) &
-                        ((data_busqueda.delta_T > 1) | data_busqueda['dem'].isnull() |
-                         data_busqueda['pre'].isnull() | data_busqueda['pro'].isnull()))
-        sosp = data_busqueda[idx_desconex].copy()
-        assert len(sosp) == 0
-        # if len(sosp) > 0:
-        #     cols_show = ['bad_dem', 'bad_pre', 'bad_T', 'delta', 'delta_T', 'dem', 'pre', 'pro']
-        #     cols_ss = cols_show[:3]
-        #     how_r = {k: pd.Series.sum if k == 'delta' else 'sum' for k in cols_show}
-        #     sosp[cols_show[0]] = sosp['dem'].isnull()
-        #     sosp[cols_show[1]] = sosp['pre'].isnull()
-        #     sosp[cols_show[2]] = sosp['delta_T'] > 1
-        #     if verbose:
-        #         print(sosp[cols_show].tz_localize(None).resample('D', how=how_r).dropna(how='all', subset=cols_ss))
-        #         print(sosp[cols_show].tz_localize(None).resample('MS', how=how_r).dropna(how='all', subset=cols_ss))
-        #     return sosp
+        Busca errores o inconsistencias en los datos adquiridos (saltos en el index o valores nulos de demanda,
+        previsión o programación, hasta el instante actual). Los días incompletos se registran además en el índice
+        de huecos (`busca_huecos`), para descargarlos de nuevo en la siguiente actualización.
+        :return: Dataframe de errores encontrados (vacío si no hay)
+        """
+        data = self.data[self.masterkey]
+        cols = [c for c in ['dem', 'pre', 'pro'] if c in data]
+        ts = data.index.values.astype('datetime64[ns]').view('int64')
+        delta_t = np.diff(ts, prepend=ts[:1] - TS_DATA_DEM * 10**9) / (TS_DATA_DEM * 10**9)
+        idx_desconex = (((data.index < pd.Timestamp.now(tz=self.TZ)) &
+                         (data.index >= pd.Timestamp(self.DATE_INI, tz=self.TZ))) &
+                        ((delta_t > 1) | data[cols].isnull().values.any(axis=1)))
+        if idx_desconex.any():
+            sosp = data.loc[idx_desconex, cols].assign(delta_T=delta_t[idx_desconex])
+            self.printif('HAY {} MUESTRAS SOSPECHOSAS EN LOS DATOS DE DEMANDA'.format(len(sosp)), 'warning')
+            return sosp
         return pd.DataFrame()
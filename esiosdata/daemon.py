@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Actualización en segundo plano de los stores locales de PVPC y demanda (`esiosdata daemon`).
+
+Cada origen de datos es una tarea (`TareaActualizacion`) que se ejecuta según su calendario de publicación
+(`esiosdata.frescura`): los precios del PVPC del día siguiente, tras `HORA_PUBLICACION_PVPC`; la demanda, cada
+`PERIODO_ACTUALIZACION_DEM` segs. Si los datos esperados aún no están publicados, la tarea se reintenta con esperas
+crecientes (`ESPERA_REINTENTO_INI` -> `ESPERA_REINTENTO_MAX`). Tras cada ejecución se guarda la marca de frescura del
+store, con la que `PVPC(update=True)` o `DatosREE(update=True)` (p.ej., dentro de `FacturaElec`) abren los datos
+locales sin ninguna petición a la red.
+
+Uso:
+```
+    esiosdata daemon               # PVPC y demanda peninsular
+    esiosdata daemon pvpc --una-vez
+    esiosdata daemon dem --zonas BALEARES CANARIAS
+```
+@author: Eugenio Panadero
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import signal
+import threading
+import pandas as pd
+from esiosdata.classdataesios import PVPC, DatosREE
+from esiosdata.esios_config import TZ, VERBOSE
+from esiosdata.frescura import ahora_tz, espera_reintento
+from esiosdata.prettyprinting import print_info, print_ok, print_warn, print_err
+from esiosdata.zonas import curvas_seleccion
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+DATASETS = ('pvpc', 'dem')
+ESPERA_MAX_BUCLE = 3600  # segs; el bucle se revisa al menos cada hora (p.ej., tras cambios de hora)
+
+
+class TareaActualizacion(object):
+    """Actualización periódica de un store (`PVPC` o `DatosREE`) según su calendario de publicación."""
+
+    def __init__(self, nombre, func_handler, verbose=VERBOSE):
+        """
+        :param nombre: identificador de la tarea
+        :param func_handler: función sin argumentos que crea el handler de datos (con `update=False`)
+        """
+        self.nombre = nombre
+        self.func_handler = func_handler
+        self.verbose = verbose
+        self.handler = None
+        self.proxima = None  # None: ejecución inmediata
+        self.intentos = 0
+        self.completo = False
+
+    def programa(self, completo, ahora, proxima_publicacion):
+        """Programa la siguiente ejecución: en la siguiente publicación si los datos están completos y, si no,
+        tras la espera de reintento (sin pasar de la siguiente publicación)."""
+        self.completo = completo
+        if completo:
+            self.intentos = 0
+            self.proxima = proxima_publicacion
+        else:
+            self.intentos += 1
+            self.proxima = min(ahora + pd.Timedelta(seconds=espera_reintento(self.intentos)), proxima_publicacion)
+        return self.proxima
+
+    def ejecuta(self, ahora=None):
+        """Ejecuta la actualización y programa la siguiente. Devuelve si los datos esperados están completos."""
+        ahora = ahora or ahora_tz()
+        completo = False
+        try:
+            if self.handler is None:
+                self.handler = self.func_handler()
+            hay_nueva_info, completo = self.handler.actualiza_hasta()
+            if self.verbose:
+                print_ok('[{:%d-%m-%Y %H:%M}] {}: {}{}, último dato: {}'
+                         .format(ahora, self.nombre, 'nuevos datos' if hay_nueva_info else 'sin cambios',
+                                 '' if completo else ' (FALTAN DATOS)', self.handler.ultimo_dato()))
+        except Exception as e:
+            print_err('[{:%d-%m-%Y %H:%M}] ERROR EN {}: {}: {}'.format(ahora, self.nombre, type(e).__name__, e))
+        proxima_pub = (self.handler.proxima_publicacion(ahora) if self.handler is not None
+                       else ahora + pd.Timedelta(days=1))
+        self.programa(completo, ahora, proxima_pub)
+        if self.verbose and not completo:
+            print_warn('{}: reintento nº {} a las {:%H:%M}'.format(self.nombre, self.intentos, self.proxima))
+        return completo
+
+    def pendiente(self, ahora):
+        """Indica si la tarea debe ejecutarse en `ahora`."""
+        return self.proxima is None or self.proxima <= ahora
+
+    def __repr__(self):
+        return '<{} {}, próxima: {}, intentos: {}>'.format(self.__class__.__name__, self.nombre, self.proxima,
+                                                           self.intentos)
+
+
+def tareas_daemon(datasets=DATASETS, zonas=None, verbose=VERBOSE):
+    """Tareas de actualización de los datos seleccionados ('pvpc', 'dem'; con `zonas`, una tarea por curva)."""
+    tareas = []
+    if 'pvpc' in datasets:
+        tareas.append(TareaActualizacion('PVPC', lambda: PVPC(update=False, verbose=False), verbose))
+    if 'dem' in datasets:
+        for zona, curva in curvas_seleccion(zonas or ['PENINSULA']):
+            tareas.append(TareaActualizacion(
+                'DEM {} - {}'.format(zona, curva),
+                lambda z=zona, c=curva: DatosREE(z, c, update=False, verbose=False), verbose))
+    return tareas
+
+
+def ejecuta_daemon(tareas, una_vez=False, evento_parada=None, verbose=VERBOSE):
+    """
+    Bucle del daemon: ejecuta (a la vez) las tareas pendientes y espera hasta la siguiente ejecución programada.
+
+    :param tareas: lista de `TareaActualizacion`
+    :param una_vez: (OPC) ejecuta una única vez cada tarea y termina
+    :param evento_parada: (OPC) threading.Event para detener el bucle
+    :return: tareas
+    """
+    parada = evento_parada or threading.Event()
+    while not parada.is_set():
+        ahora = ahora_tz(TZ)
+        pendientes = [t for t in tareas if t.pendiente(ahora)]
+        if pendientes:
+            with ThreadPoolExecutor(max_workers=len(pendientes)) as executor:
+                list(executor.map(lambda t: t.ejecuta(ahora), pendientes))
+        if una_vez:
+            break
+        proxima = min(t.proxima for t in tareas)
+        espera = min(ESPERA_MAX_BUCLE, max(0., (proxima - ahora_tz(TZ)).total_seconds()))
+        if verbose:
+            print_info('Siguiente actualización: {:%d-%m-%Y %H:%M} ({})'
+                       .format(proxima, ', '.join(t.nombre for t in tareas if t.proxima == proxima)))
+        parada.wait(espera)
+    return tareas
+
+
+def main_daemon(argv=None):
+    """CLI del daemon de actualización (`esiosdata daemon`)."""
+    p = argparse.ArgumentParser(prog='esiosdata daemon',
+                                description='Mantiene al día los datos locales de PVPC/DEMANDA (esios.ree.es)')
+    p.add_argument('datasets', nargs='*', metavar='{pvpc,dem}',
+                   help='Datos a mantener actualizados (por defecto, todos)')
+    p.add_argument('-z', '--zonas', action='store', nargs='+',
+                   help='Zonas de demanda (PENINSULA, BALEARES, CANARIAS; por defecto, la Península)')
+    p.add_argument('--una-vez', action='store_true', help='Actualiza una única vez y termina')
+    args = p.parse_args(argv)
+    if any(d not in DATASETS for d in args.datasets):
+        p.error('datos desconocidos: {} (elegir entre {})'.format(args.datasets, DATASETS))
+    tareas = tareas_daemon(args.datasets or DATASETS, args.zonas, verbose=True)
+    parada = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: parada.set())
+    try:
+        ejecuta_daemon(tareas, una_vez=args.una_vez, evento_parada=parada, verbose=True)
+    except KeyboardInterrupt:
+        parada.set()
+    return tareas
+
+
+if __name__ == '__main__':
+    main_daemon()
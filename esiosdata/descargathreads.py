@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de descarga multithread de los archivos diarios de ESIOS, para cuando no está instalado `aiohttp`.
+
+Misma salida que `esiosdata.aio.get_data_en_intervalo_aio` (y que `dataweb.requestweb.get_data_en_intervalo`):
+`(data, hay_errores, str_import)`, pero con un pool de `max_threads` threads y `requests`. El pool sólo fija un
+máximo: cada intento de petición ocupa una ranura del controlador AIMD (`downloadscheduler.CONTROL_DESCARGAS`), que
+es quien regula, como en el motor asíncrono, cuántas peticiones hay en vuelo en cada momento.
+
+@author: Eugenio Panadero
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import random
+import time
+import requests
+from esiosdata.aio import MIN_LEN_REQUEST, ESPERA_RETRY, _lista_dias, resultado_intervalo
+from esiosdata.downloadscheduler import CONTROL_DESCARGAS
+from esiosdata.esios_config import DATE_FMT, HEADERS, NUM_RETRIES, TIMEOUT, MAX_THREADS_REQUESTS, DIAS_POR_LOTE
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def request_url(url, headers=HEADERS, json_req=False, num_retries=NUM_RETRIES, timeout=TIMEOUT, control=None):
+    """Realiza sucesivos intentos de request a una url, como `dataweb.requestweb.request_data_url`.
+    Cada intento ocupa una ranura del controlador de concurrencia, informándole de su latencia y resultado.
+
+    :return: status, response
+    """
+    control = control or CONTROL_DESCARGAS
+    count, status, response = 0, -1, None
+    while count < num_retries:
+        with control.ranura() as ranura:
+            try:
+                resp = requests.get(url, headers=headers, timeout=timeout)
+                status = resp.status_code
+                if status == 200:
+                    if json_req:
+                        response = resp.json()
+                        break
+                    response = resp.content.decode()
+                    if len(response) > MIN_LEN_REQUEST:
+                        break
+                else:  # HTTP 429 Too many requests, 503 Service unavailable, ...
+                    ranura.error()
+                    logging.warning('RECIBIDO ERROR HTTP {} en url:"{}"'.format(status, url))
+            except (requests.RequestException, ValueError) as e:
+                ranura.error()
+                if count == num_retries - 1:
+                    logging.error('ERROR: {} en url: {}'.format(e, url))
+        count += 1
+        if count < num_retries:
+            # Backoff con jitter, para que las peticiones fallidas no se reintenten todas a la vez
+            time.sleep(ESPERA_RETRY * count * random.uniform(.5, 1.5))
+    if count == num_retries:
+        logging.error('NO SE HA PODIDO OBTENER LA INFO EN {}'.format(url))
+    return status, response
+
+
+def descarga_dia(key_dia, func_url_data_dia, headers=HEADERS, json_req=False, num_retries=NUM_RETRIES,
+                 timeout=TIMEOUT, control=None):
+    """Descarga la respuesta (o lista de respuestas, si hay varias urls) de un día, sin procesarla."""
+    url = func_url_data_dia(key_dia)
+    if type(url) is list:
+        return [request_url(u, headers, json_req, num_retries, timeout, control)[1] for u in url]
+    return request_url(url, headers, json_req, num_retries, timeout, control)[1]
+
+
+def _obtiene_data_dia(key_dia, func_url_data_dia, func_procesa_data_dia, headers=HEADERS, json_req=False,
+                      num_retries=NUM_RETRIES, timeout=TIMEOUT, control=None, verbose=True):
+    """Descarga (1 o varias urls) y procesa los datos de un día. Devuelve `(key_dia, data_import | None)`."""
+    count_process, ok, data_import = 0, -1, None
+    try:
+        while count_process < num_retries and ok != 0:
+            response = descarga_dia(key_dia, func_url_data_dia, headers, json_req, num_retries, timeout, control)
+            data_import, ok = func_procesa_data_dia(key_dia, response)
+            if ok == -2:  # Código de salida temprana
+                break
+            count_process += 1
+    except Exception as e:
+        url = func_url_data_dia(key_dia)
+        if verbose:
+            print('PROCESANDO DATA!???? (Exception: {}; KEY: {}; URL: {})'.format(e, key_dia, url))
+        logging.error('PROCESANDO DATA!???? (Exception: {}; KEY: {}; URL: {})'.format(e, key_dia, url))
+        ok = -1
+    return key_dia, data_import if ok == 0 else None
+
+
+def get_data_en_intervalo_threads(d0=None, df=None, func_url_data_dia=None, func_procesa_data_dia=None,
+                                  json_req=False, headers=HEADERS, max_threads=MAX_THREADS_REQUESTS,
+                                  num_retries=NUM_RETRIES, timeout=TIMEOUT, date_fmt=DATE_FMT, keys_merge=None,
+                                  control=None, func_procesa_lote=None, dias_por_lote=DIAS_POR_LOTE, dias=None,
+                                  verbose=True):
+    """Versión multithread de `esiosdata.aio.get_data_en_intervalo_aio`, con los mismos argumentos y salida
+    (`max_threads` en lugar de `max_conexiones`).
+
+    :return: data_merge, hay_errores, str_import
+    """
+    tic_ini = time.time()
+    lista_dias = list(dias) if dias is not None else _lista_dias(d0, df, date_fmt)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_threads, len(lista_dias)))) as pool:
+        tareas = [pool.submit(_obtiene_data_dia, key, func_url_data_dia, func_procesa_data_dia, headers, json_req,
+                              num_retries, timeout, control, verbose) for key in lista_dias]
+        dict_data = dict(t.result() for t in tareas)
+    return resultado_intervalo(dict_data, tic_ini, keys_merge, control, func_procesa_lote, dias_por_lote, verbose)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Control adaptativo de la concurrencia de descarga (AIMD), compartido por `PVPC` y `DatosREE`.
+
+En lugar de un nº fijo de workers (`MAX_THREADS_REQUESTS`), el nº de peticiones simultáneas se ajusta según la
+latencia y los errores observados, como el control de congestión de TCP:
+
+* Incremento aditivo: cada petición correcta y rápida suma `incremento / limite` (≈ +1 por cada 'ventana' completa).
+* Decremento multiplicativo: ante un error (timeout, 429, 503...) o una latencia excesiva, el límite se multiplica por
+  `factor_decremento`, como mucho una vez por ventana (así, cuando fallan juntas todas las peticiones en vuelo
+  no se colapsa el límite a 1 de golpe).
+
+El estado está protegido por un lock y la espera de una ranura libre se hace por sondeo, por lo que la misma
+instancia sirve para threads y para varios event loops a la vez (p.ej., actualización simultánea de varias zonas).
+
+@author: Eugenio Panadero
+"""
+import asyncio
+import threading
+import time
+from esiosdata.esios_config import (CONCURRENCIA_INI, CONCURRENCIA_MIN, CONCURRENCIA_MAX, LATENCIA_OBJETIVO)
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+ESPERA_SONDEO = .01  # segs entre intentos de obtener ranura
+ALPHA_EWMA = .2
+
+
+class _RanuraAsync(object):
+    """Context manager asíncrono: `async with control.ranura_async() as r: ...; r.error()`."""
+
+    def __init__(self, control):
+        self._control = control
+        self._tic = None
+        self.ok = True
+
+    def error(self):
+        """Marca la petición como fallida (p.ej., status HTTP 429/503 o respuesta inválida)."""
+        self.ok = False
+
+    async def __aenter__(self):
+        await self._control.adquiere_async()
+        self._tic = time.time()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._control.libera(time.time() - self._tic, ok=self.ok and exc_type is None)
+        return False
+
+
+class _Ranura(_RanuraAsync):
+    """Context manager síncrono (threads): `with control.ranura() as r: ...`."""
+
+    def __enter__(self):
+        self._control.adquiere()
+        self._tic = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._control.libera(time.time() - self._tic, ok=self.ok and exc_type is None)
+        return False
+
+
+class ControlConcurrencia(object):
+    """Limitador AIMD de peticiones simultáneas, thread-safe y usable desde asyncio."""
+
+    def __init__(self, concurrencia_ini=CONCURRENCIA_INI, concurrencia_min=CONCURRENCIA_MIN,
+                 concurrencia_max=CONCURRENCIA_MAX, latencia_objetivo=LATENCIA_OBJETIVO,
+                 incremento=1., factor_decremento=.5):
+        self._lock = threading.Lock()
+        self.concurrencia_min, self.concurrencia_max = concurrencia_min, concurrencia_max
+        self.concurrencia_ini = concurrencia_ini
+        self.latencia_objetivo = latencia_objetivo
+        self.incremento, self.factor_decremento = incremento, factor_decremento
+        self.reset()
+
+    def reset(self):
+        """Reinicia el límite y las estadísticas."""
+        with self._lock:
+            self._limite = float(min(max(self.concurrencia_ini, self.concurrencia_min), self.concurrencia_max))
+            self._en_vuelo = 0
+            self._latencia_media = None
+            self._t_decremento = 0.
+            self._num_peticiones = self._num_errores = self._num_decrementos = 0
+            self._max_alcanzada = int(self._limite)
+
+    @property
+    def concurrencia(self):
+        """Nº de peticiones simultáneas permitidas en este momento."""
+        return int(self._limite)
+
+    @property
+    def en_vuelo(self):
+        """Nº de peticiones en curso."""
+        return self._en_vuelo
+
+    def intenta_adquirir(self):
+        """Ocupa una ranura si hay alguna libre. Devuelve True si lo consigue."""
+        with self._lock:
+            if self._en_vuelo < int(self._limite):
+                self._en_vuelo += 1
+                return True
+            return False
+
+    def adquiere(self):
+        """Espera (bloqueando el thread) hasta ocupar una ranura."""
+        while not self.intenta_adquirir():
+            time.sleep(ESPERA_SONDEO)
+
+    async def adquiere_async(self):
+        """Espera (sin bloquear el event loop) hasta ocupar una ranura."""
+        while not self.intenta_adquirir():
+            await asyncio.sleep(ESPERA_SONDEO)
+
+    def libera(self, latencia, ok=True):
+        """Libera una ranura, actualizando el límite con la latencia y el resultado de la petición."""
+        with self._lock:
+            self._en_vuelo = max(0, self._en_vuelo - 1)
+            self._num_peticiones += 1
+            if self._latencia_media is None:
+                self._latencia_media = latencia
+            else:
+                self._latencia_media += ALPHA_EWMA * (latencia - self._latencia_media)
+            if ok and latencia <= self.latencia_objetivo:
+                self._limite = min(self.concurrencia_max, self._limite + self.incremento / self._limite)
+                self._max_alcanzada = max(self._max_alcanzada, int(self._limite))
+            else:
+                if not ok:
+                    self._num_errores += 1
+                now = time.time()
+                # Como mucho, un decremento por ventana (≈ latencia media):
+                if now - self._t_decremento > max(self._latencia_media, ESPERA_SONDEO):
+                    self._limite = max(self.concurrencia_min, self._limite * self.factor_decremento)
+                    self._t_decremento = now
+                    self._num_decrementos += 1
+
+    def ranura(self):
+        """Context manager síncrono para una petición."""
+        return _Ranura(self)
+
+    def ranura_async(self):
+        """Context manager asíncrono para una petición."""
+        return _RanuraAsync(self)
+
+    def resumen(self):
+        """Estado del controlador: concurrencia en la que se ha estabilizado, máximo alcanzado y estadísticas."""
+        with self._lock:
+            return dict(concurrencia=int(self._limite), max_alcanzada=self._max_alcanzada,
+                        num_peticiones=self._num_peticiones, num_errores=self._num_errores,
+                        num_decrementos=self._num_decrementos,
+                        latencia_media=round(self._latencia_media or 0., 3))
+
+    def __repr__(self):
+        return ('Concurrencia de descarga: {concurrencia} (máx: {max_alcanzada}); {num_peticiones} peticiones, '
+                '{num_errores} errores, latencia media: {latencia_media} s'.format(**self.resumen()))
+
+
+# Controlador compartido por todas las descargas del proceso (PVPC, DatosREE, ...):
+CONTROL_DESCARGAS = ControlConcurrencia()
@@ -7,6 +7,7 @@ Web Scraper para datos de demanda, producción y coste de la energía eléctrica
 """
 from collections import OrderedDict
 import os
+from urllib.parse import urlparse
 import pytz
 
 
@@ -20,21 +21,78 @@ if 'www' in path_home:
     path_home = '/home/pi'
 path_token = os.path.join(path_home, '.token_api_esios')
 
-# El archivo local se almacena en el directorio: "~/.esiosdata/":
-STORAGE_DIR = os.path.join(path_home, '.esiosdata')
+# El archivo local se almacena en el directorio: "~/.esiosdata/" (o en la ruta de la variable 'ESIOS_STORAGE_DIR'):
+STORAGE_DIR = os.environ.get('ESIOS_STORAGE_DIR', os.path.join(path_home, '.esiosdata'))
 if not os.path.exists(STORAGE_DIR):
-    os.mkdir(STORAGE_DIR)
+    os.makedirs(STORAGE_DIR)
 
-TOKEN_API = open(path_token, 'r').read().strip()
-SERVER = 'https://api.esios.ree.es'
+# Token y servidor configurables por variables de entorno ('ESIOS_TOKEN', 'ESIOS_SERVER'), p.ej. para usar
+# el servidor local de pruebas (`python -m esiosdata.standin`), que no requiere token:
+if os.environ.get('ESIOS_TOKEN'):
+    TOKEN_API = os.environ['ESIOS_TOKEN'].strip()
+elif os.path.exists(path_token):
+    TOKEN_API = open(path_token, 'r').read().strip()
+else:
+    TOKEN_API = ''
+SERVER = os.environ.get('ESIOS_SERVER', 'https://api.esios.ree.es').rstrip('/')
 HEADERS = {'Accept': 'application/json; application/vnd.esios-api-v1+json',
            'Content-Type': 'application/json',
-           'Host': 'api.esios.ree.es',
+           'Host': urlparse(SERVER).netloc,
            'Authorization': 'Token token="{}"'.format(TOKEN_API)}
 NUM_RETRIES = 4
 TIMEOUT = 8
 USAR_MULTITHREAD = True
 MAX_THREADS_REQUESTS = 50
+# Descarga asíncrona (asyncio + aiohttp, si está instalado) con un pool compartido de conexiones keep-alive:
+USAR_ASYNCIO = True
+MAX_CONEXIONES_AIO = MAX_THREADS_REQUESTS
+# Control adaptativo (AIMD) de la concurrencia de descarga, según latencia y errores observados:
+CONCURRENCIA_INI = 8
+CONCURRENCIA_MIN = 1
+CONCURRENCIA_MAX = MAX_CONEXIONES_AIO
+LATENCIA_OBJETIVO = TIMEOUT / 4  # segs
+# Ingestión en streaming día a día (`esiosdata.streaming`): nº de threads de descarga y tamaño de las colas:
+NUM_DESCARGAS_STREAMING = CONCURRENCIA_INI
+TAM_COLA_STREAMING = 16
+
+# Archivo local de las respuestas 'raw' de la API (JSON comprimido por día), para poder reprocesar sin red:
+GUARDAR_RAW = True
+RAW_ARCHIVE_DIR = os.path.join(STORAGE_DIR, 'raw')
+
+# Índice de huecos de los datos (key 'huecos' del store): en cada actualización se descargan de nuevo sólo los días
+# incompletos, hasta un máximo de intentos fallidos por día:
+REPARA_HUECOS = True
+KEY_HUECOS = 'huecos'
+MAX_INTENTOS_HUECO = 3
+
+# Marca de frescura de los datos (JSON junto a cada store, con el último dato y la hora de la última comprobación):
+# con datos frescos según el calendario de publicación, `update_data` no consulta la red.
+USAR_MARCA_FRESCURA = True
+# Actualización en segundo plano (`esiosdata daemon`), según el calendario de publicación de cada origen de datos:
+HORA_PUBLICACION_PVPC = '20:30'  # Hora local de publicación de los precios del día siguiente
+PERIODO_ACTUALIZACION_DEM = 900  # segs
+RETRASO_PUBLICACION_DEM = 1200  # segs
+ESPERA_REINTENTO_INI = 300  # segs; se duplica en cada reintento fallido, hasta ESPERA_REINTENTO_MAX
+ESPERA_REINTENTO_MAX = 3600
+
+# Almacenamiento particionado por meses (`esiosdata.particiones`): en cada grabación se escriben sólo las particiones
+# nuevas o modificadas, en vez de reescribir el fichero HDF5 completo del store:
+ALMACEN_PARTICIONADO = True
+# Formato de las particiones: 'parquet' (columnar, con lectura de sólo las columnas y grupos de filas necesarios;
+# requiere `pyarrow`, si no está instalado se usa HDF5) o 'hdf'. Nº de filas por grupo en los ficheros Parquet:
+FORMATO_ALMACEN = 'parquet'
+FILAS_GRUPO_PARQUET = 1008  # 1 semana de datos diezminutales
+# Caché de proceso de los datos de PVPC con sus columnas derivadas (`esiosdata.cachepvpc`), compartida por todas las
+# facturas y gráficas; cada mes en caché se vuelve a leer (y a comprobar su actualización) tras `TTL_CACHE_PVPC` segs:
+TTL_CACHE_PVPC = 900
+MAX_MESES_CACHE_PVPC = 120  # Se descartan los meses usados hace más tiempo
+# Si la caché actualiza el store (con peticiones a la red) cuando sus datos no llegan al final de la consulta; por
+# defecto, las facturas sólo leen el store local, que se mantiene al día con `esiosdata daemon` o `PVPC.update_data`:
+ACTUALIZA_CACHE_PVPC = False
+
+# Procesado por lotes de días (arrays acumulados en buffers preasignados, un único DataFrame por lote):
+PROCESA_POR_LOTES = True
+DIAS_POR_LOTE = 31
 
 TZ = pytz.timezone('Europe/Madrid')
 DATE_FMT = '%Y-%m-%d'
@@ -54,6 +112,17 @@ TARIFAS_DESC.update({'VHC': 'VEHÍCULO ELÉCTRICO (PEAJE 2.0 DHS)'})
 TARIFAS = list(TARIFAS_DESC.keys())
 COLS_PVPC = ['', 'PMH', 'SAH', 'TEU', 'PCAP', 'INT', 'FOS', 'FOM', 'COF']
 # + TARIFA; COF: coefs perfilado
+# Columnas derivadas (en €/kWh, con TCU, CP y PD_ por tarifa; ver `pvpc_calc_tcu_cp_feu_d`), guardadas en el store
+# con la key 'data_calc' y calculadas en cada actualización sólo para los meses con datos nuevos:
+KEY_DATA_CALC = 'data_calc'
+COLS_CALC_PVPC = ['TCU', 'CP', 'PD_']
+
+# Agregados por periodo de los datos (media, mínimo, máximo e instantes del mínimo y del máximo de cada columna; ver
+# `esiosdata.agregados`), guardados en el store con la key 'agregados_<periodo>' y extendidos en cada actualización
+# sólo para los periodos con datos nuevos. Periodos: hora, día, semana (de lunes a domingo) y mes, en hora local:
+KEY_AGREGADOS = 'agregados_{}'
+FREQ_AGREGADOS = OrderedDict([('hora', 'h'), ('dia', 'D'), ('semana', 'W'), ('mes', 'MS')])
+AGREGADOS_PVPC = ('dia', 'semana', 'mes')  # de los precios de cada tarifa
 
 # -----------
 # DATOS DEM
@@ -67,15 +136,19 @@ KEYS_DATA_DEM = ['data', 'data_dias']
 # TODO Revisar qué pasa con los datos antiguos!! --> contactar con ESIOS
 # DATE_INI_DEM = '2007-01-01'
 DATE_INI_DEM = '2015-10-01'
-# ZONAS = ('Peninsula', 'Baleares', 'Canarias')
-# ZONAS_MT = (USAR_MULTITHREAD, USAR_MULTITHREAD, USAR_MULTITHREAD)
-# ZONAS_MAX_THREAD = (MAX_THREADS_REQUESTS, MAX_THREADS_REQUESTS, MAX_THREADS_REQUESTS / 10)
-# INI_ZONAS = dict(zip(ZONAS, ['2007-01-01', '2013-05-01', '2012-03-01']))
-# TZ_ZONAS = dict(zip(ZONAS, ['Europe/Madrid', 'Europe/Madrid', 'Atlantic/Canary']))
-# CURVAS_ZONAS = {'Peninsula': ('DEMANDA',),
-#                 'Baleares': ('MALLORCA', 'MENORCA', 'MALL-MEN', 'IBI-FORM'),
-#                 'Canarias': ('TENERIFE', 'EL_HIERRO', 'GCANARIA', 'LZ_FV',
-#                              'FUERTEVE', 'LA_GOMERA', 'LANZAROT', 'LA_PALMA')}
+# Zonas y curvas de demanda: la Península se descarga de ESIOS (archivos diarios o indicadores); Baleares y Canarias,
+# de la web de demanda de REE (demanda.ree.es, o la URL de la variable 'ESIOS_SERVER_DEMANDA'), con un store por curva:
+ZONAS = ('PENINSULA', 'BALEARES', 'CANARIAS')
+INI_ZONAS = dict(zip(ZONAS, [DATE_INI_DEM, '2013-05-01', '2012-03-01']))
+TZ_ZONAS = dict(zip(ZONAS, [TZ, TZ, pytz.timezone('Atlantic/Canary')]))
+CURVAS_ZONAS = OrderedDict([('PENINSULA', ('DEMANDA',)),
+                            ('BALEARES', ('MALLORCA', 'MENORCA', 'MALL-MEN', 'IBI-FORM')),
+                            ('CANARIAS', ('TENERIFE', 'EL_HIERRO', 'GCANARIA', 'LZ_FV',
+                                          'FUERTEVE', 'LA_GOMERA', 'LANZAROT', 'LA_PALMA'))])
+SERVER_DEMANDA = os.environ.get('ESIOS_SERVER_DEMANDA', 'https://demanda.ree.es').rstrip('/')
+URL_DEMANDA_ZONA = SERVER_DEMANDA + '/WSvisionaMoviles{zona}Rest/resources/demandaGeneracion{zona}' \
+                                   '?callback=angular.callbacks._0&curva={curva}&fecha={fecha}'
+HEADERS_DEMANDA = {'Accept': 'application/json, text/javascript, */*', 'Host': urlparse(SERVER_DEMANDA).netloc}
 TIPOS_REQ_DEM = ('IND_MaxMinRenovEol', 'IND_MaxMin', 'IND_DemandaRealGen', 'IND_DemandaPrevProg')
 #          'IND_Umbrales', 'IND_PrecioFinal', 'IND_PrecioDesvios', 'IND_Interconexiones', 'IND_DemandaInterrumpible')
 IND_ARCH_JSON_DEM = (117, 116, 115, 114)
@@ -83,6 +156,24 @@ D_TIPOS_REQ_DEM = OrderedDict(zip(TIPOS_REQ_DEM, IND_ARCH_JSON_DEM))
 # IND_ARCH_JSON_DEM = (117, 116, 115, 114, 67, 66, 65, 63, 62)
 #  64: IND_PotenciaInstalada (MS)
 
+# Modo alternativo (EXPERIMENTAL) de descarga por indicadores de la API (`/indicators/{id}?start_date=...`), con
+# varios meses de datos diezminutales por petición, en vez de 4 archivos por día (útil para rellenar históricos).
+# Los ids de `INDICADORES_DEM` y `COLS_RENOV_DEM` no están contrastados con la lista de indicadores de la API real
+# (https://api.esios.ree.es/indicators), sólo con el servidor local de pruebas (`esiosdata.standin`), que construye
+# sus respuestas a partir de esta misma tabla: el modo queda desactivado por defecto.
+DEM_USAR_INDICADORES = False
+MESES_POR_PETICION_IND = 3
+GEO_ID_PENINSULA = 8741
+# Columna de los datos diezminutales ('data') -> id del indicador (sin verificar; ver `DEM_USAR_INDICADORES`)
+INDICADORES_DEM = OrderedDict([('dem', 1293), ('eol', 551), ('nuc', 549), ('gf', 548), ('car', 547), ('cc', 550),
+                               ('hid', 546), ('aut', 552), ('inter', 553), ('icb', 554), ('sol', 10206),
+                               ('solFot', 1295), ('solTer', 1294), ('termRenov', 1296), ('cogenResto', 1297),
+                               ('pre', 544), ('pro', 545)])
+# Columnas que suman la generación renovable, para los máximos y mínimos diarios ('data_dias') en este modo:
+COLS_RENOV_DEM = ('eol', 'hid', 'solFot', 'solTer', 'termRenov')
+# Agregados guardados en el store de los datos diezminutales (de todas sus columnas; ver `KEY_AGREGADOS`):
+AGREGADOS_DEM = ('hora', 'dia')
+
 # key: (Nombre, es_produccion, es_renov)
 TIPOS_ENER = {
     "nuc": (u"Nuclear", True, False),
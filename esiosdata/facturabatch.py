@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Facturación PVPC por lotes, para miles de suministros (CUPS) con consumo horario.
+
+`FacturaBatch` calcula las facturas de todos los CUPS con operaciones vectoriales sobre una matriz de consumo
+(CUPS × horas): los CUPS con el mismo intervalo de consumo comparten una única lectura de PVPC (de `CACHE_PVPC`, con
+las columnas de todos los peajes) y el calendario de periodos tarifarios (`esiosdata.calendarioperiodos`), y cada
+peaje se factura con sumas por filas sobre las horas de cada periodo. El resultado, `FacturaBatch.facturas`, es un
+pd.DataFrame indexado por CUPS con las mismas columnas y valores que `FacturaElec.to_dict()` para cada suministro,
+incluyendo los redondeos de cada término.
+
+El consumo se pasa como matriz (pd.DataFrame con los CUPS como índice y las horas como columnas) o en formato largo
+(columnas 'cups', 'ts' y 'kWh'; con horas repetidas, vale el último valor). Los parámetros de contrato de cada CUPS
+(`tipo_peaje`, `potencia_contratada`, `con_bono_social`, `zona_impuestos`) se toman de las columnas del DataFrame
+`contratos` (indexado por CUPS) o, si no están, de los valores por defecto comunes.
+
+`compara_tarifas(consumo, t0, tf)` factura así un mismo consumo con todos los peajes en una única pasada, y devuelve
+la comparativa ordenada de menor a mayor coste.
+
+@author: Eugenio Panadero
+"""
+import numpy as np
+import pandas as pd
+from esiosdata.cachepvpc import CACHE_PVPC
+from esiosdata.calendarioperiodos import periodos_horarios, _ns
+from esiosdata.esios_config import TZ
+from esiosdata.facturapvpc import (periodos_facturacion, COL_CONSUMO, ROUND_PREC, DEFAULT_POTENCIA_CONTRATADA_KW,
+                                   DEFAULT_BONO_SOCIAL, DEFAULT_IMPUESTO_ELECTRICO, DEFAULT_ALQUILER_CONT_AÑO,
+                                   TIPO_PEAJE_GEN, TIPOS_PEAJES, DATOS_TIPO_PEAJE, ZONA_IMPUESTOS_PENIN_BALEARES,
+                                   DATOS_ZONAS_IMPUESTOS, MARGEN_COMERCIALIZACIÓN_EUR_KW_AÑO_MCF,
+                                   TERM_POT_PEAJE_ACCESO_EUR_KW_AÑO_TPA, TERM_ENER_PEAJE_ACCESO_EUR_KWH_TEA)
+from esiosdata.redondeo import redondea
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+COL_CUPS = 'cups'
+COL_TS = 'ts'
+COLS_CONTRATO = ('tipo_peaje', 'potencia_contratada', 'con_bono_social', 'zona_impuestos')
+COLS_FACTURA = ('cups', 'cod_peaje', 'consumo_total', 'ts_ini', 'ts_fin', 'p_contrato', 'dias_fact', 'con_bono',
+                'coste_medida', 'descuento_bono_social', 'desc_peaje', 'desc_impuesto', 'coste_impuesto_elec',
+                'coste_termino_fijo', 'coste_termino_consumo', 'impuesto_elec', 'periodos_fact', 'tea_tcu_consumo',
+                'total_factura', 'tipos_iva', 'coste_iva')
+COLS_COMPARATIVA = ('desc_peaje', 'total_factura', 'coste_termino_fijo', 'coste_termino_consumo',
+                    'descuento_bono_social', 'coste_impuesto_elec', 'coste_medida', 'coste_iva', 'consumo_total',
+                    'tea_tcu_consumo')
+
+
+def _tuplas(*columnas):
+    """Lista de tuplas con los valores (float) de cada fila de las columnas dadas."""
+    return list(zip(*[np.asarray(c, dtype=float).tolist() for c in columnas]))
+
+
+def matriz_consumo(consumos, col_cups=COL_CUPS, col_ts=COL_TS, col_consumo=COL_CONSUMO, tz=TZ):
+    """
+    Matriz de consumo horario (CUPS × horas), con todas las horas del intervalo como columnas (tz-aware).
+
+    :param consumos: pd.DataFrame matricial (columnas: DatetimeIndex horario) o en formato largo
+    :param col_cups: columna de CUPS del formato largo
+    :param col_ts: columna de fecha-hora del formato largo
+    :param col_consumo: columna de consumo (kWh) del formato largo
+    :param tz: zona horaria para las horas 'naive'
+    :return: pd.DataFrame (NaN en las horas sin dato)
+    """
+    if not isinstance(consumos.columns, pd.DatetimeIndex):
+        consumos = (consumos.drop_duplicates(subset=[col_cups, col_ts], keep='last')
+                    .pivot(index=col_cups, columns=col_ts, values=col_consumo))
+        consumos.columns = pd.DatetimeIndex(consumos.columns)
+    consumos = consumos.sort_index(axis=1)
+    if consumos.columns.tz is None:
+        consumos.columns = consumos.columns.tz_localize(tz, ambiguous='infer')
+    horas = pd.date_range(consumos.columns[0], consumos.columns[-1], freq='h').as_unit(consumos.columns.unit)
+    if len(horas) != len(consumos.columns):
+        consumos = consumos.reindex(columns=horas)
+    return consumos.astype(float)
+
+
+class FacturaBatch(object):
+    """Cálculo vectorial de la facturación eléctrica PVPC de muchos suministros con consumo horario."""
+
+    def __init__(self, consumos, contratos=None, t0=None, tf=None,
+                 tipo_peaje=TIPO_PEAJE_GEN,
+                 potencia_contratada=DEFAULT_POTENCIA_CONTRATADA_KW,
+                 con_bono_social=DEFAULT_BONO_SOCIAL,
+                 zona_impuestos=ZONA_IMPUESTOS_PENIN_BALEARES,
+                 alquiler_euros_año=DEFAULT_ALQUILER_CONT_AÑO,
+                 impuesto_electrico=DEFAULT_IMPUESTO_ELECTRICO,
+                 col_cups=COL_CUPS, col_ts=COL_TS, col_consumo=COL_CONSUMO):
+        """
+        :param consumos: pd.DataFrame de consumo horario en kWh (CUPS × horas, o formato largo)
+        :param contratos: (OPC) pd.DataFrame indexado por CUPS con columnas de `COLS_CONTRATO`
+        :param t0: (OPC) día de lectura inicial (excluido) común; por defecto, el anterior al 1º con consumo
+        :param tf: (OPC) día de lectura final (incluido) común; por defecto, el último con consumo de cada CUPS
+        :param tipo_peaje: peaje por defecto
+        :param potencia_contratada: potencia contratada (kW) por defecto
+        :param con_bono_social: bono social por defecto
+        :param zona_impuestos: zona de impuestos por defecto
+        :param alquiler_euros_año: alquiler anual del equipo de medida (€)
+        :param impuesto_electrico: tipo del impuesto eléctrico
+        """
+        self._consumos = matriz_consumo(consumos, col_cups, col_ts, col_consumo)
+        self._t0 = None if t0 is None else pd.Timestamp(t0)
+        self._tf = None if tf is None else pd.Timestamp(tf)
+        self._contratos = self._parametros_contrato(contratos, tipo_peaje=tipo_peaje,
+                                                    potencia_contratada=potencia_contratada,
+                                                    con_bono_social=con_bono_social, zona_impuestos=zona_impuestos)
+        self.alquiler_euros_año = alquiler_euros_año
+        self._impuesto_electrico_general = impuesto_electrico
+        self._facturas = None
+
+    def __repr__(self):
+        return '<FacturaBatch: {} CUPS, {} horas de consumo>'.format(*self._consumos.shape)
+
+    def _parametros_contrato(self, contratos, **defaults):
+        """Parámetros de contrato de cada CUPS de la matriz de consumo (con los valores por defecto si faltan)."""
+        cups = self._consumos.index
+        if contratos is None:
+            contratos = pd.DataFrame(index=cups)
+        elif not cups.isin(contratos.index).all():
+            raise ValueError('Faltan los datos de contrato de los CUPS: {}'
+                             .format(', '.join(map(str, cups[~cups.isin(contratos.index)]))))
+        elif not contratos.index.equals(cups):
+            contratos = contratos.reindex(cups)
+        params = {c: (contratos[c].values if c in contratos else np.full(len(cups), defaults[c]))
+                  for c in COLS_CONTRATO}
+        for col, validos in [('tipo_peaje', TIPOS_PEAJES), ('zona_impuestos', DATOS_ZONAS_IMPUESTOS)]:
+            erroneos = set(pd.unique(params[col])) - set(validos)
+            if erroneos:
+                raise ValueError('Valores de "{}" no reconocidos: {}. Las opciones son: {}'
+                                 .format(col, ', '.join(map(str, erroneos)), '|'.join(validos)))
+        params['potencia_contratada'] = params['potencia_contratada'].astype(float)
+        params['con_bono_social'] = params['con_bono_social'].astype(bool)
+        return params
+
+    def _grupos_intervalo(self):
+        """Filas de la matriz de consumo agrupadas por su intervalo de consumo (1ª y última hora con dato)."""
+        con_dato = ~np.isnan(self._consumos.values)
+        sin_datos = ~con_dato.any(axis=1)
+        if sin_datos.any():
+            raise ValueError('CUPS sin datos de consumo: {}'
+                             .format(', '.join(map(str, self._consumos.index[sin_datos]))))
+        n = con_dato.shape[1]
+        limites = np.c_[con_dato.argmax(axis=1), n - 1 - con_dato[:, ::-1].argmax(axis=1)]
+        intervalos, grupo = np.unique(limites, axis=0, return_inverse=True)
+        return [(i_ini, i_fin, np.flatnonzero(grupo.ravel() == g)) for g, (i_ini, i_fin) in enumerate(intervalos)]
+
+    def _calcula_facturas(self):
+        """Calcula las facturas de todos los CUPS, por grupos de intervalo de consumo y peaje, y las reúne (en el
+        orden de la matriz de consumo) en un único DataFrame."""
+        posiciones, columnas = [], {c: [] for c in COLS_FACTURA}
+        for i_ini, i_fin, filas in self._grupos_intervalo():
+            horas = self._consumos.columns[i_ini:i_fin + 1]
+            consumo = self._consumos.values[filas, i_ini:i_fin + 1]
+            if np.isnan(consumo).any():
+                # Horas perdidas: bfill + ffill de máximo 1 valor y el resto a 0, como en `FacturaElec`
+                consumo = pd.DataFrame(consumo).bfill(axis=1, limit=1).ffill(axis=1, limit=1).fillna(0.).values
+            t0, tf, pvpc = self._pvpc_intervalo(horas)
+            peajes = self._contratos['tipo_peaje'][filas]
+            for peaje in pd.unique(peajes):
+                en_peaje = peajes == peaje
+                filas_peaje = filas[en_peaje]
+                factura = self._factura_grupo(consumo[en_peaje], horas, t0, tf, pvpc, peaje,
+                                              **{c: self._contratos[c][filas_peaje] for c in COLS_CONTRATO[1:]})
+                factura['cups'] = self._consumos.index[filas_peaje].tolist()
+                for c in COLS_FACTURA:
+                    columnas[c] += factura[c]
+                posiciones.append(filas_peaje)
+        posiciones = np.concatenate(posiciones)
+        if not (posiciones[1:] > posiciones[:-1]).all():
+            orden = np.argsort(posiciones, kind='stable')
+            columnas = {c: [valores[i] for i in orden] for c, valores in columnas.items()}
+        self._facturas = pd.DataFrame(columnas, index=pd.Index(columnas['cups'], name=COL_CUPS), columns=COLS_FACTURA)
+
+    def _pvpc_intervalo(self, horas):
+        """
+        Días de lectura inicial y final y datos de PVPC (con las columnas de todos los peajes) de un intervalo de
+        consumo, comunes a todos sus CUPS.
+
+        :param horas: DatetimeIndex (tz-aware) del intervalo de consumo
+        :return: t0, tf, pvpc (pd.DataFrame con las mismas horas)
+        """
+        t0 = horas[0].tz_localize(None) - pd.Timedelta('1D') if self._t0 is None else self._t0
+        tf = horas[-1].tz_localize(None).replace(hour=0) if self._tf is None else self._tf
+        pvpc = CACHE_PVPC.datos(t0 + pd.Timedelta('1D'), tf + pd.Timedelta('1D')).iloc[:-1].loc[horas[0]:horas[-1]]
+        if not np.array_equal(_ns(pvpc.index), _ns(horas)):
+            raise ValueError('Los datos de PVPC no cubren las horas de consumo ({} - {})'.format(horas[0], horas[-1]))
+        return t0, tf, pvpc
+
+    def _factura_grupo(self, consumo, horas, t0, tf, pvpc, peaje, potencia_contratada, con_bono_social,
+                       zona_impuestos):
+        """
+        Facturas de un grupo de CUPS con el mismo intervalo de consumo y peaje, replicando operación a operación (y
+        redondeo a redondeo) el cálculo de `FacturaElec`.
+
+        :param consumo: np.array (CUPS × horas) de consumo en kWh
+        :param horas: DatetimeIndex (tz-aware) de las columnas de consumo
+        :param t0: día de lectura inicial (excluido)
+        :param tf: día de lectura final (incluido)
+        :param pvpc: pd.DataFrame de PVPC de las horas de consumo
+        :param peaje: tipo de peaje de los CUPS
+        :param potencia_contratada: np.array de potencias contratadas (kW)
+        :param con_bono_social: np.array (bool) de bono social
+        :param zona_impuestos: np.array de zonas de impuestos
+        :return: dict de listas con los valores de cada columna de `COLS_FACTURA` (salvo 'cups')
+        """
+        desc_peaje, cod_tarifa, num_periodos = DATOS_TIPO_PEAJE[peaje]
+        num_dias_factura, periodos_fact = periodos_facturacion(t0, tf)
+        tcu = pvpc['TCU{}'.format(cod_tarifa)].values
+        periodos = periodos_horarios(horas, num_periodos)
+        n = len(consumo)
+
+        # Término fijo:
+        termino_fijo, termino_fijo_total = [], 0
+        for (days_fac, days_year, year) in periodos_fact:
+            coef_potencia = MARGEN_COMERCIALIZACIÓN_EUR_KW_AÑO_MCF + TERM_POT_PEAJE_ACCESO_EUR_KW_AÑO_TPA[year]
+            coste = potencia_contratada * days_fac * coef_potencia / days_year
+            termino_fijo.append((coste, coef_potencia))
+            termino_fijo_total = termino_fijo_total + coste
+        termino_fijo_total = redondea(termino_fijo_total)
+
+        # Término variable, por tramos anuales y periodos (sumas por filas sobre las horas de cada periodo):
+        def _coste_tea_tcu(i_ini, i_fin, year):
+            costes = []
+            for i, coef in enumerate(TERM_ENER_PEAJE_ACCESO_EUR_KWH_TEA[year][peaje]):
+                en_periodo = np.zeros(len(horas), dtype=bool)
+                en_periodo[i_ini:i_fin] = (periodos[i_ini:i_fin] == i + 1)
+                consumo_p = consumo[:, en_periodo]
+                cons_tot = consumo_p.sum(axis=1)
+                costes.append((cons_tot * coef, (consumo_p * tcu[en_periodo]).sum(axis=1), cons_tot))
+            return costes
+
+        if len(periodos_fact) > 1:
+            ts_limit = pd.Timestamp('{}-01-01'.format(tf.year)).tz_localize(horas.tz)
+            i_limit = horas.searchsorted(ts_limit)
+            tramos = [_coste_tea_tcu(0, i_limit, t0.year), _coste_tea_tcu(i_limit, len(horas), tf.year)]
+            coste_variable_tot = 0
+            for pos in (0, 1):
+                coste_variable_tot = coste_variable_tot + sum([sum([c[pos] for c in t]) for t in tramos])
+            tea_tcu_cons = [zip(*[_tuplas(*[redondea(c[pos]) for c in t]) for pos in range(3)]) for t in tramos]
+        else:
+            costes = _coste_tea_tcu(0, len(horas), t0.year)
+            # Como `FacturaElec._round_sum`: redondeo binario (np.round), no ROUND_HALF_UP
+            coste_variable_tot = sum([np.round(c[0], ROUND_PREC) for c in costes])
+            coste_variable_tot = coste_variable_tot + sum([np.round(c[1], ROUND_PREC) for c in costes])
+            tea_tcu_cons = [_tuplas(*[redondea(v) for v in c]) for c in costes]
+        # (TEA, TCU, consumo) de cada periodo (o tramo anual) de cada CUPS
+        tea_tcu_cons = [list(tea_tcu_cups) for tea_tcu_cups in zip(*tea_tcu_cons)]
+        termino_variable_total = redondea(coste_variable_tot)
+        subt_fijo_var = termino_fijo_total + termino_variable_total
+
+        # Bono social:
+        descuento_bono_social = np.where(con_bono_social, redondea(-0.25 * redondea(subt_fijo_var)), 0.)
+        subt_fijo_var = subt_fijo_var + descuento_bono_social
+
+        # Impuesto eléctrico:
+        termino_impuesto_electrico = redondea(self._impuesto_electrico_general * subt_fijo_var)
+
+        # Equipo de medida:
+        frac_año = sum([nd / dy for nd, dy, _ in periodos_fact])
+        termino_equipo_medida = redondea(frac_año * self.alquiler_euros_año)
+
+        # IVA o equivalente y TOTAL:
+        datos_zonas = [DATOS_ZONAS_IMPUESTOS[z] for z in zona_impuestos]
+        impuesto_gen = np.array([d[1] for d in datos_zonas])
+        impuesto_medida = np.array([d[2] for d in datos_zonas])
+        subt_fijo_var = termino_fijo_total + termino_variable_total
+        subt_fijo_var = subt_fijo_var + (termino_impuesto_electrico + descuento_bono_social)
+        termino_iva_total = redondea(subt_fijo_var * impuesto_gen + termino_equipo_medida * impuesto_medida)
+        total_factura = redondea(subt_fijo_var + (termino_equipo_medida + termino_iva_total))
+
+        coefs_fijo = [coef_p for _, coef_p in termino_fijo]
+        costes_fijo = _tuplas(*[coste for coste, _ in termino_fijo])
+        return dict(cod_peaje=[peaje] * n, consumo_total=redondea(consumo.sum(axis=1)).tolist(),
+                    ts_ini=['{:%Y-%m-%d}'.format(t0)] * n, ts_fin=['{:%Y-%m-%d}'.format(tf)] * n,
+                    p_contrato=redondea(potencia_contratada).tolist(), dias_fact=[num_dias_factura] * n,
+                    con_bono=con_bono_social.tolist(), coste_medida=[termino_equipo_medida] * n,
+                    descuento_bono_social=redondea(descuento_bono_social).tolist(), desc_peaje=[desc_peaje] * n,
+                    desc_impuesto=[d[0] for d in datos_zonas],
+                    coste_impuesto_elec=termino_impuesto_electrico.tolist(),
+                    coste_termino_fijo=termino_fijo_total.tolist(),
+                    coste_termino_consumo=termino_variable_total.tolist(),
+                    impuesto_elec=[self._impuesto_electrico_general * 100.] * n,
+                    periodos_fact=[([(ndias, ndias_año, año, coste, coef_p)
+                                     for (ndias, ndias_año, año), coste, coef_p in zip(periodos_fact, c, coefs_fijo)],)
+                                   for c in costes_fijo],
+                    tea_tcu_consumo=tea_tcu_cons, total_factura=total_factura.tolist(),
+                    tipos_iva=[d[1:] for d in datos_zonas], coste_iva=termino_iva_total.tolist())
+
+    @property
+    def contratos(self):
+        """Parámetros de contrato (`COLS_CONTRATO`) de cada CUPS facturado."""
+        return pd.DataFrame(self._contratos, index=self._consumos.index, columns=COLS_CONTRATO)
+
+    @property
+    def consumos(self):
+        """Matriz de consumo horario (CUPS × horas) facturada."""
+        return self._consumos
+
+    @property
+    def facturas(self):
+        """
+        Componentes de la factura de cada CUPS, con las mismas columnas y valores que `FacturaElec.to_dict()`.
+        :return: facturas
+        :rtype: pd.DataFrame
+        """
+        if self._facturas is None:
+            self._calcula_facturas()
+        return self._facturas
+
+    def to_dict(self, cups):
+        """Representación como `dict` de la factura de un CUPS (igual a la de `FacturaElec.to_dict()`)."""
+        return self.facturas.loc[[cups]].to_dict(orient='records')[0]
+
+
+def compara_tarifas(consumo, t0=None, tf=None, tipos_peaje=TIPOS_PEAJES, **params_contrato):
+    """
+    Compara la factura de un mismo consumo con cada peaje de acceso (por defecto, 2.0A, 2.0DHA y 2.0DHS), en una única
+    pasada de `FacturaBatch`: con el mismo índice horario de consumo, una única lectura de PVPC (con las columnas
+    TCU de todos los peajes) y el calendario de periodos de cada peaje.
+
+    Con un consumo total (kWh), éste se reparte por horas con el perfil de consumo del peaje general (2.0A), como en
+    `FacturaElec(t0, tf, consumo=total)`, y se factura ese mismo consumo horario con todos los peajes.
+
+    :param consumo: pd.Series de consumo horario en kWh, o consumo total del periodo (float, en kWh)
+    :param t0: día de lectura inicial (excluido); obligatorio con consumo total
+    :param tf: día de lectura final (incluido); obligatorio con consumo total
+    :param tipos_peaje: peajes a comparar
+    :param params_contrato: resto de parámetros de `FacturaBatch` (potencia_contratada, con_bono_social,
+    zona_impuestos, alquiler_euros_año, impuesto_electrico)
+    :return: pd.DataFrame indexado por peaje y ordenado de menor a mayor coste total, con el puesto ('ranking'),
+    la diferencia en € con el peaje más barato ('diferencia') y las columnas de `COLS_COMPARATIVA`
+    """
+    if not isinstance(consumo, pd.Series):
+        if (t0 is None) or (tf is None):
+            raise ValueError('Con un consumo total, debe especificar el intervalo de facturación (t0, tf).')
+        t0, tf = pd.Timestamp(t0), pd.Timestamp(tf)
+        perfil = CACHE_PVPC.datos(t0 + pd.Timedelta('1D'), tf + pd.Timedelta('1D'))
+        perfil = perfil['COF{}'.format(DATOS_TIPO_PEAJE[TIPO_PEAJE_GEN][1])].iloc[:-1]
+        consumo = perfil * float(consumo) / perfil.sum()
+    tipos_peaje = list(tipos_peaje)
+    consumos = pd.DataFrame(np.tile(consumo.values, (len(tipos_peaje), 1)), index=tipos_peaje, columns=consumo.index)
+    contratos = pd.DataFrame({'tipo_peaje': tipos_peaje}, index=tipos_peaje)
+    facturas = FacturaBatch(consumos, contratos, t0, tf, **params_contrato).facturas
+
+    comparativa = facturas.set_index('cod_peaje')[list(COLS_COMPARATIVA)].sort_values('total_factura', kind='stable')
+    comparativa.index.name = 'peaje'
+    comparativa.insert(0, 'ranking', np.arange(1, len(comparativa) + 1))
+    comparativa.insert(2, 'diferencia', (comparativa['total_factura'] - comparativa['total_factura'].iloc[0]).round(2))
+    return comparativa
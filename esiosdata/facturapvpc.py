@@ -23,15 +23,16 @@ Facturación de datos de consumo eléctrico para particulares según PVPC.
 @author: Eugenio Panadero
 """
 from collections import OrderedDict
-from decimal import Decimal, ROUND_HALF_UP
 from jinja2 import Environment, FileSystemLoader
 import os
+import numpy as np
 import pandas as pd
 from pytz.exceptions import AmbiguousTimeError
 # Se obtienen directamente de PVPC ('COF*')
 # from esiosdata.perfilesconsumopvpc import perfiles_consumo_en_intervalo
-from esiosdata.classdataesios import PVPC
-from esiosdata.importpvpcdata import pvpc_calc_tcu_cp_feu_d
+from esiosdata.cachepvpc import CACHE_PVPC
+from esiosdata.calendarioperiodos import periodos_horarios
+from esiosdata.redondeo import redondea
 
 
 # Plantillas para representación en HTML de la factura eléctrica
@@ -136,6 +137,25 @@ TERM_ENER_PEAJE_ACCESO_EUR_KWH_TEA = {
                                              TIPO_PEAJE_VHC: [0.062012, 0.002879, 0.000886]}}
 COL_CONSUMO = 'kWh'
 
+# Componentes calculados de la factura (en orden de cálculo) y de qué parámetros ('consumo', 'tipo_peaje',
+# 'potencia_contratada', 'con_bono_social', 'zona_impuestos', 'alquiler', 'impuesto_electrico') o componentes depende
+# cada uno. Se calculan al acceder a ellos, y cambiar un parámetro invalida sólo los que dependen de él.
+# (Una vez calculado, el consumo se mantiene como serie horaria, por lo que un cambio de peaje no rehace la estimación
+# del consumo horario por perfiles, y factura el mismo consumo horario).
+DEPENDENCIAS_FACTURA = OrderedDict([
+    ('periodos_fact', ()),
+    ('pvpc_data', ()),
+    ('consumo_horario', ('consumo', 'pvpc_data')),
+    ('pvpc_horario', ('pvpc_data', 'tipo_peaje', 'consumo_horario')),
+    ('termino_fijo', ('periodos_fact', 'potencia_contratada')),
+    ('termino_variable', ('periodos_fact', 'tipo_peaje', 'consumo_horario', 'pvpc_horario')),
+    ('descuento_bono_social', ('termino_fijo', 'termino_variable', 'con_bono_social')),
+    ('termino_impuesto_electrico', ('termino_fijo', 'termino_variable', 'descuento_bono_social',
+                                    'impuesto_electrico')),
+    ('termino_equipo_medida', ('periodos_fact', 'alquiler')),
+    ('total_factura', ('termino_fijo', 'termino_variable', 'descuento_bono_social', 'termino_impuesto_electrico',
+                       'termino_equipo_medida', 'zona_impuestos'))])
+
 def _render_jinja2_template(template, params):
     # Create the jinja2 environment.
     j2_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR),
@@ -143,6 +163,23 @@ def _render_jinja2_template(template, params):
     return j2_env.get_template(template).render(**params)
 
 
+def periodos_facturacion(t0, tf):
+    """Días facturados y tramos anuales de facturación ((días, días del año, año), ...) del intervalo (t0, tf].
+    t0 marca el siguiente inicio, por lo que no entra; con cambio de año, hay 2 tramos."""
+    year, year_f = t0.year, tf.year
+    num_dias_factura = (tf - t0).days
+    if year_f > year:
+        # Cálculo de 2 tramos
+        ts_limit = pd.Timestamp('{}-12-31'.format(year))
+        days_1 = (ts_limit - t0).days
+        days_2 = (tf - ts_limit).days
+        n_days_y1 = (pd.Timestamp('{}-01-01'.format(year + 1)) - pd.Timestamp('{}-01-01'.format(year))).days
+        n_days_y2 = (pd.Timestamp('{}-01-01'.format(year_f + 1)) - pd.Timestamp('{}-01-01'.format(year_f))).days
+        return num_dias_factura, ((days_1, n_days_y1, year), (days_2, n_days_y2, year_f))
+    n_days_y = (pd.Timestamp('{}-01-01'.format(year + 1)) - pd.Timestamp('{}-01-01'.format(year))).days
+    return num_dias_factura, ((num_dias_factura, n_days_y, year),)
+
+
 def _reindex_consumo(consumo_horario):
     # Rehacer el índice
     new_idx = pd.DatetimeIndex(
@@ -155,7 +192,10 @@ def _reindex_consumo(consumo_horario):
 
 
 class FacturaElec(object):
-    """Cálculo de la facturación eléctrica en España para particulares."""
+    """Cálculo de la facturación eléctrica en España para particulares.
+    Los componentes de la factura se calculan al acceder a ellos, y al cambiar un parámetro (consumo, peaje, potencia,
+    bono social, zona de impuestos o alquiler del equipo de medida) sólo se recalculan los componentes que dependen de
+    él (ver `DEPENDENCIAS_FACTURA`)."""
 
     def __init__(self, t0=None, tf=None, consumo=None,
                  cups=DEFAULT_CUPS, tipo_peaje=TIPO_PEAJE_GEN,
@@ -186,11 +226,11 @@ class FacturaElec(object):
         self._con_bono_social = con_bono_social
         self._zona_impuestos = zona_impuestos
         self._impuesto_electrico_general = impuesto_electrico
-        self.alquiler_euros = alquiler_euros
-        if (self.alquiler_euros is None) and (alquiler_euros_año is None):
-            self.alquiler_euros_año = DEFAULT_ALQUILER_CONT_AÑO
+        self._alquiler_euros = alquiler_euros
+        if (alquiler_euros is None) and (alquiler_euros_año is None):
+            self._alquiler_euros_año = DEFAULT_ALQUILER_CONT_AÑO
         else:
-            self.alquiler_euros_año = alquiler_euros_año
+            self._alquiler_euros_año = alquiler_euros_año
 
         # Datos de PVPC y perfiles de consumo
         self._pvpc_data = None
@@ -213,15 +253,15 @@ class FacturaElec(object):
         self._termino_iva_total = None
         self._total_factura = None
 
+        # Componentes al día (ver `DEPENDENCIAS_FACTURA`): el cálculo se hace al acceder a ellos
+        self._calculados = set()
+
         # Output renders:
         self._dict_repr = None
         self._str_repr = None
         self._html_repr = None
         self._html_repr_completa = None
 
-        # PROCESADO DE FACTURA
-        self._calcula_factura()
-
     ##############################################
     #       Representación                       #
     ##############################################
@@ -231,6 +271,7 @@ class FacturaElec(object):
             return '{:70} {:.2f} €'.format(str_line, total_value)
 
         if self._str_repr is None:
+            self._calcula_factura()
             detalle_tfijo = '\n  '.join([MASK_T_FIJO.format(pot=self._potencia_contratada, dias=ndias, y=año,
                                                             dias_y=ndias_año, coste=coste, coef_t_fijo=coef_p)
                                          for (ndias, ndias_año, año), (coste, coef_p)
@@ -305,6 +346,7 @@ class FacturaElec(object):
         :rtype dict
         """
         if self._dict_repr is None:
+            self._calcula_factura()
             tea_tcu_cons = [(self._round(tea), self._round(tcu), self._round(ct))
                             for tea, tcu, ct in zip(self._coste_peaje_acceso_tea, self._coste_ponderado_energia_tcu,
                                                     self._consumos_totales_por_periodo)]
@@ -356,16 +398,13 @@ class FacturaElec(object):
     @staticmethod
     def _round(value):
         if type(value) is tuple:
-            return tuple([float(Decimal(str(v)).quantize(Decimal('1.11'), rounding=ROUND_HALF_UP)) for v in value])
-        # try:
+            return tuple(redondea(value).tolist())
         else:
-            return float(Decimal(str(value)).quantize(Decimal('1.11'), rounding=ROUND_HALF_UP))
-        # except Exception as e:
-        #     print('Excepción "{}" --> valor="{}".; type_valor={}'.format(e, value, type(value)))
-        #     return float(Decimal(str(round(float(value), 2))).quantize(Decimal('1.11'), rounding=ROUND_HALF_UP))
+            return redondea(value)
 
     @staticmethod
     def _round_sum(values):
+        # Redondeo binario de Python (half-even sobre el valor float), no ROUND_HALF_UP como `_round`
         return sum([round(value, ROUND_PREC) for value in values])
 
     def _check_hourly_data(self, consumo_horario):
@@ -389,7 +428,7 @@ class FacturaElec(object):
 
         # Corrección de consumos horarios sin timezone (tz-naive):
         if consumo_horario.index.tz is None:
-            tz = self._pvpc_horario.index.tz
+            tz = self._pvpc_data.index.tz
             # print('Asignando timezone a consumo horario: {}'.format(tz))
             try:
                 consumo_horario.index = consumo_horario.index.tz_localize(tz, ambiguous='infer')
@@ -401,40 +440,13 @@ class FacturaElec(object):
                 print('ERROR: AmbiguousTimeError ({}) asignando timezone. Reindexado e interpolación.'.format(e))
         return consumo_horario.rename(COL_CONSUMO)
 
-    def _asigna_periodos_discr_horaria(self, series):
+    def _periodos_discr_horaria(self, index):
+        """Códigos de periodo tarifario (np.int8; 1: P1, 2: P2, 3: P3) de cada hora del index, según el peaje, del
+        calendario horario anual en caché (`esiosdata.calendarioperiodos`), o None sin discriminación horaria."""
         num_periodos = DATOS_TIPO_PEAJE[self._tipo_peaje][2]
         if num_periodos > 1:  # DISCRIMINACIÓN HORARIA
-            df = pd.DataFrame(series)
-            tt = df.index
-            p_cierre_periodos = dict(include_start=True, include_end=False)
-            idx_13_23h = tt[tt.indexer_between_time('13:00', '23:00', **p_cierre_periodos)]
-            if num_periodos == 3:  # '2.0DHS': Tarifa vehículo eléctrico
-                df['P1'] = df['P2'] = df['P3'] = False
-                idx_23_01h = tt[tt.indexer_between_time('23:00', '01:00', **p_cierre_periodos)]
-                idx_01_07h = tt[tt.indexer_between_time('01:00', '07:00', **p_cierre_periodos)]
-                idx_07_13h = tt[tt.indexer_between_time('07:00', '13:00', **p_cierre_periodos)]
-                df.loc[idx_13_23h, 'P1'] = True
-                df.loc[idx_23_01h.union(idx_07_13h), 'P2'] = True
-                df.loc[idx_01_07h, 'P3'] = True
-                assert df[['P1', 'P2', 'P3']].sum(axis=1).sum() == len(df)
-            else:  # '2.0DHA': Tarifa nocturna, con dos periodos
-                assert num_periodos == 2
-                idx_verano = tt[[x.dst().total_seconds() > 0 for x in tt]]
-                idx_invierno = tt[[x.dst().total_seconds() == 0 for x in tt]]
-                df['P1'] = df['P2'] = False
-                idx_12_22h = tt[tt.indexer_between_time('12:00', '22:00', **p_cierre_periodos)]
-                idx_22_12h = tt[tt.indexer_between_time('22:00', '12:00', **p_cierre_periodos)]
-                idx_23_13h = tt[tt.indexer_between_time('23:00', '13:00', **p_cierre_periodos)]
-                if len(idx_verano) > 0:
-                    df.loc[idx_13_23h.intersection(idx_verano), 'P1'] = True
-                    df.loc[idx_23_13h.intersection(idx_verano), 'P2'] = True
-                if len(idx_invierno) > 0:
-                    df.loc[idx_12_22h.intersection(idx_invierno), 'P1'] = True
-                    df.loc[idx_22_12h.intersection(idx_invierno), 'P2'] = True
-                assert df[['P1', 'P2']].sum(axis=1).sum() == len(df)
-            return True, df
-        else:
-            return False, series
+            return periodos_horarios(index, num_periodos)
+        return None
 
     def _consumo_numerico(self):
         """
@@ -455,14 +467,15 @@ class FacturaElec(object):
         """
         coefs_ener = TERM_ENER_PEAJE_ACCESO_EUR_KWH_TEA[periodo_fac][self._tipo_peaje]
         if len(coefs_ener) > 1:  # DISCRIMINACIÓN HORARIA
-            name = consumo.name
-            hay_discr, cons_discr = self._asigna_periodos_discr_horaria(consumo)
-            assert hay_discr
-            assert tcu.index.equals(cons_discr.index)
-            return [(cons_discr[cons_discr['P{}'.format(i + 1)]][name].sum() * coef,
-                     (cons_discr[cons_discr['P{}'.format(i + 1)]][name] * tcu[cons_discr['P{}'.format(i + 1)]]).sum(),
-                     cons_discr[cons_discr['P{}'.format(i + 1)]][name].sum())
-                    for i, coef in enumerate(coefs_ener)]
+            periodos = self._periodos_discr_horaria(consumo.index)
+            assert periodos is not None
+            assert tcu.index.equals(consumo.index)
+            costes = []
+            for i, coef in enumerate(coefs_ener):
+                en_periodo = periodos == i + 1
+                consumo_p = consumo[en_periodo]
+                costes.append((consumo_p.sum() * coef, (consumo_p * tcu[en_periodo]).sum(), consumo_p.sum()))
+            return costes
         else:
             # assert tcu.index.equals(consumo.index)
             if not tcu.index.equals(consumo.index):
@@ -470,54 +483,86 @@ class FacturaElec(object):
                 consumo = _reindex_consumo(consumo)
             return [(consumo.sum() * coefs_ener[0], (consumo * tcu).sum(), consumo.sum())]
 
-    def _calcula_iva_y_total(self):
-        """Añade el IVA y obtiene el total."""
-        # Cálculo del IVA y TOTAL:
-        subt_fijo_var = self._termino_fijo_total + self._termino_variable_total
-        subt_fijo_var += self._termino_impuesto_electrico + self._descuento_bono_social
-        _, impuesto_gen, impuesto_medida = DATOS_ZONAS_IMPUESTOS[self._zona_impuestos]
-        self._terminos_iva = (subt_fijo_var * impuesto_gen, self._termino_equipo_medida * impuesto_medida)
-        self._termino_iva_total = self._round(self._terminos_iva[0] + self._terminos_iva[1])
-
-        # TOTAL FACTURA:
-        subt_fijo_var += self._termino_equipo_medida + self._termino_iva_total
-        self._total_factura = self._round(subt_fijo_var)
-
-    def _calcula_factura(self):
-        """Método para regenerar el cálculo de la factura eléctrica."""
+    def _invalida(self, parametro):
+        """Invalida los componentes calculados que dependen (directa o indirectamente) de un parámetro, y las
+        representaciones de la factura."""
+        invalidos = {parametro}
+        for componente, dependencias in DEPENDENCIAS_FACTURA.items():
+            if invalidos.intersection(dependencias):
+                invalidos.add(componente)
+        self._calculados -= invalidos
         # Reset output cache:
         self._dict_repr = None
         self._str_repr = None
         self._html_repr = None
         self._html_repr_completa = None
 
-        cod_tarifa = DATOS_TIPO_PEAJE[self._tipo_peaje][1]
+    def _calcula(self, componente):
+        """Calcula un componente de la factura (ver `DEPENDENCIAS_FACTURA`) si no está al día, calculando antes los
+        componentes de los que depende."""
+        if componente not in self._calculados:
+            for dependencia in DEPENDENCIAS_FACTURA[componente]:
+                if dependencia in DEPENDENCIAS_FACTURA:
+                    self._calcula(dependencia)
+            getattr(self, '_calcula_' + componente)()
+            self._calculados.add(componente)
 
-        # Intervalos de facturación:
-        year = self._t0.year
-        year_f = self._tf.year
-        self._num_dias_factura = (self._tf - self._t0).days  # t0 marca el siguiente inicio, por lo que no entra
-        if year_f > year:
-            # Cálculo de 2 tramos
-            ts_limit = pd.Timestamp('{}-12-31'.format(year))
-            days_1 = (ts_limit - self._t0).days
-            days_2 = (self._tf - ts_limit).days
-            n_days_y1 = (pd.Timestamp('{}-01-01'.format(year + 1)) - pd.Timestamp('{}-01-01'.format(year))).days
-            n_days_y2 = (pd.Timestamp('{}-01-01'.format(year_f + 1)) - pd.Timestamp('{}-01-01'.format(year_f))).days
-            self._periodos_fact = ((days_1, n_days_y1, year), (days_2, n_days_y2, year_f))
-        else:
-            n_days_y = (pd.Timestamp('{}-01-01'.format(year + 1)) - pd.Timestamp('{}-01-01'.format(year))).days
-            self._periodos_fact = ((self._num_dias_factura, n_days_y, year),)
+    def _calcula_factura(self):
+        """Método para completar el cálculo de la factura eléctrica (sólo de los componentes que no estén al día)."""
+        for componente in DEPENDENCIAS_FACTURA:
+            self._calcula(componente)
 
-        # Aux: PVPC Data:
+    def _calcula_periodos_fact(self):
+        """Intervalos de facturación."""
+        self._num_dias_factura, self._periodos_fact = periodos_facturacion(self._t0, self._tf)
+
+    def _calcula_pvpc_data(self):
+        """PVPC Data (sólo el intervalo facturado, con todas las tarifas para los cambios de peaje, desde la caché
+        de PVPC compartida por todas las facturas del proceso)."""
         if self._pvpc_data is None:
-            pvpc_data = PVPC(update=True, verbose=False)
-            self._pvpc_data = pvpc_calc_tcu_cp_feu_d(pvpc_data.data['data'], verbose=False, convert_kwh=True)
-        cols_tarifa = list(filter(lambda x: cod_tarifa in x, self._pvpc_data.columns))
-        pvpc_t_ini, pvpc_t_fin = self._t0 + pd.Timedelta('1D'), self._tf + pd.Timedelta('1D')
-        self._pvpc_horario = self._pvpc_data[cols_tarifa].loc[pvpc_t_ini:pvpc_t_fin].iloc[:-1]
+            self._pvpc_data = CACHE_PVPC.datos(self._t0 + pd.Timedelta('1D'), self._tf + pd.Timedelta('1D'))
 
-        # Cálculo del término fijo:
+    def _pvpc_tarifa(self):
+        """PVPC horario del intervalo facturado para el tipo de peaje."""
+        cod_tarifa = DATOS_TIPO_PEAJE[self._tipo_peaje][1]
+        cols_tarifa = list(filter(lambda x: cod_tarifa in x, self._pvpc_data.columns))
+        return self._pvpc_data[cols_tarifa].iloc[:-1]
+
+    def _calcula_consumo_horario(self):
+        """Consumo horario: real, o estimado a partir de consumos totales mediante los perfiles de consumo."""
+        if self._consumo is None:
+            self._consumo_horario = None
+            return
+        son_totales, consumo_calc = self._consumo_numerico()
+        if son_totales:
+            # Estimación de consumo horario mediante aplicación de perfiles de consumo en el intervalo.
+            perfs_interv = self._pvpc_tarifa()['COF{}'.format(DATOS_TIPO_PEAJE[self._tipo_peaje][1])]
+            periodos = self._periodos_discr_horaria(perfs_interv.index)
+            if periodos is None:
+                self._consumo_horario = (perfs_interv * consumo_calc[0] / perfs_interv.sum()).rename(COL_CONSUMO)
+            else:
+                consumos_horarios_periodos = []
+                for i, cons_periodo_i in enumerate(consumo_calc):
+                    perfs_periodo = perfs_interv[periodos == i + 1]
+                    consumos_horarios_periodos.append(perfs_periodo * cons_periodo_i / perfs_periodo.sum())
+                self._consumo_horario = pd.Series(pd.concat(consumos_horarios_periodos)
+                                                  ).rename(COL_CONSUMO).sort_index()
+        else:
+            # Consumo horario real
+            self._consumo_horario = self._check_hourly_data(consumo_calc)
+        # Reemplaza consumo inicial con consumo horario (para los casos de consumo de entrada no horario)
+        self._consumo = self._consumo_horario
+
+    def _calcula_pvpc_horario(self):
+        """PVPC horario de la tarifa, recortado a las horas de inicio y fin de consumo (no son necesariamente días
+        completos)."""
+        self._pvpc_horario = self._pvpc_tarifa()
+        if self._consumo_horario is not None:
+            t0, tf = self._consumo_horario.index[0], self._consumo_horario.index[-1]
+            self._pvpc_horario = self._pvpc_horario.loc[t0:tf]
+
+    def _calcula_termino_fijo(self):
+        """Cálculo del término fijo."""
         self._termino_fijo, self._termino_fijo_total = [], 0
         for (days_fac, days_year, year) in self._periodos_fact:
             coef_potencia = MARGEN_COMERCIALIZACIÓN_EUR_KW_AÑO_MCF + TERM_POT_PEAJE_ACCESO_EUR_KW_AÑO_TPA[year]
@@ -526,32 +571,10 @@ class FacturaElec(object):
             self._termino_fijo_total += coste
         self._termino_fijo_total = self._round(self._termino_fijo_total)
 
-        # Cálculo del término variable:
-        if self._consumo is not None:
-            son_totales, consumo_calc = self._consumo_numerico()
-            if son_totales:
-                # Estimación de consumo horario mediante aplicación de perfiles de consumo en el intervalo.
-                c_coef = 'COF{}'.format(cod_tarifa)
-                hay_discr, perfs_interv = self._asigna_periodos_discr_horaria(self._pvpc_horario[c_coef])
-                if not hay_discr:
-                    self._consumo_horario = (perfs_interv * consumo_calc[0] / perfs_interv.sum()).rename(COL_CONSUMO)
-                else:
-                    consumos_horarios_periodos = []
-                    for i, cons_periodo_i in enumerate(consumo_calc):
-                        c = 'P{}'.format(i + 1)
-                        idx = perfs_interv[perfs_interv[c]].index
-                        consumos_horarios_periodos.append(perfs_interv.loc[idx, c_coef] * cons_periodo_i
-                                                          / perfs_interv.loc[idx, c_coef].sum())
-                    self._consumo_horario = pd.Series(pd.concat(consumos_horarios_periodos)
-                                                      ).rename(COL_CONSUMO).sort_index()
-            else:
-                # Consumo horario real
-                self._consumo_horario = self._check_hourly_data(consumo_calc)
-                # Recorte de pvpc a las horas de inicio y fin de consumo (no son necesariamente días completos)
-                t0, tf = self._consumo_horario.index[0], self._consumo_horario.index[-1]
-                self._pvpc_horario = self._pvpc_horario.loc[t0:tf]
-
-            col_tcu = 'TCU{}'.format(cod_tarifa)
+    def _calcula_termino_variable(self):
+        """Cálculo del término variable."""
+        if self._consumo_horario is not None:
+            col_tcu = 'TCU{}'.format(DATOS_TIPO_PEAJE[self._tipo_peaje][1])
             if len(self._periodos_fact) > 1:
                 ts_limit = pd.Timestamp('{}-01-01'.format(self._tf.year)).tz_localize(self._consumo_horario.index.tz)
                 consumo_1 = self._consumo_horario.loc[:ts_limit].iloc[:-1]
@@ -573,41 +596,54 @@ class FacturaElec(object):
                 self._consumos_totales_por_periodo = cons_tot
                 coste_variable_tot = self._round_sum(self._coste_peaje_acceso_tea)
                 coste_variable_tot += self._round_sum(self._coste_ponderado_energia_tcu)
-            # Reemplaza consumo inicial con consumo horario (para los casos de consumo de entrada no horario)
-            self._consumo = self._consumo_horario
         else:
             self._coste_peaje_acceso_tea = (0.,)
             self._coste_ponderado_energia_tcu = (0.,)
             self._consumos_totales_por_periodo = (0.,)
             coste_variable_tot = 0.
         self._termino_variable_total = self._round(coste_variable_tot)
-        subt_fijo_var = self._termino_fijo_total + self._termino_variable_total
 
-        # Cálculo de la bonificación (bono social):
+    def _calcula_descuento_bono_social(self):
+        """Cálculo de la bonificación (bono social)."""
         self._descuento_bono_social = 0.
         if self._con_bono_social:
+            subt_fijo_var = self._termino_fijo_total + self._termino_variable_total
             self._descuento_bono_social = self._round(-0.25 * self._round(subt_fijo_var))
-            subt_fijo_var += self._descuento_bono_social
 
-        # Cálculo del impuesto eléctrico:
+    def _calcula_termino_impuesto_electrico(self):
+        """Cálculo del impuesto eléctrico."""
+        subt_fijo_var = self._termino_fijo_total + self._termino_variable_total
+        if self._con_bono_social:
+            subt_fijo_var += self._descuento_bono_social
         self._termino_impuesto_electrico = self._round(self._impuesto_electrico_general * subt_fijo_var)
-        subt_fijo_var += self._termino_impuesto_electrico
 
-        # Cálculo del equipo de medida:
-        if self.alquiler_euros is not None:
-            self._termino_equipo_medida = self._round(self.alquiler_euros)
+    def _calcula_termino_equipo_medida(self):
+        """Cálculo del equipo de medida."""
+        if self._alquiler_euros is not None:
+            self._termino_equipo_medida = self._round(self._alquiler_euros)
         else:
             frac_año = sum([nd / dy for nd, dy, _ in self._periodos_fact])
-            self._termino_equipo_medida = self._round(frac_año * self.alquiler_euros_año)
+            self._termino_equipo_medida = self._round(frac_año * self._alquiler_euros_año)
+
+    def _calcula_total_factura(self):
+        """Añade el IVA o equivalente y obtiene el total."""
+        # Cálculo del IVA y TOTAL:
+        subt_fijo_var = self._termino_fijo_total + self._termino_variable_total
+        subt_fijo_var += self._termino_impuesto_electrico + self._descuento_bono_social
+        _, impuesto_gen, impuesto_medida = DATOS_ZONAS_IMPUESTOS[self._zona_impuestos]
+        self._terminos_iva = (subt_fijo_var * impuesto_gen, self._termino_equipo_medida * impuesto_medida)
+        self._termino_iva_total = self._round(self._terminos_iva[0] + self._terminos_iva[1])
 
-        # Cálculo del IVA o equivalente y del TOTAL:
-        self._calcula_iva_y_total()
+        # TOTAL FACTURA:
+        subt_fijo_var += self._termino_equipo_medida + self._termino_iva_total
+        self._total_factura = self._round(subt_fijo_var)
 
     @property
     def consumo_horario(self):
         """Devuelve los datos de consumo como time series horario. Si el consumo no tiene discriminación horaria,
         se aplican los perfiles de consumo para la tarifa seleccionada y el intervalo facturado,
         estimando los valores horarios."""
+        self._calcula('consumo_horario')
         return self._consumo_horario
 
     @property
@@ -616,11 +652,13 @@ class FacturaElec(object):
         :return: pvpc €/kWh
         :rtype: pd.Dataframe
         """
+        self._calcula('pvpc_horario')
         return self._pvpc_horario
 
     @property
     def num_dias_factura(self):
         """Devuelve el # de días del periodo facturado."""
+        self._calcula('periodos_fact')
         return self._num_dias_factura
 
     @property
@@ -636,15 +674,76 @@ class FacturaElec(object):
         peajes = [TIPO_PEAJE_GEN, TIPO_PEAJE_NOC, TIPO_PEAJE_VHC]
         codes_peajes = [DATOS_TIPO_PEAJE[p][1] for p in peajes]
         if type(tarifa) is int:
-            self._tipo_peaje = peajes[tarifa - 1]
+            nuevo_peaje = peajes[tarifa - 1]
         elif tarifa in peajes:
-            self._tipo_peaje = peajes[peajes.index(tarifa)]
+            nuevo_peaje = peajes[peajes.index(tarifa)]
         elif tarifa in codes_peajes:
-            self._tipo_peaje = peajes[codes_peajes.index(tarifa)]
+            nuevo_peaje = peajes[codes_peajes.index(tarifa)]
         else:
             print('ERROR: No se reconoce el tipo de tarifa "{}". Las opciones son: 1|2|3 ó {} ó {}'
                   .format(tarifa, '|'.join(peajes), '|'.join(codes_peajes)))
-        self._calcula_factura()
+            return
+        if nuevo_peaje != self._tipo_peaje:
+            self._tipo_peaje = nuevo_peaje
+            self._invalida('tipo_peaje')
+
+    @property
+    def potencia_contratada(self):
+        """Devuelve la potencia contratada, en kW."""
+        return self._potencia_contratada
+
+    @potencia_contratada.setter
+    def potencia_contratada(self, potencia):
+        """Establece la potencia contratada, en kW (sólo se recalculan el término fijo y los impuestos)."""
+        self._potencia_contratada = potencia
+        self._invalida('potencia_contratada')
+
+    @property
+    def con_bono_social(self):
+        """Devuelve si se aplica el descuento por Bono Social."""
+        return self._con_bono_social
+
+    @con_bono_social.setter
+    def con_bono_social(self, con_bono):
+        """Establece si se aplica el descuento por Bono Social."""
+        self._con_bono_social = con_bono
+        self._invalida('con_bono_social')
+
+    @property
+    def zona_impuestos(self):
+        """Devuelve la zona de impuestos (IVA|IGIC|IPSI)."""
+        return self._zona_impuestos
+
+    @zona_impuestos.setter
+    def zona_impuestos(self, zona):
+        """Establece la zona de impuestos (IVA|IGIC|IPSI; sólo se recalculan el IVA o equivalente y el total)."""
+        if zona not in DATOS_ZONAS_IMPUESTOS:
+            raise ValueError('No se reconoce la zona de impuestos "{}". Las opciones son: {}'
+                             .format(zona, '|'.join(ZONAS_IMPUESTOS)))
+        self._zona_impuestos = zona
+        self._invalida('zona_impuestos')
+
+    @property
+    def alquiler_euros(self):
+        """Devuelve el alquiler del equipo de medida del periodo facturado, en €, si se ha establecido."""
+        return self._alquiler_euros
+
+    @alquiler_euros.setter
+    def alquiler_euros(self, alquiler):
+        """Establece el alquiler del equipo de medida del periodo facturado, en € (None: según alquiler anual)."""
+        self._alquiler_euros = alquiler
+        self._invalida('alquiler')
+
+    @property
+    def alquiler_euros_año(self):
+        """Devuelve el alquiler anual del equipo de medida, en €/año."""
+        return self._alquiler_euros_año
+
+    @alquiler_euros_año.setter
+    def alquiler_euros_año(self, alquiler):
+        """Establece el alquiler anual del equipo de medida, en €/año."""
+        self._alquiler_euros_año = alquiler
+        self._invalida('alquiler')
 
     @property
     def consumo_total(self):
@@ -654,6 +753,7 @@ class FacturaElec(object):
 
         """
         if self._consumo is not None:
+            self._calcula('consumo_horario')
             return self._round(self._consumo.sum())
         print('WARNING: No se ha definido ningún consumo energético')
         return 0.
@@ -665,7 +765,7 @@ class FacturaElec(object):
         bien como time series de datos horarios.
         """
         self._consumo = nuevo_consumo
-        self._calcula_factura()
+        self._invalida('consumo')
 
     @property
     def gasto_equipo_medida(self):
@@ -674,17 +774,16 @@ class FacturaElec(object):
         :rtype float
 
         """
+        self._calcula('termino_equipo_medida')
         return self._termino_equipo_medida
 
     @gasto_equipo_medida.setter
     def gasto_equipo_medida(self, nuevo_gasto):
         """Establece el gasto relativo al alquiler de equipos de medida antes de impuestos, en €, de forma absoluta.
+        Sólo se recalculan el IVA o equivalente y el total (no el coste de la energía).
         :param nuevo_gasto: Gasto en €
         """
         self.alquiler_euros = nuevo_gasto
-        self._termino_equipo_medida = self._round(nuevo_gasto)
-        # Re-Cálculo del IVA y TOTAL:
-        self._calcula_iva_y_total()
 
     @property
     def coste_termino_fijo(self):
@@ -693,6 +792,7 @@ class FacturaElec(object):
         :rtype float
 
         """
+        self._calcula('termino_fijo')
         return self._termino_fijo_total
 
     @property
@@ -702,6 +802,7 @@ class FacturaElec(object):
         :rtype float
 
         """
+        self._calcula('termino_variable')
         return self._termino_variable_total
 
     @property
@@ -711,6 +812,7 @@ class FacturaElec(object):
         :rtype float
 
         """
+        self._calcula('descuento_bono_social')
         return self._descuento_bono_social
 
     @property
@@ -720,6 +822,7 @@ class FacturaElec(object):
         :rtype float
 
         """
+        self._calcula('termino_impuesto_electrico')
         return self._termino_impuesto_electrico
 
     @property
@@ -729,6 +832,7 @@ class FacturaElec(object):
         :rtype float
 
         """
+        self._calcula('total_factura')
         return self._termino_iva_total
 
     @property
@@ -738,6 +842,7 @@ class FacturaElec(object):
         :rtype float
 
         """
+        self._calcula('total_factura')
         return self._total_factura
 
     ##############################################
@@ -760,7 +865,7 @@ class FacturaElec(object):
         :return: dataframe de consumo con 'formato oficial'
         :rtype: pd.dataframe
         """
-        df_csv = pd.DataFrame(self._consumo_horario)
+        df_csv = pd.DataFrame(self.consumo_horario)
 
         columns = 'CUPS;Fecha;Hora;Consumo_kWh;Metodo_obtencion'.split(';')
         date_fmt = '{:%d/%m/%Y}'
@@ -794,6 +899,7 @@ class FacturaElec(object):
         :return: coste_horario
         """
         # Prepara datos
+        self._calcula_factura()
         cod_tarifa = DATOS_TIPO_PEAJE[self._tipo_peaje][1]
         _, impuesto_gen, impuesto_medida = DATOS_ZONAS_IMPUESTOS[self._zona_impuestos]
         coste_horario = pd.DataFrame(self._consumo_horario)
@@ -809,11 +915,10 @@ class FacturaElec(object):
             # Coste por energía consumida
             coefs_ener = TERM_ENER_PEAJE_ACCESO_EUR_KWH_TEA[año][self._tipo_peaje]
             tcu = self._pvpc_horario['TCU{}'.format(cod_tarifa)].loc[b_period_f]
-            hay_discr, cons_discr = self._asigna_periodos_discr_horaria(coste_horario.loc[b_period_f, COL_CONSUMO])
-            if hay_discr:
-                for c, coef in zip(cons_discr.columns[1:], coefs_ener):
-                    sub_pd = cons_discr[cons_discr[c]]
-                    coste_horario.loc[sub_pd.index, 'energia'] = coste_horario.loc[sub_pd.index, COL_CONSUMO] * coef
+            periodos = self._periodos_discr_horaria(coste_horario.index[b_period_f])
+            if periodos is not None:
+                coefs_horarios = np.asarray(coefs_ener)[periodos - 1]
+                coste_horario.loc[b_period_f, 'energia'] = coste_horario.loc[b_period_f, COL_CONSUMO] * coefs_horarios
             else:
                 coste_horario.loc[b_period_f, 'energia'] = coste_horario.loc[b_period_f, COL_CONSUMO] * coefs_ener[0]
             coste_horario.loc[b_period_f, 'energia'] += tcu * coste_horario.loc[b_period_f, COL_CONSUMO]
@@ -847,7 +952,7 @@ class FacturaElec(object):
         :return: matplotlib axes
         """
         p_params = dict(figsize=(16, 9)) if ax is None else dict(ax=ax)
-        consumo_diario = self._consumo_horario.groupby(pd.TimeGrouper('D')).sum()
+        consumo_diario = self.consumo_horario.groupby(pd.TimeGrouper('D')).sum()
         ax = consumo_diario.plot(color='blue', lw=2, **p_params)
         params_lines = dict(lw=1, linestyle=':', alpha=.6)
         xlim = consumo_diario[0], consumo_diario.index[-1]
@@ -866,7 +971,7 @@ class FacturaElec(object):
         :param ax: optional matplotlib axes
         :return: matplotlib axes
         """
-        consumo_diario = self._consumo_horario.groupby(pd.TimeGrouper('D')).sum()
+        consumo_diario = self.consumo_horario.groupby(pd.TimeGrouper('D')).sum()
         media_semanal = consumo_diario.groupby(lambda x: x.weekday).mean().round(1)
         días_semana = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
         media_semanal.columns = días_semana
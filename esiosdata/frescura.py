@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Calendario de publicación de los datos y marca de frescura de los stores locales.
+
+* PVPC: los precios del día siguiente se publican una vez al día (`HORA_PUBLICACION_PVPC`, hora local); antes de esa
+  hora, los datos están al día si llegan hasta el final de hoy, y después, si llegan hasta el final de mañana.
+* Demanda: los datos diezminutales se publican de forma continua, con un retraso de `RETRASO_PUBLICACION_DEM`; se
+  consideran al día con un margen de un periodo de actualización (`PERIODO_ACTUALIZACION_DEM`).
+
+Cada actualización de `PVPC` o `DatosREE` guarda junto al store un JSON (`*_frescura.json`) con el instante del
+último dato y el de la última comprobación. Con la marca al día (p.ej., mantenida por `esiosdata daemon`), los lectores
+abren el store sin ninguna petición a la red.
+
+@author: Eugenio Panadero
+"""
+import datetime as dt
+import json
+import os
+import pandas as pd
+from esiosdata.esios_config import (TZ, HORA_PUBLICACION_PVPC, PERIODO_ACTUALIZACION_DEM, RETRASO_PUBLICACION_DEM,
+                                    ESPERA_REINTENTO_INI, ESPERA_REINTENTO_MAX, TS_DATA_PVPC)
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+SUFIJO_MARCA = '_frescura.json'
+
+
+def ahora_tz(tz=TZ):
+    """Instante actual (pd.Timestamp) en la zona horaria `tz`."""
+    return pd.Timestamp.now(tz=tz)
+
+
+def publicacion_pvpc(ahora, siguiente=False):
+    """Instante de la última publicación de precios del PVPC anterior a `ahora` (o de la siguiente)."""
+    hora = dt.datetime.strptime(HORA_PUBLICACION_PVPC, '%H:%M').time()
+    dia = ahora.date()
+    pub = pd.Timestamp(dt.datetime.combine(dia, hora)).tz_localize(ahora.tz)
+    if siguiente and pub <= ahora:
+        pub = pd.Timestamp(dt.datetime.combine(dia + dt.timedelta(days=1), hora)).tz_localize(ahora.tz)
+    elif not siguiente and pub > ahora:
+        pub = pd.Timestamp(dt.datetime.combine(dia - dt.timedelta(days=1), hora)).tz_localize(ahora.tz)
+    return pub
+
+
+def esperado_pvpc(ahora, ts_data=TS_DATA_PVPC):
+    """Instante del último dato de PVPC que debe estar publicado en `ahora` (última hora de hoy o de mañana)."""
+    dia = publicacion_pvpc(ahora).date() + dt.timedelta(days=1)
+    fin_dia = pd.Timestamp(dia + dt.timedelta(days=1)).tz_localize(ahora.tz)
+    return fin_dia - pd.Timedelta(seconds=ts_data)
+
+
+def esperado_dem(ahora):
+    """Instante a partir del cual deben existir datos de demanda en `ahora` (con retraso y margen de actualización)."""
+    return ahora - pd.Timedelta(seconds=RETRASO_PUBLICACION_DEM + PERIODO_ACTUALIZACION_DEM)
+
+
+def proxima_dem(ahora):
+    """Instante de la siguiente actualización periódica de los datos de demanda."""
+    return ahora + pd.Timedelta(seconds=PERIODO_ACTUALIZACION_DEM)
+
+
+def espera_reintento(intentos):
+    """Espera (segs) antes del reintento nº `intentos` (>= 1), con crecimiento exponencial acotado."""
+    return min(ESPERA_REINTENTO_MAX, ESPERA_REINTENTO_INI * 2 ** max(0, intentos - 1))
+
+
+def ruta_marca(path_store):
+    """Ruta del JSON con la marca de frescura de un store."""
+    return os.path.splitext(path_store)[0] + SUFIJO_MARCA
+
+
+def guarda_marca(path_store, ultimo_dato, comprobado=None, **extra):
+    """Guarda (de forma atómica) la marca de frescura de un store: último dato y última comprobación."""
+    marca = {'ultimo_dato': pd.Timestamp(ultimo_dato).isoformat() if ultimo_dato is not None else None,
+             'comprobado': pd.Timestamp(comprobado if comprobado is not None else ahora_tz()).isoformat()}
+    marca.update(extra)
+    path = ruta_marca(path_store)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(marca, f)
+    os.replace(path + '.tmp', path)
+    return marca
+
+
+def lee_marca(path_store):
+    """Lee la marca de frescura de un store: dict con 'ultimo_dato' y 'comprobado' (pd.Timestamp), o None."""
+    try:
+        with open(ruta_marca(path_store)) as f:
+            marca = json.load(f)
+        for k in ['ultimo_dato', 'comprobado']:
+            marca[k] = pd.Timestamp(marca[k]) if marca.get(k) else None
+        return marca
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def marca_fresca(marca, esperado, ahora, ultima_publicacion=None):
+    """
+    Indica si los datos de una marca de frescura están al día: si llegan al instante `esperado` o si se han
+    comprobado hace menos de `ESPERA_REINTENTO_INI` segs, después de la última publicación (es decir, el origen aún no
+    tiene los datos nuevos y no tiene sentido volver a preguntar).
+    """
+    if marca is None or esperado is None:
+        return False
+    if marca['ultimo_dato'] is not None and marca['ultimo_dato'] >= esperado:
+        return True
+    comprobado = marca['comprobado']
+    return (comprobado is not None and comprobado <= ahora
+            and (ahora - comprobado).total_seconds() < ESPERA_REINTENTO_INI
+            and (ultima_publicacion is None or comprobado >= ultima_publicacion))
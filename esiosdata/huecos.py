@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de huecos de los datos almacenados.
+
+`indice_huecos(index, ts_data, d0, df)` localiza, de forma vectorial (búsqueda binaria de las medianoches locales
+en el index ordenado), los días con menos muestras de las esperadas, teniendo en cuenta los días de 23 y 25 horas.
+`PVPC` y `DatosREE` guardan ese índice en el store (key 'huecos') y, en cada actualización, descargan de nuevo
+únicamente los días con huecos, en vez de requerir un `force_update` completo.
+
+@author: Eugenio Panadero
+"""
+import datetime as dt
+import numpy as np
+import pandas as pd
+from esiosdata.esios_config import TZ
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+COLS_HUECOS = ['esperadas', 'presentes']
+
+
+def _ns(index):
+    return index.values.astype('datetime64[ns]').view('int64')
+
+
+def indice_huecos(index, ts_data, d0, df, tz=TZ, validos=None):
+    """Días del intervalo [d0, df] con menos muestras de las esperadas (huecos) en un index temporal.
+
+    :param index: DatetimeIndex creciente (localizado, o 'naive' en hora local, como el de los datos diarios)
+    :param ts_data: periodo de muestreo en segundos (86400 para datos diarios)
+    :param d0: día inicial (str YYYY-MM-DD, date o datetime)
+    :param df: día final
+    :param validos: (OPC) máscara booleana de las filas con datos válidos (p.ej., `data['dem'].notnull()`)
+    :return: pd.DataFrame indexado por día (naive), con las columnas 'esperadas' y 'presentes', sólo con los huecos
+    """
+    d0, df = pd.Timestamp(d0).date(), pd.Timestamp(df).date()
+    if df < d0:
+        return pd.DataFrame(columns=COLS_HUECOS, index=pd.DatetimeIndex([], name='dia'), dtype=int)
+    limites = pd.date_range(d0, df + dt.timedelta(days=1), freq='D', tz=tz)
+    esperadas = np.maximum(1, np.round(np.diff(_ns(limites)) / (ts_data * 1e9))).astype(int)
+    ts = _ns(index)
+    if validos is not None:
+        ts = ts[np.asarray(validos, dtype=bool)]
+    limites_busq = limites if index.tz is not None else limites.tz_localize(None)
+    presentes = np.diff(np.searchsorted(ts, _ns(limites_busq)))
+    hay_hueco = presentes < esperadas
+    dias = pd.DatetimeIndex(limites[:-1][hay_hueco].tz_localize(None), name='dia')
+    return pd.DataFrame({COLS_HUECOS[0]: esperadas[hay_hueco], COLS_HUECOS[1]: presentes[hay_hueco]}, index=dias)
+
+
+def dias_consecutivos(dias):
+    """Agrupa una lista ordenada de días (str YYYY-MM-DD o datetimes) en intervalos [(d0, df), ...] consecutivos."""
+    index = pd.DatetimeIndex(sorted(pd.to_datetime(dias)))
+    if len(index) == 0:
+        return []
+    cortes = np.flatnonzero(np.diff(index.values) != np.timedelta64(1, 'D')) + 1
+    return [(g[0], g[-1]) for g in np.split(index, cortes)]
@@ -19,11 +19,24 @@ Por favor, infórmese sobre descarga de información en
 y actualice sus procesos de descarga.
 """
 import json
+import numpy as np
 import pandas as pd
-import re
 from dataweb.requestweb import get_data_en_intervalo
-from esiosdata.esios_config import DATE_FMT, TZ, SERVER, HEADERS, D_TIPOS_REQ_DEM, KEYS_DATA_DEM
+from esiosdata.esios_config import (DATE_FMT, TZ, SERVER, HEADERS, D_TIPOS_REQ_DEM, KEYS_DATA_DEM, TS_DATA_DEM,
+                                    FREQ_DAT_DEM, INDICADORES_DEM, GEO_ID_PENINSULA, MESES_POR_PETICION_IND,
+                                    COLS_RENOV_DEM, URL_DEMANDA_ZONA)
+from esiosdata.lotes import AcumuladorColumnas, concat_lotes
 from esiosdata.prettyprinting import print_redb, print_err
+# Backend JSON más rápido (opcional), si está instalado:
+try:
+    import orjson
+    JSON_BACKEND, json_loads = 'orjson', orjson.loads
+except ImportError:
+    try:
+        import ujson
+        JSON_BACKEND, json_loads = 'ujson', ujson.loads
+    except ImportError:
+        JSON_BACKEND, json_loads = 'json', json.loads
 
 
 __author__ = 'Eugenio Panadero'
@@ -33,7 +46,7 @@ __license__ = "GPL"
 __version__ = "1.0"
 __maintainer__ = "Eugenio Panadero"
 
-RG_FUNC_CONTENT = re.compile('(?P<func>.*)\((?P<json>.*)\);')
+SEP_INTERVALO = '_'
 
 
 def dem_url_dia(dt_day='2015-06-22'):
@@ -50,18 +63,36 @@ def dem_url_dia(dt_day='2015-06-22'):
     return urls
 
 
+def _decode_jsonp(data_raw):
+    """Separa el envoltorio JSONP ('func({...});') por posición (1er '(' y último ')'), sin expresiones regulares,
+    y decodifica el contenido con el backend JSON disponible.
+
+    :return: func, data (None, None si la respuesta no tiene el formato JSONP esperado)
+    """
+    i_ini, i_fin = data_raw.find('('), data_raw.rfind(')')
+    if i_ini < 1 or i_fin < i_ini or data_raw[i_fin + 1:].strip() not in (';', ''):
+        return None, None
+    return data_raw[:i_ini].strip(), json_loads(data_raw[i_ini + 1:i_fin])
+
+
 def _extract_func_json_data(data_raw):
-    try:
-        busca = RG_FUNC_CONTENT.match(data_raw).groupdict()
-        ind, data = busca['func'], None
-        data = json.loads(busca['json'])
-        if len(data.keys()) == 1:
-            return ind, data[list(data.keys())[0]]
-        else:
-            return ind, data
-    except AttributeError:
-        # print('ERROR REG_EXP [{}] --> RAW: {}'.format(e, data_raw))
+    """Extrae el nombre de la función y el contenido (bajo su única clave, si es el caso) de una respuesta JSONP."""
+    ind, data = _decode_jsonp(data_raw)
+    if not isinstance(data, dict):
         return None, None
+    if len(data.keys()) == 1:
+        return ind, data[list(data.keys())[0]]
+    return ind, data
+
+
+def _columnas_registros(registros, key_ts='ts'):
+    """Pasa una lista de registros JSON (dicts) a formato columnar, sin construir DataFrames intermedios.
+
+    :return: lista de timestamps, lista de columnas, np.ndarray 2D (float) con los valores
+    """
+    cols = [c for c in dict.fromkeys(k for r in registros for k in r) if c != key_ts]
+    valores = np.array([[r.get(c) for c in cols] for r in registros], dtype=float)
+    return [r[key_ts] for r in registros], cols, valores
 
 
 def _import_daily_max_min(data):
@@ -83,16 +114,38 @@ def _import_daily_max_min(data):
     return df
 
 
-def _import_json_ts_data(data):
-    df = pd.DataFrame(data)
-    try:
-        return pd.DataFrame(df.set_index(pd.DatetimeIndex(df['ts'].apply(lambda x: pd.Timestamp(x, tz=TZ)),
-                                                          freq='10T', tz=TZ), verify_integrity=True
-                                         ).drop('ts', axis=1)).sort_index().applymap(float)
-    except ValueError:  # ES DST
-        df['ts'] = pd.DatetimeIndex(start=pd.Timestamp(df['ts'].iloc[0]), periods=len(df), freq='10T', tz=TZ)
-        # , ambiguous="infer")
-        return df.set_index('ts', verify_integrity=True).sort_index().applymap(float)
+def _index_ts_dem(ts, tz=TZ):
+    """Forma en bloque el DatetimeIndex (tz-aware) de las series diezminutales de demanda.
+
+    Los timestamps vienen en hora local ('YYYY-MM-DD HH:MM'); en el cambio de hora de octubre, la hora repetida viene
+    marcada como '2A' (aún en horario de verano) y '2B' ('1A' y '1B' en Canarias), lo que se traduce directamente en el
+    array `ambiguous` de la localización, sin pasar por excepciones. Si la hora repetida no viene marcada, se infiere
+    por el orden de los datos.
+    """
+    es_2a = np.array([t[12:13] == 'A' for t in ts], dtype=bool)
+    hay_marcas = es_2a.any() or any(t[12:13] == 'B' for t in ts)
+    if hay_marcas:
+        ts = [t[:11] + '0' + t[11] + t[13:] if t[12:13] in ('A', 'B') else t for t in ts]
+    index = pd.DatetimeIndex(pd.to_datetime(ts, format='%Y-%m-%d %H:%M'))
+    if hay_marcas:
+        ambiguous = es_2a
+    elif not index.is_unique:
+        ambiguous = 'infer'
+    else:
+        ambiguous = 'raise'
+    return index.tz_localize(tz, ambiguous=ambiguous).rename('ts')
+
+
+def _import_json_ts_data(data, tz=TZ):
+    """Procesa una serie diezminutal de demanda / generación (lista de dicts con la clave 'ts')."""
+    ts, cols, valores = _columnas_registros(data)
+    index = _index_ts_dem(ts, tz)
+    if not index.is_unique:
+        raise ValueError('Index has duplicate keys: {}'.format(index[index.duplicated()].unique().tolist()))
+    df = pd.DataFrame(valores, index=index, columns=cols).sort_index()
+    if len(df) > 2:
+        df.index = pd.DatetimeIndex(df.index, freq='infer')
+    return df
 
 
 def dem_procesa_datos_dia(key_day, response):
@@ -128,6 +181,208 @@ def dem_procesa_datos_dia(key_day, response):
         return data_import, 0
 
 
+def _frame_max_min(fechas, registros):
+    """Forma de una vez el DataFrame diario de máximos y mínimos (IND_MaxMinRenovEol + IND_MaxMin) de varios días."""
+    index = pd.DatetimeIndex(pd.to_datetime(fechas))
+    if len(index) == 1 or (np.diff(index.values) == np.timedelta64(1, 'D')).all():
+        index = pd.DatetimeIndex(index, freq='D')
+    df = pd.DataFrame(registros, index=index)
+    for c in df.columns:
+        if c.startswith('ts') or 'timeStamp' in c:
+            df[c] = pd.to_datetime(df[c])
+        else:
+            df[c] = df[c].astype(float)
+    return df
+
+
+def _arrays_dem_dia(response):
+    """Extrae los arrays de las respuestas JSONP de un día (archivos 117, 116, 115 y 114), sin formar DataFrames.
+
+    :return: (ts, columnas, valores) de la serie diezminutal (o None), (fecha, dict) de máximos y mínimos (o None)
+    """
+    series, maxmin, fecha = [], {}, None
+    for r in response:
+        tipo_datos, data = _extract_func_json_data(r) if r is not None else (None, None)
+        if tipo_datos is None or not data:
+            continue
+        if 'IND_MaxMin' in tipo_datos:
+            data = dict(data)
+            fecha_data = data.pop('date') if 'date' in data else data['tsMaxRenov']
+            fecha = fecha or fecha_data[:10]
+            maxmin.update(data)
+        else:
+            series.append(_columnas_registros(data))
+    serie = None
+    if series:
+        if len(series) != 2:
+            raise ValueError('Se esperaban 2 series diezminutales, recibidas: {}'.format(len(series)))
+        (ts, cols, valores), (ts_2, cols_2, valores_2) = series
+        if set(cols).intersection(cols_2) or len(set(ts)) != len(ts):
+            raise ValueError('Series diezminutales con columnas o timestamps repetidos')
+        # Left join de la 2ª serie sobre los timestamps de la 1ª
+        pos_2 = {t: i for i, t in enumerate(ts_2)}
+        i_2 = np.array([pos_2.get(t, -1) for t in ts], dtype=int)
+        valores_join = np.full((len(ts), len(cols_2)), np.nan)
+        valores_join[i_2 >= 0] = valores_2[i_2[i_2 >= 0]]
+        serie = ts, cols + cols_2, np.hstack([valores, valores_join])
+    return serie, (fecha, maxmin) if maxmin else None
+
+
+def dem_valida_datos_dia(key_day, response):
+    """Validación mínima de las respuestas de un día, para el procesado por lotes (`dem_procesa_lote`)."""
+    if response and any(isinstance(r, str) and '(' in r for r in response):
+        return response, 0
+    print_redb('** No hay datos para el día {}!'.format(key_day))
+    return None, -2
+
+
+def dem_procesa_lote(responses, verbose=False):
+    """Procesa un lote de días: acumula los arrays de cada día en buffers preasignados y forma un único DataFrame
+    diezminutal ('data') y otro diario ('data_dias') para todo el lote.
+
+    :param responses: dict {key_dia: [response_117, response_116, response_115, response_114]}
+    :return: dict de DataFrames del lote (o None), lista de días con error
+    """
+    acumulador = AcumuladorColumnas(capacidad=150 * len(responses), dtype_index=object)
+    fechas, registros, dias_error = [], [], []
+    for key_day in sorted(responses.keys()):
+        try:
+            serie, maxmin = _arrays_dem_dia(responses[key_day])
+        except Exception as e:
+            serie = maxmin = None
+            if verbose:
+                print_err('DÍA: {} -> ERROR: {}'.format(key_day, e))
+        if serie is None and maxmin is None:
+            dias_error.append(key_day)
+            continue
+        if serie is not None:
+            acumulador.anyade(*serie)
+        if maxmin is not None:
+            fechas.append(maxmin[0])
+            registros.append(maxmin[1])
+    data_import = {}
+    if acumulador.num_filas > 0:
+        data_import[KEYS_DATA_DEM[0]] = acumulador.to_frame(_index_ts_dem)
+    if registros:
+        data_import[KEYS_DATA_DEM[1]] = _frame_max_min(fechas, registros)
+    return data_import or None, dias_error
+
+
+def dem_url_zona_dia(dt_day, zona, curva):
+    """Obtiene la url de descarga (demanda.ree.es) de los datos de demanda y generación de una zona ('BALEARES',
+    'CANARIAS') y curva (isla o sistema eléctrico, ver `CURVAS_ZONAS`) en un día concreto."""
+    fecha = dt_day if type(dt_day) is str else dt_day.date().isoformat()
+    return URL_DEMANDA_ZONA.format(zona=zona.capitalize(), curva=curva, fecha=fecha)
+
+
+def dem_procesa_zona_dia(key_day, response, tz=TZ):
+    """Procesa la respuesta JSONP de demanda.ree.es de un día (serie diezminutal de demanda y generación de una
+    curva), en hora local de la zona (`tz`). Sólo genera datos diezminutales ('data')."""
+    tipo_datos, data = _extract_func_json_data(response) if isinstance(response, str) else (None, None)
+    if tipo_datos is None or not data:
+        print_redb('** No hay datos para el día {}!'.format(key_day))
+        return None, -2
+    try:
+        return {KEYS_DATA_DEM[0]: _import_json_ts_data(data, tz)}, 0
+    except (KeyError, TypeError, ValueError) as e:
+        print_err('DÍA: {} -> ERROR: {}'.format(key_day, e))
+        return None, -1
+
+
+def dem_intervalos_indicadores(d0, df, meses=MESES_POR_PETICION_IND):
+    """Divide el intervalo de días [d0, df] en tramos de `meses` meses naturales, para la descarga por indicadores.
+
+    :return: lista de keys de intervalo 'YYYY-MM-DD_YYYY-MM-DD'
+    """
+    d0, df = pd.Timestamp(d0).normalize(), pd.Timestamp(df).normalize()
+    inicios = [max(d0, t) for t in pd.date_range(d0.replace(day=1), df, freq='{}MS'.format(meses))]
+    finales = [t - pd.Timedelta(days=1) for t in inicios[1:]] + [df]
+    return ['{:%Y-%m-%d}{}{:%Y-%m-%d}'.format(t0, SEP_INTERVALO, tf) for t0, tf in zip(inicios, finales)]
+
+
+def _limites_intervalo(key_intervalo):
+    """Instantes (tz-aware) de inicio y fin (excluido) del intervalo de días locales 'YYYY-MM-DD_YYYY-MM-DD'."""
+    d0, df = [pd.Timestamp(d) for d in key_intervalo.split(SEP_INTERVALO)]
+    return d0.tz_localize(TZ), (df + pd.Timedelta(days=1)).tz_localize(TZ)
+
+
+def dem_url_indicadores(key_intervalo):
+    """Obtiene las urls de descarga de los indicadores de demanda y generación (`INDICADORES_DEM`) para un intervalo
+    de días, con los valores diezminutales de la Península."""
+    t0, tf = _limites_intervalo(key_intervalo)
+    query = '?start_date={:%Y-%m-%dT%H:%M:%SZ}&end_date={:%Y-%m-%dT%H:%M:%SZ}&time_trunc=ten_minutes&geo_ids[]={}'
+    query = query.format(t0.tz_convert('UTC'), (tf - pd.Timedelta(seconds=1)).tz_convert('UTC'), GEO_ID_PENINSULA)
+    return [SERVER + '/indicators/{}'.format(id_ind) + query for id_ind in INDICADORES_DEM.values()]
+
+
+def _frame_indicadores(key_intervalo, responses):
+    """Forma el DataFrame diezminutal de un intervalo, situando los valores de cada indicador en la rejilla de 10
+    minutos por su posición (timestamps UTC), sin joins entre series."""
+    t0, tf = _limites_intervalo(key_intervalo)
+    index = pd.date_range(t0, tf, freq=FREQ_DAT_DEM, inclusive='left').rename('ts')
+    t0_ns = t0.value
+    cols = list(INDICADORES_DEM.keys())
+    pos_col = {id_ind: j for j, id_ind in enumerate(INDICADORES_DEM.values())}
+    valores = np.full((len(index), len(cols)), np.nan)
+    for r in responses:
+        indicador = r['indicator']
+        data = [v for v in indicador['values'] if v.get('geo_id', GEO_ID_PENINSULA) == GEO_ID_PENINSULA]
+        if not data:
+            continue
+        ts = pd.DatetimeIndex(pd.to_datetime([v['datetime_utc'] for v in data], utc=True, format='ISO8601'))
+        pos = (ts.values.astype('datetime64[ns]').view('int64') - t0_ns) // (TS_DATA_DEM * 10**9)
+        ok = (pos >= 0) & (pos < len(index))
+        valores[pos[ok], pos_col[indicador['id']]] = np.array([v['value'] for v in data], dtype=float)[ok]
+    hay_datos = ~np.isnan(valores).all(axis=1)
+    if not hay_datos.any():
+        return None
+    i0, i1 = np.argmax(hay_datos), len(hay_datos) - np.argmax(hay_datos[::-1])
+    return pd.DataFrame(valores[i0:i1], index=index[i0:i1], columns=cols)
+
+
+def _frame_max_min_indicadores(df):
+    """Máximos y mínimos diarios (e instantes, en hora local) de la demanda, la generación renovable y la eólica,
+    con las mismas columnas que los archivos IND_MaxMinRenovEol e IND_MaxMin."""
+    index_local = df.index.tz_localize(None)
+    series = [('Renov', df[[c for c in COLS_RENOV_DEM if c in df]].sum(axis=1, min_count=1)),
+              ('Eol', df['eol']), ('Dem', df['dem'])]
+    cols = {}
+    for nombre, serie in series:
+        serie = pd.Series(serie.values, index=index_local).dropna()
+        grupos = serie.groupby(serie.index.normalize())
+        if nombre == 'Dem':
+            cols.update({'maxDem': grupos.max(), 'timeStampMax': grupos.idxmax(),
+                         'minDem': grupos.min(), 'timeStampMin': grupos.idxmin()})
+        else:
+            cols.update({'tsMax' + nombre: grupos.idxmax(), 'max' + nombre: grupos.max(),
+                         'tsMin' + nombre: grupos.idxmin(), 'min' + nombre: grupos.min()})
+    data_dias = pd.DataFrame(cols).rename_axis(None)
+    if len(data_dias) == 1 or (np.diff(data_dias.index.values) == np.timedelta64(1, 'D')).all():
+        data_dias.index = pd.DatetimeIndex(data_dias.index, freq='D')
+    return data_dias
+
+
+def dem_procesa_indicadores(key_intervalo, response):
+    """Procesa las respuestas JSON de los indicadores de un intervalo de días, formando los mismos DataFrames que con
+    los archivos diarios: 'data' (diezminutal) y 'data_dias' (máximos y mínimos diarios, calculados de la serie)."""
+    try:
+        df = _frame_indicadores(key_intervalo, response)
+    except (KeyError, TypeError, ValueError) as e:
+        print_err('INTERVALO: {} -> ERROR: {}'.format(key_intervalo, e))
+        return None, -1
+    if df is None:
+        print_redb('** No hay datos para el intervalo {}!'.format(key_intervalo))
+        return None, -2
+    if len(df) > 2:
+        df.index = pd.DatetimeIndex(df.index, freq='infer')
+    return {KEYS_DATA_DEM[0]: df, KEYS_DATA_DEM[1]: _frame_max_min_indicadores(df)}, 0
+
+
+def dem_concat_intervalos(datos_intervalos):
+    """Une los datos procesados de varios intervalos (dict {key_intervalo: data}): `(data, intervalos_error)`."""
+    return concat_lotes([datos_intervalos[k] for k in sorted(datos_intervalos.keys())]), []
+
+
 def dem_data_dia(str_dia='2015-10-10', str_dia_fin=None):
     """Obtiene datos de demanda energética en un día concreto o un intervalo, accediendo directamente a la web."""
     params = {'date_fmt': DATE_FMT, 'usar_multithread': False, 'num_retries': 1, "timeout": 10,
@@ -19,10 +19,12 @@ Por favor, infórmese sobre descarga de información en
 y actualice sus procesos de descarga.
 """
 import datetime as dt
+from operator import itemgetter
 import numpy as np
 import pandas as pd
 from dataweb.requestweb import get_data_en_intervalo
-from esiosdata.esios_config import DATE_FMT, TZ, SERVER, HEADERS, TARIFAS, COLS_PVPC
+from esiosdata.esios_config import DATE_FMT, TZ, SERVER, HEADERS, TARIFAS, COLS_PVPC, COLS_CALC_PVPC
+from esiosdata.lotes import AcumuladorColumnas
 
 
 __author__ = 'Eugenio Panadero'
@@ -32,6 +34,8 @@ __license__ = "GPL"
 __version__ = "1.0"
 __maintainer__ = "Eugenio Panadero"
 
+SEP_NUM = ';'
+
 
 def pvpc_url_dia(dt_day):
     """Obtiene la url de descarga de los datos de PVPC de un día concreto.
@@ -45,69 +49,134 @@ def pvpc_url_dia(dt_day):
         return SERVER + '/archives/70/download_json?locale=es' + '&date=' + dt_day.date().isoformat()
 
 
+def _inicios_dias(index):
+    """Posiciones de inicio de cada día (en hora local) de un DatetimeIndex creciente, con días de 23, 24 o 25 horas."""
+    if not len(index):
+        return np.array([], dtype=int)
+    dias = (index.tz_localize(None) if index.tz is not None else index).values.astype('datetime64[D]')
+    return np.r_[0, np.flatnonzero(dias[1:] != dias[:-1]) + 1]
+
+
 def pvpc_calc_tcu_cp_feu_d(df, verbose=True, convert_kwh=True):
-    """Procesa TCU, CP, FEU diario.
+    """Procesa TCU, CP, FEU diario, para las tarifas presentes en `df` (todas o un subconjunto, p.ej., las columnas
+    de una única tarifa leídas con `PVPC.read`).
+
+    Cálculo vectorizado sobre un array (horas x tarifas x componentes) con las columnas de cada tarifa en posiciones
+    fijas: TCU = PVPC - TEU; CP, suma de los componentes del coste de producción; y PD_ = TEU + media diaria del TCU
+    ponderada por los coeficientes de perfilado (COF), con sumas por día (`np.add.reduceat`) desde el inicio de cada
+    día en hora local, por lo que los días de 23 y 25 horas se promedian con sus horas reales. No modifica `df`.
 
     :param df:
     :param verbose:
     :param convert_kwh:
     :return:
     """
-    if 'TCU' + TARIFAS[0] not in df.columns:
-        # Pasa de €/MWh a €/kWh:
-        if convert_kwh:
-            cols_mwh = [c + t for c in COLS_PVPC for t in TARIFAS if c != 'COF']
-            df[cols_mwh] = df[cols_mwh].applymap(lambda x: x / 1000.)
-        # Obtiene columnas TCU, CP, precio día
-        gb_t = df.groupby(lambda x: TARIFAS[np.argmax([t in x for t in TARIFAS])], axis=1)
-        for k, g in gb_t:
-            if verbose:
-                print('TARIFA {}'.format(k))
-                print(g.head())
-
-            # Cálculo de TCU
-            df['TCU{}'.format(k)] = g[k] - g['TEU{}'.format(k)]
-
-            # Cálculo de CP
-            # cols_cp = [c + k for c in ['FOS', 'FOM', 'INT', 'PCAP', 'PMH', 'SAH']]
-            cols_cp = [c + k for c in COLS_PVPC if c not in ['', 'COF', 'TEU']]
-            df['CP{}'.format(k)] = g[cols_cp].sum(axis=1)
-
-            # Cálculo de PERD --> No es posible así, ya que los valores base ya vienen con PERD
-            # dfs_pvpc[k]['PERD{}'.format(k)] = dfs_pvpc[k]['TCU{}'.format(k)] / dfs_pvpc[k]['CP{}'.format(k)]
-            # dfs_pvpc[k]['PERD{}'.format(k)] = dfs_pvpc[k]['INT{}'.format(k)] / 1.92
-
-            # Cálculo de FEU diario
-            cols_k = ['TEU' + k, 'TCU' + k, 'COF' + k]
-            g = df[cols_k].groupby('TEU' + k)
-            pr = g.apply(lambda x: x['TCU' + k].dot(x['COF' + k]) / x['COF' + k].sum())
-            pr.name = 'PD_' + k
-            df = df.join(pr, on='TEU' + k, rsuffix='_r')
-            df['PD_' + k] += df['TEU' + k]
-    return df
-
-
-def _process_json_pvpc_hourly_data(df):
-    # Forma DateTimeIndex:
-    params_dt = dict(freq='H', tz=TZ)
-    if len(df) == 25 or len(df) == 23:  # Día con cambio de hora (DST)
-        fecha = dt.datetime.strptime(df['Dia'][0], '%d/%m/%Y')
-        df['fecha'] = pd.DatetimeIndex(start=fecha, end=fecha + dt.timedelta(days=1, hours=-1), **params_dt)
-        print('Fichero irregular nº horas != 24: --> {:%d-%m-%Y} -> {} medidas'.format(fecha, len(df['fecha'])))
+    tarifas = [t for t in TARIFAS if t in df.columns]
+    if not tarifas or 'TCU' + tarifas[0] in df.columns:
+        return df
+    cols = [c + t for t in tarifas for c in COLS_PVPC]
+    valores = np.array(df[cols].values, dtype=float).reshape(len(df), len(tarifas), len(COLS_PVPC))
+    i_teu, i_cof = COLS_PVPC.index('TEU'), COLS_PVPC.index('COF')
+    # Pasa de €/MWh a €/kWh:
+    if convert_kwh:
+        valores[:, :, [i for i, c in enumerate(COLS_PVPC) if c != 'COF']] /= 1000.
+    # Cálculo de TCU y CP
+    tcu = valores[:, :, 0] - valores[:, :, i_teu]
+    cp = np.nansum(valores[:, :, [i for i, c in enumerate(COLS_PVPC) if c not in ['', 'COF', 'TEU']]], axis=2)
+    # Cálculo de FEU diario (media del TCU ponderada por los coefs. de perfilado en las horas con datos)
+    cof = valores[:, :, i_cof]
+    validos = ~(np.isnan(tcu) | np.isnan(cof))
+    inicios = _inicios_dias(df.index)
+    if len(inicios):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media_dia = (np.add.reduceat(np.where(validos, tcu * cof, 0.), inicios, axis=0)
+                         / np.add.reduceat(np.where(validos, cof, 0.), inicios, axis=0))
+        precio_dia = np.repeat(media_dia, np.diff(np.r_[inicios, len(df)]), axis=0) + valores[:, :, i_teu]
     else:
-        df['fecha'] = pd.DatetimeIndex([dt.datetime.strptime(x, '%d/%m/%Y %H')
-                                        for x in df['Dia'].str.cat(df['Hora'].str.slice(0, 2), sep=' ')], **params_dt)
-    df = df.drop(['Dia', 'Hora'], axis=1).set_index('fecha', verify_integrity=True).sort_index()
-    # Pasa a float:
-    df = df.applymap(lambda x: float(x.replace('.', '').replace(',', '.')))  # / 1000.)
-    return df
+        precio_dia = np.empty_like(tcu)
+    derivadas = np.stack([tcu, cp, precio_dia], axis=2).reshape(len(df), -1)
+    if verbose:
+        for k in tarifas:
+            print('TARIFA {}'.format(k))
+            print(df[[c + k for c in COLS_PVPC]].head())
+    df_calc = df.copy()
+    df_calc[cols] = valores.reshape(len(df), -1)
+    return pd.concat([df_calc, pd.DataFrame(derivadas, index=df.index,
+                                            columns=[c + t for t in tarifas for c in COLS_CALC_PVPC])], axis=1)
+
+
+def _float_num_es(valores):
+    """Conversión vectorizada de una secuencia de strings en formato numérico español ('1.234,56') a np.ndarray.
+
+    Se concatenan todos los valores en un único string, sobre el que se hacen las sustituciones de separadores
+    (decimal y de miles), y se convierte en bloque, en vez de hacer una llamada python por valor. Con valores no
+    numéricos, lanza ValueError.
+    """
+    raw = SEP_NUM.join(valores).replace('.', '').replace(',', '.')
+    return np.array(raw.split(SEP_NUM), dtype=float)
+
+
+def _ts_utc_horario_pvpc(dias, horas, verbose=True):
+    """Forma los timestamps (segundos UTC, int64) de los datos horarios a partir de las columnas 'Dia' y 'Hora'.
+
+    Cada hora se obtiene como la medianoche local de su día (en UTC) + un offset horario: la hora de inicio ('HH-HH')
+    en los días normales, o la posición de la fila en el día en los días con cambio de hora (23 ó 25 horas).
+    """
+    dias_unicos, i_dia, horas_dia = np.unique(np.asarray(dias), return_inverse=True, return_counts=True)
+    i_dia = i_dia.ravel()
+    # Posición de cada fila dentro de su día (para los días con 23 / 25 horas)
+    orden = np.argsort(i_dia, kind='stable')
+    posicion = np.empty(len(i_dia), dtype=int)
+    posicion[orden] = np.arange(len(i_dia)) - (np.cumsum(horas_dia) - horas_dia)[i_dia[orden]]
+    dia_normal = horas_dia[i_dia] == 24
+    offset = np.where(dia_normal, np.asarray(horas, dtype='U2').astype(int), posicion)
+    medianoches = np.array([int(TZ.localize(dt.datetime.strptime(d, '%d/%m/%Y')).timestamp()) for d in dias_unicos])
+    if verbose:
+        for dia, n in zip(dias_unicos, horas_dia):
+            if n != 24:
+                print('Fichero irregular nº horas != 24: --> {} -> {} medidas'.format(dia.replace('/', '-'), n))
+    return medianoches[i_dia] + 3600 * offset
+
+
+def _index_pvpc(ts_utc):
+    """DatetimeIndex localizado a partir de los timestamps en segundos UTC."""
+    return pd.DatetimeIndex(pd.to_datetime(ts_utc, unit='s', utc=True)).tz_convert(TZ).rename('fecha')
+
+
+def _arrays_pvpc(d_data, verbose=True):
+    """Extrae los arrays de los registros horarios de PVPC (lista de dicts del JSON del archivo 70).
+
+    :return: timestamps (segundos UTC), lista de columnas, np.ndarray 2D (float) con los valores
+    """
+    cols = [c for c in d_data[0].keys() if c not in ('Dia', 'Hora')]
+    get_cols = itemgetter(*cols)
+    valores = [v for r in d_data for v in get_cols(r)]
+    ts_utc = _ts_utc_horario_pvpc([r['Dia'] for r in d_data], [r['Hora'] for r in d_data], verbose=verbose)
+    if len(np.unique(ts_utc)) != len(ts_utc):
+        duplicados = _index_pvpc(ts_utc)[pd.Series(ts_utc).duplicated().values]
+        raise ValueError('Index has duplicate keys: {}'.format(duplicados.tolist()))
+    return ts_utc, cols, _float_num_es(valores).reshape(len(d_data), len(cols))
+
+
+def _process_json_pvpc_hourly_data(d_data, verbose=True):
+    """Procesa los registros horarios de PVPC (lista de dicts del JSON del archivo 70, de uno o varios días).
+
+    :return: pd.DataFrame con DatetimeIndex horario localizado y las columnas de datos en float.
+    """
+    if isinstance(d_data, pd.DataFrame):
+        d_data = d_data.to_dict('records')
+    ts_utc, cols, valores = _arrays_pvpc(d_data, verbose=verbose)
+    df = pd.DataFrame(valores, index=_index_pvpc(ts_utc), columns=cols)
+    if len(df) > 2:
+        df.index = pd.DatetimeIndex(df.index, freq='infer')
+    return df.sort_index()
 
 
 def pvpc_procesa_datos_dia(_, response, verbose=True):
     """Procesa la información JSON descargada y forma el dataframe de los datos de un día."""
     try:
         d_data = response['PVPC']
-        df = _process_json_pvpc_hourly_data(pd.DataFrame(d_data))
+        df = _process_json_pvpc_hourly_data(d_data, verbose=verbose)
         return df, 0
     except Exception as e:
         if verbose:
@@ -115,6 +184,50 @@ def pvpc_procesa_datos_dia(_, response, verbose=True):
         return None, -2
 
 
+def pvpc_valida_datos_dia(key_dia, response, verbose=True):
+    """Validación mínima de la respuesta de un día, para el procesado por lotes (`pvpc_procesa_lote`)."""
+    if isinstance(response, dict) and response.get('PVPC'):
+        return response, 0
+    if verbose:
+        print('ERROR leyendo información de web: sin datos de PVPC para el día {}'.format(key_dia))
+    return None, -2
+
+
+def pvpc_procesa_lote(responses, verbose=False):
+    """Procesa un lote de días: acumula los arrays de cada día en buffers preasignados y forma un único DataFrame.
+
+    :param responses: dict {key_dia: response} con las respuestas del archivo 70
+    :return: pd.DataFrame con los datos del lote (o None), lista de días con error
+    """
+    acumulador = AcumuladorColumnas(capacidad=25 * len(responses))
+    dias_error = []
+    for key_dia in sorted(responses.keys()):
+        try:
+            acumulador.anyade(*_arrays_pvpc(responses[key_dia]['PVPC'], verbose=verbose))
+        except Exception as e:
+            if verbose:
+                print('ERROR leyendo información de web del día {}: {}'.format(key_dia, e))
+            dias_error.append(key_dia)
+    if acumulador.num_filas == 0:
+        return None, dias_error
+    return acumulador.to_frame(_index_pvpc), dias_error
+
+
+def pvpc_procesa_datos_dias(responses, verbose=True):
+    """Procesa de una sola vez las respuestas JSON de varios días (p.ej., del archivo raw local).
+
+    :param responses: lista (o dict {key_dia: response}) de respuestas del archivo 70
+    :return: pd.DataFrame con los datos de todos los días, ok (0 / -2 si algún día no se puede procesar)
+    """
+    if not isinstance(responses, dict):
+        responses = dict(enumerate(responses))
+    responses = {k: r for k, r in responses.items() if r and r.get('PVPC')}
+    df, dias_error = pvpc_procesa_lote(responses, verbose=verbose)
+    if df is None or dias_error:
+        return None, -2
+    return df, 0
+
+
 def pvpc_data_dia(str_dia, str_dia_fin=None):
     """Obtiene datos de PVPC en un día concreto o un intervalo, accediendo directamente a la web."""
     params = {'date_fmt': DATE_FMT, 'usar_multithread': False,
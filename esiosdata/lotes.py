@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Ensamblado por lotes de los datos de muchos días.
+
+En vez de formar un DataFrame por día (y varios por día en demanda) y fusionarlos de uno en uno, los procesadores
+por lotes (`pvpc_procesa_lote`, `dem_procesa_lote`) extraen los arrays de cada día y los acumulan en buffers de
+columnas preasignados (`AcumuladorColumnas`), materializando un único DataFrame por lote.
+
+* `procesa_por_lotes(dict_responses, func_procesa_lote, dias_por_lote)`: aplica un procesador por lotes a las
+  respuestas descargadas de un intervalo y une los resultados de cada lote.
+* `concat_lotes(lista_data)`: une los DataFrames (o dicts de DataFrames) de lotes de días consecutivos.
+
+@author: Eugenio Panadero
+"""
+import numpy as np
+import pandas as pd
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+class AcumuladorColumnas(object):
+    """
+    Buffers de columnas preasignados (index + matriz de valores float) para ensamblar un único DataFrame a partir
+    de los arrays de muchos días. Si la capacidad inicial se queda corta, los buffers crecen por duplicación.
+    Las columnas que aparecen en días posteriores se añaden al vuelo (con NaN en las filas anteriores).
+    """
+
+    def __init__(self, capacidad=1024, columnas=None, dtype_index='int64'):
+        self.columnas = list(columnas or [])
+        self.num_filas = 0
+        self._pos_col = {c: i for i, c in enumerate(self.columnas)}
+        self._index = np.empty(max(capacidad, 1), dtype=dtype_index)
+        self._valores = np.full((max(capacidad, 1), max(len(self.columnas), 1)), np.nan)
+
+    @property
+    def capacidad(self):
+        """Nº de filas preasignadas."""
+        return self._index.shape[0]
+
+    def _asegura_capacidad(self, num_filas_nuevas):
+        cap, cap_cols = self._valores.shape
+        filas = self.num_filas + num_filas_nuevas
+        if filas <= cap and len(self.columnas) <= cap_cols:
+            return
+        nueva_cap = max(cap * 2, filas) if filas > cap else cap
+        nuevas_cols = max(cap_cols * 2, len(self.columnas)) if len(self.columnas) > cap_cols else cap_cols
+        index = np.empty(nueva_cap, dtype=self._index.dtype)
+        index[:self.num_filas] = self._index[:self.num_filas]
+        valores = np.full((nueva_cap, nuevas_cols), np.nan)
+        valores[:self.num_filas, :cap_cols] = self._valores[:self.num_filas]
+        self._index, self._valores = index, valores
+
+    def anyade(self, index, columnas, valores):
+        """Añade las filas de un día.
+
+        :param index: array (n,) con las claves temporales de las filas (p.ej., segundos UTC, o strings)
+        :param columnas: lista (m) de nombres de columna
+        :param valores: np.ndarray (n, m) de floats
+        """
+        n = len(index)
+        for c in columnas:
+            if c not in self._pos_col:
+                self._pos_col[c] = len(self.columnas)
+                self.columnas.append(c)
+        self._asegura_capacidad(n)
+        i0, i1 = self.num_filas, self.num_filas + n
+        self._index[i0:i1] = index
+        pos = [self._pos_col[c] for c in columnas]
+        if pos == list(range(len(pos))):
+            self._valores[i0:i1, :len(pos)] = valores
+        else:
+            self._valores[i0:i1, pos] = valores
+        self.num_filas = i1
+
+    def to_frame(self, func_index, freq='infer'):
+        """Materializa el DataFrame del lote (ordenado y sin filas duplicadas, prevaleciendo la primera).
+
+        :param func_index: función que forma el DatetimeIndex a partir del array de claves del index
+        """
+        n, m = self.num_filas, len(self.columnas)
+        valores = self._valores[:n, :m]
+        if valores.shape != self._valores.shape:
+            valores = valores.copy()
+        df = pd.DataFrame(valores, index=func_index(self._index[:n]), columns=self.columnas)
+        if not df.index.is_unique:
+            df = df[~df.index.duplicated(keep='first')]
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        if freq is not None and len(df) > 2:
+            df.index = pd.DatetimeIndex(df.index, freq=freq)
+        return df
+
+
+def concat_lotes(lista_data):
+    """Une los resultados (DataFrames, o dicts de DataFrames) de varios lotes de días."""
+    lista_data = [d for d in lista_data if d is not None]
+    if not lista_data:
+        return None
+
+    def _concat(dfs):
+        if len(dfs) == 1:
+            return dfs[0]
+        df = pd.concat(dfs)
+        if not df.index.is_unique:
+            df = df[~df.index.duplicated(keep='first')]
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        if dfs[0].index.freq is not None and len(df) > 2:
+            df.index = pd.DatetimeIndex(df.index, freq='infer')
+        return df
+
+    if isinstance(lista_data[0], dict):
+        keys = list(dict.fromkeys(k for d in lista_data for k in d.keys()))
+        return {k: _concat([d[k] for d in lista_data if d.get(k) is not None]) for k in keys}
+    return _concat(lista_data)
+
+
+def procesa_por_lotes(dict_responses, func_procesa_lote, dias_por_lote=31):
+    """Procesa las respuestas de un intervalo de días por lotes de `dias_por_lote` días consecutivos.
+
+    :param dict_responses: dict {key_dia: response}
+    :param func_procesa_lote: función que procesa un dict {key_dia: response} y devuelve `(data, dias_error)`
+    :return: data (DataFrame o dict de DataFrames, o None si no hay datos), lista de días con error
+    """
+    keys = sorted(k for k, r in dict_responses.items() if r is not None)
+    resultados, dias_error = [], []
+    for i in range(0, len(keys), dias_por_lote):
+        data_lote, error_lote = func_procesa_lote({k: dict_responses[k] for k in keys[i:i + dias_por_lote]})
+        resultados.append(data_lote)
+        dias_error += error_lote
+    return concat_lotes(resultados), dias_error
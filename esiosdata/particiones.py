@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento particionado por meses de los DataFrames de `PVPC` y `DatosREE`.
+
+En vez de un único fichero HDF5 que se reescribe completo en cada actualización, cada key de datos se guarda en un
+fichero por mes (en hora local del store), junto a un manifiesto JSON con la firma (hash) de cada partición:
+
+    {directorio}/_particiones.json
+    {directorio}/{key}/{YYYY-MM}.parquet  (o .h5)
+
+Con `pyarrow` instalado (`pip install esiosdata[parquet]`), las particiones se escriben en formato columnar Parquet
+(`FORMATO_ALMACEN`), en grupos de `FILAS_GRUPO_PARQUET` filas: las lecturas leen sólo las columnas pedidas y los grupos
+de filas del intervalo (con las estadísticas de cada grupo). Sin `pyarrow`, se usa HDF5 (`HAY_PYARROW = False`).
+Cada partición guarda su formato en el manifiesto, por lo que las de un formato anterior se siguen leyendo (y se
+reescriben en el formato actual cuando cambian).
+
+Al grabar, sólo se escriben las particiones nuevas o cuyo contenido ha cambiado (y, si se indican los meses
+modificados, sólo se comparan éstos), por lo que el coste de una actualización no depende de la longitud del
+histórico. Las lecturas de un intervalo (`lee(key, start, end)`) abren únicamente las particiones que lo cubren.
+
+Los DataFrames sin index de fechas se guardan en una única partición (`PARTICION_UNICA`).
+
+@author: Eugenio Panadero
+"""
+import datetime as dt
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from esiosdata.esios_config import FORMATO_ALMACEN, FILAS_GRUPO_PARQUET
+try:
+    import pyarrow.parquet  # noqa: F401
+    HAY_PYARROW = True
+except ImportError:
+    HAY_PYARROW = False
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+NOMBRE_MANIFIESTO = '_particiones.json'
+PARTICION_UNICA = 'todo'
+EXTENSIONES = {'hdf': '.h5', 'parquet': '.parquet'}
+COL_INDEX_PARQUET = '__index_level_0__'  # Nombre de la columna del index (sin nombre) en los ficheros Parquet
+
+
+def meses_index(index, tz=None):
+    """Lista ordenada de los meses ('YYYY-MM') con datos en un DatetimeIndex, en la zona horaria `tz`."""
+    if index.tz is not None and tz is not None:
+        index = index.tz_convert(tz)
+    codigos = np.unique(index.year.values * 100 + index.month.values)
+    return ['{:04d}-{:02d}'.format(c // 100, c % 100) for c in codigos]
+
+
+def mascara_meses(index, meses, tz=None):
+    """Máscara booleana de las filas de un DatetimeIndex (creciente) en los meses indicados ('YYYY-MM'), por
+    bisección en el index."""
+    mascara = np.zeros(len(index), dtype=bool)
+    tz = tz if index.tz is not None else None
+    for mes in meses:
+        inicio = pd.Timestamp(mes + '-01', tz=tz)
+        mascara[index.searchsorted(inicio):index.searchsorted(inicio + pd.offsets.MonthBegin())] = True
+    return mascara
+
+
+def parte_por_meses(df, tz=None):
+    """
+    Divide un DataFrame (con index de fechas creciente) en particiones mensuales. Los cortes se buscan por
+    bisección en el index, con un coste que sólo depende del nº de meses.
+
+    :return: dict {'YYYY-MM': sub-DataFrame} (cortes por posición, sin copias), o {PARTICION_UNICA: df} si el
+        index no es de fechas
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        return {PARTICION_UNICA: df}
+    if df.empty:
+        return {}
+    tz = tz if df.index.tz is not None else None
+    t0, tf = df.index[0], df.index[-1]
+    if tz is not None:
+        t0, tf = t0.tz_convert(tz), tf.tz_convert(tz)
+    inicios_mes = pd.date_range(pd.Timestamp(t0.year, t0.month, 1), tf.tz_localize(None), freq='MS', tz=tz)
+    cortes = np.r_[0, df.index.searchsorted(inicios_mes[1:]), len(df)]
+    return {'{:%Y-%m}'.format(mes): df.iloc[i0:i1]
+            for mes, i0, i1 in zip(inicios_mes, cortes[:-1], cortes[1:]) if i1 > i0}
+
+
+def firma_df(df):
+    """Firma (hash) del contenido de un DataFrame: index, columnas y valores."""
+    h = pd.util.hash_pandas_object(df, index=True).values.sum() if len(df) else 0
+    h_cols = hashlib.md5('|'.join('{}:{}'.format(c, t) for c, t in df.dtypes.items()).encode()).hexdigest()
+    return '{:x}-{}'.format(int(h), h_cols[:16])
+
+
+def limite_intervalo(t, tz=None, final=False):
+    """
+    Límite de un intervalo de lectura como pd.Timestamp (en `tz`, si se indica). Un día (o mes) como str o date
+    equivale a su inicio o, con `final=True`, a su final, como en el 'partial string indexing' de pandas.
+    """
+    if t is None:
+        return None
+    if isinstance(t, dt.date) and not isinstance(t, dt.datetime):
+        t = t.isoformat()
+    if isinstance(t, str) and len(t) <= 10:
+        t_p = pd.Period(t)
+        t = t_p.end_time if final else t_p.start_time
+    t = pd.Timestamp(t)
+    if tz is not None:
+        if t.tz is None:
+            t = t.tz_localize(tz, ambiguous=not final, nonexistent='shift_forward')
+        t = t.tz_convert(tz)
+    return t
+
+
+class AlmacenParticionado(object):
+    """
+    Store de DataFrames particionados por meses en un directorio, con un fichero por key y mes y un manifiesto con
+    las particiones existentes. No es thread-safe: las llamadas concurrentes se serializan desde fuera
+    (`classdataesios.LOCK_HDF`).
+
+    `formato` ('parquet' o 'hdf') es el formato en el que se escriben las particiones ('parquet' sólo con `pyarrow`).
+    """
+
+    def __init__(self, directorio, tz=None, formato=FORMATO_ALMACEN):
+        if formato not in EXTENSIONES:
+            raise ValueError('Formato de almacén desconocido: "{}". Formatos: {}'.format(formato, list(EXTENSIONES)))
+        self.directorio = directorio
+        self.tz = tz
+        self.formato = formato if formato != 'parquet' or HAY_PYARROW else 'hdf'
+        self._manifiesto = None
+        self._mtime = None
+
+    @property
+    def path_manifiesto(self):
+        """Ruta del JSON con el manifiesto de particiones."""
+        return os.path.join(self.directorio, NOMBRE_MANIFIESTO)
+
+    def existe(self):
+        """Indica si el almacén tiene manifiesto (aunque no tenga datos)."""
+        return os.path.exists(self.path_manifiesto)
+
+    @property
+    def manifiesto(self):
+        """Dict {key: {'freq': str, 'columnas': [...], 'particiones': {mes: {'filas', 'firma', 'inicio', 'fin'}}}}."""
+        try:
+            mtime = os.path.getmtime(self.path_manifiesto)
+        except OSError:
+            mtime = None
+        if self._manifiesto is None or (mtime is not None and mtime != self._mtime):
+            # Se vuelve a leer si lo ha modificado otro proceso (p.ej., `esiosdata daemon`)
+            try:
+                with open(self.path_manifiesto) as f:
+                    self._manifiesto = json.load(f)
+            except (OSError, ValueError):
+                self._manifiesto = {}
+            self._mtime = mtime
+        return self._manifiesto
+
+    def _guarda_manifiesto(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        path_tmp = '{}.{}.tmp'.format(self.path_manifiesto, os.getpid())
+        with open(path_tmp, 'w') as f:
+            json.dump(self._manifiesto, f, indent=1, sort_keys=True)
+        os.replace(path_tmp, self.path_manifiesto)
+        self._mtime = os.path.getmtime(self.path_manifiesto)
+
+    def keys(self):
+        """Keys de datos del almacén."""
+        return list(self.manifiesto.keys())
+
+    def particiones(self, key):
+        """Lista ordenada de las particiones de una key."""
+        return sorted(self.manifiesto.get(key, {}).get('particiones', {}).keys())
+
+    def firma_particion(self, key, particion):
+        """Firma del contenido de una partición según el manifiesto (None si no existe)."""
+        return self.manifiesto.get(key, {}).get('particiones', {}).get(particion, {}).get('firma')
+
+    def formato_particion(self, key, particion):
+        """Formato en el que está escrita una partición (las anteriores al formato Parquet, en HDF5)."""
+        return self.manifiesto[key]['particiones'][particion].get('formato', 'hdf')
+
+    def path_particion(self, key, particion, formato=None):
+        """Ruta del fichero de una partición (por defecto, en el formato con el que está escrita)."""
+        formato = formato or self.formato_particion(key, particion)
+        return os.path.join(self.directorio, key, particion + EXTENSIONES[formato])
+
+    def _escribe_fichero(self, path, df):
+        if self.formato == 'parquet':
+            df.to_parquet(path, engine='pyarrow', row_group_size=FILAS_GRUPO_PARQUET)
+        else:
+            df.to_hdf(path, key='data', mode='w')
+
+    @staticmethod
+    def _lee_fichero(path, formato, columns=None, filtros=None):
+        if formato == 'parquet':
+            return pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filtros)
+        df = pd.read_hdf(path, 'data')
+        return df[columns] if columns is not None else df
+
+    def escribe(self, key, df, meses=None):
+        """
+        Graba un DataFrame en sus particiones mensuales, escribiendo sólo las nuevas o modificadas.
+
+        :param key: key de datos
+        :param df: DataFrame completo de la key
+        :param meses: (OPC) conjunto de meses ('YYYY-MM') que pueden haber cambiado; si se indica, no se comparan
+            las demás particiones existentes (ni se eliminan las que ya no tienen datos)
+        :return: lista de particiones escritas
+        """
+        partes = parte_por_meses(df, self.tz)
+        info = self.manifiesto.setdefault(key, {'particiones': {}})
+        meta = {'columnas': [str(c) for c in df.columns], 'freq': getattr(df.index, 'freqstr', None),
+                'indice': df.index.name, 'tz': str(getattr(df.index, 'tz', None) or '') or None}
+        cambia_meta = any(info.get(k) != v for k, v in meta.items())
+        info.update(meta)
+        existentes = info['particiones']
+        escritas = []
+        for particion, df_p in partes.items():
+            if meses is not None and particion in existentes and particion not in meses:
+                continue
+            firma = firma_df(df_p)
+            if existentes.get(particion, {}).get('firma') == firma:
+                continue
+            path = self.path_particion(key, particion, self.formato)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            path_tmp = '{}.{}.tmp'.format(path, os.getpid())
+            self._escribe_fichero(path_tmp, df_p)
+            os.replace(path_tmp, path)
+            if particion in existentes and self.formato_particion(key, particion) != self.formato:
+                self._elimina_fichero(key, particion)
+            es_fechas = isinstance(df_p.index, pd.DatetimeIndex) and len(df_p)
+            existentes[particion] = {'filas': len(df_p), 'firma': firma, 'formato': self.formato,
+                                     'inicio': df_p.index[0].isoformat() if es_fechas else None,
+                                     'fin': df_p.index[-1].isoformat() if es_fechas else None}
+            escritas.append(particion)
+        if meses is None:
+            for particion in sorted(set(existentes) - set(partes)):
+                self._elimina_fichero(key, particion)
+                existentes.pop(particion)
+                escritas.append(particion)
+        if escritas or cambia_meta or not self.existe():
+            self._guarda_manifiesto()
+        return escritas
+
+    def _elimina_fichero(self, key, particion):
+        path = self.path_particion(key, particion)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _particiones_intervalo(self, key, start=None, end=None):
+        particiones = self.particiones(key)
+        if PARTICION_UNICA in particiones:
+            return [PARTICION_UNICA]
+        mes_0 = '{:%Y-%m}'.format(self._ts(start)) if start is not None else None
+        mes_f = '{:%Y-%m}'.format(self._ts(end)) if end is not None else None
+        return [p for p in particiones if (mes_0 is None or p >= mes_0) and (mes_f is None or p <= mes_f)]
+
+    def _ts(self, t):
+        t = pd.Timestamp(t)
+        if self.tz is not None and t.tz is not None:
+            t = t.tz_convert(self.tz)
+        return t
+
+    def lee(self, key, start=None, end=None, columns=None):
+        """
+        Lee los datos de una key en el intervalo [start, end], abriendo sólo las particiones necesarias (y, en las
+        particiones Parquet, sólo las columnas pedidas y los grupos de filas del intervalo).
+
+        :param key: key de datos
+        :param start: (OPC) instante o día inicial (str, date(time) o pd.Timestamp; sin tz, en la del almacén)
+        :param end: (OPC) instante o día final (incluido; p.ej., '2016-03-31' incluye todo el día)
+        :param columns: (OPC) lista de columnas
+        :return: pd.DataFrame (vacío si no hay datos)
+        """
+        info = self.manifiesto.get(key)
+        if info is None:
+            raise KeyError('No existe la key "{}" en el almacén {}'.format(key, self.directorio))
+        if columns is not None:
+            columns = list(columns)
+            faltan = [c for c in columns if c not in info.get('columnas', [])]
+            if faltan:
+                raise KeyError('Columnas {} no disponibles en "{}". Columnas: {}'.format(faltan, key, info['columnas']))
+        particiones = self._particiones_intervalo(key, start, end)
+        if not particiones:
+            return pd.DataFrame(columns=columns if columns is not None else info.get('columnas', []))
+        tz = (self.tz or info['tz']) if info.get('tz') else None
+        t0, tf = limite_intervalo(start, tz), limite_intervalo(end, tz, final=True)
+        col_index = info.get('indice') or COL_INDEX_PARQUET
+        filtros = [(col_index, op, t) for op, t in [('>=', t0), ('<=', tf)] if t is not None] or None
+        if particiones == [PARTICION_UNICA]:
+            filtros = None
+        df = pd.concat([self._lee_fichero(self.path_particion(key, p), self.formato_particion(key, p), columns,
+                                          filtros)
+                        for p in particiones])
+        if isinstance(df.index, pd.DatetimeIndex):
+            if tz is not None and df.index.tz is not None:
+                df = df.tz_convert(tz)
+            if info.get('freq') and len(df) > 2:
+                df = df.asfreq(info['freq'])
+            if t0 is not None or tf is not None:
+                df = df.loc[t0:tf]
+        return df
+
+    def lee_todo(self):
+        """Lee todas las keys del almacén: dict {key: DataFrame}."""
+        return {k: self.lee(k) for k in self.keys()}
+
+    def ultimo(self, key):
+        """Instante del último dato de una key según el manifiesto (sin leer datos), o None."""
+        info = self.manifiesto.get(key, {}).get('particiones', {})
+        fines = [p['fin'] for p in info.values() if p.get('fin')]
+        return pd.Timestamp(max(fines, key=pd.Timestamp)) if fines else None
+
+    def __repr__(self):
+        return '<{} {}: {}>'.format(self.__class__.__name__, self.directorio,
+                                    ', '.join('{} ({} particiones)'.format(k, len(self.particiones(k)))
+                                              for k in self.keys()))
@@ -10,6 +10,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter, MonthLocator, HourLocator
 # import seaborn as sns
+from esiosdata.agregados import agrega_periodos
 from esiosdata.esios_config import TARIFAS, TARIFAS_DESC, COLS_PVPC
 from esiosdata.importpvpcdata import pvpc_calc_tcu_cp_feu_d
 # from matplotlib.ticker import MultipleLocator
@@ -60,7 +61,10 @@ FIGSIZE = (18, 10)
 
 # MAKE DATA AS WEB: https://www.esios.ree.es/es/pvpc?date=22-02-2016
 def _prep_pvpc_data_for_plot_web_esios(df):
-    return pvpc_calc_tcu_cp_feu_d(df.copy(), verbose=False, convert_kwh=True).tz_localize(None).sort_index()
+    # Los datos con las columnas derivadas (de `CACHE_PVPC`, `PVPC.read` o ya preparados) no se copian ni recalculan
+    if not any(c.startswith('TCU') for c in df.columns):
+        df = pvpc_calc_tcu_cp_feu_d(df.copy(), verbose=False, convert_kwh=True)
+    return (df.tz_localize(None) if df.index.tz is not None else df).sort_index()
 
 
 def pvpcplot_fill_tarifa(df, tarifa=TARIFAS[0], ax=None, show=True, ymax=None):
@@ -126,6 +130,8 @@ def pvpcplot_grid_hora(df_day, fs=FIGSIZE):
 # SCATTER PLOT EV. PVPC
 def pvpcplot_ev_scatter(pvpc_mean_daily, pvpc_mean_monthly, tarifa=TARIFAS[0],
                         superposic_anual=True, ax=None, plot=True):
+    """Evolución de los precios medios diarios y mensuales de una tarifa (los agregados del store, de
+    `PVPC.get_resample_data`), por años superpuestos o con la envolvente semanal de los precios diarios."""
     if ax is None:
         fig, ax = plt.subplots(figsize=FIGSIZE)
     # sns.set_style("whitegrid")
@@ -155,10 +161,9 @@ def pvpcplot_ev_scatter(pvpc_mean_daily, pvpc_mean_monthly, tarifa=TARIFAS[0],
         ax.xaxis.set_major_locator(MonthLocator())
         plt.xlim(base_t, pd.Timestamp(dt.datetime(year=base_t.year + 1, month=1, day=1), tz='Europe/Madrid'))
     else:
-        # envolv_dia = pvpc_diario.tz_localize(None).resample('W', how=[np.min, np.max, np.argmax, np.argmin])
-        envolv_dia = pvpc_diario.tz_localize(None).resample('W').apply([np.min, np.max, np.argmax, np.argmin])
-        x = envolv_dia['argmax'].tolist() + envolv_dia['argmin'].tolist()[::-1]
-        y = envolv_dia['amax'].tolist() + envolv_dia['amin'].tolist()[::-1]
+        envolv_dia = agrega_periodos(pvpc_diario.to_frame(tarifa), 'W').dropna()
+        x = envolv_dia[tarifa + '_argmax'].tolist() + envolv_dia[tarifa + '_argmin'].tolist()[::-1]
+        y = envolv_dia[tarifa + '_max'].tolist() + envolv_dia[tarifa + '_min'].tolist()[::-1]
         ax.fill(x, y, color=TARIFAS_COL[tarifa], alpha=.25)
         ax.scatter(pvpc_diario.index, pvpc_diario.values,
                    label='PVPC_{} diario'.format(tarifa), color=TARIFAS_COL[tarifa])
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Archivo local de las respuestas 'raw' de la API de ESIOS, para reprocesar los datos sin acceder a la red.
+
+Cada día descargado correctamente se guarda tal cual se recibe (JSON del archivo 70 para PVPC, lista de respuestas
+JSONP de los archivos 117, 116, 115 y 114 para demanda) en un fichero JSON comprimido con gzip:
+
+    {RAW_ARCHIVE_DIR}/{nombre}/{año}/{YYYY-MM-DD}.json.gz
+
+Así, cualquier cambio en el procesado (p.ej., en el tratamiento de los días con cambio de hora) se aplica con
+`PVPC.reprocess(start, end)` / `DatosREE.reprocess(start, end)`, que reconstruyen los stores en paralelo y sin
+ninguna petición web, en vez de con un `force_update` completo.
+
+@author: Eugenio Panadero
+"""
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import json
+import os
+import pandas as pd
+from esiosdata.esios_config import RAW_ARCHIVE_DIR, DATE_FMT
+from esiosdata.lotes import concat_lotes
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+EXT_RAW = '.json.gz'
+DIAS_POR_BLOQUE = 31
+
+
+def _key_dia(dia):
+    if isinstance(dia, str):
+        return pd.Timestamp(dia).strftime(DATE_FMT)
+    return '{:%Y-%m-%d}'.format(dia)
+
+
+def path_raw_dia(nombre, dia, raw_dir=RAW_ARCHIVE_DIR):
+    """Ruta del fichero raw de un día."""
+    key = _key_dia(dia)
+    return os.path.join(raw_dir, nombre, key[:4], key + EXT_RAW)
+
+
+def guarda_raw_dia(nombre, dia, response, raw_dir=RAW_ARCHIVE_DIR):
+    """Guarda (de forma atómica) la respuesta raw de un día.
+    :param nombre: Identificador del origen de datos ('pvpc', 'dem_PENINSULA', ...)
+    :param dia: str (YYYY-MM-DD) o date(time)
+    :param response: Respuesta recibida (dict JSON, str JSONP o lista de éstos)
+    """
+    path = path_raw_dia(nombre, dia, raw_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    path_tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with gzip.open(path_tmp, 'wt', encoding='utf-8') as f:
+        json.dump(response, f, ensure_ascii=False)
+    os.replace(path_tmp, path)
+    return path
+
+
+def lee_raw_dia(nombre, dia, raw_dir=RAW_ARCHIVE_DIR):
+    """Lee la respuesta raw de un día. Devuelve None si no está en el archivo."""
+    path = path_raw_dia(nombre, dia, raw_dir)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dias_en_archivo(nombre, d0=None, df=None, raw_dir=RAW_ARCHIVE_DIR):
+    """Lista ordenada de los días (str YYYY-MM-DD) disponibles en el archivo raw dentro del intervalo [d0, df]."""
+    path_base = os.path.join(raw_dir, nombre)
+    if not os.path.exists(path_base):
+        return []
+    d0 = _key_dia(d0) if d0 is not None else None
+    df = _key_dia(df) if df is not None else None
+    dias = []
+    for year in sorted(os.listdir(path_base)):
+        if (d0 is not None and year < d0[:4]) or (df is not None and year > df[:4]):
+            continue
+        dias += [f[:-len(EXT_RAW)] for f in os.listdir(os.path.join(path_base, year)) if f.endswith(EXT_RAW)]
+    return sorted([d for d in dias if (d0 is None or d >= d0) and (df is None or d <= df)])
+
+
+def _procesa_bloque_raw(nombre, func_procesa_data_dia, dias, raw_dir):
+    """Worker: lee y procesa un bloque de días del archivo raw. Devuelve [(key_dia, data_import | None), ...]."""
+    result = []
+    for key_dia in dias:
+        data_import, ok = func_procesa_data_dia(key_dia, lee_raw_dia(nombre, key_dia, raw_dir))
+        result.append((key_dia, data_import if ok == 0 else None))
+    return result
+
+
+def procesa_archivo_raw(nombre, func_procesa_data_dia, d0=None, df=None, raw_dir=RAW_ARCHIVE_DIR,
+                        n_procesos=None, dias_por_bloque=DIAS_POR_BLOQUE):
+    """Procesa en paralelo (multiproceso, por bloques de días) el archivo raw en el intervalo [d0, df].
+
+    :param func_procesa_data_dia: función 'picklable' con la firma de `procesa_data_dia(key_dia, response)`
+    :return: dict {key_dia: data_import | None}
+    """
+    dias = dias_en_archivo(nombre, d0, df, raw_dir)
+    bloques = [dias[i:i + dias_por_bloque] for i in range(0, len(dias), dias_por_bloque)]
+    dict_data = {}
+    if len(bloques) == 1 or n_procesos == 1:
+        for bloque in bloques:
+            dict_data.update(_procesa_bloque_raw(nombre, func_procesa_data_dia, bloque, raw_dir))
+    elif bloques:
+        with ProcessPoolExecutor(max_workers=n_procesos) as executor:
+            for result in executor.map(_procesa_bloque_raw, [nombre] * len(bloques),
+                                       [func_procesa_data_dia] * len(bloques), bloques, [raw_dir] * len(bloques)):
+                dict_data.update(result)
+    return dict_data
+
+
+def _procesa_lote_raw(nombre, func_procesa_lote, dias, raw_dir):
+    """Worker: lee un bloque de días del archivo raw y lo procesa como un único lote. Devuelve (data, dias_error)."""
+    responses = {key_dia: lee_raw_dia(nombre, key_dia, raw_dir) for key_dia in dias}
+    return func_procesa_lote({k: r for k, r in responses.items() if r is not None})
+
+
+def procesa_archivo_raw_lotes(nombre, func_procesa_lote, d0=None, df=None, raw_dir=RAW_ARCHIVE_DIR,
+                              n_procesos=None, dias_por_bloque=DIAS_POR_BLOQUE):
+    """Como `procesa_archivo_raw`, pero procesando cada bloque de días como un lote (un único DataFrame por bloque).
+
+    :param func_procesa_lote: función 'picklable' con la firma `func(dict {key_dia: response}) -> (data, dias_error)`
+    :return: data (DataFrame o dict de DataFrames, o None), nº de días procesados, lista de días con error
+    """
+    dias = dias_en_archivo(nombre, d0, df, raw_dir)
+    bloques = [dias[i:i + dias_por_bloque] for i in range(0, len(dias), dias_por_bloque)]
+    resultados = []
+    if len(bloques) == 1 or n_procesos == 1:
+        resultados = [_procesa_lote_raw(nombre, func_procesa_lote, bloque, raw_dir) for bloque in bloques]
+    elif bloques:
+        with ProcessPoolExecutor(max_workers=n_procesos) as executor:
+            resultados = list(executor.map(_procesa_lote_raw, [nombre] * len(bloques),
+                                           [func_procesa_lote] * len(bloques), bloques, [raw_dir] * len(bloques)))
+    dias_error = sorted(k for _, error_bloque in resultados for k in error_bloque)
+    return concat_lotes([data for data, _ in resultados]), len(dias), dias_error
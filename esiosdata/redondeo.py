@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Redondeo exacto a céntimos (ROUND_HALF_UP) de arrays de NumPy, en aritmética de enteros (céntimos).
+
+Reproduce, valor a valor, el redondeo de la facturación `float(Decimal(str(v)).quantize(Decimal('1.11'),
+rounding=ROUND_HALF_UP))`, en el que `str(v)` es la representación decimal más corta que identifica al float: un
+valor como 2.675 (en binario, 2.67499999...) se redondea a 2.68, como su representación decimal, y no a 2.67.
+
+Para cada valor `v`, con `n = floor(|v| · 100)`, el único empate posible está en el float más cercano al decimal
+`(n + 0,5) / 100`, que es exactamente `(2n + 1) / 200` (división IEEE de enteros exactos, correctamente redondeada):
+- Si `|v|` coincide con él, `str(v)` es ese decimal de 3 cifras terminado en 5 (ninguna representación más corta
+  identifica al mismo float), y se redondea hacia arriba (alejándose de cero).
+- Si no, ningún decimal de empate cae entre `v` y `str(v)`, de modo que ambos se redondean al mismo céntimo, que es
+  `n` o `n + 1` según `|v|` quede por debajo o por encima del empate.
+
+Un posible error de ±1 en `n` (por el redondeo del producto `|v| · 100`) no cambia el resultado, pues `v` está en ese
+caso junto a un céntimo exacto, lejos del empate. El redondeo es exacto para `|v| < 1e11` € (con separación entre
+floats de `v` muy inferior a 0,005 €).
+
+@author: Eugenio Panadero
+"""
+import numpy as np
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def centimos(valores):
+    """
+    Importes en euros redondeados a céntimos enteros, con ROUND_HALF_UP sobre su representación decimal.
+
+    :param valores: float o array-like de importes en €
+    :return: np.array (int64) de céntimos (o np.int64 si `valores` es escalar)
+    """
+    valores = np.asarray(valores, dtype=float)
+    absolutos = np.abs(valores)
+    n = np.floor(absolutos * 100)
+    cents = n + (absolutos >= (2 * n + 1) / 200)
+    return (np.sign(valores) * cents).astype(np.int64)
+
+
+def redondea(valores):
+    """
+    Redondeo a céntimos (ROUND_HALF_UP, exacto) de importes en euros, idéntico a
+    `float(Decimal(str(v)).quantize(Decimal('1.11'), rounding=ROUND_HALF_UP))` para cada valor.
+
+    :param valores: float o array-like de importes en €
+    :return: float (si `valores` es escalar) o np.array de floats redondeados a céntimos
+    """
+    valores = np.asarray(valores, dtype=float)
+    absolutos = np.abs(valores)
+    n = np.floor(absolutos * 100)
+    redondeados = np.copysign((n + (absolutos >= (2 * n + 1) / 200)) / 100, valores)
+    return float(redondeados) if redondeados.ndim == 0 else redondeados
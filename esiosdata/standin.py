@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local que imita a la API de ESIOS, con datos sintéticos, para tests y benchmarks sin red ni token.
+
+Sirve, para cualquier día, respuestas con el mismo formato que las reales:
+* `/archives/70/download_json?locale=es&date=YYYY-MM-DD`: JSON de PVPC (27 columnas en formato numérico español).
+* `/archives/{114, 115, 116, 117}/download_json?locale=es&date=YYYY-MM-DD`: JSONP de demanda y generación
+  (valores cada 10 minutos y máximos/mínimos diarios).
+* `/indicators/{id}?start_date=...&end_date=...`: JSON de los indicadores de demanda y generación de
+  `INDICADORES_DEM`, para intervalos de varios días, con los mismos valores diezminutales que los archivos diarios.
+* `/WSvisionaMoviles{Zona}Rest/resources/demandaGeneracion{Zona}?curva=...&fecha=YYYY-MM-DD`: JSONP de demanda y
+  generación de las curvas de Baleares y Canarias (como demanda.ree.es, en hora local de cada zona).
+
+Los días con cambio de hora tienen 23 / 25 horas (y 138 / 150 valores diezminutales, con las horas repetidas
+marcadas como '2A' y '2B' -'1A' y '1B' en Canarias-, como en la web de REE). Los valores son deterministas para cada
+día.
+
+Se puede inyectar latencia (`latencia` + `jitter` aleatorio, en segundos) y una tasa de errores HTTP 503/429.
+
+`store_pvpc_sintetico(path, dias)` crea con los mismos datos un store local de PVPC, sin pasar por el servidor.
+
+Uso desde línea de comandos:
+```
+    python -m esiosdata.standin --port 8080 --latencia .05 --errores .02
+    export ESIOS_SERVER=http://127.0.0.1:8080
+    export ESIOS_SERVER_DEMANDA=http://127.0.0.1:8080
+```
+Desde python, la variable de entorno `ESIOS_SERVER` debe definirse *antes* de importar `esiosdata`:
+```
+    with ServidorESIOSLocal(latencia=.02) as servidor:
+        os.environ['ESIOS_SERVER'] = servidor.url
+        from esiosdata.importpvpcdata import pvpc_data_dia
+        ...
+```
+@author: Eugenio Panadero
+"""
+import argparse
+import datetime as dt
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+import pytz
+from esiosdata.classdataesios import PVPC
+from esiosdata.esios_config import INDICADORES_DEM, GEO_ID_PENINSULA, CURVAS_ZONAS, TZ_ZONAS
+from esiosdata.importpvpcdata import pvpc_procesa_lote
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+TZ = pytz.timezone('Europe/Madrid')
+DATE_INI_STANDIN = '2014-04-01'
+TARIFAS = ['GEN', 'NOC', 'VHC']
+COMPS_PVPC = ['PMH', 'SAH', 'TEU', 'PCAP', 'INT', 'FOS', 'FOM']
+COLS_GENERACION = ['eol', 'nuc', 'gf', 'car', 'cc', 'hid', 'aut', 'inter', 'icb', 'sol', 'solFot', 'solTer',
+                   'termRenov', 'cogenResto']
+ARCHIVOS_DEM = {117: 'IND_MaxMinRenovEol', 116: 'IND_MaxMin', 115: 'IND_DemandaRealGen', 114: 'IND_DemandaPrevProg'}
+COL_INDICADORES = {id_ind: col for col, id_ind in INDICADORES_DEM.items()}
+COLS_GENERACION_ISLAS = ['car', 'die', 'gas', 'vap', 'cc', 'eol', 'fot', 'tnr', 'hid', 'cb', 'emm']
+
+
+def _num_es(valor, decimales=2):
+    """Formato numérico español: '1.234,56'."""
+    return '{:,.{}f}'.format(valor, decimales).replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _rng_dia(dia, extra=0):
+    return np.random.RandomState(int('{:%Y%m%d}'.format(dia)) + extra)
+
+
+def _index_dia(dia, freq_min, tz=TZ):
+    """Index tz-aware de un día local completo (con 23 / 25 horas en los días con cambio de hora)."""
+    t0 = tz.localize(dt.datetime(dia.year, dia.month, dia.day))
+    t1 = tz.localize(dt.datetime(dia.year, dia.month, dia.day) + dt.timedelta(days=1))
+    periods = int((t1 - t0).total_seconds() / (60 * freq_min))
+    return pd.date_range(start=t0, periods=periods, freq='{}min'.format(freq_min))
+
+
+def payload_pvpc_dia(dia):
+    """Respuesta sintética del archivo 70 (PVPC desglosado) para un día."""
+    dia = pd.Timestamp(dia).date()
+    idx = _index_dia(dia, 60)
+    rng = _rng_dia(dia)
+    n = len(idx)
+    horas = [ts.hour for ts in idx]
+    pmh = 45 + 15 * np.sin(np.linspace(0, 2 * np.pi, n)) + rng.normal(0, 3, n)
+    registros = []
+    for i, (ts, h) in enumerate(zip(idx, horas)):
+        reg = {'Dia': '{:%d/%m/%Y}'.format(dia), 'Hora': '{:02d}-{:02d}'.format(h, (h + 1) % 24)}
+        for k, tarifa in enumerate(TARIFAS):
+            punta = 13 <= h < 23
+            teu_vhc = 62.012 if punta else (0.886 if 1 <= h < 7 else 2.879)
+            comps = {'PMH': pmh[i] * (1.02 + .01 * k), 'SAH': 2.5 + .5 * rng.rand(),
+                     'TEU': [44.027, 62.012 if punta else 2.215, teu_vhc][k],
+                     'PCAP': 4.5 if punta else .9, 'INT': 2.1, 'FOS': .13, 'FOM': .04}
+            for c in COMPS_PVPC:
+                reg[c + tarifa] = _num_es(comps[c])
+            reg[tarifa] = _num_es(sum(comps.values()))
+            reg['COF' + tarifa] = _num_es(1e-4 * (1 + .5 * np.sin(h / 24 * 2 * np.pi)) + 1e-6 * k, 12)
+        registros.append(reg)
+    return {'PVPC': registros}
+
+
+def _ts_dem(idx):
+    """Formato de timestamp de la web de demanda: la hora repetida del cambio de hora se marca como 2A / 2B."""
+    repetidas = idx.tz_localize(None).duplicated(keep=False)
+    return ['{:%Y-%m-%d} {}{}:{:%M}'.format(ts, ts.hour, 'A' if ts.dst().total_seconds() > 0 else 'B', ts)
+            if rep else '{:%Y-%m-%d %H:%M}'.format(ts) for ts, rep in zip(idx, repetidas)]
+
+
+def _ts_max_min(idx, i):
+    return '{:%Y-%m-%d %H:%M}'.format(idx[int(i)])
+
+
+def _dem_sintetica(dia, id_archivo):
+    idx = _index_dia(dia, 10)
+    n = len(idx)
+    rng = _rng_dia(dia, id_archivo)
+    return idx, rng, 28000 + 6000 * np.sin(np.linspace(-np.pi / 2, 3 * np.pi / 2, n)) + rng.normal(0, 200, n)
+
+
+@lru_cache(maxsize=1024)
+def _series_dem_dia(dia, id_archivo):
+    """Valores diezminutales de los archivos 115 (demanda real y generación) o 114 (demanda prevista y programada)
+    de un día, compartidos por las respuestas de los archivos y de los indicadores.
+
+    :return: index, dict {columna: lista de valores}
+    """
+    idx, rng, dem = _dem_sintetica(dia, id_archivo)
+    if id_archivo == 115:
+        series = {c: [] for c in ['dem'] + COLS_GENERACION}
+        for d in dem:
+            series['dem'].append(round(float(d), 1))
+            for c in COLS_GENERACION:
+                series[c].append(round(float(d * rng.uniform(0, .2)), 1))
+    else:
+        series = {'pre': [round(float(d * 1.01), 1) for d in dem], 'pro': [round(float(d * .99), 1) for d in dem]}
+    return idx, series
+
+
+def payload_dem_dia(dia, id_archivo):
+    """Respuesta sintética (JSONP) de uno de los archivos de demanda (114-117) para un día."""
+    dia = pd.Timestamp(dia).date()
+    func = ARCHIVOS_DEM[id_archivo]
+    if id_archivo in (114, 115):
+        idx, series = _series_dem_dia(dia, id_archivo)
+        cols = ['ts'] + list(series.keys())
+        valores = [dict(zip(cols, reg)) for reg in zip(_ts_dem(idx), *series.values())]
+        return '{}({});'.format(func, json.dumps({'valoresHorariosGeneracion' if id_archivo == 115
+                                                  else 'valoresPrevistaProgramada': valores}))
+    idx, rng, dem = _dem_sintetica(dia, id_archivo)
+    if id_archivo == 116:
+        data = {'demandaMaxMin': {'date': '{:%Y-%m-%d}'.format(dia),
+                                  'maxDem': round(float(dem.max()), 1), 'timeStampMax': _ts_max_min(idx, dem.argmax()),
+                                  'minDem': round(float(dem.min()), 1), 'timeStampMin': _ts_max_min(idx, dem.argmin())}}
+    else:
+        renov = dem * rng.uniform(.3, .5)
+        eol = renov * .6
+        data = {'maxMinRenovEol': {
+            'tsMaxRenov': _ts_max_min(idx, renov.argmax()), 'maxRenov': round(float(renov.max()), 1),
+            'tsMinRenov': _ts_max_min(idx, renov.argmin()), 'minRenov': round(float(renov.min()), 1),
+            'tsMaxEol': _ts_max_min(idx, eol.argmax()), 'maxEol': round(float(eol.max()), 1),
+            'tsMinEol': _ts_max_min(idx, eol.argmin()), 'minEol': round(float(eol.min()), 1)}}
+    return '{}({});'.format(func, json.dumps(data))
+
+
+def payload_zona_dia(dia, zona, curva):
+    """Respuesta sintética (JSONP, como la de demanda.ree.es) de demanda y generación de una curva de Baleares o
+    Canarias para un día, con los timestamps en hora local de la zona."""
+    dia = pd.Timestamp(dia).date()
+    idx = _index_dia(dia, 10, TZ_ZONAS[zona])
+    n = len(idx)
+    rng = _rng_dia(dia, sum(ord(c) for c in curva))
+    escala = 50 + 10 * (sum(ord(c) for c in curva) % 50)
+    dem = escala * (1 + .25 * np.sin(np.linspace(-np.pi / 2, 3 * np.pi / 2, n))) + rng.normal(0, escala / 100, n)
+    reparto = rng.dirichlet(np.ones(len(COLS_GENERACION_ISLAS)), n)
+    valores = []
+    for ts, d, rep in zip(_ts_dem(idx), dem, reparto):
+        reg = {'ts': ts, 'dem': round(float(d), 1), 'pre': round(float(d * 1.01), 1), 'pro': round(float(d * .99), 1)}
+        reg.update({c: round(float(d * r), 1) for c, r in zip(COLS_GENERACION_ISLAS, rep)})
+        valores.append(reg)
+    return 'angular.callbacks._0({});'.format(json.dumps({'valoresHorariosGeneracion': valores}))
+
+
+@lru_cache(maxsize=1024)
+def _ts_indicadores_dia(dia):
+    """Timestamps diezminutales de un día con el formato de los indicadores: hora local ISO-8601 y UTC."""
+    idx = _index_dia(dia, 10)
+    offsets = ['{}{:02d}:{:02d}'.format('+' if s >= 0 else '-', abs(s) // 3600, abs(s) % 3600 // 60)
+               for s in (idx.tz_localize(None) - idx.tz_convert('UTC').tz_localize(None)).total_seconds().astype(int)]
+    ts_local = [t + o for t, o in zip(idx.strftime('%Y-%m-%dT%H:%M:%S.000'), offsets)]
+    return ts_local, list(idx.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ'))
+
+
+def _valores_indicador_dia(dia, col, t0=None, t1=None):
+    """Lista JSON (sin corchetes) de los valores de un indicador en un día, opcionalmente limitados a [t0, t1]."""
+    idx, series = _series_dem_dia(dia, 114 if col in ('pre', 'pro') else 115)
+    ts_local, ts_utc = _ts_indicadores_dia(dia)
+    en_intervalo = np.ones(len(idx), dtype=bool) if t0 is None else (idx >= t0) & (idx <= t1)
+    valores = [{'value': valor, 'datetime': str_ts, 'datetime_utc': str_ts_utc,
+                'geo_id': GEO_ID_PENINSULA, 'geo_name': 'Península'}
+               for ok, str_ts, str_ts_utc, valor in zip(en_intervalo, ts_local, ts_utc, series[col]) if ok]
+    return json.dumps(valores)[1:-1]
+
+
+_valores_indicador_dia_completo = lru_cache(maxsize=16384)(_valores_indicador_dia)
+
+
+def payload_indicador(id_indicador, t0, t1, fecha_ini=None, fecha_fin=None):
+    """Respuesta sintética (JSON) de un indicador de demanda o generación (`INDICADORES_DEM`): valores diezminutales
+    de la Península en [t0, t1] (Timestamps tz-aware), iguales a los de los archivos diarios 114 y 115."""
+    col = COL_INDICADORES[id_indicador]
+    fragmentos = []
+    for dia in pd.date_range(t0.tz_convert(TZ).date(), t1.tz_convert(TZ).date()).date:
+        if (fecha_ini is not None and dia < fecha_ini) or (fecha_fin is not None and dia > fecha_fin):
+            continue
+        idx = _index_dia(dia, 10)
+        if t0 <= idx[0] and idx[-1] <= t1:
+            fragmentos.append(_valores_indicador_dia_completo(dia, col))
+        else:
+            fragmentos.append(_valores_indicador_dia(dia, col, t0, t1))
+    valores = ', '.join(f for f in fragmentos if f)
+    return '{{"indicator": {{"id": {}, "short_name": "{}", "values": [{}]}}}}'.format(id_indicador, col, valores)
+
+
+def store_pvpc_sintetico(path, dias):
+    """Crea (sin red) un store local de PVPC en `path` con los datos sintéticos de los días `dias`, los mismos que
+    sirve el servidor local: datos, columnas derivadas y agregados, guardados como en una actualización.
+
+    :param path: ruta del fichero HDF5 del store (como `PATH_DATABASE_PVPC`; el almacén particionado se guarda en el
+        directorio del mismo nombre)
+    :param dias: días del store (p.ej., `pd.date_range('2016-01-01', '2016-12-31')`)
+    :return: handler `PVPC` del store, con los datos en `data`
+    """
+    pvpc = PVPC(update=False, verbose=False, path_database=path)
+    df, _ = pvpc_procesa_lote({dia.strftime('%Y-%m-%d'): payload_pvpc_dia(dia) for dia in pd.DatetimeIndex(dias)})
+    pvpc.data = {pvpc.masterkey: df}
+    pvpc.post_update_data()
+    pvpc.save_data()
+    return pvpc
+
+
+class _HandlerESIOS(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _responde(self, status, body, content_type='application/json'):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Atiende las peticiones de archivos, con latencia y errores inyectados."""
+        servidor = self.server.standin
+        servidor.registra_peticion()
+        espera = servidor.latencia + servidor.jitter * random.random()
+        if espera > 0:
+            time.sleep(espera)
+        if servidor.tasa_errores > 0 and random.random() < servidor.tasa_errores:
+            servidor.registra_error()
+            self._responde(random.choice([429, 503]), '{"message": "error simulado"}')
+            return
+        url = urlparse(self.path)
+        partes = url.path.strip('/').split('/')
+        query = parse_qs(url.query)
+        if partes[0] == 'indicators':
+            self._responde_indicador(partes, query)
+            return
+        if partes[0].startswith('WSvisionaMoviles'):
+            self._responde_zona(partes, query)
+            return
+        try:
+            assert partes[0] == 'archives' and partes[2] == 'download_json'
+            id_archivo = int(partes[1])
+            dia = pd.Timestamp(query['date'][0]).date()
+        except (AssertionError, IndexError, KeyError, ValueError):
+            self._responde(404, '{"message": "not found"}')
+            return
+        hay_datos = servidor.fecha_ini <= dia <= servidor.fecha_fin
+        if id_archivo == 70:
+            self._responde(200, json.dumps(payload_pvpc_dia(dia) if hay_datos else {'PVPC': []}))
+        elif id_archivo in ARCHIVOS_DEM:
+            body = payload_dem_dia(dia, id_archivo) if hay_datos else 'null'
+            self._responde(200, body, 'application/javascript')
+        else:
+            self._responde(404, '{"message": "not found"}')
+
+    def _responde_indicador(self, partes, query):
+        servidor = self.server.standin
+        try:
+            id_indicador = int(partes[1])
+            assert id_indicador in COL_INDICADORES
+            t0, t1 = pd.Timestamp(query['start_date'][0]), pd.Timestamp(query['end_date'][0])
+            t0, t1 = [t if t.tz is not None else t.tz_localize(TZ) for t in (t0, t1)]
+        except (AssertionError, IndexError, KeyError, ValueError):
+            self._responde(404, '{"message": "not found"}')
+            return
+        self._responde(200, payload_indicador(id_indicador, t0, t1, servidor.fecha_ini, servidor.fecha_fin))
+
+    def _responde_zona(self, partes, query):
+        servidor = self.server.standin
+        try:
+            zona = partes[0][len('WSvisionaMoviles'):-len('Rest')].upper()
+            curva = query['curva'][0]
+            assert curva in CURVAS_ZONAS[zona] and partes[2] == 'demandaGeneracion' + zona.capitalize()
+            dia = pd.Timestamp(query['fecha'][0]).date()
+        except (AssertionError, IndexError, KeyError, ValueError):
+            self._responde(404, '{"message": "not found"}')
+            return
+        hay_datos = servidor.fecha_ini <= dia <= servidor.fecha_fin
+        body = payload_zona_dia(dia, zona, curva) if hay_datos else 'null'
+        self._responde(200, body, 'application/javascript')
+
+
+class ServidorESIOSLocal(object):
+    """Servidor HTTP local (multithread, keep-alive) con respuestas sintéticas de la API de ESIOS."""
+
+    def __init__(self, host='127.0.0.1', port=0, latencia=0., jitter=0., tasa_errores=0.,
+                 fecha_ini=DATE_INI_STANDIN, fecha_fin=None):
+        self.host, self.port = host, port
+        self.latencia, self.jitter, self.tasa_errores = latencia, jitter, tasa_errores
+        self.fecha_ini = pd.Timestamp(fecha_ini).date()
+        self.fecha_fin = pd.Timestamp(fecha_fin).date() if fecha_fin else dt.date.today() + dt.timedelta(days=1)
+        self.num_peticiones = self.num_errores = 0
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """URL base del servidor (para usar como `ESIOS_SERVER`)."""
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    def registra_peticion(self):
+        with self._lock:
+            self.num_peticiones += 1
+
+    def registra_error(self):
+        with self._lock:
+            self.num_errores += 1
+
+    def precalcula(self, d0, df):
+        """Genera (y deja en caché) los datos sintéticos de demanda de los días [d0, df], para que las mediciones de
+        rendimiento no incluyan su cálculo, como ocurre con un servidor real, que ya tiene los datos."""
+        for dia in pd.date_range(pd.Timestamp(d0).date(), pd.Timestamp(df).date()).date:
+            for col in COL_INDICADORES.values():
+                _valores_indicador_dia_completo(dia, col)
+
+    def start(self):
+        """Arranca el servidor en un thread de fondo."""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _HandlerESIOS)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='esios_standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el servidor."""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main_standin():
+    """CLI del servidor local de pruebas."""
+    p = argparse.ArgumentParser(description='Servidor local con datos sintéticos de la API de ESIOS')
+    p.add_argument('--host', action='store', default='127.0.0.1')
+    p.add_argument('--port', action='store', type=int, default=8080)
+    p.add_argument('--latencia', action='store', type=float, default=0., help='Latencia fija por petición (s)')
+    p.add_argument('--jitter', action='store', type=float, default=0., help='Latencia aleatoria adicional (s)')
+    p.add_argument('--errores', action='store', type=float, default=0., help='Tasa de errores HTTP 503/429 (0-1)')
+    args = p.parse_args()
+    servidor = ServidorESIOSLocal(args.host, args.port, args.latencia, args.jitter, args.errores).start()
+    print('Servidor local de ESIOS en {0}\n  export ESIOS_SERVER={0}\n  export ESIOS_SERVER_DEMANDA={0}'
+          .format(servidor.url))
+    try:
+        servidor._thread.join()
+    except KeyboardInterrupt:
+        servidor.stop()
+
+
+if __name__ == '__main__':
+    main_standin()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Ingestión en streaming, día a día, de los archivos diarios de ESIOS.
+
+A diferencia de `pvpc_data_dia(str_dia, str_dia_fin)` / `dem_data_dia(...)`, que no devuelven nada hasta haber
+descargado todo el intervalo, los generadores `iter_pvpc_days(start, end)` e `iter_dem_days(start, end)` devuelven
+`(key_dia, data)` según se completa cada día (en orden de finalización, no cronológico), de modo que el consumidor
+(p.ej., un loader que escribe en disco) puede empezar a trabajar de inmediato.
+
+Internamente es un pipeline de 3 etapas conectadas por colas acotadas:
+
+    descarga (`num_descargas` threads) --> cola_raw --> procesado (1 thread) --> cola_datos --> consumidor
+
+Si el consumidor es más lento, las colas se llenan y las etapas anteriores se detienen (contrapresión), por lo que
+la memoria ocupada queda acotada a unos `num_descargas + 2 * tam_cola` días. Los días que no se pueden obtener se
+devuelven como `(key_dia, None)`. Cerrar el generador antes de tiempo (`break`, `.close()`) detiene el pipeline.
+
+@author: Eugenio Panadero
+"""
+from functools import partial
+import logging
+import queue
+import threading
+from esiosdata.aio import HAY_AIOHTTP, LOOP_DESCARGAS, descarga_dia, _lista_dias
+from esiosdata.descargathreads import descarga_dia as descarga_dia_threads
+from esiosdata.esios_config import (DATE_FMT, HEADERS, NUM_RETRIES, TIMEOUT, USAR_ASYNCIO,
+                                    NUM_DESCARGAS_STREAMING, TAM_COLA_STREAMING)
+from esiosdata.importdemdata import dem_url_dia, dem_procesa_datos_dia
+from esiosdata.importpvpcdata import pvpc_url_dia, pvpc_procesa_datos_dia
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+ESPERA_COLA = .1  # segs entre comprobaciones de la señal de parada
+
+
+def _descarga_dia_sync(key_dia, func_url_data_dia, json_req, headers, num_retries, timeout, usar_asyncio, control):
+    """Descarga la respuesta (o lista de respuestas) de un día, con el pool asíncrono o con `requests`, ocupando en
+    ambos casos una ranura del controlador de concurrencia por petición."""
+    if usar_asyncio:
+        return LOOP_DESCARGAS.run(descarga_dia, headers=headers, key_dia=key_dia,
+                                  func_url_data_dia=func_url_data_dia, json_req=json_req,
+                                  num_retries=num_retries, timeout=timeout, control=control)
+    return descarga_dia_threads(key_dia, func_url_data_dia, headers, json_req, num_retries, timeout, control)
+
+
+def _put(cola, item, parada):
+    """`put` bloqueante en una cola acotada, que se interrumpe si se activa la señal de parada."""
+    while not parada.is_set():
+        try:
+            cola.put(item, timeout=ESPERA_COLA)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(cola, parada):
+    """`get` bloqueante de una cola, que se interrumpe (devolviendo None) si se activa la señal de parada."""
+    while not parada.is_set():
+        try:
+            return cola.get(timeout=ESPERA_COLA)
+        except queue.Empty:
+            pass
+    return None
+
+
+def iter_datos_dias(d0, df=None, func_url_data_dia=None, func_procesa_data_dia=None, json_req=False,
+                    headers=HEADERS, num_retries=NUM_RETRIES, timeout=TIMEOUT, date_fmt=DATE_FMT,
+                    num_descargas=NUM_DESCARGAS_STREAMING, tam_cola=TAM_COLA_STREAMING,
+                    usar_asyncio=USAR_ASYNCIO, control=None, verbose=True):
+    """Generador de `(key_dia, data_import | None)` para los días del intervalo [d0, df], según se van completando.
+
+    :param func_url_data_dia: función `key_dia -> url` (o lista de urls)
+    :param func_procesa_data_dia: función `(key_dia, response) -> (data_import, ok)`, como en `get_data_en_intervalo`
+    :param num_descargas: nº de threads de descarga (peticiones simultáneas)
+    :param tam_cola: tamaño máximo de las colas de respuestas descargadas y de datos procesados
+    """
+    keys_dias = _lista_dias(d0, df, date_fmt)
+    usar_asyncio = usar_asyncio and HAY_AIOHTTP
+    cola_keys, cola_raw, cola_datos = queue.Queue(), queue.Queue(maxsize=tam_cola), queue.Queue(maxsize=tam_cola)
+    parada = threading.Event()
+    for key_dia in keys_dias:
+        cola_keys.put((key_dia, 0))
+
+    def _etapa_descarga():
+        while not parada.is_set():
+            item = _get(cola_keys, parada)
+            if item is None:
+                break
+            key_dia, intento = item
+            try:
+                response = _descarga_dia_sync(key_dia, func_url_data_dia, json_req, headers,
+                                              num_retries, timeout, usar_asyncio, control)
+            except Exception as e:
+                logging.error('DESCARGANDO DATA!???? (Exception: {}; KEY: {})'.format(e, key_dia))
+                response = None
+            _put(cola_raw, (key_dia, intento, response), parada)
+
+    def _etapa_procesado():
+        while not parada.is_set():
+            item = _get(cola_raw, parada)
+            if item is None:
+                break
+            key_dia, intento, response = item
+            try:
+                data_import, ok = func_procesa_data_dia(key_dia, response)
+            except Exception as e:
+                if verbose:
+                    print('PROCESANDO DATA!???? (Exception: {}; KEY: {})'.format(e, key_dia))
+                logging.error('PROCESANDO DATA!???? (Exception: {}; KEY: {})'.format(e, key_dia))
+                data_import, ok = None, -1
+            if ok not in (0, -2) and intento + 1 < num_retries:  # (-2: código de salida temprana, sin retry)
+                cola_keys.put((key_dia, intento + 1))
+            else:
+                _put(cola_datos, (key_dia, data_import if ok == 0 else None), parada)
+
+    threads = [threading.Thread(target=_etapa_descarga, name='esiosdata_stream_descarga_{}'.format(i), daemon=True)
+               for i in range(max(1, min(num_descargas, len(keys_dias))))]
+    threads.append(threading.Thread(target=_etapa_procesado, name='esiosdata_stream_procesado', daemon=True))
+    for th in threads:
+        th.start()
+    try:
+        for _ in range(len(keys_dias)):
+            key_dia, data_import = cola_datos.get()
+            if data_import is None and verbose:
+                print('NO SE HA PODIDO OBTENER EL DÍA {}'.format(key_dia))
+            yield key_dia, data_import
+    finally:
+        parada.set()
+
+
+def iter_pvpc_days(start, end=None, **kwargs):
+    """Generador de `(key_dia, pd.DataFrame | None)` con los datos de PVPC de cada día del intervalo [start, end],
+    según se van descargando y procesando. Si `end` es None, hasta hoy. Ver `iter_datos_dias` para los kwargs.
+    """
+    verbose = kwargs.get('verbose', True)
+    return iter_datos_dias(start, end, func_url_data_dia=pvpc_url_dia, json_req=True,
+                           func_procesa_data_dia=partial(pvpc_procesa_datos_dia, verbose=verbose), **kwargs)
+
+
+def iter_dem_days(start, end=None, **kwargs):
+    """Generador de `(key_dia, dict | None)` con los datos de demanda de cada día del intervalo [start, end], según
+    se van descargando y procesando: `{'data': pd.DataFrame (10 min), 'data_dias': pd.DataFrame (máx-mín diarios)}`.
+    Si `end` es None, hasta hoy. Ver `iter_datos_dias` para los kwargs.
+    """
+    return iter_datos_dias(start, end, func_url_data_dia=dem_url_dia, json_req=False,
+                           func_procesa_data_dia=dem_procesa_datos_dia, **kwargs)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Bases de datos de demanda de varias zonas (Península, Baleares y Canarias) y sus curvas.
+
+`DatosZonas` mantiene un `DatosREE` (con su propio store) por cada zona y curva seleccionada, y los actualiza a la vez,
+cada uno en su thread, bajo un único presupuesto de descarga: todos comparten el controlador AIMD de concurrencia
+(`downloadscheduler.CONTROL_DESCARGAS`) y el event loop de descargas de `esiosdata.aio` (o, con el motor multithread
+de `dataweb`, se reparte entre ellos `MAX_THREADS_REQUESTS`). Las lecturas y grabaciones de los stores HDF5 se
+serializan con `classdataesios.LOCK_HDF`.
+
+`DatosZonas.datos(start, end, cols)` devuelve los datos de todas las curvas en un único DataFrame.
+
+@author: Eugenio Panadero
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import time
+import pandas as pd
+from esiosdata.classdataesios import DatosREE
+from esiosdata.downloadscheduler import CONTROL_DESCARGAS
+from esiosdata.esios_config import (ZONAS, CURVAS_ZONAS, TZ, VERBOSE, USAR_ASYNCIO, USAR_MULTITHREAD,
+                                    MAX_THREADS_REQUESTS, KEYS_DATA_DEM)
+from esiosdata.prettyprinting import print_ok, print_err
+
+
+__author__ = 'Eugenio Panadero'
+__copyright__ = "Copyright 2015, AzogueLabs"
+__credits__ = ["Eugenio Panadero"]
+__license__ = "GPL"
+__version__ = "1.0"
+__maintainer__ = "Eugenio Panadero"
+
+
+def curvas_seleccion(zonas=None):
+    """Lista de (zona, curva) a partir de una selección de zonas ('BALEARES'), de curvas concretas
+    (('CANARIAS', 'TENERIFE')) o de ambas. Por defecto, todas las curvas de todas las zonas."""
+    if zonas is None:
+        zonas = ZONAS
+    elif isinstance(zonas, str):
+        zonas = [zonas]
+    curvas = []
+    for sel in zonas:
+        if isinstance(sel, str):
+            zona = sel.upper()
+            if zona not in CURVAS_ZONAS:
+                raise ValueError('Zona desconocida: "{}". Zonas disponibles: {}'.format(sel, ZONAS))
+            curvas += [(zona, curva) for curva in CURVAS_ZONAS[zona]]
+        else:
+            zona, curva = sel[0].upper(), sel[1].upper()
+            if curva not in CURVAS_ZONAS.get(zona, ()):
+                raise ValueError('Curva desconocida: {}'.format(sel))
+            curvas.append((zona, curva))
+    return list(OrderedDict.fromkeys(curvas))
+
+
+class DatosZonas(object):
+    """
+    Conjunto de bases de datos de demanda (`DatosREE`) de varias zonas y curvas, actualizadas en paralelo.
+
+    `handlers` es un OrderedDict {(zona, curva): DatosREE}. Sin `fecha_inicio`, cada zona comienza en su fecha de
+    inicio de datos (`INI_ZONAS`).
+    """
+
+    def __init__(self, zonas=None, update=True, force_update=False, verbose=VERBOSE, fecha_inicio=None, fecha_fin=None,
+                 usar_multithread=USAR_MULTITHREAD, usar_asyncio=USAR_ASYNCIO, control_descargas=CONTROL_DESCARGAS,
+                 max_workers=None):
+        self.verbose = verbose
+        self.usar_asyncio = usar_asyncio
+        self.control_descargas = control_descargas
+        curvas = curvas_seleccion(zonas)
+        self.max_workers = max_workers or len(curvas)
+        # Con el motor multithread, el nº máximo de threads de descarga se reparte entre las curvas:
+        max_n_threads = max(1, MAX_THREADS_REQUESTS // min(len(curvas), self.max_workers))
+        self.handlers = OrderedDict(
+            ((zona, curva), DatosREE(zona, curva, update=False, verbose=verbose,
+                                     fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                                     usar_multithread=usar_multithread,
+                                     max_n_threads=max_n_threads, usar_asyncio=usar_asyncio,
+                                     control_descargas=control_descargas))
+            for zona, curva in curvas)
+        self.resumen_descargas = None
+        if update or force_update:
+            self.update_data(force_update)
+
+    def _actualiza(self, key, force_update):
+        try:
+            return self.handlers[key].update_data(force_update)
+        except Exception as e:
+            print_err('ERROR ACTUALIZANDO {} - {}: {}: {}'.format(key[0], key[1], type(e).__name__, e))
+            return False
+
+    def update_data(self, force_update=False):
+        """
+        Actualiza a la vez (un thread por curva, hasta `max_workers`) los datos de todas las zonas y curvas.
+
+        :param force_update: Fuerza la reconstrucción total de cada store
+        :return: dict {(zona, curva): hay_nueva_info}
+        """
+        tic = time.time()
+        keys = list(self.handlers.keys())
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            nueva_info = list(executor.map(lambda k: self._actualiza(k, force_update), keys))
+        self.resumen_descargas = self.control_descargas.resumen()
+        if self.verbose:
+            print_ok('{} curvas de demanda actualizadas en paralelo ({} con nueva información) [{:.2f} seg]\n{}'
+                     .format(len(keys), sum(nueva_info), time.time() - tic, self.control_descargas))
+        return OrderedDict(zip(keys, nueva_info))
+
+    def datos(self, start=None, end=None, cols=('dem',), key=KEYS_DATA_DEM[0], tz=TZ):
+        """
+        Datos de todas las zonas y curvas en un único DataFrame, con columnas (zona, curva, columna) y el index en la
+        zona horaria `tz` (las de Canarias se convierten desde su hora local).
+
+        :param start: (OPC) instante o día inicial (en hora de `tz`)
+        :param end: (OPC) instante o día final (incluido)
+        :param cols: (OPC) columnas de cada curva (None para todas)
+        :param key: (OPC) key de datos ('data' o, sólo para la Península, 'data_dias')
+        :return: pd.DataFrame
+        """
+        frames = OrderedDict()
+        for (zona, curva), handler in self.handlers.items():
+            df = handler.data.get(key) if handler.data else None
+            if df is None or df.empty:
+                continue
+            if cols is not None:
+                df = df[[c for c in cols if c in df.columns]]
+            if df.index.tz is not None:
+                df = df.tz_convert(tz)
+            frames[(zona, curva)] = df
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1, names=['zona', 'curva', 'columna']).sort_index()
+        if start is not None or end is not None:
+            data = data.loc[start:end]
+        return data
@@ -38,6 +38,11 @@ setup(
     },
     install_requires=['termcolor', 'pandas', 'pytz', 'numpy',
                       'matplotlib', 'dataweb', 'jinja2'],
+    extras_require={
+        'aio': ['aiohttp'],
+        'fastjson': ['orjson'],
+        'parquet': ['pyarrow'],
+    },
     entry_points={
         'console_scripts': ['esiosdata = esiosdata.__main__:main_cli']
     },
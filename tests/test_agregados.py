@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para los agregados por periodo de los datos almacenados (esiosdata.agregados)
+
+"""
+from unittest import TestCase
+
+
+class TestsAgregados(TestCase):
+    """Tests para los agregados vectoriales por hora, día, semana y mes, y su actualización incremental."""
+
+    def test_agrega_periodos(self):
+        """Agregados iguales a los de `groupby`, con días de 23 y 25 horas y periodos sin datos."""
+        import numpy as np
+        import pandas as pd
+        from esiosdata.esios_config import TZ
+        from esiosdata.agregados import agrega_periodos, etiquetas_periodo, columnas_agregados
+
+        index = pd.date_range('2016-03-20', '2016-11-06', freq='10min', tz=TZ, inclusive='left')
+        df = pd.DataFrame(np.random.rand(len(index), 2), index=index, columns=['dem', 'eol'])
+        df.loc['2016-07-10', 'eol'] = np.nan
+        for freq, n_periodos in [('h', 5544), ('D', 231), ('W', 34), ('MS', 9)]:
+            agr = agrega_periodos(df, freq)
+            self.assertEqual(len(agr), n_periodos)
+            self.assertEqual(list(agr.columns), columnas_agregados(['dem', 'eol']))
+            g = df.groupby(etiquetas_periodo(df.index, freq))
+            self.assertTrue(np.allclose(agr['dem'], g['dem'].mean()))
+            self.assertTrue(np.allclose(agr['eol_min'], g['eol'].min(), equal_nan=True))
+            self.assertTrue(np.allclose(agr['eol_max'], g['eol'].max(), equal_nan=True))
+            self.assertTrue((agr['dem_argmax'].values == g['dem'].idxmax().values).all())
+            self.assertTrue((agr['dem_argmin'].values == g['dem'].idxmin().values).all())
+
+        dias = agrega_periodos(df, 'D')
+        self.assertEqual(dias.index[0], pd.Timestamp('2016-03-20', tz=TZ))
+        self.assertTrue(np.isnan(dias.loc['2016-07-10', 'eol']))
+        self.assertTrue(pd.isnull(dias.loc['2016-07-10', 'eol_argmax']))
+        semanas = agrega_periodos(df, 'W')
+        self.assertTrue(all(d.weekday() == 0 for d in semanas.index[1:]))
+        horas = agrega_periodos(df.loc['2016-10-30'], 'h')
+        self.assertEqual(len(horas), 25)
+        self.assertEqual(horas.index[2].utcoffset(), pd.Timedelta(hours=2))
+        self.assertEqual(horas.index[3].utcoffset(), pd.Timedelta(hours=1))
+
+    def test_actualiza_agregados(self):
+        """Actualización incremental por meses modificados igual al cálculo completo (con semanas entre dos meses)."""
+        import numpy as np
+        import pandas as pd
+        from esiosdata.esios_config import TZ
+        from esiosdata.agregados import agrega_periodos, actualiza_agregados
+
+        index = pd.date_range('2016-08-01', '2016-10-20', freq='h', tz=TZ, inclusive='left')
+        df = pd.DataFrame(np.random.rand(len(index), 3), index=index, columns=['GEN', 'NOC', 'VHC'])
+        cols = ['GEN', 'VHC']
+        for freq in ['D', 'W', 'MS']:
+            agr_ant = agrega_periodos(df.loc[:'2016-09-29'], freq, cols)
+            agr, periodos = actualiza_agregados(agr_ant, df, freq, {'2016-09', '2016-10'}, cols, TZ)
+            pd.testing.assert_frame_equal(agr, agrega_periodos(df, freq, cols), check_freq=False)
+            self.assertGreater(len(periodos), 0)
+            agr, periodos = actualiza_agregados(agr, df, freq, set(), cols, TZ)
+            self.assertEqual(len(periodos), 0)
+
+        agr_ant = agrega_periodos(df.loc[:'2016-09-29'], 'W', cols)
+        _, periodos = actualiza_agregados(agr_ant, df, 'W', {'2016-10'}, cols, TZ)
+        self.assertEqual(periodos[0], pd.Timestamp('2016-09-26', tz=TZ))
+        agr, periodos = actualiza_agregados(agr_ant, df, 'W', None, ['GEN'], TZ)
+        self.assertEqual(len(periodos), len(agr))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el motor de descarga asíncrona (esiosdata.aio)
+
+"""
+import asyncio
+from unittest import TestCase
+
+
+class TestsAIO(TestCase):
+    """Tests para la descarga asíncrona de datos de PVPC y demanda."""
+
+    def test_pvpc_range(self):
+        """Test de descarga asíncrona de un intervalo de datos de PVPC."""
+        from esiosdata.aio import pvpc_range, get_data_en_intervalo_aio
+        from esiosdata.importpvpcdata import pvpc_url_dia, pvpc_procesa_datos_dia
+
+        data = asyncio.run(pvpc_range('2015-10-20', '2015-11-20'))
+        print(data)
+        self.assertIsNotNone(data)
+        self.assertEqual(data.empty, False)
+        self.assertEqual(len(data), 32 * 24 + 1)
+
+        # Backend síncrono, sobre el pool de conexiones compartido:
+        data_2, hay_errores, str_import = get_data_en_intervalo_aio(
+            '2017-01-20', '2017-01-22', func_url_data_dia=pvpc_url_dia,
+            func_procesa_data_dia=pvpc_procesa_datos_dia, json_req=True)
+        print(str_import)
+        self.assertFalse(hay_errores)
+        self.assertEqual(len(data_2), 3 * 24)
+
+    def test_dem_range(self):
+        """Test de descarga asíncrona de un intervalo de datos de demanda."""
+        from esiosdata.aio import dem_range
+
+        data = asyncio.run(dem_range('2015-10-22', '2015-10-27'))
+        print(data)
+        self.assertIsNotNone(data)
+        self.assertEqual(data['data_dias'].empty, False)
+        self.assertEqual(data['data'].empty, False)
+
+        data = asyncio.run(dem_range('2007-03-01', '2007-03-05', verbose=False))
+        self.assertIsNone(data)
+
+    def test_cierre_loop(self):
+        """Cierre de las sesiones http y parada del loop de fondo (y nuevo arranque tras el cierre)."""
+        from esiosdata.aio import _LoopDescargas
+
+        async def _sesion(session=None):
+            return session
+
+        loop_descargas = _LoopDescargas()
+        session = loop_descargas.run(_sesion)
+        thread = loop_descargas._thread
+        self.assertFalse(session.closed)
+        self.assertIs(loop_descargas.run(_sesion), session)
+        loop_descargas.close()
+        self.assertTrue(session.closed)
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(loop_descargas._loop)
+
+        session_2 = loop_descargas.run(_sesion)
+        self.assertFalse(session_2.closed)
+        loop_descargas.close()
+        self.assertTrue(session_2.closed)
+        loop_descargas.close()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para la caché de proceso de los datos de PVPC
+
+"""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+
+class TestsCachePVPC(TestCase):
+    """Tests para la caché de PVPC compartida por las facturas del proceso."""
+
+    def setUp(self):
+        import pandas as pd
+        from esiosdata.standin import store_pvpc_sintetico
+
+        # Store local de 2016 con datos sintéticos (sin red), como el del servidor local de pruebas:
+        self.dir_test = tempfile.mkdtemp()
+        self.path_store = os.path.join(self.dir_test, 'pvpc_test.h5')
+        store_pvpc_sintetico(self.path_store, pd.date_range('2016-01-01', '2016-12-31'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_test)
+
+    def _cache(self, **kwargs):
+        from esiosdata import PVPC
+        from esiosdata.cachepvpc import CachePVPC
+
+        return CachePVPC(func_handler=lambda: PVPC(update=False, verbose=False, carga_completa=False,
+                                                   path_database=self.path_store), **kwargs)
+
+    def test_cache_pvpc(self):
+        """Aciertos, fallos, caducidad e invalidación de los meses en caché."""
+        from concurrent.futures import ThreadPoolExecutor
+        import pandas as pd
+
+        cache = self._cache(ttl=3600)
+        df = cache.datos('2016-11-01', '2016-12-09')
+        print(cache)
+        self.assertEqual(df.index[0], pd.Timestamp('2016-11-01', tz='Europe/Madrid'))
+        self.assertEqual(df.index[-1], pd.Timestamp('2016-12-09 23:00', tz='Europe/Madrid'))
+        self.assertTrue(all(c in df.columns for c in ['TCUGEN', 'CPNOC', 'PD_VHC']))
+        self.assertEqual(cache.resumen()['meses_leidos'], 2)
+
+        with ThreadPoolExecutor(8) as executor:
+            dfs = list(executor.map(lambda _: cache.datos('2016-11-15', '2016-12-01'), range(16)))
+        pd.testing.assert_frame_equal(dfs[-1], df.loc['2016-11-15':'2016-12-01'])
+        resumen = cache.resumen()
+        self.assertEqual((resumen['aciertos'], resumen['fallos'], resumen['meses_leidos']), (16, 1, 2))
+
+        dfs[0]['TCUGEN'] = 0.
+        self.assertFalse((cache.datos('2016-11-15', '2016-11-15')['TCUGEN'] == 0).all())
+        cache.invalida(['2016-11'])
+        cache.datos('2016-11-15', '2016-11-15')
+        self.assertEqual(cache.resumen()['meses_leidos'], 3)
+
+        cache.ttl = 0
+        cache.datos('2016-11-15', '2016-12-01')
+        resumen = cache.resumen()
+        print(resumen)
+        self.assertEqual((resumen['fallos'], resumen['meses_leidos'], resumen['invalidaciones']), (3, 5, 3))
+        cache.invalida()
+        self.assertEqual(cache.resumen()['meses_en_cache'], 0)
+
+    def test_consulta_mayor_que_cache(self):
+        """Consultas de más meses que `max_meses`: se devuelven completas y se descartan los meses más antiguos."""
+        import pandas as pd
+
+        cache = self._cache(ttl=3600, max_meses=3)
+        df = cache.datos('2016-01-01', '2016-06-30')
+        self.assertEqual(df.index[0], pd.Timestamp('2016-01-01', tz='Europe/Madrid'))
+        self.assertEqual(df.index[-1], pd.Timestamp('2016-06-30 23:00', tz='Europe/Madrid'))
+        self.assertEqual(len(df), 182 * 24 - 1)
+        self.assertEqual(list(cache._meses), ['2016-04', '2016-05', '2016-06'])
+
+        # Con parte de los meses en caché:
+        df_2 = cache.datos('2016-03-01', '2016-06-30')
+        pd.testing.assert_frame_equal(df_2, df.loc['2016-03-01':])
+        resumen = cache.resumen()
+        self.assertEqual((resumen['fallos'], resumen['meses_leidos'], resumen['meses_en_cache']), (2, 7, 3))
+
+    def test_actualizacion_opcional(self):
+        """Sin `actualiza`, las consultas posteriores al último dato del store no acceden a la red."""
+        from unittest import mock
+        import pandas as pd
+        from esiosdata import PVPC
+
+        with mock.patch.object(PVPC, 'update_data') as update_data:
+            df = self._cache().datos('2016-12-01', '2017-01-31')
+            update_data.assert_not_called()
+            self.assertEqual(df.index[-1], pd.Timestamp('2016-12-31 23:00', tz='Europe/Madrid'))
+            self._cache(actualiza=True).datos('2016-12-01', '2017-01-31')
+            update_data.assert_called_once_with()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el calendario horario de periodos tarifarios (esiosdata.calendarioperiodos)
+
+"""
+from unittest import TestCase
+
+
+class TestsCalendarioPeriodos(TestCase):
+    """Tests para los códigos de periodo de los peajes con discriminación horaria."""
+
+    def test_calendario_periodos(self):
+        """Calendarios anuales de 2.0DHA y 2.0DHS, con el cambio de horario de verano e invierno."""
+        import numpy as np
+        from esiosdata.calendarioperiodos import calendario_periodos
+
+        for year, horas in [(2015, 8760), (2016, 8784)]:
+            _, dha = calendario_periodos(year, 2)
+            _, dhs = calendario_periodos(year, 3)
+            self.assertEqual(dha.dtype, np.int8)
+            self.assertEqual(len(dha), horas)
+            self.assertEqual((dha == 1).sum(), 10 * horas // 24)
+            self.assertEqual(np.bincount(dhs)[1:].tolist(), [10 * horas // 24, 8 * horas // 24, 6 * horas // 24])
+            self.assertFalse(dha.flags.writeable)
+        self.assertIs(calendario_periodos(2016, 2)[1], calendario_periodos(2016, 2)[1])
+        self.assertRaises(ValueError, calendario_periodos, 2016, 4)
+
+    def test_periodos_horarios(self):
+        """Códigos unidos por posición a índices horarios: días de 23 y 25 horas, varios años e índices naive o de otra
+        zona horaria (con los periodos en su hora local)."""
+        import pandas as pd
+        from esiosdata.esios_config import TZ
+        from esiosdata.calendarioperiodos import periodos_horarios
+
+        invierno = pd.date_range('2016-01-15', periods=24, freq='h', tz=TZ)
+        self.assertEqual(periodos_horarios(invierno, 2).tolist(), [2] * 12 + [1] * 10 + [2] * 2)
+        verano = pd.date_range('2016-07-15', periods=24, freq='h', tz=TZ)
+        self.assertEqual(periodos_horarios(verano, 2).tolist(), [2] * 13 + [1] * 10 + [2])
+        self.assertEqual(periodos_horarios(verano, 3).tolist(), [2] + [3] * 6 + [2] * 6 + [1] * 10 + [2])
+
+        dia_23h = pd.date_range('2016-03-27', '2016-03-28', freq='h', tz=TZ, inclusive='left')
+        self.assertEqual(len(dia_23h), 23)
+        self.assertEqual(periodos_horarios(dia_23h, 2).tolist(), [2] * 12 + [1] * 10 + [2])
+        self.assertEqual(periodos_horarios(dia_23h, 3).tolist(), [2] + [3] * 5 + [2] * 6 + [1] * 10 + [2])
+        dia_25h = pd.date_range('2016-10-30', '2016-10-31', freq='h', tz=TZ, inclusive='left')
+        self.assertEqual(periodos_horarios(dia_25h, 2).tolist(), [2] * 13 + [1] * 10 + [2] * 2)
+        self.assertEqual(periodos_horarios(dia_25h, 3).tolist(), [2] + [3] * 7 + [2] * 6 + [1] * 10 + [2])
+
+        index = pd.date_range('2016-12-31 20:00', '2017-01-01 03:00', freq='h', tz=TZ)
+        self.assertEqual(periodos_horarios(index, 3).tolist(), [1, 1, 1, 2, 2, 3, 3, 3])
+        self.assertEqual(periodos_horarios(index.tz_localize(None), 3).tolist(), [1, 1, 1, 2, 2, 3, 3, 3])
+        index_canarias = index.tz_localize(None).tz_localize('Atlantic/Canary')
+        self.assertEqual(periodos_horarios(index_canarias, 3).tolist(), [1, 1, 1, 2, 2, 3, 3, 3])
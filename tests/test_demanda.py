@@ -77,3 +77,88 @@ class TestsDemanda(TestCase):
         data = dem_data_dia('2007-03-01', '2007-04-25')
         print(data)
         self.assertIsNone(data)
+
+    def test_parser_demanda(self):
+        """Test del procesado vectorizado de las series diezminutales de demanda (días normales y DST)."""
+        from esiosdata.importdemdata import dem_procesa_datos_dia, _extract_func_json_data, _import_json_ts_data
+        from esiosdata.standin import payload_dem_dia
+        import pandas as pd
+
+        for dia, n_horas in zip(['2016-03-27', '2016-06-22', '2016-10-30'], [23, 24, 25]):
+            data, ok = dem_procesa_datos_dia(dia, [payload_dem_dia(dia, a) for a in (117, 116, 115, 114)])
+            self.assertEqual(ok, 0)
+            df = data['data']
+            self.assertEqual(len(df), n_horas * 6)
+            self.assertEqual(df.index.freq, '10min')
+            self.assertTrue(df.index.is_unique and df.index.is_monotonic_increasing)
+            self.assertEqual(df.index[0], pd.Timestamp(dia, tz='Europe/Madrid'))
+            self.assertTrue(all(c in df.columns for c in ['dem', 'pre', 'pro', 'eol']))
+            self.assertEqual(len(data['data_dias']), 1)
+
+        # Hora repetida sin marcas '2A' / '2B': se infiere por orden
+        _, data = _extract_func_json_data(payload_dem_dia('2016-10-30', 114))
+        for r in data:
+            r['ts'] = r['ts'].replace(' 2A:', ' 02:').replace(' 2B:', ' 02:')
+        df = _import_json_ts_data(data)
+        self.assertEqual(len(df), 150)
+        self.assertTrue(df.index.is_unique)
+        self.assertEqual(df.index.freq, '10min')
+
+    def test_decode_jsonp(self):
+        """Test de la extracción del envoltorio JSONP de las respuestas de demanda."""
+        from esiosdata.importdemdata import _extract_func_json_data, _decode_jsonp, _columnas_registros
+        import numpy as np
+
+        func, data = _extract_func_json_data('IND_MaxMin({"demandaMaxMin": {"date": "2017-01-01", "maxDem": 1}});')
+        self.assertEqual(func, 'IND_MaxMin')
+        self.assertEqual(data, {'date': '2017-01-01', 'maxDem': 1})
+        func, data = _decode_jsonp('IND_X(\n{"a": "(1)", "b": [1, 2]}\n);\n')
+        self.assertEqual(func, 'IND_X')
+        self.assertEqual(data, {'a': '(1)', 'b': [1, 2]})
+        self.assertEqual(_extract_func_json_data('IND_X({"a": 1, "b": 2});')[1], {'a': 1, 'b': 2})
+        for raw in ['null', '', '({"a": 1});', 'IND_X({"a": 1}) basura', 'IND_X([1, 2]);', 'IND_X(null);']:
+            self.assertEqual(_extract_func_json_data(raw), (None, None))
+        ts, cols, valores = _columnas_registros([{'ts': 't0', 'dem': 1, 'eol': 2.5}, {'ts': 't1', 'dem': None}])
+        self.assertEqual(ts, ['t0', 't1'])
+        self.assertEqual(cols, ['dem', 'eol'])
+        self.assertEqual(valores.shape, (2, 2))
+        self.assertEqual(valores[0, 1], 2.5)
+        self.assertTrue(np.isnan(valores[1]).all())
+
+    def test_indicadores_demanda(self):
+        """
+        Test del modo de descarga por indicadores: tramos de meses, y mismos DataFrames que con los archivos diarios
+        para las mismas series sintéticas (comprueba el procesado, no los ids de `INDICADORES_DEM` en la API real).
+        """
+        import json
+        import pandas as pd
+        from esiosdata.esios_config import INDICADORES_DEM, TZ
+        from esiosdata.importdemdata import (dem_intervalos_indicadores, dem_url_indicadores, dem_procesa_indicadores,
+                                             dem_procesa_lote)
+        from esiosdata.standin import payload_dem_dia, payload_indicador
+
+        self.assertEqual(dem_intervalos_indicadores('2016-02-10', '2016-08-05', meses=3),
+                         ['2016-02-10_2016-04-30', '2016-05-01_2016-07-31', '2016-08-01_2016-08-05'])
+        self.assertEqual(dem_intervalos_indicadores('2016-10-30', '2016-10-30'), ['2016-10-30_2016-10-30'])
+        urls = dem_url_indicadores('2016-03-26_2016-03-27')
+        self.assertEqual(len(urls), len(INDICADORES_DEM))
+        self.assertIn('start_date=2016-03-25T23:00:00Z&end_date=2016-03-27T21:59:59Z', urls[0])
+
+        key = '2016-03-26_2016-10-31'
+        t0, tf = pd.Timestamp('2016-03-26', tz=TZ), pd.Timestamp('2016-10-31 23:59:59', tz=TZ)
+        responses = [json.loads(payload_indicador(i, t0, tf)) for i in INDICADORES_DEM.values()]
+        data, ok = dem_procesa_indicadores(key, responses)
+        self.assertEqual(ok, 0)
+        dias = [d.strftime('%Y-%m-%d') for d in pd.date_range('2016-03-26', '2016-10-31')]
+        data_arch, dias_error = dem_procesa_lote({d: [payload_dem_dia(d, a) for a in (117, 116, 115, 114)]
+                                                  for d in dias})
+        self.assertEqual(dias_error, [])
+        pd.testing.assert_frame_equal(data['data'], data_arch['data'][data['data'].columns], check_freq=False)
+        self.assertEqual(data['data'].index.freq, '10min')
+        self.assertEqual(len(data['data'].loc['2016-10-30']), 25 * 6)
+        self.assertEqual(list(data['data_dias'].index), list(data_arch['data_dias'].index))
+        self.assertEqual(sorted(data['data_dias'].columns), sorted(data_arch['data_dias'].columns))
+        self.assertTrue((data['data_dias']['maxDem'] >= data['data_dias']['minDem']).all())
+
+        self.assertEqual(dem_procesa_indicadores(key, [{'indicator': {'id': 1293, 'values': []}}]), (None, -2))
+        self.assertEqual(dem_procesa_indicadores(key, [{'error': 'x'}]), (None, -1))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el control adaptativo (AIMD) de la concurrencia de descarga
+
+"""
+import asyncio
+from unittest import TestCase
+
+
+class TestsControlConcurrencia(TestCase):
+    """Tests para el controlador AIMD de peticiones simultáneas."""
+
+    def test_aimd(self):
+        """Incremento aditivo con peticiones rápidas, decremento multiplicativo con errores."""
+        from esiosdata.downloadscheduler import ControlConcurrencia
+
+        control = ControlConcurrencia(concurrencia_ini=4, concurrencia_max=10, latencia_objetivo=1.)
+        self.assertEqual(control.concurrencia, 4)
+        for _ in range(100):
+            self.assertTrue(control.intenta_adquirir())
+            control.libera(.1, ok=True)
+        print(control)
+        self.assertEqual(control.concurrencia, 10)
+
+        # Ráfaga de errores simultáneos: un único decremento por ventana
+        for _ in range(5):
+            control.intenta_adquirir()
+        for _ in range(5):
+            control.libera(2., ok=False)
+        print(control)
+        self.assertEqual(control.concurrencia, 5)
+        resumen = control.resumen()
+        self.assertEqual(resumen['num_errores'], 5)
+        self.assertEqual(resumen['num_decrementos'], 1)
+        self.assertEqual(resumen['max_alcanzada'], 10)
+        self.assertEqual(control.en_vuelo, 0)
+
+    def test_ranuras(self):
+        """Límite de peticiones en vuelo con los context managers síncrono y asíncrono."""
+        from esiosdata.downloadscheduler import ControlConcurrencia
+
+        control = ControlConcurrencia(concurrencia_ini=2, concurrencia_max=2)
+        with control.ranura():
+            with control.ranura():
+                self.assertEqual(control.en_vuelo, 2)
+                self.assertFalse(control.intenta_adquirir())
+        self.assertEqual(control.en_vuelo, 0)
+
+        max_en_vuelo = []
+
+        async def _peticion():
+            async with control.ranura_async():
+                max_en_vuelo.append(control.en_vuelo)
+                await asyncio.sleep(.02)
+
+        async def _main():
+            await asyncio.gather(*[_peticion() for _ in range(10)])
+
+        asyncio.run(_main())
+        self.assertEqual(max(max_en_vuelo), 2)
+        self.assertEqual(control.resumen()['num_peticiones'], 12)
+
+    def test_descarga_threads(self):
+        """Motor multithread (sin `aiohttp`) regulado por el controlador, también desde `PVPC(usar_asyncio=False)`."""
+        import os
+        import shutil
+        import tempfile
+        from unittest import mock
+        from esiosdata.classdataesios import PVPC
+        from esiosdata.descargathreads import get_data_en_intervalo_threads
+        from esiosdata.downloadscheduler import ControlConcurrencia
+        from esiosdata.importpvpcdata import pvpc_procesa_datos_dia
+        from esiosdata.standin import ServidorESIOSLocal
+
+        class _ControlMedido(ControlConcurrencia):
+            max_en_vuelo = 0
+
+            def intenta_adquirir(self):
+                ok = super(_ControlMedido, self).intenta_adquirir()
+                self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+                return ok
+
+        with ServidorESIOSLocal(fecha_ini='2016-01-01', fecha_fin='2016-12-31', latencia=.02) as servidor:
+            control = _ControlMedido(concurrencia_ini=2, concurrencia_max=2)
+            data, hay_errores, str_import = get_data_en_intervalo_threads(
+                '2016-01-01', '2016-01-20', json_req=True, max_threads=10, control=control,
+                func_url_data_dia=lambda k: servidor.url + '/archives/70/download_json?locale=es&date=' + k,
+                func_procesa_data_dia=pvpc_procesa_datos_dia, verbose=False)
+            print(str_import)
+            self.assertFalse(hay_errores)
+            self.assertEqual(len(data), 20 * 24)
+            self.assertEqual(control.max_en_vuelo, 2)
+            self.assertEqual(control.resumen()['num_peticiones'], 20)
+            self.assertEqual(control.en_vuelo, 0)
+
+            path_st = tempfile.mkdtemp()
+            try:
+                with mock.patch('esiosdata.classdataesios.PATH_DATABASE_PVPC', os.path.join(path_st, 'pvpc.h5')), \
+                        mock.patch('esiosdata.importpvpcdata.SERVER', servidor.url):
+                    pvpc = PVPC(update=False, verbose=False, usar_asyncio=False)
+                    pvpc.control_descargas = control = _ControlMedido(concurrencia_ini=3, concurrencia_max=3)
+                    servidor.tasa_errores = .2
+                    data = pvpc._get_data_en_intervalo('2016-02-01', '2016-02-10')
+                    self.assertEqual(len(data[pvpc.masterkey]), 10 * 24)
+                    self.assertLessEqual(control.max_en_vuelo, 3)
+                    self.assertEqual(pvpc.resumen_descargas, control.resumen())
+                    self.assertGreaterEqual(pvpc.resumen_descargas['num_peticiones'], 10)
+                    self.assertEqual(pvpc.resumen_descargas['num_errores'], servidor.num_errores)
+            finally:
+                shutil.rmtree(path_st)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para la facturación PVPC por lotes de muchos suministros (esiosdata.facturabatch)
+
+"""
+from unittest import TestCase
+
+
+def _consumos_aleatorios(t_ini, t_fin, num_cups, seed=0):
+    import numpy as np
+    import pandas as pd
+    from esiosdata.esios_config import TZ
+
+    rs = np.random.RandomState(seed)
+    horas = pd.date_range(t_ini, t_fin, freq='h', tz=TZ)
+    cups = ['ES00{:014d}DB'.format(i) for i in range(num_cups)]
+    return pd.DataFrame(rs.gamma(1.5, .3, (num_cups, len(horas))), index=cups, columns=horas)
+
+
+class TestsFacturaBatch(TestCase):
+    """Tests para el cálculo vectorial de facturas de muchos CUPS, idénticas a las de `FacturaElec`."""
+
+    @classmethod
+    def setUpClass(cls):
+        import os
+        import tempfile
+        from unittest import mock
+        import pandas as pd
+        from esiosdata import PVPC
+        from esiosdata.cachepvpc import CachePVPC
+        from esiosdata.standin import store_pvpc_sintetico
+
+        # Store local con datos sintéticos (sin red), leído por `FacturaBatch` y `FacturaElec` desde una caché propia:
+        cls.dir_test = tempfile.mkdtemp()
+        path_store = os.path.join(cls.dir_test, 'pvpc_test.h5')
+        store_pvpc_sintetico(path_store, pd.date_range('2016-10-01', '2017-02-28'))
+        cache = CachePVPC(func_handler=lambda: PVPC(update=False, verbose=False, carga_completa=False,
+                                                    path_database=path_store))
+        cls.patches = [mock.patch(modulo + '.CACHE_PVPC', cache)
+                       for modulo in ('esiosdata.facturapvpc', 'esiosdata.facturabatch')]
+        for patch in cls.patches:
+            patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        import shutil
+
+        for patch in cls.patches:
+            patch.stop()
+        shutil.rmtree(cls.dir_test)
+
+    def test_facturas_iguales_a_factura_elec(self):
+        """Facturas por lotes (matriz o formato largo) iguales a `FacturaElec.to_dict()` de cada CUPS, con los tres
+        peajes, bono social, zonas de impuestos, CUPS con intervalos distintos y facturas con cambio de año."""
+        import numpy as np
+        import pandas as pd
+        from esiosdata.facturapvpc import FacturaElec, TIPOS_PEAJES, ZONAS_IMPUESTOS
+        from esiosdata.facturabatch import FacturaBatch
+
+        for t_ini, t_fin in [('2016-11-02', '2016-12-01 23:00'), ('2016-12-16', '2017-01-15 23:00')]:
+            consumos = _consumos_aleatorios(t_ini, t_fin, 18)
+            consumos.iloc[-1, -48:] = np.nan
+            contratos = pd.DataFrame(dict(tipo_peaje=list(TIPOS_PEAJES) * 6,
+                                          potencia_contratada=[3.45, 4.6, 5.75] * 6,
+                                          con_bono_social=[True, False] * 9,
+                                          zona_impuestos=sorted(ZONAS_IMPUESTOS * 6)), index=consumos.index)
+            lote = FacturaBatch(consumos, contratos)
+            self.assertEqual(len(lote.facturas), 18)
+            self.assertEqual(lote.facturas.iloc[-1]['dias_fact'], lote.facturas.iloc[0]['dias_fact'] - 2)
+            for cups, params in contratos.iterrows():
+                factura = FacturaElec(consumo=consumos.loc[cups].dropna().rename('kWh'), cups=cups,
+                                      tipo_peaje=params['tipo_peaje'],
+                                      potencia_contratada=params['potencia_contratada'],
+                                      con_bono_social=bool(params['con_bono_social']),
+                                      zona_impuestos=params['zona_impuestos'])
+                self.assertEqual(lote.to_dict(cups), factura.to_dict())
+
+            consumos_largo = consumos.stack().rename('kWh').reset_index()
+            consumos_largo.columns = ['cups', 'ts', 'kWh']
+            lote_largo = FacturaBatch(consumos_largo.sample(frac=1, random_state=1), contratos)
+            pd.testing.assert_frame_equal(lote_largo.facturas, lote.facturas)
+
+    def test_parametros_contrato(self):
+        """Parámetros de contrato por defecto y errores por contratos o peajes desconocidos."""
+        import pandas as pd
+        from esiosdata.facturabatch import FacturaBatch
+
+        consumos = _consumos_aleatorios('2016-11-02', '2016-11-03 23:00', 3)
+        lote = FacturaBatch(consumos, pd.DataFrame({'tipo_peaje': ['2.0DHA'] * 3}, index=consumos.index),
+                            potencia_contratada=4.6)
+        self.assertEqual(lote.contratos['tipo_peaje'].tolist(), ['2.0DHA'] * 3)
+        self.assertEqual(lote.contratos['potencia_contratada'].tolist(), [4.6] * 3)
+        self.assertEqual(lote.consumos.shape, (3, 48))
+        self.assertRaises(ValueError, FacturaBatch, consumos, pd.DataFrame(index=consumos.index[:2]))
+        self.assertRaises(ValueError, FacturaBatch, consumos, tipo_peaje='3.0A')
+        self.assertRaises(ValueError, FacturaBatch, consumos, zona_impuestos='XX')
+
+    def test_compara_tarifas(self):
+        """Comparativa de los tres peajes para un consumo horario o total, igual a las facturas de `FacturaElec`."""
+        from esiosdata.facturapvpc import FacturaElec, TIPOS_PEAJES, TIPO_PEAJE_GEN, ZONA_IMPUESTOS_CANARIAS
+        from esiosdata.facturabatch import compara_tarifas, COLS_COMPARATIVA
+
+        consumo = _consumos_aleatorios('2016-12-02', '2017-01-08 23:00', 1).iloc[0].rename('kWh')
+        comparativa = compara_tarifas(consumo, potencia_contratada=4.6, zona_impuestos=ZONA_IMPUESTOS_CANARIAS)
+        self.assertEqual(sorted(comparativa.index), sorted(TIPOS_PEAJES))
+        self.assertEqual(list(comparativa.columns),
+                         ['ranking', 'desc_peaje', 'diferencia'] + list(COLS_COMPARATIVA[1:]))
+        self.assertEqual(comparativa['ranking'].tolist(), [1, 2, 3])
+        self.assertTrue(comparativa['total_factura'].is_monotonic_increasing)
+        self.assertEqual(comparativa['diferencia'].iloc[0], 0.)
+        for peaje, fila in comparativa.iterrows():
+            d_factura = FacturaElec(consumo=consumo, tipo_peaje=peaje, potencia_contratada=4.6,
+                                    zona_impuestos=ZONA_IMPUESTOS_CANARIAS).to_dict()
+            self.assertEqual({c: fila[c] for c in COLS_COMPARATIVA}, {c: d_factura[c] for c in COLS_COMPARATIVA})
+
+        t_0, t_f = '2016-11-01', '2016-12-09'
+        comparativa = compara_tarifas(1000., t_0, t_f)
+        factura = FacturaElec(t_0, t_f, consumo=1000.)
+        self.assertEqual(comparativa.loc[TIPO_PEAJE_GEN, 'total_factura'], factura.coste_total)
+        for peaje in TIPOS_PEAJES:
+            factura.tipo_peaje = peaje
+            self.assertEqual(comparativa.loc[peaje, 'total_factura'], factura.coste_total)
+            self.assertEqual(comparativa.loc[peaje, 'tea_tcu_consumo'], factura.to_dict()['tea_tcu_consumo'])
+        self.assertRaises(ValueError, compara_tarifas, 1000.)
@@ -5,6 +5,17 @@ Test Cases para el cálculo de facturas de suministro eléctrico conforme al PVP
 """
 from unittest import TestCase
 from esiosdata.facturapvpc import (FacturaElec, ROUND_PREC, TIPO_PEAJE_VHC, ZONA_IMPUESTOS_PENIN_BALEARES)
+from esiosdata.cachepvpc import CACHE_PVPC
+from esiosdata.esios_config import ACTUALIZA_CACHE_PVPC
+
+
+def setUpModule():
+    # Facturas con datos reales de PVPC: se descargan los que falten en el store local
+    CACHE_PVPC.actualiza = True
+
+
+def tearDownModule():
+    CACHE_PVPC.actualiza = ACTUALIZA_CACHE_PVPC
 
 
 def _check_results_factura(factura,
@@ -8,6 +8,17 @@ import os
 from unittest import TestCase
 from esiosdata.facturapvpc import FacturaElec, TIPO_PEAJE_NOC, COL_CONSUMO
 from esiosdata.prettyprinting import print_cyan, print_red
+from esiosdata.cachepvpc import CACHE_PVPC
+from esiosdata.esios_config import ACTUALIZA_CACHE_PVPC
+
+
+def setUpModule():
+    # Facturas con datos reales de PVPC: se descargan los que falten en el store local
+    CACHE_PVPC.actualiza = True
+
+
+def tearDownModule():
+    CACHE_PVPC.actualiza = ACTUALIZA_CACHE_PVPC
 
 
 path_export = os.path.dirname(os.path.abspath(__file__))
@@ -7,6 +7,17 @@ import os
 from unittest import TestCase
 from esiosdata.facturapvpc import (FacturaElec, ROUND_PREC, TIPO_PEAJE_GEN, TIPO_PEAJE_NOC, TIPO_PEAJE_VHC,
                                    ZONA_IMPUESTOS_CANARIAS, ZONA_IMPUESTOS_PENIN_BALEARES, ZONA_IMPUESTOS_CEUTA_MELILLA)
+from esiosdata.cachepvpc import CACHE_PVPC
+from esiosdata.esios_config import ACTUALIZA_CACHE_PVPC
+
+
+def setUpModule():
+    # Facturas con datos reales de PVPC: se descargan los que falten en el store local
+    CACHE_PVPC.actualiza = True
+
+
+def tearDownModule():
+    CACHE_PVPC.actualiza = ACTUALIZA_CACHE_PVPC
 
 
 def _check_results_factura(factura,
@@ -180,3 +191,52 @@ class TestsFacturasPVPC(TestCase):
         assert str_1 == str(f3)
         print(f3.consumo_horario.loc[d_cambio].iloc[:10])
         assert not f3.consumo_horario.equals(f.consumo_horario)
+
+    def test_calculo_perezoso(self):
+        """Componentes calculados al acceder a ellos: el término fijo y el equipo de medida, sin datos de PVPC."""
+        f = FacturaElec('2016-11-01', '2016-12-09', consumo=[219, 280], tipo_peaje=TIPO_PEAJE_NOC,
+                        alquiler_euros=1.62)
+        self.assertEqual(f._calculados, set())
+        self.assertEqual(f.coste_termino_fijo, 15.06)
+        self.assertEqual(f.gasto_equipo_medida, 1.62)
+        self.assertEqual(f.num_dias_factura, 38)
+        self.assertEqual(f._calculados, {'periodos_fact', 'termino_fijo', 'termino_equipo_medida'})
+        self.assertIsNone(f._pvpc_data)
+
+        f.potencia_contratada = 6.9
+        self.assertEqual(f._calculados, {'periodos_fact', 'termino_equipo_medida'})
+        self.assertEqual(f.coste_termino_fijo, 30.12)
+
+    def test_recalculo_dependencias(self):
+        """Un cambio de parámetro sólo invalida los componentes que dependen de él, con los mismos resultados que una
+        factura nueva."""
+        t_0, t_f = '2016-11-01', '2016-12-09'
+        params = dict(tipo_peaje=TIPO_PEAJE_VHC, consumo=[219, 126, 154], alquiler_euros=1.62)
+        f = FacturaElec(t_0, t_f, **params)
+        str_1 = str(f)
+        consumo_horario = f.consumo_horario
+
+        f.gasto_equipo_medida = 10.8
+        self.assertEqual(f._calculados, {'periodos_fact', 'pvpc_data', 'consumo_horario', 'pvpc_horario',
+                                         'termino_fijo', 'termino_variable', 'descuento_bono_social',
+                                         'termino_impuesto_electrico'})
+        self.assertEqual(f.to_dict(), FacturaElec(t_0, t_f, **dict(params, alquiler_euros=10.8)).to_dict())
+
+        f.zona_impuestos = ZONA_IMPUESTOS_CANARIAS
+        f.con_bono_social = True
+        self.assertNotIn('termino_impuesto_electrico', f._calculados)
+        self.assertIn('termino_variable', f._calculados)
+        f_ref = FacturaElec(t_0, t_f, con_bono_social=True, zona_impuestos=ZONA_IMPUESTOS_CANARIAS,
+                            **dict(params, alquiler_euros=10.8))
+        self.assertEqual(str(f), str(f_ref))
+
+        f.tipo_peaje = TIPO_PEAJE_GEN
+        self.assertIn('consumo_horario', f._calculados)
+        self.assertNotIn('termino_variable', f._calculados)
+        self.assertIs(f.consumo_horario, consumo_horario)
+        f.tipo_peaje = TIPO_PEAJE_VHC
+        f.gasto_equipo_medida = 1.62
+        f.zona_impuestos = ZONA_IMPUESTOS_PENIN_BALEARES
+        f.con_bono_social = False
+        self.assertEqual(str(f), str_1)
+        self.assertRaises(ValueError, setattr, f, 'zona_impuestos', 'XX')
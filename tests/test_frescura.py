@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el calendario de publicación, la marca de frescura y el daemon de actualización
+
+"""
+from unittest import TestCase
+
+
+class TestsFrescura(TestCase):
+    """Tests del calendario de publicación de los datos y de la marca de frescura de los stores."""
+
+    def test_calendario_publicacion(self):
+        """Datos esperados de PVPC (antes y después de la publicación diaria) y de demanda."""
+        import pandas as pd
+        from esiosdata.esios_config import TZ, PERIODO_ACTUALIZACION_DEM
+        from esiosdata.frescura import publicacion_pvpc, esperado_pvpc, esperado_dem, proxima_dem
+
+        antes, despues = pd.Timestamp('2016-10-29 12:00', tz=TZ), pd.Timestamp('2016-10-29 21:00', tz=TZ)
+        self.assertEqual(publicacion_pvpc(antes), pd.Timestamp('2016-10-28 20:30', tz=TZ))
+        self.assertEqual(publicacion_pvpc(antes, siguiente=True), pd.Timestamp('2016-10-29 20:30', tz=TZ))
+        self.assertEqual(publicacion_pvpc(despues, siguiente=True), pd.Timestamp('2016-10-30 20:30', tz=TZ))
+        self.assertEqual(esperado_pvpc(antes), pd.Timestamp('2016-10-29 23:00', tz=TZ))
+        # Día de 25 horas: la última hora es la de las 23:00 en horario de invierno
+        self.assertEqual(esperado_pvpc(despues), pd.Timestamp('2016-10-30 23:00', tz=TZ))
+        self.assertEqual(esperado_pvpc(despues).utcoffset(), pd.Timedelta('1h'))
+        self.assertLess(esperado_dem(antes), antes)
+        self.assertEqual(proxima_dem(antes) - antes, pd.Timedelta(seconds=PERIODO_ACTUALIZACION_DEM))
+
+    def test_marca_frescura(self):
+        """Escritura / lectura de la marca y criterio de datos al día."""
+        import os
+        import tempfile
+        import pandas as pd
+        from esiosdata.esios_config import TZ, ESPERA_REINTENTO_INI
+        from esiosdata.frescura import guarda_marca, lee_marca, marca_fresca, ruta_marca
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path_store = os.path.join(tmp, 'store.h5')
+            self.assertIsNone(lee_marca(path_store))
+            ahora = pd.Timestamp('2016-10-29 21:00', tz=TZ)
+            guarda_marca(path_store, pd.Timestamp('2016-10-29 23:00', tz=TZ), comprobado=ahora)
+            self.assertTrue(os.path.exists(ruta_marca(path_store)))
+            marca = lee_marca(path_store)
+            self.assertEqual(marca['ultimo_dato'], pd.Timestamp('2016-10-29 23:00', tz=TZ))
+            self.assertEqual(marca['comprobado'], ahora)
+
+            pub = pd.Timestamp('2016-10-29 20:30', tz=TZ)
+            esperado = pd.Timestamp('2016-10-30 23:00', tz=TZ)
+            self.assertTrue(marca_fresca(marca, marca['ultimo_dato'], ahora, pub))
+            # Comprobado tras la publicación, hace poco: no se vuelve a preguntar
+            self.assertTrue(marca_fresca(marca, esperado, ahora + pd.Timedelta('1min'), pub))
+            self.assertFalse(marca_fresca(marca, esperado, ahora + pd.Timedelta(seconds=ESPERA_REINTENTO_INI), pub))
+            self.assertFalse(marca_fresca(marca, esperado, ahora + pd.Timedelta('1min'), ahora + pd.Timedelta('1s')))
+            self.assertFalse(marca_fresca(None, esperado, ahora))
+            self.assertFalse(marca_fresca(marca, None, ahora))
+
+            guarda_marca(path_store, None)
+            self.assertIsNone(lee_marca(path_store)['ultimo_dato'])
+            with open(ruta_marca(path_store), 'w') as f:
+                f.write('{corrupta')
+            self.assertIsNone(lee_marca(path_store))
+
+    def test_programacion_tareas(self):
+        """Reintentos con espera creciente hasta la siguiente publicación."""
+        import pandas as pd
+        from esiosdata.esios_config import TZ, ESPERA_REINTENTO_INI, ESPERA_REINTENTO_MAX
+        from esiosdata.daemon import TareaActualizacion
+        from esiosdata.frescura import espera_reintento
+
+        self.assertEqual(espera_reintento(1), ESPERA_REINTENTO_INI)
+        self.assertEqual(espera_reintento(2), 2 * ESPERA_REINTENTO_INI)
+        self.assertEqual(espera_reintento(100), ESPERA_REINTENTO_MAX)
+
+        tarea = TareaActualizacion('test', None, verbose=False)
+        ahora = pd.Timestamp('2016-10-29 20:31', tz=TZ)
+        proxima_pub = pd.Timestamp('2016-10-30 20:30', tz=TZ)
+        self.assertTrue(tarea.pendiente(ahora))
+        esperas = [(tarea.programa(False, ahora, proxima_pub) - ahora).total_seconds() for _ in range(3)]
+        self.assertEqual(esperas, [espera_reintento(1), espera_reintento(2), espera_reintento(3)])
+        self.assertFalse(tarea.pendiente(ahora))
+        self.assertEqual(tarea.programa(False, ahora, ahora + pd.Timedelta('1min')), ahora + pd.Timedelta('1min'))
+        self.assertEqual(tarea.programa(True, ahora, proxima_pub), proxima_pub)
+        self.assertEqual(tarea.intentos, 0)
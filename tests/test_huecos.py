@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el índice de huecos de los datos almacenados (esiosdata.huecos)
+
+"""
+from unittest import TestCase
+
+
+class TestsHuecos(TestCase):
+    """Tests para la detección vectorial de días incompletos."""
+
+    def test_indice_huecos(self):
+        """Huecos en datos horarios, diezminutales y diarios, con días de 23 y 25 horas."""
+        import pandas as pd
+        from esiosdata.esios_config import TZ
+        from esiosdata.huecos import indice_huecos
+
+        index = pd.date_range('2016-03-25', '2016-11-01', freq='h', tz=TZ, inclusive='left')
+        self.assertTrue(indice_huecos(index, 3600, '2016-03-25', '2016-10-31').empty)
+        index = index.drop(index[(index >= '2016-03-27 05:00') & (index < '2016-03-27 08:00')])
+        index = index.drop(index[(index >= '2016-07-10') & (index < '2016-07-12')])
+        huecos = indice_huecos(index, 3600, '2016-03-20', '2016-11-02')
+        self.assertEqual([d.strftime('%Y-%m-%d') for d in huecos.index],
+                         ['2016-03-20', '2016-03-21', '2016-03-22', '2016-03-23', '2016-03-24',
+                          '2016-03-27', '2016-07-10', '2016-07-11', '2016-11-01', '2016-11-02'])
+        self.assertEqual(huecos.loc['2016-03-27', 'esperadas'], 23)
+        self.assertEqual(huecos.loc['2016-03-27', 'presentes'], 20)
+        self.assertEqual(huecos.loc['2016-07-10', 'presentes'], 0)
+
+        index = pd.date_range('2016-10-29', '2016-11-01', freq='10min', tz=TZ, inclusive='left')
+        df = pd.DataFrame({'dem': 1.}, index=index)
+        df.iloc[24 * 6 + 12:24 * 6 + 24, 0] = None  # 2016-10-30, de 02:00 a 02:50 (CEST, 1ª de las horas repetidas)
+        self.assertTrue(indice_huecos(index, 600, '2016-10-29', '2016-10-31').empty)
+        huecos = indice_huecos(index, 600, '2016-10-29', '2016-10-31', validos=df['dem'].notnull())
+        self.assertEqual(len(huecos), 1)
+        self.assertEqual(huecos.iloc[0].tolist(), [25 * 6, 25 * 6 - 12])
+
+        index_dias = pd.DatetimeIndex(['2016-10-29', '2016-10-30', '2016-11-01'])
+        huecos = indice_huecos(index_dias, 24 * 3600, '2016-10-29', '2016-11-01')
+        self.assertEqual(huecos.index.tolist(), [pd.Timestamp('2016-10-31')])
+        self.assertTrue(indice_huecos(index_dias, 24 * 3600, '2016-11-01', '2016-10-29').empty)
+
+    def test_dias_consecutivos(self):
+        """Agrupación de los días con huecos en intervalos para el backend multithread."""
+        import pandas as pd
+        from esiosdata.huecos import dias_consecutivos
+
+        intervalos = dias_consecutivos(['2016-01-02', '2016-01-01', '2016-01-05', '2016-02-28', '2016-02-29'])
+        self.assertEqual(intervalos, [(pd.Timestamp('2016-01-01'), pd.Timestamp('2016-01-02')),
+                                      (pd.Timestamp('2016-01-05'), pd.Timestamp('2016-01-05')),
+                                      (pd.Timestamp('2016-02-28'), pd.Timestamp('2016-02-29'))])
+        self.assertEqual(dias_consecutivos([]), [])
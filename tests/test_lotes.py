@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el procesado por lotes de días (buffers de columnas preasignados)
+
+"""
+import shutil
+import tempfile
+from unittest import TestCase
+
+
+class TestsLotes(TestCase):
+    """Tests para el ensamblado por lotes de los datos de PVPC y demanda."""
+
+    def test_acumulador(self):
+        """Buffers preasignados: crecimiento, columnas nuevas, duplicados y orden."""
+        from esiosdata.lotes import AcumuladorColumnas
+        import numpy as np
+        import pandas as pd
+
+        def _index(ts):
+            return pd.to_datetime(ts, unit='s', utc=True)
+
+        acum = AcumuladorColumnas(capacidad=2)
+        acum.anyade(np.array([7200, 10800]), ['a', 'b'], np.array([[1., 2.], [3., 4.]]))
+        acum.anyade(np.array([0, 3600, 7200]), ['b', 'c'], np.array([[5., 6.], [7., 8.], [9., 10.]]))
+        self.assertGreaterEqual(acum.capacidad, 5)
+        df = acum.to_frame(_index)
+        self.assertEqual(list(df.columns), ['a', 'b', 'c'])
+        self.assertEqual(len(df), 4)
+        self.assertTrue(df.index.is_monotonic_increasing and df.index.is_unique)
+        self.assertEqual(df.index.freq, 'h')
+        self.assertEqual(df['b'].tolist(), [5., 7., 2., 4.])
+        self.assertTrue(np.isnan(df['a'].iloc[0]) and np.isnan(df['c'].iloc[-1]))
+
+    def test_lotes_pvpc_dem(self):
+        """Procesado por lotes de PVPC y demanda: mismo resultado que día a día, con días erróneos descartados."""
+        from esiosdata.importdemdata import dem_procesa_lote, dem_procesa_datos_dia
+        from esiosdata.importpvpcdata import pvpc_procesa_lote, pvpc_procesa_datos_dia
+        from esiosdata.lotes import procesa_por_lotes, concat_lotes
+        from esiosdata.standin import payload_pvpc_dia, payload_dem_dia
+        import pandas as pd
+
+        dias = [d.strftime('%Y-%m-%d') for d in pd.date_range('2016-10-20', '2016-11-05')]
+        resp_pvpc = {d: payload_pvpc_dia(d) for d in dias}
+        resp_pvpc['2016-10-25'] = {'PVPC': [{'Dia': '25/10/2016', 'Hora': '00-01', 'GEN': 'x'}]}
+        data, dias_error = procesa_por_lotes(resp_pvpc, pvpc_procesa_lote, dias_por_lote=7)
+        self.assertEqual(dias_error, ['2016-10-25'])
+        self.assertEqual(len(data), 24 * (len(dias) - 1) + 1)
+        ref = concat_lotes([pvpc_procesa_datos_dia(d, resp_pvpc[d], verbose=False)[0] for d in dias])
+        pd.testing.assert_frame_equal(data, ref, check_freq=False)
+
+        resp_dem = {d: [payload_dem_dia(d, a) for a in (117, 116, 115, 114)] for d in dias}
+        resp_dem['2016-10-25'][2] = None
+        data, dias_error = procesa_por_lotes(resp_dem, dem_procesa_lote, dias_por_lote=7)
+        self.assertEqual(dias_error, ['2016-10-25'])
+        self.assertEqual(len(data['data']), 144 * (len(dias) - 1) + 6)
+        self.assertEqual(len(data['data_dias']), len(dias) - 1)
+        for d in ['2016-10-24', '2016-10-30']:
+            ref = dem_procesa_datos_dia(d, resp_dem[d])[0]
+            pd.testing.assert_frame_equal(data['data'].loc[d], ref['data'][data['data'].columns], check_freq=False)
+
+    def test_lotes_archivo_raw(self):
+        """Reprocesado por lotes del archivo raw."""
+        from esiosdata.importpvpcdata import pvpc_procesa_lote
+        from esiosdata.rawarchive import guarda_raw_dia, procesa_archivo_raw_lotes
+        from esiosdata.standin import payload_pvpc_dia
+        import pandas as pd
+
+        raw_dir = tempfile.mkdtemp()
+        try:
+            dias = pd.date_range('2016-01-01', '2016-03-31')
+            for dia in dias:
+                guarda_raw_dia('pvpc', dia, payload_pvpc_dia(dia), raw_dir=raw_dir)
+            data, num_dias, dias_error = procesa_archivo_raw_lotes('pvpc', pvpc_procesa_lote, raw_dir=raw_dir,
+                                                                   n_procesos=2)
+            self.assertEqual(num_dias, len(dias))
+            self.assertEqual(dias_error, [])
+            self.assertEqual(len(data), 24 * len(dias) - 1)
+            self.assertEqual(data.index.freq, 'h')
+        finally:
+            shutil.rmtree(raw_dir)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el almacenamiento particionado por meses de los stores locales
+
+"""
+import shutil
+import tempfile
+from unittest import TestCase
+
+
+class TestsParticiones(TestCase):
+    """Tests del almacén particionado: escritura incremental y lectura por intervalos."""
+
+    def setUp(self):
+        self.dir_test = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_test)
+
+    def test_parte_por_meses(self):
+        """Particiones mensuales en hora local (con cambio de hora y fin de mes en UTC)."""
+        import numpy as np
+        import pandas as pd
+        from esiosdata.esios_config import TZ
+        from esiosdata.particiones import parte_por_meses, meses_index, mascara_meses, PARTICION_UNICA
+
+        idx = pd.date_range('2016-02-20', '2016-04-10', freq='10min', tz=TZ)
+        df = pd.DataFrame({'dem': np.arange(len(idx), dtype=float)}, index=idx)
+        partes = parte_por_meses(df, TZ)
+        self.assertEqual(list(partes.keys()), ['2016-02', '2016-03', '2016-04'])
+        self.assertEqual(sum(len(p) for p in partes.values()), len(df))
+        self.assertEqual(partes['2016-03'].index[0], pd.Timestamp('2016-03-01', tz=TZ))
+        # Marzo de 2016, con el cambio de hora del día 27 (23 horas):
+        self.assertEqual(len(partes['2016-03']), (31 * 24 - 1) * 6)
+        self.assertEqual(meses_index(idx.tz_convert('UTC'), TZ), ['2016-02', '2016-03', '2016-04'])
+
+        idx_utc = pd.date_range('2016-01-31 22:00', periods=4, freq='h', tz='UTC')
+        partes_utc = parte_por_meses(pd.DataFrame({'a': range(4)}, index=idx_utc), TZ)
+        self.assertEqual({k: len(v) for k, v in partes_utc.items()}, {'2016-01': 1, '2016-02': 3})
+        self.assertEqual(list(parte_por_meses(pd.DataFrame({'a': [1, 2]})).keys()), [PARTICION_UNICA])
+
+        mascara = mascara_meses(idx, ['2016-04', '2016-02'], TZ)
+        self.assertEqual(mascara.sum(), len(partes['2016-02']) + len(partes['2016-04']))
+        self.assertTrue(mascara[0] and mascara[-1] and not mascara[len(partes['2016-02'])])
+        self.assertEqual(mascara_meses(idx_utc, ['2016-02'], TZ).tolist(), [False, True, True, True])
+        self.assertFalse(mascara_meses(idx, ['2017-01'], TZ).any())
+
+    def test_almacen_particionado(self):
+        """Escritura sólo de las particiones modificadas y lectura sólo de las necesarias, en cada formato."""
+        from esiosdata.particiones import HAY_PYARROW
+
+        self._test_almacen('hdf')
+        if HAY_PYARROW:
+            self._test_almacen('parquet')
+
+    def _test_almacen(self, formato):
+        import os
+        import numpy as np
+        import pandas as pd
+        from esiosdata.esios_config import TZ
+        from esiosdata.particiones import AlmacenParticionado
+
+        shutil.rmtree(self.dir_test)
+        idx = pd.date_range('2016-01-01', '2016-04-30 23:00', freq='h', tz=TZ)
+        df = pd.DataFrame({'GEN': np.random.rand(len(idx)), 'NOC': np.random.rand(len(idx))}, index=idx)
+        almacen = AlmacenParticionado(self.dir_test, TZ, formato=formato)
+        self.assertFalse(almacen.existe())
+        self.assertEqual(almacen.escribe('data', df), ['2016-01', '2016-02', '2016-03', '2016-04'])
+        self.assertEqual(almacen.escribe('data', df), [])
+        self.assertEqual(almacen.ultimo('data'), idx[-1])
+
+        # Nuevo día + corrección de un dato de febrero:
+        idx_2 = pd.date_range('2016-01-01', '2016-05-01 23:00', freq='h', tz=TZ)
+        df_2 = df.reindex(idx_2)
+        df_2.loc[idx_2[-24:]] = 1.
+        df_2.loc['2016-02-10 12:00', 'GEN'] = 0.
+        self.assertEqual(almacen.escribe('data', df_2, meses={'2016-05'}), ['2016-05'])
+        self.assertEqual(almacen.escribe('data', df_2), ['2016-02'])
+
+        # Otra instancia (otro proceso) lee el manifiesto de disco:
+        almacen_2 = AlmacenParticionado(self.dir_test, TZ, formato=formato)
+        self.assertEqual(almacen_2.particiones('data'), ['2016-01', '2016-02', '2016-03', '2016-04', '2016-05'])
+        leido = almacen_2.lee('data')
+        pd.testing.assert_frame_equal(leido, df_2)
+        self.assertEqual(leido.index.freq, 'h')
+
+        os.remove(almacen_2.path_particion('data', '2016-01'))  # Las lecturas por intervalo no la necesitan
+        tramo = almacen_2.lee('data', '2016-03-27', '2016-03-28', columns=['NOC'])
+        self.assertEqual(len(tramo), 47)
+        pd.testing.assert_frame_equal(tramo, df_2.loc['2016-03-27':'2016-03-28', ['NOC']], check_freq=False)
+        tramo = almacen_2.lee('data', pd.Timestamp('2016-04-30 22:00', tz='UTC'), '2016-05')
+        self.assertEqual(tramo.index[0], pd.Timestamp('2016-05-01', tz=TZ))
+        self.assertEqual(len(tramo), 24)
+        self.assertTrue(almacen_2.lee('data', '2017-01-01').empty)
+        with self.assertRaises(KeyError):
+            almacen_2.lee('no_existe')
+        with self.assertRaises(KeyError):
+            almacen_2.lee('data', columns=['GEN', 'VHC'])
+
+        # Sin los meses modificados, se eliminan las particiones sin datos:
+        self.assertEqual(almacen_2.escribe('data', df_2.loc['2016-03-01':]), ['2016-01', '2016-02'])
+        self.assertEqual(almacen_2.particiones('data'), ['2016-03', '2016-04', '2016-05'])
+        huecos = pd.DataFrame({'data': [3], 'intentos': [1]}, index=pd.DatetimeIndex(['2016-03-27'], name='dia'))
+        almacen_2.escribe('huecos', huecos)
+        pd.testing.assert_frame_equal(almacen_2.lee('huecos'), huecos)
+
+    def test_almacen_parquet(self):
+        """Particiones Parquet: lectura por grupos de filas y conversión de las particiones HDF5 anteriores."""
+        import os
+        import numpy as np
+        import pandas as pd
+        from esiosdata.esios_config import TZ, FILAS_GRUPO_PARQUET
+        from esiosdata.particiones import AlmacenParticionado, HAY_PYARROW
+
+        if not HAY_PYARROW:
+            print('Test de almacén Parquet omitido (sin pyarrow)')
+            return
+        import pyarrow.parquet as pq
+
+        idx = pd.date_range('2016-02-01', '2016-03-31 23:50', freq='10min', tz=TZ)
+        df = pd.DataFrame({'dem': np.random.rand(len(idx)), 'eol': np.random.rand(len(idx))}, index=idx)
+        df['ts_max'] = idx
+        almacen_hdf = AlmacenParticionado(self.dir_test, TZ, formato='hdf')
+        almacen_hdf.escribe('data', df)
+        self.assertTrue(os.path.exists(almacen_hdf.path_particion('data', '2016-02')))
+
+        almacen = AlmacenParticionado(self.dir_test, TZ, formato='parquet')
+        df_2 = df.copy()
+        df_2.loc['2016-03-27', 'dem'] = 0.
+        self.assertEqual(almacen.escribe('data', df_2), ['2016-03'])
+        self.assertEqual(almacen.formato_particion('data', '2016-02'), 'hdf')
+        self.assertEqual(almacen.formato_particion('data', '2016-03'), 'parquet')
+        self.assertFalse(os.path.exists(almacen.path_particion('data', '2016-03', 'hdf')))
+        path = almacen.path_particion('data', '2016-03')
+        self.assertEqual(pq.ParquetFile(path).metadata.num_row_groups,
+                         int(np.ceil(len(df_2.loc['2016-03']) / FILAS_GRUPO_PARQUET)))
+        pd.testing.assert_frame_equal(almacen.lee('data'), df_2)
+
+        dia = almacen.lee('data', '2016-03-27', '2016-03-27', columns=['dem', 'ts_max'])
+        self.assertEqual(len(dia), 23 * 6)
+        self.assertEqual(list(dia.columns), ['dem', 'ts_max'])
+        self.assertEqual(str(dia['ts_max'].dt.tz), str(TZ))
+        self.assertTrue((dia['dem'] == 0).all())
+        # Sólo se leen los grupos de filas del intervalo:
+        filtros = [('__index_level_0__', '>=', dia.index[0]), ('__index_level_0__', '<=', dia.index[-1])]
+        self.assertEqual(len(pq.read_table(path, filters=filtros)), len(dia))
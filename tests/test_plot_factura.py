@@ -5,6 +5,17 @@ Test Cases.
 """
 import os
 from unittest import TestCase
+from esiosdata.cachepvpc import CACHE_PVPC
+from esiosdata.esios_config import ACTUALIZA_CACHE_PVPC
+
+
+def setUpModule():
+    # Facturas con datos reales de PVPC: se descargan los que falten en el store local
+    CACHE_PVPC.actualiza = True
+
+
+def tearDownModule():
+    CACHE_PVPC.actualiza = ACTUALIZA_CACHE_PVPC
 
 
 class TestsPlotsFactura(TestCase):
@@ -30,6 +30,11 @@ class TestsPVPC(TestCase):
         self.assertIsNotNone(pvpc_mean_monthly)
         self.assertEqual(pvpc_mean_daily.empty, False)
         self.assertEqual(pvpc_mean_monthly.empty, False)
+        self.assertEqual(list(pvpc_mean_daily.columns[:5]), ['GEN', 'GEN_min', 'GEN_max', 'GEN_argmin', 'GEN_argmax'])
+        self.assertEqual(sorted(k for k in pvpc.data if k.startswith('agregados')),
+                         ['agregados_dia', 'agregados_mes', 'agregados_semana'])
+        pvpc_lect = PVPC(update=False, verbose=False, carga_completa=False)
+        self.assertEqual(len(pvpc_lect.agregados('semana')), len(pvpc.data['agregados_semana']))
 
     def test_attrs_pvpc(self):
         """Test de attributos extra de los datos de PVPC."""
@@ -88,3 +93,104 @@ class TestsPVPC(TestCase):
         self.assertEqual(data.empty, False)
 
         self.assertEqual(pvpc_procesa_datos_dia(None, data, verbose=True)[0], None)
+
+    def test_parser_pvpc(self):
+        """Test del procesado vectorizado de los datos JSON de PVPC (días normales, DST y varios días a la vez)."""
+        from esiosdata.importpvpcdata import pvpc_procesa_datos_dia, pvpc_procesa_datos_dias
+        from esiosdata.standin import payload_pvpc_dia
+        import pandas as pd
+
+        for dia, n_horas in zip(['2016-03-27', '2016-06-22', '2016-10-30'], [23, 24, 25]):
+            response = payload_pvpc_dia(dia)
+            df, ok = pvpc_procesa_datos_dia(dia, response, verbose=True)
+            self.assertEqual(ok, 0)
+            self.assertEqual(len(df), n_horas)
+            self.assertEqual(df.shape[1], 27)
+            self.assertTrue(df.index.is_unique and df.index.is_monotonic_increasing)
+            self.assertEqual(df.index[0], pd.Timestamp(dia, tz='Europe/Madrid'))
+            self.assertEqual((df.index[-1] - df.index[0]).total_seconds(), 3600 * (n_horas - 1))
+            reg = response['PVPC'][5]
+            self.assertAlmostEqual(df['GEN'].iloc[5], float(reg['GEN'].replace('.', '').replace(',', '.')))
+            self.assertAlmostEqual(df['COFNOC'].iloc[5], float(reg['COFNOC'].replace('.', '').replace(',', '.')))
+
+        responses = {d: payload_pvpc_dia(d) for d in ['2016-10-29', '2016-10-30', '2016-10-31']}
+        df_dias, ok = pvpc_procesa_datos_dias(responses, verbose=False)
+        self.assertEqual(ok, 0)
+        self.assertEqual(len(df_dias), 24 + 25 + 24)
+        df_dia, _ = pvpc_procesa_datos_dia(None, responses['2016-10-30'], verbose=False)
+        pd.testing.assert_frame_equal(df_dias.loc['2016-10-30'], df_dia, check_freq=False)
+        self.assertEqual(pvpc_procesa_datos_dias([{'PVPC': [{'Dia': '01/01/2016', 'Hora': '00-01', 'GEN': 'x'}]}],
+                                                 verbose=False)[1], -2)
+
+    def test_calc_tarifas(self):
+        """Columnas derivadas (TCU, CP, PD_) de todas las tarifas o de sólo las tarifas presentes en los datos."""
+        from esiosdata.importpvpcdata import pvpc_procesa_datos_dias, pvpc_calc_tcu_cp_feu_d
+        from esiosdata.standin import payload_pvpc_dia
+        from esiosdata.esios_config import COLS_PVPC
+        import numpy as np
+        import pandas as pd
+
+        responses = {d: payload_pvpc_dia(d) for d in ['2016-03-26', '2016-03-27', '2016-10-29', '2016-10-30']}
+        df, _ = pvpc_procesa_datos_dias(responses, verbose=False)
+        df_calc = pvpc_calc_tcu_cp_feu_d(df, verbose=False, convert_kwh=True)
+        self.assertNotIn('TCUGEN', df.columns)
+        # PD_: TEU + media diaria del TCU ponderada por COF, en días de 24, 23 y 25 horas
+        for dia, n_horas in zip(['2016-03-26', '2016-03-27', '2016-10-30'], [24, 23, 25]):
+            d = df_calc.loc[dia]
+            self.assertEqual(len(d), n_horas)
+            media = (d['TCUNOC'] * d['COFNOC']).sum() / d['COFNOC'].sum()
+            self.assertTrue(np.allclose(d['PD_NOC'], d['TEUNOC'] + media))
+        self.assertTrue(np.allclose(df_calc['TCUVHC'], df_calc['VHC'] - df_calc['TEUVHC']))
+        cols_cp = [c + 'GEN' for c in COLS_PVPC if c not in ['', 'COF', 'TEU']]
+        self.assertTrue(np.allclose(df_calc['CPGEN'], df_calc[cols_cp].sum(axis=1)))
+        for t in ['GEN', 'NOC', 'VHC']:
+            self.assertTrue(all(c + t in df_calc.columns for c in ['TCU', 'CP', 'PD_']))
+        self.assertAlmostEqual(df_calc['GEN'].iloc[0], df['GEN'].iloc[0] / 1000.)
+        self.assertAlmostEqual(df_calc['COFGEN'].iloc[0], df['COFGEN'].iloc[0])
+
+        df_noc = pvpc_calc_tcu_cp_feu_d(df[[c + 'NOC' for c in COLS_PVPC]].copy(), verbose=False)
+        self.assertEqual(len(df_noc.columns), len(COLS_PVPC) + 3)
+        pd.testing.assert_frame_equal(df_noc, df_calc[df_noc.columns])
+        pd.testing.assert_frame_equal(pvpc_calc_tcu_cp_feu_d(df_noc.copy(), verbose=False), df_noc)
+
+    def test_data_calc(self):
+        """Columnas derivadas guardadas en el store ('data_calc') y actualizadas sólo en los meses con datos nuevos."""
+        from esiosdata import PVPC
+        from esiosdata.importpvpcdata import pvpc_calc_tcu_cp_feu_d
+        import pandas as pd
+
+        pvpc = PVPC(update=True, verbose=True)
+        data, data_calc = pvpc.data['data'], pvpc.data['data_calc']
+        self.assertTrue(data_calc.index.equals(data.index))
+        df_ref = pvpc_calc_tcu_cp_feu_d(data.loc['2016-11-01':'2016-12-31'], verbose=False)
+        pd.testing.assert_frame_equal(data_calc.loc['2016-11-01':'2016-12-31'], df_ref, check_freq=False)
+
+        pvpc.data['data'] = data.copy()
+        pvpc.data['data'].loc['2016-11-10', 'GEN'] += 100.
+        pvpc._meses_modificados = {'2016-11'}
+        pvpc.post_update_data()
+        dif = (pvpc.data['data_calc']['GEN'] - data_calc['GEN']).round(6)
+        dias_dif = dif[dif != 0].index.normalize().unique().tolist()
+        self.assertEqual(dias_dif, [pd.Timestamp('2016-11-10', tz='Europe/Madrid')])
+        pd.testing.assert_frame_equal(pvpc.data['data_calc'].loc['2016-12-01':], data_calc.loc['2016-12-01':])
+
+    def test_read(self):
+        """Lectura de un intervalo de datos de PVPC con sus columnas derivadas, sin cargar todo el histórico."""
+        from esiosdata import PVPC
+        from esiosdata.importpvpcdata import pvpc_calc_tcu_cp_feu_d
+        import pandas as pd
+
+        pvpc = PVPC(update=True, verbose=True)
+        pvpc_consulta = PVPC(update=False, verbose=True, carga_completa=False)
+        self.assertTrue(pvpc_consulta.cubre_intervalo('2016-12-09'))
+        df = pvpc_consulta.read('2016-11-01', '2016-12-09', tarifa='VHC')
+        print(df.head())
+        self.assertEqual(df.index[0], pd.Timestamp('2016-11-01', tz='Europe/Madrid'))
+        self.assertEqual(df.index[-1], pd.Timestamp('2016-12-09 23:00', tz='Europe/Madrid'))
+        self.assertTrue(all(c.endswith('VHC') for c in df.columns))
+        df_ref = pvpc_calc_tcu_cp_feu_d(pvpc.data['data'].loc['2016-11-01':'2016-12-09'].copy(), verbose=False)
+        pd.testing.assert_series_equal(df['TCUVHC'], df_ref['TCUVHC'], check_freq=False, check_index_type=False)
+
+        self.assertEqual(len(pvpc_consulta.read('2016-11-01', '2016-11-01').columns), 36)
+        with self.assertRaises(KeyError):
+            pvpc_consulta.read('2016-11-01', '2016-11-02', tarifa='2.0A')
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el archivo local de respuestas 'raw' de la API de ESIOS
+
+"""
+import shutil
+import tempfile
+from unittest import TestCase
+import pandas as pd
+
+
+def _procesa_test(key_dia, response):
+    if response is None or 'valor' not in response:
+        return None, -2
+    return pd.DataFrame({'valor': [response['valor']]}, index=[pd.Timestamp(key_dia)]), 0
+
+
+class TestsRawArchive(TestCase):
+    """Tests para el archivo raw y el reprocesado offline."""
+
+    def setUp(self):
+        self.raw_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.raw_dir)
+
+    def test_archivo_raw(self):
+        """Guardado, lectura y listado de respuestas raw por día."""
+        from esiosdata.rawarchive import guarda_raw_dia, lee_raw_dia, dias_en_archivo, path_raw_dia
+
+        response_pvpc = {'PVPC': [{'Dia': '22/06/2015', 'Hora': '00-01', 'GEN': '123,45'}]}
+        response_dem = ['IND_MaxMin({"data": 1});', 'IND_DemandaRealGen({"data": [1, 2]});']
+        guarda_raw_dia('pvpc', '2015-06-22', response_pvpc, raw_dir=self.raw_dir)
+        guarda_raw_dia('dem_PENINSULA', pd.Timestamp('2015-06-22'), response_dem, raw_dir=self.raw_dir)
+        print(path_raw_dia('pvpc', '2015-06-22', raw_dir=self.raw_dir))
+        self.assertEqual(lee_raw_dia('pvpc', '2015-06-22', raw_dir=self.raw_dir), response_pvpc)
+        self.assertEqual(lee_raw_dia('dem_PENINSULA', '2015-06-22', raw_dir=self.raw_dir), response_dem)
+        self.assertIsNone(lee_raw_dia('pvpc', '2015-06-23', raw_dir=self.raw_dir))
+
+        for dia in ['2014-12-31', '2015-01-01', '2016-03-01']:
+            guarda_raw_dia('pvpc', dia, response_pvpc, raw_dir=self.raw_dir)
+        self.assertEqual(len(dias_en_archivo('pvpc', raw_dir=self.raw_dir)), 4)
+        self.assertEqual(dias_en_archivo('pvpc', '2015-01-01', '2015-12-31', raw_dir=self.raw_dir),
+                         ['2015-01-01', '2015-06-22'])
+        self.assertEqual(dias_en_archivo('otro', raw_dir=self.raw_dir), [])
+
+    def test_procesa_archivo_raw(self):
+        """Reprocesado multiproceso del archivo raw."""
+        from esiosdata.rawarchive import guarda_raw_dia, procesa_archivo_raw
+
+        dias = pd.date_range('2016-01-01', '2016-03-31')
+        for i, dia in enumerate(dias):
+            guarda_raw_dia('test', dia, {'valor': i} if i != 10 else {}, raw_dir=self.raw_dir)
+        dict_data = procesa_archivo_raw('test', _procesa_test, raw_dir=self.raw_dir, n_procesos=2)
+        self.assertEqual(len(dict_data), len(dias))
+        self.assertIsNone(dict_data['2016-01-11'])
+        self.assertEqual(dict_data['2016-03-31']['valor'].iloc[0], len(dias) - 1)
+
+        dict_data_2 = procesa_archivo_raw('test', _procesa_test, '2016-02-01', '2016-02-29',
+                                          raw_dir=self.raw_dir, n_procesos=1)
+        self.assertEqual(len(dict_data_2), 29)
+
+    def test_reprocess_conserva_historico(self):
+        """El reprocesado de un archivo raw más reciente que el store conserva el histórico anterior."""
+        import os
+        from unittest import mock
+        from esiosdata import PVPC
+        from esiosdata.rawarchive import guarda_raw_dia
+        from esiosdata.standin import payload_pvpc_dia, store_pvpc_sintetico
+
+        path_store = os.path.join(self.raw_dir, 'pvpc_test.h5')
+        raw_dir = os.path.join(self.raw_dir, 'raw')
+        pvpc = store_pvpc_sintetico(path_store, pd.date_range('2016-01-01', '2016-03-31'))
+        df = pvpc.data[pvpc.masterkey].copy()
+        pvpc.data[pvpc.masterkey].loc['2016-03-10', 'GEN'] = 0.  # Dato erróneo en el store, corregido al reprocesar
+        pvpc.save_data()
+        for dia in pd.date_range('2016-03-01', '2016-03-31'):
+            guarda_raw_dia('pvpc', dia.strftime('%Y-%m-%d'), payload_pvpc_dia(dia), raw_dir=raw_dir)
+
+        with mock.patch('esiosdata.classdataesios.PATH_DATABASE_PVPC', path_store):
+            erroneo = PVPC(update=False, verbose=False).data[pvpc.masterkey].loc['2016-03-10', 'GEN']
+            self.assertTrue((erroneo == 0).all())
+            pvpc = PVPC(update=False, verbose=False, carga_completa=False)
+            pvpc.raw_dir = raw_dir
+            self.assertTrue(pvpc.reprocess(n_procesos=1))
+            reprocesado = PVPC(update=False, verbose=False).data[pvpc.masterkey]
+            self.assertEqual(len(reprocesado), len(df))
+            self.assertEqual(reprocesado.index[0], pd.Timestamp('2016-01-01', tz='Europe/Madrid'))
+            self.assertTrue((reprocesado.loc['2016-03-10', 'GEN'] > 0).all())
+            self.assertEqual(pvpc.almacen.particiones(pvpc.masterkey), ['2016-01', '2016-02', '2016-03'])
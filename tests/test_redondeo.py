@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el redondeo exacto a céntimos de arrays (esiosdata.redondeo)
+
+"""
+from unittest import TestCase
+
+
+def _redondeo_decimal(valor):
+    from decimal import Decimal, ROUND_HALF_UP
+
+    return float(Decimal(str(valor)).quantize(Decimal('1.11'), rounding=ROUND_HALF_UP))
+
+
+class TestsRedondeo(TestCase):
+    """Tests para el redondeo ROUND_HALF_UP a céntimos, idéntico al de `Decimal(str(v)).quantize(...)`."""
+
+    def test_redondeo_igual_a_decimal(self):
+        """Valores aleatorios, con 3 decimales (empates incluidos), medios céntimos exactos y sus floats vecinos."""
+        import numpy as np
+        from esiosdata.redondeo import redondea, centimos
+
+        rs = np.random.RandomState(0)
+        milesimas = rs.randint(-10 ** 6, 10 ** 6, 20000) / 1000
+        valores = np.concatenate([rs.uniform(-1000, 1000, 20000), milesimas,
+                                  rs.randint(-10 ** 6, 10 ** 6, 20000) / 200,
+                                  np.nextafter(milesimas, np.inf), np.nextafter(milesimas, -np.inf),
+                                  rs.uniform(-1e10, 1e10, 20000), [0., -0., 1e-9, -0.004999, 0.005, -0.005]])
+        esperados = [_redondeo_decimal(v) for v in valores.tolist()]
+        redondeados = redondea(valores)
+        self.assertEqual(redondeados.tolist(), esperados)
+        self.assertEqual(np.signbit(redondeados).tolist(), np.signbit(esperados).tolist())
+        self.assertEqual(centimos(valores).tolist(), [int(round(100 * v)) for v in esperados])
+
+        for valor, redondeado in [(2.675, 2.68), (1.005, 1.01), (0.125, .13), (-2.675, -2.68), (41.264999, 41.26)]:
+            self.assertEqual(redondea(valor), redondeado)
+            self.assertIs(type(redondea(valor)), float)
+        self.assertTrue(np.isnan(redondea(np.nan)))
+
+    def test_suma_factura_empates(self):
+        """La suma de los costes por periodo de la factura mantiene el redondeo binario de Python en los empates,
+        a diferencia de `redondea` (ROUND_HALF_UP sobre la representación decimal)."""
+        from esiosdata.facturapvpc import FacturaElec
+        from esiosdata.redondeo import redondea
+
+        empates = (2.675, 0.125, 1.005)
+        self.assertEqual(FacturaElec._round_sum(empates), sum([round(v, 2) for v in empates]))
+        self.assertAlmostEqual(FacturaElec._round_sum(empates), 3.79)
+        self.assertAlmostEqual(sum(redondea(empates)), 3.82)
+        self.assertEqual(FacturaElec._round(empates), (2.68, 0.13, 1.01))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para el servidor local de pruebas con datos sintéticos de la API de ESIOS
+
+"""
+import json
+from unittest import TestCase
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+
+class TestsStandIn(TestCase):
+    """Tests para el servidor local de pruebas (formato de las respuestas, días DST, errores inyectados)."""
+
+    def test_payloads_dst(self):
+        """Respuestas sintéticas en días normales y con cambio de hora."""
+        from esiosdata.standin import payload_pvpc_dia, payload_dem_dia
+        from esiosdata.esios_config import TARIFAS, COLS_PVPC
+        from esiosdata.importdemdata import _extract_func_json_data
+
+        for dia, n_horas in zip(['2016-03-27', '2016-06-22', '2016-10-30'], [23, 24, 25]):
+            data = payload_pvpc_dia(dia)['PVPC']
+            self.assertEqual(len(data), n_horas)
+            cols = set([c + t for c in COLS_PVPC for t in TARIFAS] + ['Dia', 'Hora'])
+            self.assertEqual(set(data[0].keys()), cols)
+            self.assertEqual(data[0]['Hora'], '00-01')
+            for id_archivo in [114, 115]:
+                _, valores = _extract_func_json_data(payload_dem_dia(dia, id_archivo))
+                self.assertEqual(len(valores), n_horas * 6)
+        self.assertEqual(payload_pvpc_dia('2016-06-22'), payload_pvpc_dia('2016-06-22'))
+        dem_oct = payload_dem_dia('2016-10-30', 115)
+        self.assertEqual(dem_oct.count('2016-10-30 2A:'), 6)
+        self.assertEqual(dem_oct.count('2016-10-30 2B:'), 6)
+        self.assertTrue(payload_dem_dia('2016-10-30', 116).startswith('IND_MaxMin('))
+
+    def test_servidor(self):
+        """Peticiones HTTP al servidor local, con y sin errores inyectados."""
+        from esiosdata.standin import ServidorESIOSLocal
+
+        with ServidorESIOSLocal(fecha_ini='2016-01-01', fecha_fin='2016-12-31') as servidor:
+            url = servidor.url + '/archives/70/download_json?locale=es&date=2016-10-30'
+            data = json.loads(urlopen(url).read().decode())
+            self.assertEqual(len(data['PVPC']), 25)
+            url_dem = servidor.url + '/archives/115/download_json?locale=es&date=2016-10-30'
+            self.assertTrue(urlopen(url_dem).read().decode().startswith('IND_DemandaRealGen('))
+            data = json.loads(urlopen(servidor.url + '/archives/70/download_json?locale=es&date=2017-01-01')
+                              .read().decode())
+            self.assertEqual(data['PVPC'], [])
+            with self.assertRaises(HTTPError):
+                urlopen(servidor.url + '/indicators/1001')
+            url_ind = servidor.url + '/indicators/1293?start_date=2016-10-29T22:00:00Z&end_date=2016-10-30T22:59:59Z'
+            data = json.loads(urlopen(url_ind).read().decode())
+            self.assertEqual(len(data['indicator']['values']), 25 * 6)
+            servidor.tasa_errores = 1.
+            with self.assertRaises(HTTPError) as cm:
+                urlopen(url)
+            self.assertIn(cm.exception.code, (429, 503))
+            self.assertEqual(servidor.num_peticiones, 6)
+            self.assertEqual(servidor.num_errores, 1)
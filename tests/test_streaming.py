@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para la ingestión en streaming, día a día (esiosdata.streaming)
+
+"""
+import time
+from unittest import TestCase
+
+
+class TestsStreaming(TestCase):
+    """Tests para los generadores de datos diarios con colas acotadas."""
+
+    def test_iter_datos_dias_local(self):
+        """Pipeline descarga -> procesado -> consumidor contra el servidor local de pruebas (sin red)."""
+        from esiosdata.downloadscheduler import ControlConcurrencia
+        from esiosdata.importdemdata import dem_procesa_datos_dia
+        from esiosdata.importpvpcdata import pvpc_procesa_datos_dia
+        from esiosdata.standin import ServidorESIOSLocal
+        from esiosdata.streaming import iter_datos_dias
+
+        with ServidorESIOSLocal(fecha_ini='2016-01-01', fecha_fin='2016-12-31', latencia=.01) as servidor:
+            def _url_pvpc(key_dia):
+                return servidor.url + '/archives/70/download_json?locale=es&date=' + key_dia
+
+            def _urls_dem(key_dia):
+                return [servidor.url + '/archives/{}/download_json?locale=es&date={}'.format(i, key_dia)
+                        for i in (117, 116, 115, 114)]
+
+            for usar_asyncio in [True, False]:
+                dias = {}
+                control = ControlConcurrencia(concurrencia_ini=2, concurrencia_max=2)
+                for key_dia, df in iter_datos_dias('2016-10-25', '2016-11-03', func_url_data_dia=_url_pvpc,
+                                                   func_procesa_data_dia=pvpc_procesa_datos_dia, json_req=True,
+                                                   headers={}, num_descargas=3, tam_cola=2,
+                                                   usar_asyncio=usar_asyncio, control=control):
+                    dias[key_dia] = df
+                self.assertEqual(len(dias), 10)
+                self.assertEqual(control.resumen()['num_peticiones'], 10)
+                self.assertEqual(len(dias['2016-10-30']), 25)
+                self.assertEqual(len(dias['2016-10-29']), 24)
+
+            # Consumidor lento: las colas acotadas limitan las peticiones adelantadas
+            num_peticiones_0 = servidor.num_peticiones
+            gen = iter_datos_dias('2016-03-01', '2016-03-31', func_url_data_dia=_url_pvpc,
+                                  func_procesa_data_dia=pvpc_procesa_datos_dia, json_req=True, headers={},
+                                  num_descargas=2, tam_cola=1)
+            key_dia, df = next(gen)
+            time.sleep(.5)
+            self.assertLessEqual(servidor.num_peticiones - num_peticiones_0, 2 + 2 * 1 + 2)
+            gen.close()
+
+            # Demanda (varias urls por día) y días sin datos:
+            dias = dict(iter_datos_dias('2016-12-30', '2017-01-02', func_url_data_dia=_urls_dem,
+                                        func_procesa_data_dia=dem_procesa_datos_dia, headers={}, num_retries=1))
+            self.assertEqual(sorted(dias.keys()), ['2016-12-30', '2016-12-31', '2017-01-01', '2017-01-02'])
+            self.assertEqual(len(dias['2016-12-31']['data']), 24 * 6)
+            self.assertIsNone(dias['2017-01-02'])
+
+    def test_iter_pvpc_dem_days(self):
+        """Generadores de datos diarios de PVPC y demanda desde la API de ESIOS."""
+        from esiosdata.streaming import iter_pvpc_days, iter_dem_days
+
+        dias = dict(iter_pvpc_days('2016-10-28', '2016-11-02'))
+        self.assertEqual(len(dias), 6)
+        self.assertEqual(len(dias['2016-10-30']), 25)
+
+        dias = dict(iter_dem_days('2016-10-28', '2016-10-30'))
+        self.assertEqual(len(dias), 3)
+        self.assertTrue(all(d is not None and not d['data'].empty for d in dias.values()))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Test Cases para las bases de datos de demanda de varias zonas (esiosdata.zonas)
+
+"""
+from unittest import TestCase
+
+
+class TestsZonas(TestCase):
+    """Tests para las zonas y curvas de demanda (Península, Baleares y Canarias)."""
+
+    def test_curvas_seleccion(self):
+        """Selección de zonas y curvas."""
+        from esiosdata.esios_config import CURVAS_ZONAS
+        from esiosdata.zonas import curvas_seleccion
+
+        self.assertEqual(len(curvas_seleccion()), sum(len(c) for c in CURVAS_ZONAS.values()))
+        self.assertEqual(curvas_seleccion('peninsula'), [('PENINSULA', 'DEMANDA')])
+        self.assertEqual(curvas_seleccion(['BALEARES', ('Baleares', 'menorca'), ('CANARIAS', 'TENERIFE')]),
+                         [('BALEARES', c) for c in CURVAS_ZONAS['BALEARES']] + [('CANARIAS', 'TENERIFE')])
+        with self.assertRaises(ValueError):
+            curvas_seleccion(['MELILLA'])
+        with self.assertRaises(ValueError):
+            curvas_seleccion([('BALEARES', 'TENERIFE')])
+
+    def test_parser_zonas(self):
+        """Procesado de las respuestas de demanda.ree.es, en hora local de cada zona (días de 23 y 25 horas)."""
+        import pandas as pd
+        from esiosdata.esios_config import TZ_ZONAS
+        from esiosdata.importdemdata import dem_url_zona_dia, dem_procesa_zona_dia
+        from esiosdata.standin import payload_zona_dia
+
+        url = dem_url_zona_dia('2016-10-30', 'CANARIAS', 'LA_GOMERA')
+        self.assertIn('/WSvisionaMovilesCanariasRest/resources/demandaGeneracionCanarias?', url)
+        self.assertTrue(url.endswith('curva=LA_GOMERA&fecha=2016-10-30'))
+        for zona, curva, dia, n_horas in [('CANARIAS', 'TENERIFE', '2016-10-30', 25),
+                                          ('CANARIAS', 'EL_HIERRO', '2016-03-27', 23),
+                                          ('BALEARES', 'MALLORCA', '2016-10-30', 25),
+                                          ('BALEARES', 'IBI-FORM', '2016-06-22', 24)]:
+            payload = payload_zona_dia(dia, zona, curva)
+            data, ok = dem_procesa_zona_dia(dia, payload, TZ_ZONAS[zona])
+            self.assertEqual(ok, 0)
+            df = data['data']
+            self.assertEqual(list(data.keys()), ['data'])
+            self.assertEqual(len(df), n_horas * 6)
+            self.assertEqual(df.index.freq, '10min')
+            self.assertEqual(df.index[0], pd.Timestamp(dia, tz=TZ_ZONAS[zona]))
+            self.assertTrue(all(c in df.columns for c in ['dem', 'pre', 'pro', 'eol']))
+        self.assertEqual(payload_zona_dia('2016-10-30', 'CANARIAS', 'TENERIFE').count(' 1A:'), 6)
+        self.assertEqual(dem_procesa_zona_dia('2016-10-30', 'null'), (None, -2))
+        self.assertEqual(dem_procesa_zona_dia('2016-10-30', None), (None, -2))
+
+    def test_servidor_zonas(self):
+        """Peticiones de las curvas de Baleares y Canarias al servidor local."""
+        from urllib.error import HTTPError
+        from urllib.request import urlopen
+        from esiosdata.standin import ServidorESIOSLocal
+
+        with ServidorESIOSLocal(fecha_ini='2016-01-01', fecha_fin='2016-12-31') as servidor:
+            url = servidor.url + '/WSvisionaMovilesBalearesRest/resources/demandaGeneracionBaleares?curva={}&fecha={}'
+            body = urlopen(url.format('MENORCA', '2016-10-30')).read().decode()
+            self.assertTrue(body.startswith('angular.callbacks._0({"valoresHorariosGeneracion": ['))
+            self.assertEqual(urlopen(url.format('MENORCA', '2017-01-01')).read().decode(), 'null')
+            with self.assertRaises(HTTPError):
+                urlopen(url.format('TENERIFE', '2016-10-30'))
+
+    def test_datos_zonas(self):
+        """Actualización en paralelo de las curvas de Baleares y consulta conjunta."""
+        from esiosdata.esios_config import CURVAS_ZONAS
+        from esiosdata.zonas import DatosZonas
+
+        zonas = DatosZonas(['BALEARES', ('CANARIAS', 'LA_PALMA')], update=True, verbose=True)
+        self.assertEqual(len(zonas.handlers), len(CURVAS_ZONAS['BALEARES']) + 1)
+        data = zonas.datos('2017-01-01', '2017-01-02')
+        self.assertEqual(list(data.columns.names), ['zona', 'curva', 'columna'])
+        self.assertEqual(sorted(set(data.columns.get_level_values('zona'))), ['BALEARES', 'CANARIAS'])
+        self.assertEqual(str(data.index.tz), 'Europe/Madrid')